@@ -0,0 +1,88 @@
+"""
+Batch throughput (prompts per minute) against the number of concurrent LLM workers.
+
+    python -m benchmarks.bench_batch [prompts.jsonl] [--workers=1,2,4,8] [--slots=4] [--hosts=1] [--latency=0.2] [--llm]
+
+By default the prompts go to local stub Ollama servers that answer in
+`latency` seconds and serve `slots` requests at once each (like
+OLLAMA_NUM_PARALLEL), so throughput should grow with the worker count until it
+reaches slots x hosts. With more than one host the requests are balanced by
+the Ollama pool and its per-host latency is printed. With --llm the configured
+Ollama host(s) are used instead. Plans are drawn into the headless backend.
+"""
+import os
+import sys
+from contextlib import ExitStack
+
+from src.cad.headless_backend import HeadlessBackend
+from src.llm.stub_ollama import StubOllamaServer
+from src.plan.batch_runner import BatchRunner, load_prompts
+from src.plan.dispatcher import PlanDispatcher
+
+SAMPLE_PROMPTS = [
+    "draw a house with a pitched roof",
+    "draw 12 radial lines around 0,0 every 30 degrees with radius 50",
+    "make a 5x5 grid of circles of radius 2 spaced 10 apart starting at 0,0",
+    "draw a smooth curve through 0,0 5,5 10,0 15,5",
+    "draw 5 concentric rings at 0,0 starting at radius 2 spaced 1 apart",
+    "draw a triangle with corners 0,0 10,0 5,8",
+    "a sun at 0,0 with rays of lengths 3, 5, 4, 6, 3, 5",
+    "draw a square of side 20 centered on 50,50",
+]
+
+
+def _reply(body):
+    return {'role': 'assistant', 'content': '', 'tool_calls': [
+        {'function': {'name': 'draw_circle', 'arguments': {'center': [0, 0, 0], 'radius': 5}}},
+        {'function': {'name': 'draw_line', 'arguments': {'start': [0, 0, 0], 'end': [10, 0, 0]}}},
+    ]}
+
+
+def _make_llm():
+    from src.llm.llm_manager import LLMManager
+    llm = LLMManager()
+    llm.fast_path = None
+    llm.plan_cache = None
+    llm.session = None
+    return llm
+
+
+def run(entries, worker_counts):
+    """prompts/min for each worker count, against whatever LLM_API_URL points to."""
+    results = {}
+    for workers in worker_counts:
+        runner = BatchRunner(_make_llm, PlanDispatcher(HeadlessBackend()).run_plan, workers=workers)
+        runner.run(entries)
+        results[workers] = runner.summary
+    return results
+
+
+if __name__ == "__main__":
+    options = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    worker_counts = [int(n) for n in options.get("workers", "1,2,4,8").split(",")]
+    if args:
+        entries = load_prompts(args[0])
+    else:
+        entries = [{'id': i, 'prompt': p} for i, p in enumerate(SAMPLE_PROMPTS * 4, 1)]
+
+    if "--llm" in sys.argv:
+        results = run(entries, worker_counts)
+    else:
+        slots = int(options.get("slots", "4"))
+        hosts = int(options.get("hosts", "1"))
+        latency = float(options.get("latency", "0.2"))
+        with ExitStack() as stack:
+            servers = [stack.enter_context(StubOllamaServer(reply=_reply, latency=latency, parallel=slots))
+                       for _ in range(hosts)]
+            os.environ["LLM_API_URL"] = servers[0].url
+            os.environ["LLM_API_URLS"] = ",".join(server.url for server in servers) if hosts > 1 else ""
+            results = run(entries, worker_counts)
+        print(f"Stub Ollama: {hosts} host(s) with {slots} parallel slots each")
+        if hosts > 1:
+            from src.llm.llm_manager import LLMManager
+            print(LLMManager().pool.format_report())
+    base = results[worker_counts[0]]['prompts_per_minute']
+    for workers, summary in results.items():
+        print(f"  {workers:2d} workers: {summary['prompts']} prompts in {summary['seconds']:6.2f}s "
+              f"| {summary['prompts_per_minute']:7.1f} prompts/min | x{summary['prompts_per_minute'] / base:.1f}")
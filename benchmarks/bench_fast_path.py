@@ -0,0 +1,85 @@
+"""
+Measure how much of a prompt corpus the local command parser answers without the LLM.
+
+    python -m benchmarks.bench_fast_path [corpus.txt] [--llm]
+
+The corpus has one prompt per line; without one, a built-in sample of typical
+drafting requests is used. With --llm the prompts the parser rejects are sent
+to the configured Ollama model so both latencies can be compared.
+"""
+import sys
+import time
+
+from src.llm.command_parser import CommandParser
+
+SAMPLE_CORPUS = [
+    "circle at 5,5 radius 2",
+    "Draw a circle at (10, 20) with radius 5cm",
+    "circle radius 3 at 0,0",
+    "draw a circle at 100,100 diameter 50",
+    "line from 0,0 to 100,0",
+    "draw a line from 0,0,0 to 10 ft,0",
+    "point at 3,4",
+    "arc at 0,0 radius 5 from 0 to 90",
+    "polyline 0,0 100,0 100,50 0,50 closed",
+    "turn off layer DIM",
+    "turn on layer A-WALL",
+    "layer TEXT off",
+    "hide layer HATCH",
+    "create layer Walls color red",
+    "rename layer Layer1 to Doors",
+    "change the color of layer DIM to 3",
+    "list layers",
+    "circle at 5,5 radius 2 and then turn off layer DIM",
+    "draw a house with a pitched roof",
+    "draw 12 radial lines around 0,0 every 30 degrees",
+    "make a 5x5 grid of circles spaced 10 apart",
+    "draw a circle",
+    "trim everything",
+    "what layers are locked?",
+]
+
+
+def run(corpus, units="mm"):
+    parser = CommandParser(units=units)
+    fast, slow = [], []
+    for prompt in corpus:
+        started = time.perf_counter()
+        calls = parser.parse(prompt)
+        elapsed = time.perf_counter() - started
+        (fast if calls is not None else slow).append((prompt, elapsed))
+    return {
+        'prompts': len(corpus),
+        'fast_path': len(fast),
+        'fraction': len(fast) / len(corpus) if corpus else 0.0,
+        'fast_avg_s': sum(t for _, t in fast) / len(fast) if fast else 0.0,
+        'rejected': [prompt for prompt, _ in slow],
+    }
+
+
+def llm_latency(prompts):
+    """Average seconds per process_prompt call with the fast path disabled."""
+    from src.llm.llm_manager import LLMManager
+    llm = LLMManager()
+    llm.fast_path = None
+    llm.plan_cache = None
+    llm.session = None
+    started = time.perf_counter()
+    for prompt in prompts:
+        llm.process_prompt(prompt)
+    return (time.perf_counter() - started) / max(len(prompts), 1)
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    corpus = SAMPLE_CORPUS
+    if args:
+        with open(args[0], "r", encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    r = run(corpus)
+    print(f"Prompts: {r['prompts']}")
+    print(f"  fast path   {r['fast_path']:4d} ({r['fraction']:.0%}), avg {r['fast_avg_s'] * 1e6:8.1f} us")
+    print(f"  to the LLM  {len(r['rejected']):4d}")
+    if "--llm" in sys.argv and r['rejected']:
+        llm_s = llm_latency(r['rejected'])
+        print(f"  LLM avg     {llm_s:8.2f} s  (x{llm_s / max(r['fast_avg_s'], 1e-9):,.0f} slower)")
@@ -0,0 +1,83 @@
+"""
+Compare the original per-ray radial loop against the vectorized generators.
+
+    python -m benchmarks.bench_patterns [rays]
+"""
+import math
+import sys
+import time
+
+from src.cad import geometry
+from src.cad.headless_backend import HeadlessBackend
+
+
+def legacy_radial_segments(center, radius, angle_increment):
+    """The pre-vectorization draw_radials loop, kept as the benchmark baseline."""
+    cx, cy = float(center[0]), float(center[1])
+    cz = float(center[2]) if len(center) > 2 else 0.0
+    r = float(radius)
+    inc = float(angle_increment)
+    segments = []
+    current_angle_deg = 90.0
+    total_rotated = 0.0
+    while total_rotated < 359.9:
+        rad = math.radians(current_angle_deg)
+        segments.append((cx, cy, cz, cx + r * math.cos(rad), cy + r * math.sin(rad), cz))
+        current_angle_deg -= inc
+        total_rotated += inc
+    return segments
+
+
+def legacy_cloud_radial_segments(center, radii, angle_increment):
+    cx, cy = float(center[0]), float(center[1])
+    cz = float(center[2]) if len(center) > 2 else 0.0
+    segments = []
+    current_angle_deg = 90.0
+    for r in radii:
+        rad = math.radians(current_angle_deg)
+        segments.append((cx, cy, cz, cx + float(r) * math.cos(rad), cy + float(r) * math.sin(rad), cz))
+        current_angle_deg -= float(angle_increment)
+    return segments
+
+
+def _best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(rays=50000):
+    inc = 360.0 / rays
+    radii = [1.0 + (i % 7) for i in range(rays)]
+    results = {}
+
+    results['radials_loop_s'] = _best_of(lambda: legacy_radial_segments((0, 0, 0), 10, inc))
+    results['radials_numpy_s'] = _best_of(lambda: geometry.radial_segments((0, 0, 0), 10, inc))
+    results['cloud_loop_s'] = _best_of(lambda: legacy_cloud_radial_segments((0, 0, 0), radii, inc))
+    results['cloud_numpy_s'] = _best_of(lambda: geometry.cloud_radial_segments((0, 0, 0), radii, inc))
+
+    def loop_into_backend():
+        cad = HeadlessBackend()
+        for x1, y1, z1, x2, y2, z2 in legacy_radial_segments((0, 0, 0), 10, inc):
+            cad.add_line((x1, y1, z1), (x2, y2, z2))
+
+    def bulk_into_backend():
+        HeadlessBackend().add_lines(geometry.radial_segments((0, 0, 0), 10, inc))
+
+    results['headless_loop_s'] = _best_of(loop_into_backend, repeat=3)
+    results['headless_bulk_s'] = _best_of(bulk_into_backend, repeat=3)
+    results['rays'] = rays
+    return results
+
+
+if __name__ == "__main__":
+    rays = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    r = run(rays)
+    print(f"Rays: {r['rays']}")
+    for label in ('radials', 'cloud', 'headless'):
+        slow = r[f'{label}_loop_s']
+        fast = r[f'{label}_numpy_s'] if f'{label}_numpy_s' in r else r[f'{label}_bulk_s']
+        print(f"  {label:<9} loop {slow * 1000:8.2f} ms | vectorized {fast * 1000:8.2f} ms | x{slow / fast:5.1f}")
@@ -0,0 +1,390 @@
+"""
+Regression benchmarks for the prompt-to-drawing path, run with pytest.
+
+    python -m pytest benchmarks/bench_suite.py [--bench-json=benchmark_results.json]
+        [--bench-baseline=previous.json] [--bench-tolerance=1.5] [--bench-rounds=5] [--com-latency=0.0002]
+
+AutoCAD is replaced by the recording COM stand-in, which counts every COM call
+and sleeps `--com-latency` seconds per call like a cross-process round-trip,
+and Ollama by a local stub server that answers with the recorded tool-call
+responses in recorded_responses.json. Results (timings and COM call counts)
+go to a JSON file; pass an earlier one as the baseline to catch regressions.
+The file name keeps the suite out of the regular `python -m pytest` run.
+"""
+import json
+import math
+import os
+
+import pytest
+
+from src.cad import geometry
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+from src.llm.stub_ollama import StubOllamaServer
+from src.plan.dispatcher import PlanDispatcher
+from src.plan.point_simplifier import PointSimplifier
+
+RECORDED = os.path.join(os.path.dirname(__file__), "recorded_responses.json")
+
+
+def _load_recorded():
+    with open(RECORDED, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _tool_calls(message):
+    """Tool calls of a recorded reply, including the ones written out as JSON content."""
+    if message.get('tool_calls'):
+        return message['tool_calls']
+    return [{'function': item} for item in json.loads(message['content'])]
+
+
+@pytest.fixture(scope="module")
+def recorded():
+    return _load_recorded()
+
+
+@pytest.fixture(scope="module")
+def stub_ollama(recorded):
+    replies = {entry['prompt']: entry['message'] for entry in recorded}
+
+    def reply(body):
+        prompt = [m for m in body['messages'] if m.get('role') == 'user'][-1]['content']
+        return replies.get(prompt, {'role': 'assistant', 'content': ''})
+
+    with StubOllamaServer(reply=reply, parallel=4) as server:
+        yield server
+
+
+@pytest.fixture
+def autocad(com_latency):
+    """Factory for a fresh client attached to a recording application; returns (client, app)."""
+    def make():
+        app = RecordingApplication(latency=com_latency)
+        cad = AutoCADClient()
+        cad.attach(app)
+        return cad, app
+    return make
+
+
+def _com_metrics(cad, app):
+    return {'com_calls': app.log.total, 'entities': cad.entity_count()}
+
+
+def _headless_metrics(cad):
+    return {'entities': cad.entity_count()}
+
+
+# --- LLM ------------------------------------------------------------------
+
+
+def test_process_prompt(bench, stub_ollama, recorded, monkeypatch):
+    """process_prompt over every recorded reply: request, response parsing and plan passes."""
+    from src.llm.llm_manager import LLMManager
+    monkeypatch.setenv("LLM_API_URL", stub_ollama.url)
+    monkeypatch.setenv("LLM_API_URLS", "")
+    monkeypatch.setenv("PLAN_CACHE", "0")
+    monkeypatch.setenv("FAST_PATH", "0")
+    monkeypatch.setenv("LLM_SESSION", "0")
+    llm = LLMManager()
+    parsed = []
+
+    def run():
+        stub_ollama.requests.clear()
+        parsed[:] = [len(llm.process_prompt(entry['prompt'])[0]) for entry in recorded]
+
+    entry = bench(run, metrics=lambda: {'llm_requests': len(stub_ollama.requests), 'tool_calls': sum(parsed)})
+    assert parsed == [len(_tool_calls(e['message'])) for e in recorded]
+    assert entry['llm_requests'] == len(recorded)
+
+
+# --- Dispatch loop -------------------------------------------------------
+
+
+def test_dispatch_recorded_plans(bench, autocad, recorded):
+    """Every recorded plan through PlanDispatcher.run_plan, the loop main.py runs per prompt."""
+    plans = [_tool_calls(entry['message']) for entry in recorded]
+
+    def setup():
+        cad, app = autocad()
+        return PlanDispatcher(cad, verbose=False), app
+
+    def run(dispatcher, app):
+        for plan in plans:
+            dispatcher.run_plan(plan)
+
+    entry = bench(run, setup=setup, metrics=lambda d, app: _com_metrics(d.cad, app))
+    headless = PlanDispatcher(HeadlessBackend(), verbose=False)
+    for plan in plans:
+        headless.run_plan(plan)
+    assert entry['entities'] == headless.cad.entity_count()
+
+
+def test_dispatch_recorded_plans_headless(bench, recorded):
+    plans = [_tool_calls(entry['message']) for entry in recorded]
+
+    def setup():
+        return PlanDispatcher(HeadlessBackend(), verbose=False),
+
+    def run(dispatcher):
+        for plan in plans:
+            dispatcher.run_plan(plan)
+
+    bench(run, setup=setup, metrics=lambda d: _headless_metrics(d.cad))
+
+
+# --- Composite drawing ---------------------------------------------------
+
+
+@pytest.mark.parametrize("angle_increment", [5.0, 1.0, 0.1])
+def test_draw_radials(bench, autocad, angle_increment):
+    rays = len(geometry.radial_segments((0, 0, 0), 100.0, angle_increment))
+    entry = bench(lambda cad, app: cad.draw_radials((0, 0, 0), 100.0, angle_increment),
+                  setup=autocad, metrics=_com_metrics)
+    assert entry['entities'] == rays + 1
+
+
+@pytest.mark.parametrize("angle_increment", [1.0, 0.1])
+def test_draw_radials_headless(bench, angle_increment):
+    bench(lambda cad: cad.draw_radials((0, 0, 0), 100.0, angle_increment),
+          setup=lambda: (HeadlessBackend(),), metrics=_headless_metrics)
+
+
+@pytest.mark.parametrize("rays", [72, 1000])
+def test_cloud_radials(bench, autocad, rays):
+    radii = [10.0 + (i % 13) * 0.5 for i in range(rays)]
+    entry = bench(lambda cad, app: cad.cloud_radials((0, 0, 0), radii, 360.0 / rays),
+                  setup=autocad, metrics=_com_metrics)
+    assert entry['entities'] == rays
+
+
+@pytest.mark.parametrize("points", [10, 200, 2000])
+def test_add_spline(bench, autocad, points):
+    pts = [(i * 0.5, 10.0 * math.sin(i * 0.1), 0.0) for i in range(points)]
+    entry = bench(lambda cad, app: cad.add_spline(pts), setup=autocad, metrics=_com_metrics)
+    assert entry['entities'] == 1
+
+
+POINT_TOLERANCE = 0.01
+
+
+@pytest.mark.parametrize("simplified", [False, True])
+@pytest.mark.parametrize("points", [200, 2000])
+def test_draw_spline_step(bench, autocad, points, simplified):
+    """A draw_spline step with `points` fit points, as the model sent it or after the point simplification pass."""
+    # The same wave (100 units long, 10 high) however many points describe it
+    pts = [[100.0 * i / points, 10.0 * math.sin(10.0 * i / points)] for i in range(points)]
+    plan = [{'function': {'name': 'draw_spline', 'arguments': {'points': pts}}}]
+    simplifier = PointSimplifier(enabled=simplified, tolerance=POINT_TOLERANCE)
+
+    def run(cad, app):
+        PlanDispatcher(cad, verbose=False).run_plan(simplifier.optimize(plan))
+
+    def metrics(cad, app):
+        report = simplifier.last_report or {'max_deviation': 0.0}
+        return {**_com_metrics(cad, app), 'fit_points': len(app.ActiveDocument.ModelSpace.entities[0].geometry['points']),
+                'max_deviation': report['max_deviation']}
+
+    entry = bench(run, setup=autocad, metrics=metrics)
+    assert entry['max_deviation'] <= POINT_TOLERANCE
+    # About sqrt(8 * r * tolerance) apart along the wave, whatever the input density
+    assert entry['fit_points'] < 150 if simplified else entry['fit_points'] == points
+
+
+# --- Layers --------------------------------------------------------------
+
+
+def _layered(autocad, count):
+    """A client whose drawing already has `count` layers, created outside the assistant."""
+    def setup():
+        cad, app = autocad()
+        for i in range(count):
+            app.ActiveDocument.Layers.Add(f"L{i:05d}")
+        app.log.reset()
+        return cad, app
+    return setup
+
+
+def _layer_metrics(cad, app):
+    return {'com_calls': app.log.total, 'layers': len(cad.get_layers_info())}
+
+
+@pytest.mark.parametrize("count", [50, 500])
+def test_create_layers(bench, autocad, count):
+    def run(cad, app):
+        for i in range(count):
+            cad.create_layer(f"NEW{i:05d}", i % 255 + 1)
+
+    entry = bench(run, setup=autocad, metrics=_layer_metrics)
+    assert entry['layers'] == count + 1
+
+
+@pytest.mark.parametrize("count", [50, 500])
+def test_layer_operations(bench, autocad, count):
+    """list, recolor, toggle and rename every layer of a drawing that has `count` of them."""
+    def run(cad, app):
+        cad.get_layers_info()
+        for i in range(count):
+            name = f"L{i:05d}"
+            cad.change_layer_color(name, i % 255 + 1)
+            cad.set_layer_status(name, i % 2 == 0)
+            cad.rename_layer(name, f"R{i:05d}")
+        cad.get_layers_info()
+
+    entry = bench(run, setup=_layered(autocad, count), metrics=_layer_metrics)
+    assert entry['layers'] == count + 1
+
+
+# Simulated prompt evaluation cost for the layer summary (about 100k tokens/s)
+LAYER_SECONDS_PER_TOKEN = 0.00001
+
+
+def _standard_layers(count):
+    """A headless drawing with `count` layers named like a CAD layer standard, some off, frozen or locked."""
+    cad = HeadlessBackend()
+    for i in range(count):
+        layer = cad.create_layer(f"{'AEMS'[i % 4]}-{('WALL', 'DOOR', 'GLAZ', 'LITE', 'DIMS')[i % 5]}-{i:05d}", i % 9 + 1)
+        layer.update(is_on=i % 10 != 0, is_frozen=i % 25 == 0, is_locked=i % 40 == 0)
+    return cad
+
+
+@pytest.mark.parametrize("mode", ["digest", "full_json"])
+@pytest.mark.parametrize("count", [1000, 5000])
+def test_list_layers_summary(bench, monkeypatch, count, mode):
+    """list_layers with the model writing the summary: the token-budgeted digest vs the whole layer table as JSON."""
+    from src.llm.llm_manager import LLMManager
+    reply = lambda body: {'role': 'assistant', 'content': 'Most layers are on.'}
+    with StubOllamaServer(reply=reply, seconds_per_token=LAYER_SECONDS_PER_TOKEN) as server:
+        monkeypatch.setenv("LLM_API_URL", server.url)
+        monkeypatch.setenv("LLM_API_URLS", "")
+        # The model is unloaded after every request, so no round reuses the previous prompt
+        monkeypatch.setenv("OLLAMA_KEEP_ALIVE", "0")
+        llm = LLMManager()
+        cad = _standard_layers(count)
+        dispatcher = PlanDispatcher(cad, llm, verbose=False)
+
+        def run():
+            server.requests.clear()
+            if mode == "digest":
+                plan = [{'function': {'name': 'list_layers', 'arguments': {}}}]
+                dispatcher.summarize_layers(plan, dispatcher.run_plan(plan))
+                return
+            # What list_layers used to send
+            prompt = f"The user asked about layers. Here is the technical data of the layers: {json.dumps(cad.get_layers_info())}."
+            llm.client.chat(model=llm.model, messages=[{'role': 'user', 'content': prompt}], keep_alive=llm.keep_alive)
+
+        entry = bench(run, metrics=lambda: {'layers': count, 'prompt_tokens': server.requests[-1]['prompt_tokens']})
+    if mode == "digest":
+        assert entry['prompt_tokens'] < 600
+    else:
+        assert entry['prompt_tokens'] > 10 * count
+
+
+# --- Model-space snapshot ------------------------------------------------
+
+
+def _existing_drawing(com_latency, count):
+    """A client attached to a drawing that already holds `count` lines and circles, created without latency."""
+    app = RecordingApplication()
+    space = app.ActiveDocument.ModelSpace
+    for i in range(count):
+        if i % 2:
+            space.AddCircle((i, 5.0, 0.0), 0.5)
+        else:
+            space.AddLine((i, 0.0, 0.0), (i, 1.0, 0.0))
+    cad = AutoCADClient()
+    cad.attach(app)
+    app.log.latency = com_latency
+    return cad, app
+
+
+def _snapshot_metrics(cad, app):
+    return {'com_calls': app.log.total, 'entities': len(cad.snapshot()),
+            'bytes_per_entity': round(cad.snapshot().bytes_per_entity(), 1)}
+
+
+@pytest.mark.parametrize("count", [200, 1000])
+def test_snapshot_full_sync(bench, com_latency, count):
+    def setup():
+        cad, app = _existing_drawing(com_latency, count)
+        app.log.reset()
+        return cad, app
+
+    entry = bench(lambda cad, app: cad.snapshot(), setup=setup, metrics=_snapshot_metrics)
+    assert entry['entities'] == count
+
+
+@pytest.mark.parametrize("count", [2000, 20000])
+def test_snapshot_incremental_sync(bench, com_latency, count):
+    """Sync after 10 entities were erased and 10 added outside the assistant."""
+    def setup():
+        cad, app = _existing_drawing(0.0, count)
+        cad.snapshot()
+        space = app.ActiveDocument.ModelSpace
+        for entity in space.entities[::count // 10][:10]:
+            entity.Delete()
+        for i in range(10):
+            space.AddPoint((i, -5.0, 0.0))
+        app.log.latency = com_latency
+        app.log.reset()
+        return cad, app
+
+    entry = bench(lambda cad, app: cad.snapshot(), setup=setup, metrics=_snapshot_metrics)
+    assert entry['entities'] == count
+
+
+# --- Selection -------------------------------------------------------------
+
+
+SELECTION_LAYERS = ["0", "WALLS", "DOORS", "A-DIM"]
+
+
+def _layered_entities(count):
+    """(layer, kind, args) for `count` lines and circles spread over four layers and a 1000 x 1000 area."""
+    for i in range(count):
+        x, y = float((i * 7919) % 1000), float((i * 104729) % 1000)
+        if i % 2:
+            yield SELECTION_LAYERS[i % 4], 'circle', ((x, y, 0.0), 1.0)
+        else:
+            yield SELECTION_LAYERS[i % 4], 'line', ((x, y, 0.0), (x + 2, y + 1, 0.0))
+
+
+@pytest.mark.parametrize("count", [10000, 100000])
+def test_select_entities_headless(bench, count):
+    cad = HeadlessBackend()
+    for name in SELECTION_LAYERS[1:]:
+        cad.create_layer(name, 1)
+    for layer, kind, args in _layered_entities(count):
+        cad.set_current_layer(layer)
+        getattr(cad, 'add_' + kind)(*args)
+    cad.spatial_index()
+
+    def run():
+        cad.count_entities('circle', 'WALL*')
+        cad.select_entities('line', corner1=(100, 100), corner2=(300, 200))
+
+    bench(run, metrics=lambda: {'entities': cad.entity_count()})
+
+
+def test_select_entities_autocad(bench, com_latency):
+    """Filters run inside 'AutoCAD': the COM calls do not grow with the 20k entities."""
+    app = RecordingApplication()
+    space = app.ActiveDocument.ModelSpace
+    for layer, kind, args in _layered_entities(20000):
+        entity = space.AddCircle(*args) if kind == 'circle' else space.AddLine(*args)
+        entity.layer = layer
+    cad = AutoCADClient()
+    cad.attach(app)
+    app.log.latency = com_latency
+
+    def setup():
+        app.log.reset()
+        return ()
+
+    def run():
+        cad.count_entities('circle', 'WALL*')
+        cad.select_entities('line', corner1=(100, 100), corner2=(300, 200), limit=20)
+
+    entry = bench(run, setup=setup, metrics=lambda: {'com_calls': app.log.total})
+    assert entry['com_calls'] < 100
@@ -0,0 +1,82 @@
+"""
+Compare sending every tool schema against sending only the top-k relevant ones.
+
+    python -m benchmarks.bench_tool_selection [corpus.txt] [--k=6] [--llm]
+
+Offline, the tool-schema size per prompt is estimated (about four characters per
+token). With --llm every prompt is sent to the configured Ollama model twice, with
+all tools and with the ranked subset, and Ollama's prompt_eval_count and
+prompt_eval_duration are compared.
+"""
+import os
+import sys
+
+from src.llm.tool_registry import ToolRegistry, estimate_tokens
+
+SAMPLE_CORPUS = [
+    "draw a house with a pitched roof",
+    "draw 12 radial lines around 0,0 every 30 degrees with radius 50",
+    "make a 5x5 grid of circles of radius 2 spaced 10 apart starting at 0,0",
+    "which layers are locked?",
+    "draw a smooth curve through 0,0 5,5 10,0 15,5",
+    "copy a circle of radius 1 along the points 0,0 10,10 20,0",
+    "draw 5 concentric rings at 0,0 starting at radius 2 spaced 1 apart",
+    "a sun at 0,0 with rays of lengths 3, 5, 4, 6, 3, 5",
+    "put the walls on a new red layer and hide the dimensions layer",
+    "draw a triangle with corners 0,0 10,0 5,8",
+]
+
+
+def _manager():
+    os.environ.setdefault("PLAN_CACHE", "0")
+    from src.llm.llm_manager import LLMManager
+    llm = LLMManager()
+    llm.fast_path = None
+    llm.plan_cache = None
+    llm.session = None
+    return llm
+
+
+def run(corpus, k=6):
+    llm = _manager()
+    tools = llm.get_tool_definitions()
+    registry = ToolRegistry(tools, top_k=k)
+    full = estimate_tokens(tools)
+    selected = [estimate_tokens(registry.select(prompt)) for prompt in corpus]
+    return {
+        'prompts': len(corpus),
+        'tools': len(tools),
+        'full_tokens': full,
+        'selected_avg_tokens': sum(selected) / len(selected) if selected else 0,
+    }
+
+
+def run_llm(corpus, k=6):
+    llm = _manager()
+    totals = {}
+    for label, top_k in (('all', 0), (f'top{k}', k)):
+        llm.tool_registry.top_k = top_k
+        tokens = seconds = retries = 0
+        for prompt in corpus:
+            llm.process_prompt(prompt)
+            tokens += llm.last_eval['prompt_tokens'] or 0
+            seconds += llm.last_eval['prompt_eval_seconds']
+            retries += llm.last_eval['retried']
+        totals[label] = (tokens / len(corpus), seconds / len(corpus), retries)
+    return totals
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    k = int(next((a.split("=", 1)[1] for a in sys.argv[1:] if a.startswith("--k=")), 6))
+    corpus = SAMPLE_CORPUS
+    if args:
+        with open(args[0], "r", encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    r = run(corpus, k)
+    print(f"Prompts: {r['prompts']}, tools: {r['tools']}")
+    print(f"  tool schemas  all {r['full_tokens']:6d} tokens | top-{k} avg {r['selected_avg_tokens']:8.0f} tokens "
+          f"| -{1 - r['selected_avg_tokens'] / r['full_tokens']:.0%}")
+    if "--llm" in sys.argv:
+        for label, (tokens, seconds, retries) in run_llm(corpus, k).items():
+            print(f"  {label:<6} prompt_eval_count {tokens:8.0f} | prompt_eval {seconds:6.2f} s | retries {retries}")
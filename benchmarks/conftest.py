@@ -0,0 +1,153 @@
+"""
+Fixtures for the pytest benchmark suite (benchmarks/bench_suite.py).
+
+Every benchmark is timed over a few rounds and its deterministic counters (COM
+calls, LLM requests, entities) are kept next to the timings. At the end of the
+run all results are written as JSON, and with --bench-baseline a previous
+results file is used to fail benchmarks that got slower or chattier.
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import pytest
+
+RESULTS_VERSION = 1
+# Counters that must never grow between releases
+COUNTERS = ('com_calls', 'llm_requests')
+# Timing differences below this are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.002
+
+_results_key = pytest.StashKey[dict]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "CAD assistant benchmarks")
+    group.addoption("--bench-json", default=os.getenv("BENCH_RESULTS_PATH", "benchmark_results.json"),
+                    help="file the benchmark results are written to")
+    group.addoption("--bench-baseline", default=os.getenv("BENCH_BASELINE", ""),
+                    help="results file of an earlier run to compare against")
+    group.addoption("--bench-tolerance", type=float, default=float(os.getenv("BENCH_TOLERANCE", "1.5")),
+                    help="allowed slowdown of the median against the baseline")
+    group.addoption("--bench-rounds", type=int, default=int(os.getenv("BENCH_ROUNDS", "5")),
+                    help="timed rounds per benchmark")
+    group.addoption("--com-latency", type=float, default=float(os.getenv("BENCH_COM_LATENCY", "0.0002")),
+                    help="simulated seconds per COM call")
+
+
+def _option(config, name, default):
+    try:
+        return config.getoption(name)
+    except ValueError:
+        # Collected from the repository root, where this conftest is not an initial one
+        return default
+
+
+def _load_baseline(config):
+    path = _option(config, "bench_baseline", "")
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get('benchmarks', {})
+
+
+def regressions(name, entry, baseline, tolerance):
+    """Reasons `entry` is worse than its baseline entry, if any."""
+    reasons = []
+    base = baseline.get(name)
+    if not base:
+        return reasons
+    limit = base['median'] * tolerance
+    if entry['median'] > limit and entry['median'] - base['median'] > MIN_REGRESSION_SECONDS:
+        reasons.append(f"median {entry['median'] * 1000:.2f}ms > {tolerance:g} x baseline {base['median'] * 1000:.2f}ms")
+    for counter in COUNTERS:
+        if counter in entry and counter in base and entry[counter] > base[counter]:
+            reasons.append(f"{counter} {entry[counter]} > baseline {base[counter]}")
+    return reasons
+
+
+class Bench:
+    """
+    Times `fn(*setup())` over several rounds. `setup` builds fresh state for
+    each round outside the timed part; `metrics(state)` reads the counters of
+    the last round. Returns the recorded entry (timings in seconds plus metrics).
+    """
+
+    def __init__(self, name, config, results, baseline):
+        self.name = name
+        self.rounds = _option(config, "bench_rounds", 5)
+        self.tolerance = _option(config, "bench_tolerance", 1.5)
+        self._results = results
+        self._baseline = baseline
+
+    def __call__(self, fn, setup=None, metrics=None, rounds=None):
+        timings = []
+        state = ()
+        for _ in range(rounds or self.rounds):
+            state = setup() if setup else ()
+            started = time.perf_counter()
+            fn(*state)
+            timings.append(time.perf_counter() - started)
+        entry = {
+            'rounds': len(timings),
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.fmean(timings),
+            'max': max(timings),
+        }
+        if metrics:
+            entry.update(metrics(*state))
+        self._results[self.name] = entry
+        reasons = regressions(self.name, entry, self._baseline, self.tolerance)
+        if reasons:
+            pytest.fail(f"{self.name} regressed: " + "; ".join(reasons))
+        return entry
+
+
+@pytest.fixture(scope="session")
+def com_latency(pytestconfig):
+    return _option(pytestconfig, "com_latency", 0.0002)
+
+
+@pytest.fixture(scope="session")
+def _bench_baseline(pytestconfig):
+    return _load_baseline(pytestconfig)
+
+
+@pytest.fixture
+def bench(request, pytestconfig, _bench_baseline):
+    results = pytestconfig.stash.setdefault(_results_key, {})
+    name = request.node.name
+    return Bench(name[5:] if name.startswith("test_") else name, pytestconfig, results, _bench_baseline)
+
+
+def pytest_sessionfinish(session):
+    results = session.config.stash.get(_results_key, None)
+    if not results:
+        return
+    path = _option(session.config, "bench_json", "benchmark_results.json")
+    report = {
+        'v': RESULTS_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'com_latency': _option(session.config, "com_latency", 0.0002),
+        'benchmarks': dict(sorted(results.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(_results_key, None)
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, entry in sorted(results.items()):
+        counters = " ".join(f"{k}={v}" for k, v in entry.items()
+                            if k not in ('rounds', 'min', 'median', 'mean', 'max'))
+        terminalreporter.write_line(f"{name:40s} median {entry['median'] * 1000:9.2f}ms  min {entry['min'] * 1000:9.2f}ms  {counters}")
+    terminalreporter.write_line(f"Results written to {_option(config, 'bench_json', 'benchmark_results.json')}")
@@ -24,7 +24,28 @@ def build():
         '--hidden-import=win32com.client',
         '--hidden-import=pythoncom',
         '--hidden-import=src.cad.autocad_client',
+        '--hidden-import=src.cad.backend',
+        '--hidden-import=src.cad.com_executor',
+        '--hidden-import=src.cad.headless_backend',
+        '--hidden-import=src.cad.geometry',
+        '--hidden-import=src.cad.selection',
+        '--hidden-import=src.cad.simplify',
+        '--hidden-import=src.cad.snapshot',
+        '--hidden-import=src.cad.spatial_index',
         '--hidden-import=src.llm.llm_manager',
+        '--hidden-import=src.llm.command_parser',
+        '--hidden-import=src.llm.ollama_pool',
+        '--hidden-import=src.llm.plan_cache',
+        '--hidden-import=src.llm.stream_parser',
+        '--hidden-import=src.llm.tool_registry',
+        '--hidden-import=src.plan.batch_runner',
+        '--hidden-import=src.plan.block_instancer',
+        '--hidden-import=src.plan.dispatcher',
+        '--hidden-import=src.plan.layer_report',
+        '--hidden-import=src.plan.plan_file',
+        '--hidden-import=src.plan.point_simplifier',
+        '--hidden-import=src.plan.polyline_coalescer',
+        '--hidden-import=src.tracing',
     ])
 
     # Copy .env.example to dist folder for convenience
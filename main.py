@@ -1,19 +1,40 @@
 def main():
     import sys
     import os
-    import json
+    import argparse
     import shutil
+    import time
+    from concurrent.futures import Future
+    from contextlib import nullcontext
 
     # Ensure .env exists
     if not os.path.exists(".env") and os.path.exists(".env.example"):
         print("[*] .env file not found. Creating from .env.example...")
         shutil.copy(".env.example", ".env")
 
+    parser = argparse.ArgumentParser(description="AutoCAD AI Assistant")
+    parser.add_argument("--batch", metavar="PROMPTS_JSONL", help="run the prompts in a JSONL file instead of the interactive prompt")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "4")), help="concurrent LLM requests in batch mode")
+    parser.add_argument("--report", default=os.getenv("BATCH_REPORT", "batch_report.jsonl"), help="per-prompt JSONL report written in batch mode")
+    vector = lambda text: tuple(float(v) for v in text.split(","))
+    parser.add_argument("--replay", metavar="PLANS_JSONL", help="execute recorded plans without the LLM")
+    parser.add_argument("--shift", type=vector, default=(0.0, 0.0, 0.0), help="replay: move the geometry by dx,dy[,dz]")
+    parser.add_argument("--scale", type=float, default=1.0, help="replay: scale positions and lengths around --about")
+    parser.add_argument("--about", type=vector, default=(0.0, 0.0, 0.0), help="replay: base point for --scale (x,y[,z])")
+    cli = parser.parse_args()
+
     try:
-        from src.cad.autocad_client import AutoCADClient
+        from src.cad.backend import create_backend
+        from src.cad.com_executor import ComExecutor
         from src.llm.llm_manager import LLMManager
-        import win32com.client
-        import pythoncom
+        from src.plan.batch_runner import BatchRunner, load_prompts
+        from src.plan.block_instancer import BlockInstancer
+        from src.plan.dispatcher import PlanDispatcher
+        from src.plan.layer_report import LayerReporter
+        from src.plan.plan_file import PlanRecorder, format_replay_report, load_plans, replay_plans
+        from src.plan.point_simplifier import PointSimplifier
+        from src.plan.polyline_coalescer import PolylineCoalescer
+        from src.tracing import Tracer, set_tracer
     except ImportError as e:
         print(f"\n[!] IMPORT ERROR: {e}")
         print("This usually means a library is missing from the compiled executable.")
@@ -21,100 +42,260 @@ def main():
 
     print("--- AutoCAD AI Assistant ---")
     
-    cad = AutoCADClient()
+    if cli.replay:
+        # Recorded plans go straight to the CAD backend; no model is loaded
+        cad = create_backend()
+        if not cad.connect():
+            print("Could not connect to AutoCAD. Please make sure it is open.")
+            return
+        plans = load_plans(cli.replay)
+        print(f"[*] Replaying {len(plans)} plans from '{cli.replay}'.")
+        stats = replay_plans(PlanDispatcher(cad, verbose=False), plans, cli.shift, cli.scale, cli.about)
+        print(format_replay_report(stats))
+        dxf_path = os.getenv("HEADLESS_DXF_PATH")
+        if cad.name == 'headless' and dxf_path:
+            cad.save_dxf(dxf_path)
+        return
+
+    # Per-request timing spans; installed before the backend so its COM calls are traced too
+    tracer = set_tracer(Tracer.from_env())
+
+    llm = LLMManager()
+    if os.getenv("OLLAMA_WARMUP", "1") != "0":
+        # Load the model while the CAD connection is being set up
+        llm.warm_up(background=True)
+
+    executor = None
+    if os.getenv("COM_EXECUTOR", "1") != "0":
+        # AutoCAD is driven from one worker thread, so drawing never blocks the prompt loop
+        executor = ComExecutor(create_backend, max_queue=int(os.getenv("COM_QUEUE_SIZE", "64")))
+        cad = executor.proxy
+    else:
+        cad = create_backend()
     if not cad.connect():
         print("Could not connect to AutoCAD. Please make sure it is open.")
         # sys.exit(1) # Uncomment for production
 
-    llm = LLMManager()
+    coalescer = PolylineCoalescer(
+        enabled=os.getenv("POLYLINE_COALESCING", "1") != "0",
+        tolerance=float(os.getenv("POLYLINE_TOLERANCE", "1e-6")),
+    )
+    simplifier = PointSimplifier(
+        enabled=os.getenv("POINT_SIMPLIFICATION", "1") != "0",
+        tolerance=float(os.getenv("POINT_TOLERANCE", "0.01")),
+    )
+    instancer = BlockInstancer(enabled=os.getenv("BLOCK_INSTANCING", "1") != "0")
+    # Executed plans are kept so they can be replayed later with --replay
+    record_path = os.getenv("PLAN_RECORD_PATH", "recorded_plans.jsonl")
+    recorder = PlanRecorder(record_path) if record_path else None
     
     print(f"[*] Configuration Loaded:")
     print(f"    - Model: {llm.model}")
     print(f"    - API URL: {llm.api_url or 'Ollama Default (localhost:11434)'}")
-    print(f"    - CAD: AutoCAD (via COM)")
+    print(f"    - CAD: {'Headless (in-memory)' if cad.name == 'headless' else 'AutoCAD (via COM)'}")
+
+    layer_reporter = LayerReporter(
+        mode=os.getenv("LAYER_SUMMARY", "llm"),
+        max_tokens=int(os.getenv("LAYER_SUMMARY_TOKENS", "400")),
+        page_size=int(os.getenv("LAYER_PAGE_SIZE", "50")),
+    )
+    dispatcher = PlanDispatcher(cad, llm, layer_reporter=layer_reporter)
     
-    while True:
+    def dispatch(fn, *args):
+        """Run `fn` on the COM thread when there is one; returns a Future either way."""
+        if executor is not None:
+            return executor.submit(fn, *args)
+        future = Future()
         try:
-            user_input = input("\n[CAD AI] > ")
-            if user_input.lower() in ['exit', 'quit']:
-                break
-                
-            print("Processing request...")
-            tool_calls, ai_content = llm.process_prompt(user_input)
-            
-            if not tool_calls:
-                if ai_content:
-                    print(f"\nAI: {ai_content}")
-                else:
-                    print("LLM did not identify any CAD commands.")
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    # Plans still being drawn on the COM thread, with their prompt, tool calls and the session turn and trace they belong to
+    pending = []
+
+    def finish_trace(root):
+        """Export a finished request trace and print its one-line timing summary."""
+        if root is not None:
+            print(tracer.finish(root))
+
+    def collect_results(wait=False):
+        """Record the results of finished plans in the session they came from, and the plans in the plan file."""
+        for entry in list(pending):
+            prompt, future, tool_calls, turn, root = entry
+            if not wait and not future.done():
                 continue
+            pending.remove(entry)
+            try:
+                # Layer summaries are written by the model here, on this thread, not on the COM thread
+                results = dispatcher.summarize_layers(tool_calls, future.result())
+            except Exception as e:
+                print(f"Error while drawing: {e}")
+                continue
+            finally:
+                finish_trace(root)
+            if recorder is not None:
+                # Only plans that ran through without errors are worth replaying
+                recorder.record(prompt, tool_calls, results)
+            if llm.session is not None:
+                # Let follow-up prompts know what was actually drawn
+                llm.session.record_results(results, turn)
+
+    def run_streaming(user_input):
+        """Execute tool calls while the LLM is still generating the rest of the plan."""
+        started = time.perf_counter()
+        steps = []
+        calls = []
+        if not cad.ensure_connected():
+            print("[!] CAD backend is not reachable; skipping this prompt.")
+            return
+        # Plan-level passes (coalescing, instancing) need the whole plan, so they are skipped here;
+        # point simplification works call by call
+        with cad.batch():
+            for call in llm.stream_prompt(user_input):
+                call, = simplifier.optimize([call])
+                calls.append(call)
+                steps.append(dispatch(dispatcher.draw_step, len(steps) + 1, call['function']['name'], call['function']['arguments'], True))
+        done = [future.result() for future in steps]
+        summaries = dispatcher.summarize_layers(calls, [(func_name, result) for func_name, result, _ in done])
+        drawn = [finished for func_name, _, finished in done
+                 if func_name.startswith('draw_') or func_name.endswith('_array') or func_name == 'insert_block']
+        first_entity = min(drawn) - started if drawn else None
+
+        if llm.session is not None:
+            llm.session.record_results(summaries)
+        if recorder is not None:
+            recorder.record(user_input, calls, summaries)
+        if llm.last_fast_path:
+            print("[*] Parsed locally (fast path).")
+        elif llm.last_cache_hit:
+            print("[*] Plan served from cache.")
+        if not steps:
+            print(f"\nAI: {llm.last_content}" if llm.last_content else "LLM did not identify any CAD commands.")
+            return
+        stats = llm.last_stream
+        first = f"{first_entity:.2f}s" if first_entity is not None else "n/a"
+        print(f"[*] Streaming: {len(steps)} steps, first entity after {first}, "
+              f"generation finished after {stats['seconds']:.2f}s, all steps done after {time.perf_counter() - started:.2f}s.")
+
+    streaming = os.getenv("LLM_STREAMING", "0") == "1"
+    drawing_context = os.getenv("DRAWING_CONTEXT", "0") == "1"
+
+    def repl():
+        """Interactive prompt loop."""
+        while True:
+            try:
+                user_input = input("\n[CAD AI] > ")
+                if user_input.lower() in ['exit', 'quit']:
+                    break
+                if user_input.lower() in ['reset', 'new'] and llm.session is not None:
+                    llm.session.reset()
+                    print("[*] Conversation history cleared.")
+                    continue
                 
-            print(f"Total steps to execute: {len(tool_calls)}")
-            for i, call in enumerate(tool_calls, 1):
-                func_name = call['function']['name']
-                args = call['function']['arguments']
-                
-                print(f"[Step {i}/{len(tool_calls)}] Executing: {func_name}")
-                
-                try:
-                    if func_name == 'draw_line':
-                        cad.add_line(tuple(args['start']), tuple(args['end']))
-                    elif func_name == 'draw_circle':
-                        cad.add_circle(tuple(args['center']), args['radius'])
-                    elif func_name == 'draw_point':
-                        cad.add_point(tuple(args['point']))
-                    elif func_name == 'draw_arc':
-                        cad.add_arc(tuple(args['center']), args['radius'], args['start_angle'], args['end_angle'])
-                    elif func_name == 'draw_spline':
-                        cad.add_spline(
-                            args['points'], 
-                            args.get('start_angle', 15.0), 
-                            args.get('end_angle', 15.0)
-                        )
-                    elif func_name == 'trim_entities':
-                        cad.trim()
-                    elif func_name == 'list_layers':
-                        layers = cad.get_layers_info()
-                        # Add a second LLM pass to explain the layers to the user
-                        print(f"Retrieved {len(layers)} layers. Generating summary...")
-                        summary_prompt = f"The user asked about layers. Here is the technical data of the layers: {json.dumps(layers)}. Please summarize this for the user in a friendly way, highlighting which ones are off or locked."
-                        summary_response = llm.client.chat(
-                            model=llm.model,
-                            messages=[{'role': 'user', 'content': summary_prompt}]
-                        )
-                        print(f"\n[Layers Summary]:\n{summary_response['message']['content']}")
-                    elif func_name == 'set_layer_status':
-                        success = cad.set_layer_status(args['layer_name'], args['is_on'])
-                        status_str = "ON" if args['is_on'] else "OFF"
-                        if success:
-                            print(f"[*] Layer '{args['layer_name']}' successfully turned {status_str}.")
+                collect_results()
+                if drawing_context:
+                    # Synced incrementally, so only entities added or erased since the last prompt are read
+                    llm.drawing_context = cad.drawing_summary()
+                print("Processing request...")
+                # The trace stays open until the plan has been drawn on the COM thread
+                with (tracer.request(prompt=user_input) if tracer is not None else nullcontext()) as root:
+                    if streaming:
+                        run_streaming(user_input)
+                        finish_trace(root)
+                        continue
+
+                    tool_calls, ai_content = llm.process_prompt(user_input)
+                    if llm.last_fast_path:
+                        print("[*] Parsed locally (fast path).")
+                    elif llm.last_cache_hit:
+                        print("[*] Plan served from cache.")
+                    elif llm.last_eval and llm.last_eval['prompt_tokens']:
+                        e = llm.last_eval
+                        print(f"[*] Prompt eval: {e['prompt_tokens']} tokens in {e['prompt_eval_seconds']:.2f}s "
+                              f"({e['tools_sent']} tools sent{', retried with all tools' if e['retried'] else ''}).")
+
+                    if not tool_calls:
+                        if ai_content:
+                            print(f"\nAI: {ai_content}")
                         else:
-                            print(f"[!] Failed to turn {status_str} the layer '{args['layer_name']}'.")
-                    elif func_name == 'create_layer':
-                        color = args.get('color', 7)
-                        cad.create_layer(args['layer_name'], color)
-                        print(f"[*] Layer '{args['layer_name']}' created with color {color}.")
-                    elif func_name == 'rename_layer':
-                        cad.rename_layer(args['old_name'], args['new_name'])
-                        print(f"[*] Layer '{args['old_name']}' renamed to '{args['new_name']}'.")
-                    elif func_name == 'change_layer_color':
-                        cad.change_layer_color(args['layer_name'], args['color'])
-                        print(f"[*] Layer '{args['layer_name']}' color set to {args['color']}.")
-                    elif func_name == 'draw_radials':
-                        cad.draw_radials(args['center'], args['radius'], args['angle_increment'])
-                        print(f"[*] Radial pattern created at {args['center']} with radius {args['radius']}.")
-                    elif func_name == 'draw_cloud_radials':
-                        cad.cloud_radials(args['center'], args['radii'], args.get('angle_increment', 20.0))
-                        print(f"[*] Cloud radial pattern created at {args['center']} with {len(args['radii'])} lines.")
-                    else:
-                        print(f"Unsupported command: {func_name}")
-                except Exception as step_error:
-                    print(f"Error in step {i}: {step_error}")
-                    
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            print(f"Error: {e}")
+                            print("LLM did not identify any CAD commands.")
+                        finish_trace(root)
+                        continue
+
+                    tool_calls = coalescer.optimize(tool_calls)
+                    if coalescer.last_report:
+                        print(coalescer.format_report())
+                    tool_calls = simplifier.optimize(tool_calls)
+                    if simplifier.last_report:
+                        print(simplifier.format_report())
+                    tool_calls = instancer.optimize(tool_calls)
+                    if instancer.last_report:
+                        print(instancer.format_report())
+
+                    print(f"Total steps to execute: {len(tool_calls)}")
+                    turn = llm.session.turns[-1] if llm.session is not None and llm.session.turns else None
+                    pending.append((user_input, dispatch(dispatcher.run_plan, tool_calls), tool_calls, turn, root))
+                    if dispatcher.summarizes_layers(tool_calls):
+                        # The user asked a question; answer it before the next prompt
+                        collect_results(wait=True)
+                if executor is not None:
+                    print(f"[*] Drawing in the background (COM queue depth {executor.depth}); ready for the next prompt.")
+                collect_results()
+
+            except KeyboardInterrupt:
+                break
+            except Exception as e:
+                print(f"Error: {e}")
+
+    def run_batch(path, workers, report_path):
+        """Plan a file of prompts with concurrent LLM requests and draw them in order."""
+        entries = load_prompts(path)
+
+        def make_llm():
+            # Batch prompts stand alone, so workers keep no conversation history
+            worker = LLMManager()
+            worker.session = None
+            return worker
+
+        runner = BatchRunner(
+            make_llm,
+            lambda tool_calls: dispatcher.summarize_layers(tool_calls, dispatch(dispatcher.run_plan, tool_calls).result()),
+            workers=workers,
+            passes=[coalescer, simplifier, instancer],
+            recorder=recorder,
+        )
+        print(f"[*] Batch: {len(entries)} prompts from '{path}' with {runner.workers} LLM workers.")
+        runner.run(entries, report_path)
+        print(runner.format_report())
+        if report_path:
+            print(f"[*] Per-prompt report written to '{report_path}'.")
+
+    if cli.batch:
+        run_batch(cli.batch, cli.workers, cli.report)
+    else:
+        repl()
+
+    collect_results(wait=True)
+    if llm.plan_cache is not None:
+        print(llm.plan_cache.format_report())
+    if llm.fast_path is not None and llm.format_fast_path_report():
+        print(llm.format_fast_path_report())
+    if llm.session is not None and llm.session.format_report():
+        print(llm.session.format_report())
+    if llm.pool is not None:
+        print(llm.pool.format_report())
+    if tracer is not None and tracer.requests and tracer.path:
+        print(f"[*] {tracer.requests} request traces written to '{tracer.path}'.")
+
+    dxf_path = os.getenv("HEADLESS_DXF_PATH")
+    if cad.name == 'headless' and dxf_path:
+        cad.save_dxf(dxf_path)
+    if executor is not None:
+        if executor.format_report():
+            print(executor.format_report())
+        executor.shutdown()
 
 if __name__ == "__main__":
     try:
@@ -1,61 +1,437 @@
-import win32com.client
-import pythoncom
+import math
+import os
+import queue
+import threading
 import time
 from array import array
 
-class AutoCADClient:
-    def __init__(self):
+from src import tracing
+from src.cad import geometry
+from src.cad.backend import CADBackend
+from src.cad.selection import KIND_NAMES, OBJECT_DXF_TYPES, SELECT_ALL, SELECT_CROSSING, SELECT_WINDOW, selection_filter
+from src.cad.snapshot import ModelSpaceSnapshot
+from src.cad.spatial_index import SpatialIndex
+
+try:
+    import win32com.client
+    import pythoncom
+except ImportError:
+    # Without pywin32 the client can still drive a stand-in such as RecordingApplication.
+    win32com = None
+    pythoncom = None
+
+# Name of the selection set the query methods build and delete again
+SELECTION_SET_NAME = "AI_QUERY"
+
+PROG_IDS = [
+    "AutoCAD.Application",
+    "AutoCAD.Application.25",
+    "AutoCAD.Application.24.1",
+    "AutoCAD.Application.24",
+    "AutoCAD.Application.23.1",
+    "AutoCAD.Application.23",
+    "AutoCAD.Application.22",
+    "AutoCAD.Application.21",
+    "AutoCAD.Application.20.1",
+    "AutoCAD.Application.20",
+]
+
+# HRESULTs meaning the AutoCAD process went away (RPC server unavailable, call failed,
+# object disconnected, server died, object not connected)
+_DISCONNECTED = {code - 2 ** 32 for code in (0x800706BA, 0x800706BE, 0x80010108, 0x80010007, 0x800401FD)}
+
+class AutoCADClient(CADBackend):
+    name = "autocad"
+
+    def __init__(self, get_active_object=None, prog_id_file=None):
+        # Looks up a running COM server by ProgID; tests pass a FakeComProvider
+        self.get_active_object = get_active_object or (win32com.client.GetActiveObject if win32com else None)
+        self.prog_id_file = prog_id_file if prog_id_file is not None else os.getenv("AUTOCAD_PROGID_FILE", ".autocad_progid")
+        self.probe_timeout = float(os.getenv("AUTOCAD_PROBE_TIMEOUT", "10"))
+        self.reconnect_attempts = int(os.getenv("AUTOCAD_RECONNECT_ATTEMPTS", "5"))
+        self.reconnect_delay = float(os.getenv("AUTOCAD_RECONNECT_DELAY", "0.5"))
+        # Opt-in: a batch flush skips primitives queued more than once (reported as 'duplicates')
+        self.drop_duplicates = os.getenv("AUTOCAD_DROP_DUPLICATES", "0") == "1"
+        self.connection_stats = None
+        self.reconnects = 0
         self.app = None
         self.doc = None
         self.model_space = None
+        self._batch = None
+        self._batch_depth = 0
+        self.last_flush = None
+        self._blocks = set()
+        # Layer table cache: lower-case name -> {'info': {...}, 'com': layer object}
+        self._layers = None
+        self._layer_count = 0
+        # Model-space snapshot and the spatial index built from it, both loaded on first use
+        self._snapshot = None
+        self._index = None
+        self._indexed_count = 0
 
-    def connect(self):
-        """Connect to a running instance of AutoCAD using win32com."""
-        prog_ids = [
-            "AutoCAD.Application",
-            "AutoCAD.Application.25",
-            "AutoCAD.Application.24.1",
-            "AutoCAD.Application.24",
-            "AutoCAD.Application.23.1",
-            "AutoCAD.Application.23",
-            "AutoCAD.Application.22",
-            "AutoCAD.Application.21",
-            "AutoCAD.Application.20.1",
-            "AutoCAD.Application.20",
-        ]
-        
-        last_error = None
+    @property
+    def connected(self):
+        return self.model_space is not None
+
+    def attach(self, app):
+        """Bind the client to an AutoCAD application object (or a compatible stand-in)."""
+        self.app = app
+        self._bind_document(app.ActiveDocument)
+        return True
+
+    def _bind_document(self, doc):
+        if tracing.get_tracer() is not None:
+            # Every call on the document tree is charged to the open trace span
+            doc = tracing.TracedCom.wrap(doc)
+        self.doc = doc
+        self.model_space = doc.ModelSpace
+        # Block and layer tables belong to the document, and so do the snapshot and spatial index
+        self._blocks = set()
+        self.invalidate_layers()
+        self._snapshot = None
+        self._index = None
+
+    def _check_document(self):
+        """Follow the user to another drawing, dropping per-document caches."""
+        if self.app is None:
+            return
+        doc = self.app.ActiveDocument
+        if doc != tracing.TracedCom.unwrap(self.doc):
+            if self._batch:
+                # Queued primitives were meant for the drawing that was active when queued
+                self.flush()
+            self._bind_document(doc)
+
+    def _load_prog_id(self):
+        if not self.prog_id_file:
+            return None
+        try:
+            with open(self.prog_id_file, "r", encoding="utf-8") as f:
+                prog_id = f.read().strip()
+        except OSError:
+            return None
+        return prog_id or None
+
+    def _save_prog_id(self, prog_id):
+        if not self.prog_id_file:
+            return
+        try:
+            with open(self.prog_id_file, "w", encoding="utf-8") as f:
+                f.write(prog_id)
+        except OSError as e:
+            print(f"[!] Could not remember the AutoCAD ProgID: {e}")
+
+    def _probe(self, prog_id, results):
+        """Worker thread: report whether a running instance answers to `prog_id`."""
+        if pythoncom is not None:
+            pythoncom.CoInitialize()
+        try:
+            # The proxy belongs to this thread's apartment, so it is dropped right away
+            self.get_active_object(prog_id)
+            results.put((prog_id, None))
+        except Exception as e:
+            results.put((prog_id, e))
+        finally:
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+
+    def _probe_all(self, prog_ids):
+        """Look up every ProgID concurrently; returns (first ProgID that answered, last error)."""
+        results = queue.Queue()
         for prog_id in prog_ids:
+            threading.Thread(target=self._probe, args=(prog_id, results), daemon=True).start()
+        deadline = time.monotonic() + self.probe_timeout
+        last_error = None
+        for _ in prog_ids:
             try:
-                print(f"[*] Trying to connect via '{prog_id}'...")
-                # win32com.client.GetActiveObject is generally more robust for running apps
-                self.app = win32com.client.GetActiveObject(prog_id)
-                self.doc = self.app.ActiveDocument
-                self.model_space = self.doc.ModelSpace
-                print(f"[+] Successfully connected via '{prog_id}'.")
-                return True
+                prog_id, error = results.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                return None, last_error or TimeoutError("Timed out probing AutoCAD ProgIDs")
+            if error is None:
+                return prog_id, None
+            last_error = error
+        return None, last_error
+
+    def connect(self):
+        """
+        Connect to a running instance of AutoCAD using win32com.
+
+        The ProgID that worked last time is tried first; if it fails, the other
+        known ProgIDs are probed concurrently and the first one that answers is
+        remembered for the next start. Timing is kept in `connection_stats`.
+        """
+        if self.get_active_object is None:
+            print("Error connecting to AutoCAD: pywin32 is not installed on this machine.")
+            return False
+
+        started = time.perf_counter()
+        cached = self._load_prog_id()
+        prog_id, last_error, probed = None, None, 0
+        if cached:
+            try:
+                self.attach(self.get_active_object(cached))
+                prog_id = cached
             except Exception as e:
-                # print(f"    [-] Connection failed for '{prog_id}': {e}")
                 last_error = e
-                continue
-        
-        print(f"Error connecting to AutoCAD: {last_error}")
-        print("Tip: Make sure AutoCAD is open and a drawing is active.")
+        if prog_id is None:
+            candidates = [p for p in PROG_IDS if p != cached]
+            probed = len(candidates)
+            found, error = self._probe_all(candidates)
+            last_error = error or last_error
+            if found is not None:
+                try:
+                    # Bind on the calling thread, which is the one that will use the objects
+                    self.attach(self.get_active_object(found))
+                    prog_id = found
+                    self._save_prog_id(found)
+                except Exception as e:
+                    last_error = e
+
+        seconds = time.perf_counter() - started
+        self.connection_stats = {'prog_id': prog_id, 'seconds': seconds, 'cached': prog_id is not None and prog_id == cached,
+                                 'probed': probed, 'reconnects': self.reconnects}
+        if prog_id is None:
+            print(f"Error connecting to AutoCAD: {last_error}")
+            print("Tip: Make sure AutoCAD is open and a drawing is active.")
+            return False
+        how = "remembered ProgID" if self.connection_stats['cached'] else f"probed {probed} ProgIDs in parallel"
+        print(f"[+] Connected via '{prog_id}' in {seconds * 1000:.0f} ms ({how}).")
+        return True
+
+    @staticmethod
+    def is_disconnect(error):
+        """True when `error` is a COM error meaning the AutoCAD process is gone."""
+        hresult = getattr(error, 'hresult', None)
+        if hresult is None and getattr(error, 'args', None) and isinstance(error.args[0], int):
+            hresult = error.args[0]
+        return hresult in _DISCONNECTED
+
+    def reconnect(self):
+        """Reconnect after the COM server went away, backing off between attempts."""
+        self.model_space = None
+        delay = self.reconnect_delay
+        for attempt in range(1, self.reconnect_attempts + 1):
+            print(f"[*] Reconnecting to AutoCAD (attempt {attempt}/{self.reconnect_attempts})...")
+            if self.connect():
+                self.reconnects += 1
+                self.connection_stats['reconnects'] = self.reconnects
+                return True
+            if attempt < self.reconnect_attempts:
+                time.sleep(delay)
+                delay = min(delay * 2, 8.0)
         return False
 
+    def ensure_connected(self):
+        """Check that AutoCAD still answers (one property read) and reconnect if it went away."""
+        if self.app is None:
+            return self.connect()
+        try:
+            self.app.ActiveDocument
+            return True
+        except Exception as e:
+            if not self.is_disconnect(e):
+                raise
+            print("[!] Lost the connection to AutoCAD.")
+            return self.reconnect()
+
+    def recover(self, error):
+        return self.is_disconnect(error) and self.reconnect()
+
+    def entity_count(self):
+        if not self.model_space: return 0
+        return self.model_space.Count
+
     def _get_double_array(self, point):
         """Convert a point to a win32com-compatible double array."""
+        if win32com is None:
+            return self._point3(point)
         if len(point) == 2:
             return win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, (float(point[0]), float(point[1]), 0.0))
         return win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, (float(point[0]), float(point[1]), float(point[2])))
 
+    def begin_batch(self):
+        """Start queuing primitives instead of sending each one to AutoCAD immediately."""
+        if self._batch is None:
+            self._batch = []
+        self._batch_depth += 1
+
+    def end_batch(self):
+        """Close a batch level; the outermost level flushes the queue."""
+        if self._batch_depth == 0:
+            return None
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            return self.flush()
+        return None
+
+    def _queue(self, kind, args):
+        """Queue a primitive if a batch is open. Returns True when it was queued."""
+        if self._batch is None:
+            return False
+        self._batch.append((kind, args))
+        return True
+
+    @staticmethod
+    def _polar_fan(lines):
+        """
+        Detect lines sharing a start point with equal length and a constant angular step.
+        Returns the AutoCAD ArrayPolar fill angle (radians) or None if the run is not a fan.
+        """
+        (cx, cy, cz), _ = lines[0]
+        lengths = []
+        angles = []
+        for _, (ex, ey, ez) in lines:
+            if abs(ez - cz) > 1e-9:
+                return None
+            lengths.append(math.hypot(ex - cx, ey - cy))
+            angles.append(math.atan2(ey - cy, ex - cx))
+        if lengths[0] < 1e-12 or any(abs(l - lengths[0]) > 1e-9 * max(1.0, lengths[0]) for l in lengths):
+            return None
+        steps = [math.remainder(b - a, 2 * math.pi) for a, b in zip(angles, angles[1:])]
+        step = steps[0]
+        if abs(step) < 1e-9 or any(abs(s - step) > 1e-9 for s in steps):
+            return None
+        if abs(abs(step) * len(lines) - 2 * math.pi) < 1e-6:
+            return 2 * math.pi
+        fill = step * (len(lines) - 1)
+        return fill if abs(fill) < 2 * math.pi else None
+
+    def _emit(self, kind, args, variant, space=None):
+        """Create one primitive in model space or a block definition (exactly one COM call)."""
+        space = space if space is not None else self.model_space
+        if kind == 'line':
+            created = space.AddLine(variant(args[0]), variant(args[1]))
+        elif kind == 'circle':
+            created = space.AddCircle(variant(args[0]), args[1])
+        elif kind == 'point':
+            created = space.AddPoint(variant(args[0]))
+        elif kind == 'arc':
+            created = space.AddArc(variant(args[0]), args[1], args[2], args[3])
+        elif kind == 'spline':
+            created = space.AddSpline(*self._spline_arrays(*args))
+        elif kind == 'polyline':
+            created = self._add_lwpolyline(space, *args)
+        elif kind == 'insert':
+            created = space.InsertBlock(variant(args[0]), args[1], 1.0, 1.0, 1.0, args[2])
+        else:
+            raise ValueError(f"Unknown primitive '{kind}'")
+        if space is self.model_space:
+            self._track(kind, args)
+        return created
+
+    def _track(self, kind, args):
+        """Add a primitive this client created in model space to the spatial index, once it is loaded."""
+        if self._index is not None:
+            self._index.insert(kind, args)
+            self._indexed_count += 1
+
+    def _send(self, ops, space, stats):
+        """
+        Create `ops` in `space`, sharing point VARIANTs and collapsing runs of equal rays
+        around a common center into one AddLine plus one ArrayPolar. Updates `stats`.
+        """
+        variants = {}
+
+        def variant(point):
+            v = variants.get(point)
+            if v is None:
+                v = variants[point] = self._get_double_array(point)
+            return v
+
+        i = 0
+        while i < len(ops):
+            kind, args = ops[i]
+            try:
+                if kind == 'line':
+                    j = i + 1
+                    while j < len(ops) and ops[j][0] == 'line' and ops[j][1][0] == args[0]:
+                        j += 1
+                    fill = self._polar_fan([op[1] for op in ops[i:j]]) if j - i >= 3 else None
+                    if fill is not None:
+                        seed = self._emit(kind, args, variant, space)
+                        stats['com_calls'] += 1
+                        stats['entities'] += 1
+                        try:
+                            seed.ArrayPolar(j - i, fill, variant(args[0]))
+                            stats['com_calls'] += 1
+                            stats['entities'] += j - i - 1
+                            if space is self.model_space:
+                                for op in ops[i + 1:j]:
+                                    self._track(*op)
+                            i = j
+                        except Exception as e:
+                            # The remaining rays fall back to individual AddLine calls
+                            stats['errors'] += 1
+                            print(f"Error in ArrayPolar, drawing rays one by one: {e}")
+                            i += 1
+                        continue
+                self._emit(kind, args, variant, space)
+                stats['com_calls'] += 1
+                stats['entities'] += 1
+            except Exception as e:
+                stats['errors'] += 1
+                print(f"Error flushing {kind}: {e}")
+            i += 1
+        return stats
+
+    def flush(self):
+        """
+        Send every queued primitive to AutoCAD in as few COM operations as possible.
+        Point VARIANTs are shared, runs of equal rays around a common center become one
+        AddLine plus one ArrayPolar, and the whole flush is a single undo step. Every
+        queued primitive is drawn, exact duplicates included, unless `drop_duplicates`
+        is set. Throughput and the number of dropped duplicates are stored in `last_flush`.
+        """
+        ops = self._batch or []
+        self._batch = [] if self._batch_depth > 0 else None
+        if not ops or not self.model_space:
+            return None
+        if not self.ensure_connected():
+            # Otherwise every queued primitive would fail on its own
+            print(f"[!] AutoCAD is not reachable; {len(ops)} queued entities were not drawn.")
+            return None
+
+        started = time.perf_counter()
+        unique = list(dict.fromkeys(ops)) if self.drop_duplicates else ops
+        stats = {'queued': len(ops), 'duplicates': len(ops) - len(unique), 'entities': 0, 'com_calls': 0, 'errors': 0}
+        if stats['duplicates']:
+            print(f"[*] Dropped {stats['duplicates']} duplicate queued entities.")
+        grouped = len(unique) > 1
+        with tracing.span('flush', queued=len(ops)) as trace:
+            if grouped:
+                self.doc.StartUndoMark()
+                stats['com_calls'] += 1
+            try:
+                self._send(unique, self.model_space, stats)
+            finally:
+                if grouped:
+                    self.doc.EndUndoMark()
+                    stats['com_calls'] += 1
+            if trace is not None:
+                trace.set(entities=stats['entities'])
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['entities_per_sec'] = stats['entities'] / stats['seconds'] if stats['seconds'] > 0 else float('inf')
+        self.last_flush = stats
+        print(f"[+] Flushed {stats['entities']} entities with {stats['com_calls']} COM calls "
+              f"in {stats['seconds']:.3f}s ({stats['entities_per_sec']:.0f} entities/sec).")
+        return stats
+
+    def add_lines(self, segments):
+        """Queue a whole (N, 6) segment array; it is sent with the enclosing batch flush."""
+        if not self.model_space: return 0
+        rows = segments.tolist() if hasattr(segments, 'tolist') else segments
+        with self.batch():
+            self._batch.extend(('line', (self._point3(r[0:3]), self._point3(r[3:6]))) for r in rows)
+        return len(rows)
+
     def add_line(self, start_point, end_point):
         """Add a line to the model space."""
         if not self.model_space: return None
+        args = (self._point3(start_point), self._point3(end_point))
+        if self._queue('line', args): return None
         try:
-            start = self._get_double_array(start_point)
-            end = self._get_double_array(end_point)
-            return self.model_space.AddLine(start, end)
+            return self._emit('line', args, self._get_double_array)
         except Exception as e:
             print(f"Error in add_line: {e}")
             raise e
@@ -63,9 +439,10 @@ class AutoCADClient:
     def add_circle(self, center, radius):
         """Add a circle to the model space."""
         if not self.model_space: return None
+        args = (self._point3(center), float(radius))
+        if self._queue('circle', args): return None
         try:
-            c = self._get_double_array(center)
-            return self.model_space.AddCircle(c, float(radius))
+            return self._emit('circle', args, self._get_double_array)
         except Exception as e:
             print(f"Error in add_circle: {e}")
             raise e
@@ -73,9 +450,10 @@ class AutoCADClient:
     def add_point(self, point):
         """Add a point to the model space."""
         if not self.model_space: return None
+        args = (self._point3(point),)
+        if self._queue('point', args): return None
         try:
-            p = self._get_double_array(point)
-            return self.model_space.AddPoint(p)
+            return self._emit('point', args, self._get_double_array)
         except Exception as e:
             print(f"Error in add_point: {e}")
             raise e
@@ -83,52 +461,501 @@ class AutoCADClient:
     def add_arc(self, center, radius, start_angle, end_angle):
         """Add an arc to the model space."""
         if not self.model_space: return None
+        args = (self._point3(center), float(radius), float(start_angle), float(end_angle))
+        if self._queue('arc', args): return None
         try:
-            c = self._get_double_array(center)
-            return self.model_space.AddArc(c, float(radius), float(start_angle), float(end_angle))
+            return self._emit('arc', args, self._get_double_array)
         except Exception as e:
             print(f"Error in add_arc: {e}")
             raise e
 
+    def _spline_arrays(self, points, start_angle, end_angle):
+        """Build the fit-point and tangent arrays expected by ModelSpace.AddSpline."""
+        flattened = []
+        for pt in points:
+            if len(pt) == 2:
+                flattened.extend([float(pt[0]), float(pt[1]), 0.0])
+            else:
+                flattened.extend([float(pt[0]), float(pt[1]), float(pt[2])])
+
+        # Convert degrees to vectors for AutoCAD
+        # We assume the tangents are in the XY plane for natural user input
+        s_rad = math.radians(float(start_angle))
+        e_rad = math.radians(float(end_angle))
+
+        s_vec = [math.cos(s_rad), math.sin(s_rad), 0.0]
+        e_vec = [math.cos(e_rad), math.sin(e_rad), 0.0]
+
+        if win32com is None:
+            return flattened, s_vec, e_vec
+        pts_array = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, flattened)
+        start_tan = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, s_vec)
+        end_tan = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, e_vec)
+        return pts_array, start_tan, end_tan
+
+    def _add_lwpolyline(self, space, points, closed):
+        """One AddLightWeightPolyline call with all vertices in a single flat double array."""
+        flattened = []
+        for pt in points:
+            flattened.extend((float(pt[0]), float(pt[1])))
+        if win32com is not None:
+            flattened = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, flattened)
+        polyline = space.AddLightWeightPolyline(flattened)
+        if closed:
+            polyline.Closed = True
+        elevation = float(points[0][2]) if len(points[0]) > 2 else 0.0
+        if elevation:
+            polyline.Elevation = elevation
+        return polyline
+
+    def add_polyline(self, points, closed=False):
+        """Add a lightweight polyline (2D, at the elevation of the first vertex)."""
+        if not self.model_space: return None
+        args = (tuple(self._point3(p) for p in points), bool(closed))
+        if self._queue('polyline', args): return None
+        try:
+            return self._emit('polyline', args, self._get_double_array)
+        except Exception as e:
+            print(f"Error in add_polyline: {e}")
+            raise e
+
     def add_spline(self, points, start_angle=15.0, end_angle=15.0):
         """Add a spline to the model space with tangent angles (in degrees)."""
         if not self.model_space: return None
+        args = (tuple(self._point3(p) for p in points), float(start_angle), float(end_angle))
+        if self._queue('spline', args): return None
         try:
-            import math
-            flattened = []
-            for pt in points:
-                if len(pt) == 2:
-                    flattened.extend([float(pt[0]), float(pt[1]), 0.0])
-                else:
-                    flattened.extend([float(pt[0]), float(pt[1]), float(pt[2])])
-            
-            # Convert degrees to vectors for AutoCAD
-            # We assume the tangents are in the XY plane for natural user input
-            s_rad = math.radians(float(start_angle))
-            e_rad = math.radians(float(end_angle))
-            
-            s_vec = [math.cos(s_rad), math.sin(s_rad), 0.0]
-            e_vec = [math.cos(e_rad), math.sin(e_rad), 0.0]
-
-            pts_array = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, flattened)
-            start_tan = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, s_vec)
-            end_tan = win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_R8, e_vec)
-            
-            return self.model_space.AddSpline(pts_array, start_tan, end_tan)
+            return self._emit('spline', args, self._get_double_array)
         except Exception as e:
             print(f"Error in add_spline: {e}")
             raise e
 
+    def _add_seed(self, kind, args):
+        """Create a primitive immediately (after any queued ones) and return its COM object."""
+        if self._batch:
+            self.flush()
+        return self._emit(kind, args, self._get_double_array)
+
+    def define_block(self, name, entities):
+        """Define a block once from entity specs in block-local coordinates."""
+        if not self.doc: return False
+        try:
+            if name in self._blocks:
+                return True
+            try:
+                self.doc.Blocks.Item(name)
+                self._blocks.add(name)
+                return True
+            except Exception:
+                pass
+            block = self.doc.Blocks.Add(self._get_double_array((0.0, 0.0, 0.0)), name)
+            stats = {'entities': 0, 'com_calls': 0, 'errors': 0}
+            self._send([self._entity_args(e) for e in entities], block, stats)
+            self._blocks.add(name)
+            print(f"[+] Block '{name}' defined with {stats['entities']} entities.")
+            return True
+        except Exception as e:
+            print(f"Error defining block: {e}")
+            return False
+
+    def insert_block(self, name, insertion_point, rotation=0.0):
+        """Insert a reference to a defined block; rotation in degrees."""
+        if not self.model_space: return None
+        args = (self._point3(insertion_point), str(name), math.radians(float(rotation)))
+        if self._queue('insert', args): return None
+        try:
+            return self._emit('insert', args, self._get_double_array)
+        except Exception as e:
+            print(f"Error in insert_block: {e}")
+            raise e
+
+    def polar_array(self, entity, center, count, fill_angle=360.0):
+        """Create the seed once and let AutoCAD replicate it with ArrayPolar."""
+        if not self.model_space: return 0
+        # Checked before the seed is placed, so a bad count draws nothing
+        count = geometry.polar_count(count)
+        try:
+            kind, args = self._entity_args(entity)
+            seed = self._add_seed(kind, args)
+            if count > 1:
+                fill = math.radians(float(fill_angle))
+                seed.ArrayPolar(count, fill, self._get_double_array(center))
+                # Same spacing as AutoCAD: a full turn is split evenly, a partial fill includes both ends
+                step = fill / count if abs(abs(fill) - 2 * math.pi) < 1e-9 else fill / (count - 1)
+                for k in range(1, count):
+                    self._track(kind, self._rotated(kind, args, center, step * k))
+            print(f"[+] Polar array of {count} {kind}s around {center} ({fill_angle}°).")
+            return count
+        except Exception as e:
+            print(f"Error in polar_array: {e}")
+            return 0
+
+    def rectangular_array(self, entity, rows, columns, row_spacing, column_spacing):
+        """Create the seed once and let AutoCAD replicate it with ArrayRectangular."""
+        if not self.model_space: return 0
+        try:
+            rows, columns = int(rows), int(columns)
+            kind, args = self._entity_args(entity)
+            seed = self._add_seed(kind, args)
+            if rows * columns > 1:
+                seed.ArrayRectangular(rows, columns, 1, float(row_spacing), float(column_spacing), 0.0)
+                for row in range(rows):
+                    for column in range(columns):
+                        if row or column:
+                            offset = (column * float(column_spacing), row * float(row_spacing), 0.0)
+                            self._track(kind, self._translated(kind, args, offset))
+            print(f"[+] Rectangular array of {rows}x{columns} {kind}s.")
+            return rows * columns
+        except Exception as e:
+            print(f"Error in rectangular_array: {e}")
+            return 0
+
+    def path_array(self, entity, points):
+        """
+        Place the seed at the first path point and replicate it along the rest.
+        Splines and polylines are duplicated server-side with Copy + Move so their points
+        cross the process boundary only once; simpler primitives are cheaper to re-add
+        through the batch queue (one call each instead of two).
+        """
+        if not self.model_space: return 0
+        try:
+            kind, args = self._entity_args(entity)
+            targets = [self._point3(p) for p in points]
+            if not targets:
+                return 0
+            ax, ay, az = self._anchor(kind, args)
+            offsets = [(x - ax, y - ay, z - az) for x, y, z in targets]
+            if kind in ('spline', 'polyline'):
+                seed = self._add_seed(kind, self._translated(kind, args, offsets[0]))
+                origin = self._get_double_array(targets[0])
+                for target, offset in zip(targets[1:], offsets[1:]):
+                    seed.Copy().Move(origin, self._get_double_array(target))
+                    self._track(kind, self._translated(kind, args, offset))
+            else:
+                with self.batch():
+                    for offset in offsets:
+                        self._queue(kind, self._translated(kind, args, offset))
+            print(f"[+] Path array of {len(targets)} {kind}s.")
+            return len(targets)
+        except Exception as e:
+            print(f"Error in path_array: {e}")
+            return 0
+
+    # --- Model-space snapshot ---------------------------------------------
+
+    def _read_geometry(self, entity, name):
+        """(kind, args) of an entity with the given ObjectName, or (None, ()) for types kept without geometry."""
+        p3 = self._point3
+        if name == 'AcDbLine':
+            return 'line', (p3(entity.StartPoint), p3(entity.EndPoint))
+        if name == 'AcDbCircle':
+            return 'circle', (p3(entity.Center), float(entity.Radius))
+        if name == 'AcDbArc':
+            return 'arc', (p3(entity.Center), float(entity.Radius), float(entity.StartAngle), float(entity.EndAngle))
+        if name == 'AcDbPoint':
+            return 'point', (p3(entity.Coordinates),)
+        if name == 'AcDbPolyline':
+            flat = entity.Coordinates
+            elevation = float(entity.Elevation)
+            points = tuple((float(flat[i]), float(flat[i + 1]), elevation) for i in range(0, len(flat), 2))
+            return 'polyline', (points, bool(entity.Closed))
+        if name == 'AcDbSpline':
+            # Splines drawn by hand may only have control points
+            flat = entity.FitPoints or entity.ControlPoints
+            return 'spline', (tuple(p3(flat[i:i + 3]) for i in range(0, len(flat), 3)), 0.0, 0.0)
+        if name == 'AcDbBlockReference':
+            return 'insert', (p3(entity.InsertionPoint), str(entity.Name), float(entity.Rotation))
+        return None, ()
+
+    def _read_into(self, snapshot, entity):
+        """Copy one entity into the snapshot: ObjectName, Handle, Layer and a few geometry reads."""
+        try:
+            kind, args = self._read_geometry(entity, entity.ObjectName)
+            snapshot.append(kind, args, entity.Handle, entity.Layer)
+        except Exception as e:
+            print(f"Error reading entity for the snapshot: {e}")
+
+    def _handseed(self):
+        """HANDSEED as an integer: every object created from now on gets a handle at least this large."""
+        return int(self.doc.GetVariable("HANDSEED"), 16)
+
+    def _full_sync(self):
+        snapshot = ModelSpaceSnapshot()
+        snapshot.handseed = self._handseed()
+        for entity in self.model_space:
+            self._read_into(snapshot, entity)
+        self._snapshot = snapshot
+        return len(snapshot), 0
+
+    def _find_erased(self, live, present, missing, known):
+        """
+        Handles of the `missing` entities among `live` (the snapshot's handles in
+        model-space order) that are gone, given that the first `present` model-space
+        items are the survivors in the same order. Each run of erased entities is
+        found by binary search on ModelSpace.Item(i).Handle, so a few erasures cost
+        O(log n) reads instead of a pass over the drawing. `known` caches position -> handle.
+        """
+        def handle_at(i):
+            if i not in known:
+                known[i] = int(self.model_space.Item(i).Handle, 16)
+            return known[i]
+
+        erased = []
+        shift = lo = 0
+        while len(erased) < missing:
+            a, b = lo, present
+            while a < b:
+                mid = (a + b) // 2
+                if handle_at(mid) == live[mid + shift]:
+                    a = mid + 1
+                else:
+                    b = mid
+            if a == present:
+                # Everything after the last survivor is gone
+                erased.extend(live[present + shift:])
+                break
+            try:
+                resumed = live.index(handle_at(a), a + shift + 1)
+            except ValueError:
+                return None
+            erased.extend(live[a + shift:resumed])
+            shift = resumed - a
+            lo = a + 1
+        return erased if len(erased) == missing else None
+
+    def _incremental_sync(self):
+        """
+        Bring the snapshot up to date by handle: entities added since the last
+        sync have handles at or above the HANDSEED recorded then and sit at the
+        end of model space, so they are read from the end backwards; erased ones
+        are located by `_find_erased`. Returns (added, erased), or None when
+        model space does not look like the snapshot plus appended entities.
+        """
+        snapshot = self._snapshot
+        count = self.model_space.Count
+        seed = self._handseed()
+        if seed == snapshot.handseed and count == len(snapshot):
+            return 0, 0
+        known = {}
+        added = []
+        position = count - 1
+        while position >= 0:
+            entity = self.model_space.Item(position)
+            handle = int(entity.Handle, 16)
+            if handle < snapshot.handseed:
+                known[position] = handle
+                break
+            added.append(entity)
+            position -= 1
+        present = count - len(added)
+        missing = len(snapshot) - present
+        if missing < 0:
+            return None
+        if missing:
+            erased = self._find_erased(snapshot.live_handles(), present, missing, known)
+            if erased is None:
+                return None
+            for handle in erased:
+                snapshot.erase(handle)
+        for entity in reversed(added):
+            self._read_into(snapshot, entity)
+        snapshot.handseed = seed
+        return len(added), missing
+
+    def snapshot(self):
+        """
+        Columnar copy of model space (type, handle, layer, geometry), read once
+        and then kept current by syncing only the handles added or erased since
+        the previous call. Queued primitives are flushed first. Edits to existing
+        entities that keep their handle are not picked up; send_command, whose
+        commands may make such edits, drops the snapshot so the next call re-reads
+        everything. Sync statistics are in `snapshot.last_sync`.
+        """
+        self._check_document()
+        if self._batch:
+            self.flush()
+        started = time.perf_counter()
+        changes = self._incremental_sync() if self._snapshot is not None else None
+        mode = 'incremental'
+        if changes is None:
+            mode = 'full'
+            changes = self._full_sync()
+        snapshot = self._snapshot
+        seconds = time.perf_counter() - started
+        snapshot.last_sync = {
+            'mode': mode, 'entities': len(snapshot), 'added': changes[0], 'erased': changes[1],
+            'seconds': seconds, 'bytes_per_entity': round(snapshot.bytes_per_entity(), 1),
+        }
+        if mode == 'full' or any(changes):
+            print(f"[*] Snapshot ({mode}): {len(snapshot)} entities, +{changes[0]}/-{changes[1]} "
+                  f"in {seconds:.3f}s, {snapshot.bytes_per_entity():.0f} bytes/entity.")
+        return snapshot
+
+    def count_by_type(self):
+        return self.snapshot().count_by_type()
+
+    def count_by_layer(self):
+        return self.snapshot().count_by_layer()
+
+    # --- Selection --------------------------------------------------------
+
+    def _filter_arrays(self, codes, values):
+        """FilterType / FilterData arguments of SelectionSet.Select."""
+        if win32com is None:
+            return codes, values
+        return (win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_I2, codes),
+                win32com.client.VARIANT(pythoncom.VT_ARRAY | pythoncom.VT_VARIANT, values))
+
+    def _new_selection_set(self):
+        sets = self.doc.SelectionSets
+        try:
+            # Left over from an interrupted query
+            sets.Item(SELECTION_SET_NAME).Delete()
+        except Exception:
+            pass
+        return sets.Add(SELECTION_SET_NAME)
+
+    def select_entities(self, entity_type=None, layer=None, corner1=None, corner2=None, crossing=True, limit=20):
+        """
+        Select with a DXF group-code filter (0 = type, 8 = layer) so AutoCAD does
+        the filtering: the query costs a handful of COM calls plus three property
+        reads per returned entity, however large the drawing. Without corners the
+        whole drawing is searched; window and crossing selection only see what is
+        visible in the current view, as in AutoCAD itself.
+        """
+        self._check_document()
+        if self._batch:
+            self.flush()
+        codes, values = selection_filter(entity_type, layer)
+        selection = self._new_selection_set()
+        try:
+            if corner1 is not None and corner2 is not None:
+                mode = SELECT_CROSSING if crossing else SELECT_WINDOW
+                points = (self._get_double_array(corner1), self._get_double_array(corner2))
+            else:
+                mode = SELECT_ALL
+                empty = pythoncom.Empty if pythoncom is not None else None
+                points = (empty, empty)
+            if codes:
+                selection.Select(mode, *points, *self._filter_arrays(codes, values))
+            else:
+                selection.Select(mode, *points)
+            count = selection.Count
+            entities = []
+            for i in range(min(int(limit), count)):
+                entity = selection.Item(i)
+                dxf = OBJECT_DXF_TYPES.get(entity.ObjectName)
+                entities.append({'type': KIND_NAMES.get(dxf, 'other'), 'handle': entity.Handle, 'layer': entity.Layer})
+            return {'count': count, 'entities': entities}
+        finally:
+            selection.Delete()
+
+    # --- Spatial index ----------------------------------------------------
+
+    def spatial_index(self):
+        """
+        Spatial index over model space. It is built from the snapshot; after
+        that, entities created through this client are added as they are sent,
+        and the snapshot is only synced again when ModelSpace.Count shows that
+        something else added or erased entities.
+        """
+        self._check_document()
+        if self._batch:
+            # Queued primitives have to exist before queries can see them
+            self.flush()
+        if self._index is None or self.model_space.Count != self._indexed_count:
+            snapshot = self.snapshot()
+            self._index = SpatialIndex()
+            self._index.bulk_load(snapshot.primitives())
+            self._indexed_count = len(snapshot)
+        return self._index
+
+    # --- Layer table cache ------------------------------------------------
+
+    @staticmethod
+    def _read_layer(layer):
+        return {
+            "name": layer.Name,
+            "is_on": layer.LayerOn,
+            "is_frozen": layer.Freeze,
+            "is_locked": layer.Lock,
+            "color": layer.Color
+        }
+
+    def invalidate_layers(self):
+        """Forget the cached layer table; the next layer operation reloads it."""
+        self._layers = None
+        self._layer_count = 0
+
+    def refresh_layers(self, full=True):
+        """
+        Load the layer table in one pass over the Layers collection.
+        With full=False only layers appended since the last load are read
+        (a full reload still happens if layers were removed meanwhile).
+        """
+        layers = self.doc.Layers
+        if full or self._layers is None:
+            start = time.perf_counter()
+            table = {}
+            for layer in layers:
+                info = self._read_layer(layer)
+                table[info["name"].lower()] = {"info": info, "com": layer}
+            self._layers = table
+            self._layer_count = len(table)
+            print(f"[*] Layer table loaded: {len(table)} layers in {time.perf_counter() - start:.2f}s.")
+            return len(table)
+
+        count = layers.Count
+        if count < self._layer_count:
+            return self.refresh_layers(full=True)
+        for i in range(self._layer_count, count):
+            layer = layers.Item(i)
+            info = self._read_layer(layer)
+            self._layers.setdefault(info["name"].lower(), {"info": info, "com": layer})
+        self._layer_count = count
+        return len(self._layers)
+
+    def _layer_table(self):
+        self._check_document()
+        if self._layers is None:
+            self.refresh_layers(full=True)
+        return self._layers
+
+    def _layer_entry(self, layer_name):
+        """Cached entry for a layer; layers created outside the assistant are looked up once."""
+        table = self._layer_table()
+        entry = table.get(layer_name.lower())
+        if entry is None:
+            layer = self.doc.Layers.Item(layer_name)
+            info = self._read_layer(layer)
+            entry = table[info["name"].lower()] = {"info": info, "com": layer}
+        return entry
+
     def create_layer(self, layer_name, color_index=7):
         """Create a new layer with a specific color (default: 7 - White/Black)."""
         try:
             if not self.doc: return None
+            table = self._layer_table()
+            layers = self.doc.Layers
+            before = layers.Count
             # Add method will return existing layer if it already exists
-            layer = self.doc.Layers.Add(layer_name)
+            layer = layers.Add(layer_name)
             layer.Color = int(color_index)
+            created = layers.Count > before
+            # Only a layer Add really appended moves the delta refresh on; an existing one keeps its index
+            if created and before == self._layer_count:
+                self._layer_count += 1
+            entry = table.get(layer_name.lower())
+            if entry is None:
+                info = {"name": layer_name, "is_on": True, "is_frozen": False, "is_locked": False,
+                        "color": int(color_index)} if created else self._read_layer(layer)
+                table[info["name"].lower()] = {"com": layer, "info": info}
+            else:
+                entry["info"]["color"] = int(color_index)
             print(f"[+] Layer '{layer_name}' created/updated with color {color_index}.")
             return layer
         except Exception as e:
+            self.invalidate_layers()
             print(f"Error creating layer: {e}")
             return None
 
@@ -136,11 +963,15 @@ class AutoCADClient:
         """Rename an existing layer."""
         try:
             if not self.doc: return False
-            layer = self.doc.Layers.Item(old_name)
-            layer.Name = new_name
+            entry = self._layer_entry(old_name)
+            entry["com"].Name = new_name
+            del self._layers[old_name.lower()]
+            entry["info"]["name"] = new_name
+            self._layers[new_name.lower()] = entry
             print(f"[+] Layer '{old_name}' renamed to '{new_name}'.")
             return True
         except Exception as e:
+            self.invalidate_layers()
             print(f"Error renaming layer: {e}")
             return False
 
@@ -148,95 +979,23 @@ class AutoCADClient:
         """Change the color of an existing layer."""
         try:
             if not self.doc: return False
-            layer = self.doc.Layers.Item(layer_name)
-            layer.Color = int(color_index)
+            entry = self._layer_entry(layer_name)
+            entry["com"].Color = int(color_index)
+            entry["info"]["color"] = int(color_index)
             print(f"[+] Layer '{layer_name}' color changed to {color_index}.")
             return True
         except Exception as e:
+            self.invalidate_layers()
             print(f"Error changing layer color: {e}")
             return False
 
-    def draw_radials(self, center, radius, angle_increment):
-        """Draw a circle and radial lines clockwise starting from the top."""
-        try:
-            if not self.model_space: return None
-            import math
-            
-            # 1. Draw the circle
-            self.add_circle(center, radius)
-            
-            # 2. Draw radial lines
-            # In AutoCAD, 0 degrees is to the right (East).
-            # Vertical up is 90 degrees.
-            # Clockwise means we subtract the increment.
-            
-            cx, cy = float(center[0]), float(center[1])
-            cz = float(center[2]) if len(center) > 2 else 0.0
-            r = float(radius)
-            inc = float(angle_increment)
-            
-            current_angle_deg = 90.0
-            # We draw until we've covered 360 degrees
-            # Using a small epsilon to avoid floating point issues if the increment divides 360 exactly
-            total_rotated = 0.0
-            while total_rotated < 359.9:
-                rad = math.radians(current_angle_deg)
-                ex = cx + r * math.cos(rad)
-                ey = cy + r * math.sin(rad)
-                
-                self.add_line((cx, cy, cz), (ex, ey, cz))
-                
-                current_angle_deg -= inc
-                total_rotated += inc
-            
-            print(f"[+] Radial pattern completed at {center} with radius {radius} and {inc}° increments.")
-            return True
-        except Exception as e:
-            print(f"Error drawing radials: {e}")
-            return False
-
-    def cloud_radials(self, center, radii, angle_increment=20.0):
-        """Draw radial lines with different lengths clockwise starting from the top."""
-        try:
-            if not self.model_space: return None
-            import math
-            
-            cx, cy = float(center[0]), float(center[1])
-            cz = float(center[2]) if len(center) > 2 else 0.0
-            inc = float(angle_increment)
-            
-            current_angle_deg = 90.0
-            for r in radii:
-                rad = math.radians(current_angle_deg)
-                ex = cx + float(r) * math.cos(rad)
-                ey = cy + float(r) * math.sin(rad)
-                
-                self.add_line((cx, cy, cz), (ex, ey, cz))
-                current_angle_deg -= inc
-            
-            print(f"[+] Cloud radial pattern completed at {center} with {len(radii)} lines.")
-            return True
-        except Exception as e:
-            print(f"Error drawing cloud radials: {e}")
-            return False
-
     def get_layers_info(self):
-        """Retrieve a list of layers and their properties."""
+        """Retrieve a list of layers and their properties (served from the layer table cache)."""
         try:
             if not self.doc: return []
-            layers_data = []
-            layers = self.doc.Layers
-            for i in range(layers.Count):
-                layer = layers.Item(i)
-                layers_data.append({
-                    "name": layer.Name,
-                    "is_on": layer.LayerOn,
-                    "is_frozen": layer.Freeze,
-                    "is_locked": layer.Lock,
-                    "color": layer.Color
-                })
-            return layers_data
+            return [dict(entry["info"]) for entry in self._layer_table().values()]
         except Exception as e:
+            self.invalidate_layers()
             print(f"Error retrieving layers: {e}")
             return []
 
@@ -244,22 +1003,26 @@ class AutoCADClient:
         """Enable or disable a specific layer."""
         try:
             if not self.doc: return False
-            layer = self.doc.Layers.Item(layer_name)
-            layer.LayerOn = is_on
+            entry = self._layer_entry(layer_name)
+            entry["com"].LayerOn = is_on
+            entry["info"]["is_on"] = bool(is_on)
             return True
         except Exception as e:
+            self.invalidate_layers()
             print(f"Error setting layer status: {e}")
             return False
 
-    def trim(self):
-        """Invoke the TRIM command."""
-        self.send_command("_TRIM")
-
     def send_command(self, command):
         """Send a raw command to AutoCAD."""
         try:
+            if self._batch:
+                # Commands act on existing geometry, so queued primitives must exist first
+                self.flush()
             if self.doc:
                 self.doc.SendCommand(f"{command} ")
+                # Commands such as TRIM edit geometry in place, which a handle sync cannot see
+                self._snapshot = None
+                self._index = None
                 return True
         except Exception as e:
             print(f"Error sending command: {e}")
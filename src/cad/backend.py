@@ -0,0 +1,355 @@
+import math
+import os
+from contextlib import contextmanager
+
+from src.cad import geometry
+
+
+class CADBackend:
+    """
+    Interface shared by every drawing target (AutoCAD over COM, headless in-memory).
+    Backends implement the primitive and layer operations; composite drawing
+    routines such as radial patterns are built on top of them here.
+    """
+
+    name = "base"
+
+    @property
+    def connected(self):
+        """True when the backend can accept drawing operations."""
+        raise NotImplementedError
+
+    def connect(self):
+        raise NotImplementedError
+
+    def ensure_connected(self):
+        """Make sure the backend is still reachable before a plan runs, reconnecting if needed."""
+        return self.connected
+
+    def recover(self, error):
+        """Try to recover from `error` raised by an operation; True when it is worth retrying."""
+        return False
+
+    def entity_count(self):
+        """Number of entities in model space (block references count as one)."""
+        raise NotImplementedError
+
+    # --- Primitives -------------------------------------------------------
+
+    @staticmethod
+    def _point3(point):
+        """Normalize a 2D/3D point into a hashable (x, y, z) tuple of floats."""
+        if len(point) == 2:
+            return (float(point[0]), float(point[1]), 0.0)
+        return (float(point[0]), float(point[1]), float(point[2]))
+
+    def add_line(self, start_point, end_point):
+        raise NotImplementedError
+
+    def add_circle(self, center, radius):
+        raise NotImplementedError
+
+    def add_point(self, point):
+        raise NotImplementedError
+
+    def add_arc(self, center, radius, start_angle, end_angle):
+        raise NotImplementedError
+
+    def add_spline(self, points, start_angle=15.0, end_angle=15.0):
+        raise NotImplementedError
+
+    def add_polyline(self, points, closed=False):
+        """Add a 2D polyline through `points` at the elevation of the first vertex."""
+        raise NotImplementedError
+
+    # --- Bulk primitives --------------------------------------------------
+    # Rows follow the layouts produced by src.cad.geometry. Backends that can
+    # ingest whole arrays at once override these.
+
+    def add_lines(self, segments):
+        """Add one line per (x1, y1, z1, x2, y2, z2) row."""
+        with self.batch():
+            for x1, y1, z1, x2, y2, z2 in segments:
+                self.add_line((x1, y1, z1), (x2, y2, z2))
+        return len(segments)
+
+    def add_circles(self, circles):
+        """Add one circle per (cx, cy, cz, r) row."""
+        with self.batch():
+            for cx, cy, cz, r in circles:
+                self.add_circle((cx, cy, cz), r)
+        return len(circles)
+
+    def add_points(self, points):
+        """Add one point per (x, y, z) row."""
+        with self.batch():
+            for p in points:
+                self.add_point(tuple(p))
+        return len(points)
+
+    # --- Entity specs -----------------------------------------------------
+    # Array tools describe their seed entity as a dict such as
+    # {'type': 'circle', 'center': [x, y, z], 'radius': r}.
+
+    @classmethod
+    def _entity_args(cls, entity):
+        """Normalize an entity spec into (kind, args) using the primitive argument order."""
+        kind = str(entity.get('type', '')).lower()
+        p3 = cls._point3
+        if kind == 'line':
+            return kind, (p3(entity['start']), p3(entity['end']))
+        if kind == 'circle':
+            return kind, (p3(entity['center']), float(entity['radius']))
+        if kind == 'point':
+            return kind, (p3(entity['point']),)
+        if kind == 'arc':
+            return kind, (p3(entity['center']), float(entity['radius']),
+                          float(entity['start_angle']), float(entity['end_angle']))
+        if kind == 'spline':
+            return kind, (tuple(p3(p) for p in entity['points']),
+                          float(entity.get('start_angle', 15.0)), float(entity.get('end_angle', 15.0)))
+        if kind == 'polyline':
+            return kind, (tuple(p3(p) for p in entity['points']), bool(entity.get('closed', False)))
+        raise ValueError(f"Unsupported entity type '{kind}'")
+
+    @staticmethod
+    def _anchor(kind, args):
+        """Reference point of a primitive: line start, circle/arc center, point, first vertex."""
+        return args[0][0] if kind in ('spline', 'polyline') else args[0]
+
+    @staticmethod
+    def _translated(kind, args, offset):
+        """Primitive args moved by an (dx, dy, dz) offset."""
+        dx, dy, dz = offset
+        move = lambda p: (p[0] + dx, p[1] + dy, p[2] + dz)
+        if kind == 'line':
+            return (move(args[0]), move(args[1]))
+        if kind in ('spline', 'polyline'):
+            return (tuple(move(p) for p in args[0]),) + args[1:]
+        return (move(args[0]),) + args[1:]
+
+    @staticmethod
+    def _rotated(kind, args, center, angle):
+        """Primitive args rotated by `angle` radians about `center` in the XY plane."""
+        cx, cy = float(center[0]), float(center[1])
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        turn = lambda p: (cx + (p[0] - cx) * cos_a - (p[1] - cy) * sin_a, cy + (p[0] - cx) * sin_a + (p[1] - cy) * cos_a, p[2])
+        if kind == 'line':
+            return (turn(args[0]), turn(args[1]))
+        if kind == 'arc':
+            return (turn(args[0]), args[1], args[2] + angle, args[3] + angle)
+        if kind == 'spline':
+            # Tangent angles are in degrees
+            return (tuple(turn(p) for p in args[0]), args[1] + math.degrees(angle), args[2] + math.degrees(angle))
+        if kind == 'polyline':
+            return (tuple(turn(p) for p in args[0]),) + args[1:]
+        if kind == 'insert':
+            return (turn(args[0]), args[1], args[2] + angle)
+        return (turn(args[0]),) + args[1:]
+
+    def add_entity(self, entity):
+        """Create a single entity from a spec dict."""
+        kind, args = self._entity_args(entity)
+        return getattr(self, f'add_{kind}')(*args)
+
+    # --- Arrays -----------------------------------------------------------
+    # The seed entity is created once and replicated by the backend. Every
+    # method returns the total number of entities in the array (seed included).
+
+    def polar_array(self, entity, center, count, fill_angle=360.0):
+        """Copies of `entity` rotated around `center`; fill_angle in degrees, positive is counter-clockwise."""
+        raise NotImplementedError
+
+    def rectangular_array(self, entity, rows, columns, row_spacing, column_spacing):
+        """Grid copies of `entity`; rows advance along Y and columns along X."""
+        raise NotImplementedError
+
+    def path_array(self, entity, points):
+        """Copies of `entity` whose reference point lands on each path point, in order."""
+        raise NotImplementedError
+
+    # --- Blocks -----------------------------------------------------------
+
+    def define_block(self, name, entities):
+        """Define block `name` once from entity specs in block-local coordinates."""
+        raise NotImplementedError
+
+    def insert_block(self, name, insertion_point, rotation=0.0):
+        """Insert a reference to block `name`; rotation in degrees."""
+        raise NotImplementedError
+
+    # --- Layers -----------------------------------------------------------
+
+    def create_layer(self, layer_name, color_index=7):
+        raise NotImplementedError
+
+    def rename_layer(self, old_name, new_name):
+        raise NotImplementedError
+
+    def change_layer_color(self, layer_name, color_index):
+        raise NotImplementedError
+
+    def get_layers_info(self):
+        raise NotImplementedError
+
+    def set_layer_status(self, layer_name, is_on):
+        raise NotImplementedError
+
+    # --- Drawing statistics -----------------------------------------------
+
+    def count_by_type(self):
+        """Entities per type name."""
+        raise NotImplementedError
+
+    def count_by_layer(self):
+        """Entities per layer name (layers without entities are left out)."""
+        raise NotImplementedError
+
+    def drawing_summary(self, max_layers=8):
+        """A few lines describing what is in the drawing, short enough to give the LLM as context."""
+        types = {name: count for name, count in self.count_by_type().items() if count}
+        layers = sorted(self.count_by_layer().items(), key=lambda item: -item[1])
+        total = sum(types.values())
+        if not total:
+            return "The drawing is empty."
+        lines = [f"The drawing has {total} entities: " + ", ".join(f"{count} {name}" for name, count in types.items()) + "."]
+        shown = ", ".join(f"{name} ({count})" for name, count in layers[:max_layers])
+        more = f" and {len(layers) - max_layers} more" if len(layers) > max_layers else ""
+        lines.append(f"Entities are on layers {shown}{more}.")
+        return "\n".join(lines)
+
+    # --- Spatial queries --------------------------------------------------
+    # Answered from a SpatialIndex over model space, so a query touches a few
+    # grid cells instead of every entity in the drawing.
+
+    def spatial_index(self):
+        """SpatialIndex over the model-space entities, up to date as of this call."""
+        raise NotImplementedError
+
+    def nearest_entities(self, point, count=1, max_distance=None):
+        """The `count` entities closest to `point` (XY distance), nearest first."""
+        index = self.spatial_index()
+        limit = math.inf if max_distance is None else float(max_distance)
+        return [dict(index.describe(i), distance=round(d, 6)) for d, i in index.nearest(point, int(count), limit)]
+
+    def entities_in_window(self, corner1, corner2, crossing=True, limit=20):
+        """Entities in the rectangle between two corners: the total count and the first `limit` of them."""
+        index = self.spatial_index()
+        hits = index.window(corner1, corner2, crossing)
+        return {'count': len(hits), 'entities': [index.describe(i) for i in hits[:limit]]}
+
+    def snap_to_endpoint(self, point, tolerance):
+        """The existing endpoint, vertex or point nearest to `point` within `tolerance`, or None."""
+        index = self.spatial_index()
+        hit = index.snap(point, float(tolerance))
+        if hit is None:
+            return None
+        distance, snapped, i = hit
+        return {'point': [round(float(v), 6) for v in snapped], 'distance': round(distance, 6), 'entity': index.describe(i)}
+
+    def snap_point(self, point, tolerance):
+        """`point` moved onto the nearest existing endpoint within `tolerance`; unchanged when there is none."""
+        hit = self.spatial_index().snap(point, float(tolerance))
+        return hit[1] if hit is not None else self._point3(point)
+
+    # --- Selection --------------------------------------------------------
+    # Filters follow AutoCAD selection-set semantics (see src.cad.selection):
+    # entity_type and layer are wildcard patterns matched against the DXF type
+    # name and layer name, and a window selects entities whose bounding box lies
+    # inside it, or touches it with crossing=True.
+
+    def select_entities(self, entity_type=None, layer=None, corner1=None, corner2=None, crossing=True, limit=20):
+        """Entities matching the filters: the total count and type, handle and layer of the first `limit`."""
+        raise NotImplementedError
+
+    def count_entities(self, entity_type=None, layer=None, corner1=None, corner2=None, crossing=True):
+        """Number of entities matching the filters."""
+        return self.select_entities(entity_type, layer, corner1, corner2, crossing, limit=0)['count']
+
+    # --- Commands ---------------------------------------------------------
+
+    def send_command(self, command):
+        raise NotImplementedError
+
+    def trim(self):
+        """Invoke the TRIM command."""
+        self.send_command("_TRIM")
+
+    # --- Batching ---------------------------------------------------------
+
+    def begin_batch(self):
+        """Start a batch. Backends without per-call overhead can ignore it."""
+
+    def end_batch(self):
+        """Close a batch level and return flush statistics, if any."""
+        return None
+
+    def flush(self):
+        return None
+
+    @contextmanager
+    def batch(self):
+        """Queue every primitive created inside the block and flush them together on exit."""
+        self.begin_batch()
+        try:
+            yield self
+        finally:
+            self.end_batch()
+
+    # --- Composite drawing ------------------------------------------------
+
+    def draw_radials(self, center, radius, angle_increment):
+        """Draw a circle and radial lines clockwise starting from the top."""
+        try:
+            if not self.connected: return None
+            # In AutoCAD, 0 degrees is to the right (East) and vertical up is 90 degrees,
+            # so clockwise rays subtract the increment from 90.
+            inc = float(angle_increment)
+            segments = geometry.radial_segments(center, radius, inc)
+            with self.batch():
+                self.add_circle(center, radius)
+                self.add_lines(segments)
+
+            print(f"[+] Radial pattern completed at {center} with radius {radius} and {inc}° increments.")
+            return True
+        except Exception as e:
+            print(f"Error drawing radials: {e}")
+            return False
+
+    def cloud_radials(self, center, radii, angle_increment=20.0):
+        """Draw radial lines with different lengths clockwise starting from the top."""
+        try:
+            if not self.connected: return None
+            segments = geometry.cloud_radial_segments(center, radii, angle_increment)
+            with self.batch():
+                self.add_lines(segments)
+
+            print(f"[+] Cloud radial pattern completed at {center} with {len(radii)} lines.")
+            return True
+        except Exception as e:
+            print(f"Error drawing cloud radials: {e}")
+            return False
+
+    def draw_concentric_rings(self, center, start_radius, spacing, count):
+        """Draw `count` concentric circles starting at `start_radius`, `spacing` apart."""
+        try:
+            if not self.connected: return None
+            circles = geometry.concentric_circles(center, geometry.ring_radii(start_radius, spacing, count))
+            self.add_circles(circles)
+            print(f"[+] {len(circles)} concentric rings completed at {center}.")
+            return True
+        except Exception as e:
+            print(f"Error drawing concentric rings: {e}")
+            return False
+
+
+def create_backend(name=None):
+    """Instantiate the backend selected by `name` or the CAD_BACKEND environment variable."""
+    name = (name or os.getenv("CAD_BACKEND", "autocad")).strip().lower()
+    if name == "headless":
+        from src.cad.headless_backend import HeadlessBackend
+        return HeadlessBackend()
+    if name != "autocad":
+        print(f"[!] Unknown CAD_BACKEND '{name}', falling back to AutoCAD.")
+    from src.cad.autocad_client import AutoCADClient
+    return AutoCADClient()
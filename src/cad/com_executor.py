@@ -0,0 +1,216 @@
+import contextvars
+import inspect
+import math
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import pythoncom
+except ImportError:
+    pythoncom = None
+
+
+def _percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class ComExecutor:
+    """
+    Runs every CAD backend operation on one dedicated worker thread.
+
+    COM objects are bound to the apartment of the thread that created them, so
+    the backend is built by `factory` on the worker itself, after the thread has
+    joined a single-threaded apartment. Other threads submit work through a
+    bounded queue and get a Future back; when `max_queue` jobs are waiting,
+    submit() blocks (backpressure) instead of letting a fast LLM pile up work.
+
+    A job is a backend method name or any callable; a callable can use `proxy`,
+    which talks to the backend directly on the worker. Queue depth, time spent
+    waiting in the queue and run time per operation are recorded for the report.
+    """
+
+    SAMPLES = 1000
+
+    def __init__(self, factory, max_queue=64):
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.backend = None
+        self.submitted = 0
+        self.max_depth = 0
+        self.waits = deque(maxlen=self.SAMPLES)
+        self.latencies = defaultdict(lambda: deque(maxlen=self.SAMPLES))
+        self.calls = defaultdict(int)
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(factory,), name="com-executor", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        self.proxy = BackendProxy(self)
+
+    def _run(self, factory):
+        if pythoncom is not None:
+            # Single-threaded apartment: AutoCAD's objects are only touched from here
+            pythoncom.CoInitialize()
+        try:
+            try:
+                self.backend = factory()
+            except Exception as e:
+                self._error = e
+                return
+            finally:
+                self._ready.set()
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    break
+                self._execute(*job)
+        finally:
+            self.backend = None
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+
+    def _execute(self, future, label, fn, args, kwargs, enqueued, context):
+        started = time.perf_counter()
+        self.waits.append(started - enqueued)
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = context.run(fn, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            self.latencies[label].append(time.perf_counter() - started)
+            self.calls[label] += 1
+
+    @property
+    def on_worker(self):
+        return threading.current_thread() is self._thread
+
+    @property
+    def depth(self):
+        """Jobs waiting in the queue (not counting the one running)."""
+        return self._queue.qsize()
+
+    def _resolve(self, job):
+        if callable(job):
+            return getattr(job, '__name__', 'job'), job
+        return job, lambda *a, **k: getattr(self.backend, job)(*a, **k)
+
+    def submit(self, job, *args, timeout=None, **kwargs):
+        """
+        Queue `job` and return a Future. Blocks while the queue is full; with a
+        `timeout` in seconds, raises queue.Full instead of waiting longer.
+        """
+        if not self._thread.is_alive():
+            raise RuntimeError("COM executor has been shut down")
+        label, fn = self._resolve(job)
+        future = Future()
+        # The job runs in a copy of the caller's context, so it lands in the caller's trace span
+        context = contextvars.copy_context()
+        self._queue.put((future, label, fn, args, kwargs, time.perf_counter(), context), timeout=timeout)
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return future
+
+    def call(self, job, *args, **kwargs):
+        """Run `job` on the worker and wait for its result (directly when already on the worker)."""
+        if self.on_worker:
+            return self._resolve(job)[1](*args, **kwargs)
+        return self.submit(job, *args, **kwargs).result()
+
+    def shutdown(self, wait=True):
+        """Finish the queued jobs, then stop the worker."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            if wait:
+                self._thread.join()
+
+    def stats(self):
+        waits = list(self.waits)
+        ops = {
+            label: {'calls': self.calls[label], 'avg': sum(samples) / len(samples) if samples else 0.0,
+                    'p95': _percentile(list(samples), 0.95)}
+            for label, samples in self.latencies.items()
+        }
+        return {
+            'submitted': self.submitted,
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+            'wait_p95': _percentile(waits, 0.95),
+            'ops': ops,
+        }
+
+    def format_report(self, top=5):
+        s = self.stats()
+        if not s['submitted']:
+            return ""
+        slowest = sorted(s['ops'].items(), key=lambda item: item[1]['avg'] * item[1]['calls'], reverse=True)[:top]
+        ops = ", ".join(f"{label} x{op['calls']} avg {op['avg'] * 1000:.1f} ms p95 {op['p95'] * 1000:.1f} ms"
+                        for label, op in slowest)
+        return (f"[*] COM executor: {s['submitted']} jobs, max queue depth {s['max_depth']}/{self.max_queue}, "
+                f"wait avg {s['wait_avg'] * 1000:.1f} ms p95 {s['wait_p95'] * 1000:.1f} ms. {ops}")
+
+
+class BackendProxy:
+    """
+    Stand-in for the backend that forwards every call to the executor's worker
+    and waits for the result. Code already running on the worker (a submitted
+    plan, for instance) talks to the backend directly, so it can use the proxy too.
+    A method call is a single job; whether a name is a method is decided once,
+    from the backend's class when it is defined there, so only plain attribute
+    reads need a "get <name>" job.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._methods = {}
+
+    def _is_method(self, name):
+        """True/False once known, None for names that have to be read from the backend first."""
+        known = self._methods.get(name)
+        if known is None:
+            # Looked up on the class without running descriptors, so properties still count as values
+            static = inspect.getattr_static(type(self._executor.backend), name, None)
+            if static is not None:
+                known = self._methods[name] = callable(static)
+        return known
+
+    def __getattr__(self, name):
+        executor = self._executor
+        if executor.on_worker:
+            return getattr(executor.backend, name)
+
+        if not self._is_method(name):
+            def read():
+                return getattr(executor.backend, name)
+            read.__name__ = f"get {name}"
+            value = executor.call(read)
+            if not callable(value):
+                return value
+            self._methods[name] = True
+
+        def forward(*args, **kwargs):
+            return executor.call(name, *args, **kwargs)
+        forward.__name__ = name
+        return forward
+
+    @contextmanager
+    def batch(self):
+        """Same as CADBackend.batch, with begin/end running on the worker."""
+        self.begin_batch()
+        try:
+            yield self
+        finally:
+            self.end_batch()
@@ -0,0 +1,150 @@
+"""
+Vectorized geometry generators for repeated patterns.
+
+Every generator returns a contiguous float64 NumPy array with one row per entity,
+in the layouts consumed by `CADBackend.add_lines` / `add_circles` / `add_points`:
+    segments -> (N, 6): x1 y1 z1 x2 y2 z2
+    circles  -> (N, 4): cx cy cz r
+    points   -> (N, 3): x y z
+Angles are in degrees, measured counter-clockwise from East like AutoCAD.
+"""
+import math
+
+import numpy as np
+
+
+def _center3(center):
+    cx, cy = float(center[0]), float(center[1])
+    cz = float(center[2]) if len(center) > 2 else 0.0
+    return cx, cy, cz
+
+
+def ray_segments(center, lengths, angles_deg):
+    """Segments from `center` with the given lengths along the given angles."""
+    cx, cy, cz = _center3(center)
+    rad = np.radians(np.asarray(angles_deg, dtype=np.float64))
+    lengths = np.broadcast_to(np.asarray(lengths, dtype=np.float64), rad.shape)
+    seg = np.empty((rad.size, 6), dtype=np.float64)
+    seg[:, 0] = cx
+    seg[:, 1] = cy
+    seg[:, 2] = cz
+    seg[:, 3] = cx + lengths * np.cos(rad)
+    seg[:, 4] = cy + lengths * np.sin(rad)
+    seg[:, 5] = cz
+    return seg
+
+
+def radial_count(angle_increment):
+    """Number of rays drawn by a full radial pattern (covers 360° within a 0.1° epsilon)."""
+    inc = float(angle_increment)
+    if inc <= 0:
+        raise ValueError("angle_increment must be positive")
+    return int(math.ceil(359.9 / inc))
+
+
+def radial_segments(center, radius, angle_increment):
+    """Equal rays clockwise from the top (90°) until the full circle is covered."""
+    inc = float(angle_increment)
+    angles = 90.0 - inc * np.arange(radial_count(inc), dtype=np.float64)
+    return ray_segments(center, float(radius), angles)
+
+
+def cloud_radial_segments(center, radii, angle_increment=20.0):
+    """One ray per radius, clockwise from the top, `angle_increment` degrees apart."""
+    radii = np.asarray(radii, dtype=np.float64).ravel()
+    angles = 90.0 - float(angle_increment) * np.arange(radii.size, dtype=np.float64)
+    return ray_segments(center, radii, angles)
+
+
+def polar_count(count):
+    """Item count of a polar array as an int; an array needs at least its seed."""
+    count = int(count)
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    return count
+
+
+def polar_points(center, radius, count, start_angle=90.0, fill_angle=360.0):
+    """
+    `count` points on a circle. A full 360° fill spreads them evenly; a partial fill
+    places the first and last point at both ends of the arc (AutoCAD ARRAY semantics).
+    """
+    cx, cy, cz = _center3(center)
+    count = polar_count(count)
+    fill = float(fill_angle)
+    step = fill / count if abs(abs(fill) - 360.0) < 1e-9 else fill / max(count - 1, 1)
+    rad = np.radians(float(start_angle) + step * np.arange(count, dtype=np.float64))
+    pts = np.empty((count, 3), dtype=np.float64)
+    pts[:, 0] = cx + float(radius) * np.cos(rad)
+    pts[:, 1] = cy + float(radius) * np.sin(rad)
+    pts[:, 2] = cz
+    return pts
+
+
+def polar_angles(count, fill_angle=360.0):
+    """Rotation (degrees) applied to each item of a polar array, the seed being item 0."""
+    count = polar_count(count)
+    fill = float(fill_angle)
+    step = fill / count if abs(abs(fill) - 360.0) < 1e-9 else fill / max(count - 1, 1)
+    return step * np.arange(count, dtype=np.float64)
+
+
+def rectangular_points(origin, rows, columns, row_spacing, column_spacing):
+    """Grid of rows x columns points; rows advance along Y and columns along X."""
+    ox, oy, oz = _center3(origin)
+    rows, columns = int(rows), int(columns)
+    pts = np.empty((rows * columns, 3), dtype=np.float64)
+    pts[:, 0] = np.tile(ox + float(column_spacing) * np.arange(columns), rows)
+    pts[:, 1] = np.repeat(oy + float(row_spacing) * np.arange(rows), columns)
+    pts[:, 2] = oz
+    return pts
+
+
+def concentric_circles(center, radii):
+    """One circle per radius around a shared center."""
+    cx, cy, cz = _center3(center)
+    radii = np.asarray(radii, dtype=np.float64).ravel()
+    circles = np.empty((radii.size, 4), dtype=np.float64)
+    circles[:, 0] = cx
+    circles[:, 1] = cy
+    circles[:, 2] = cz
+    circles[:, 3] = radii
+    return circles
+
+
+def ring_radii(start_radius, spacing, count):
+    """Evenly spaced radii for concentric rings."""
+    return float(start_radius) + float(spacing) * np.arange(int(count), dtype=np.float64)
+
+
+def rotated_copies(row, xyz_columns, center, angles_deg, angle_columns=(), degree_columns=()):
+    """
+    Copies of one entity row rotated about `center` in the XY plane, one per angle.
+    `xyz_columns` are the first columns of each (x, y, z) triple in the row,
+    `angle_columns` hold angles in radians that rotate along (arc start/end)
+    and `degree_columns` the same in degrees (spline end tangents).
+    """
+    row = np.asarray(row, dtype=np.float64)
+    cx, cy, _ = _center3(center)
+    rad = np.radians(np.asarray(angles_deg, dtype=np.float64))
+    cos_a, sin_a = np.cos(rad), np.sin(rad)
+    out = np.repeat(row[None, :], rad.size, axis=0)
+    for col in xyz_columns:
+        dx, dy = row[col] - cx, row[col + 1] - cy
+        out[:, col] = cx + dx * cos_a - dy * sin_a
+        out[:, col + 1] = cy + dx * sin_a + dy * cos_a
+    for col in angle_columns:
+        out[:, col] = row[col] + rad
+    for col in degree_columns:
+        out[:, col] = row[col] + np.asarray(angles_deg, dtype=np.float64)
+    return out
+
+
+def translated_copies(row, xyz_columns, offsets):
+    """Copies of one entity row moved by each (dx, dy, dz) offset."""
+    row = np.asarray(row, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.float64).reshape(-1, 3)
+    out = np.repeat(row[None, :], len(offsets), axis=0)
+    for col in xyz_columns:
+        out[:, col:col + 3] += offsets
+    return out
@@ -0,0 +1,414 @@
+import math
+from array import array
+
+import numpy as np
+
+from src.cad import geometry
+from src.cad.backend import CADBackend
+from src.cad.selection import DXF_TYPES, filter_predicates, selection_filter
+from src.cad.spatial_index import SpatialIndex
+
+# Entity type codes stored in HeadlessBackend.types
+LINE, CIRCLE, POINT, ARC, SPLINE, INSERT, POLYLINE = range(7)
+TYPE_NAMES = ('line', 'circle', 'point', 'arc', 'spline', 'insert', 'polyline')
+
+
+class HeadlessBackend(CADBackend):
+    """
+    Pure-Python drawing target that keeps entities in compact columnar arrays.
+
+    Every entity is a row in `types`/`layer_ids`/`offsets`; its geometry lives in the
+    shared `coords` buffer starting at `offsets[i]`:
+        line   -> x1 y1 z1 x2 y2 z2
+        circle -> cx cy cz r
+        point  -> x y z
+        arc    -> cx cy cz r start end        (angles in radians, as AutoCAD)
+        spline -> start_deg end_deg x y z ... (tangent angles in degrees, then fit points)
+        insert -> x y z rotation block_index  (rotation in radians)
+        polyline -> closed x y z ...          (closed flag 0/1, then vertices)
+    """
+
+    name = "headless"
+
+    def __init__(self):
+        self.types = array('B')
+        self.layer_ids = array('I')
+        self.offsets = array('Q')
+        self.coords = array('d')
+        self.layers = []
+        self._layer_index = {}
+        self.current_layer = 0
+        self.commands = []
+        self.blocks = {}
+        self.block_names = []
+        self._index = None
+        self._add_layer("0", 7)
+
+    @property
+    def connected(self):
+        return True
+
+    def connect(self):
+        print("[+] Using headless CAD backend (in-memory, DXF export).")
+        return True
+
+    def __len__(self):
+        return len(self.types)
+
+    def entity_count(self):
+        return len(self.types)
+
+    # --- Primitives -------------------------------------------------------
+
+    def _append(self, type_code, values):
+        index = len(self.types)
+        self.types.append(type_code)
+        self.layer_ids.append(self.current_layer)
+        self.offsets.append(len(self.coords))
+        self.coords.extend(values)
+        return index
+
+    def add_line(self, start_point, end_point):
+        """Add a line and return its entity index."""
+        return self._append(LINE, self._point3(start_point) + self._point3(end_point))
+
+    def add_circle(self, center, radius):
+        """Add a circle and return its entity index."""
+        return self._append(CIRCLE, self._point3(center) + (float(radius),))
+
+    def add_point(self, point):
+        """Add a point and return its entity index."""
+        return self._append(POINT, self._point3(point))
+
+    def add_arc(self, center, radius, start_angle, end_angle):
+        """Add an arc (angles in radians) and return its entity index."""
+        return self._append(ARC, self._point3(center) + (float(radius), float(start_angle), float(end_angle)))
+
+    def add_spline(self, points, start_angle=15.0, end_angle=15.0):
+        """Add a spline through the fit points and return its entity index."""
+        values = [float(start_angle), float(end_angle)]
+        for pt in points:
+            values.extend(self._point3(pt))
+        return self._append(SPLINE, values)
+
+    def add_polyline(self, points, closed=False):
+        """Add a polyline through `points` and return its entity index."""
+        values = [1.0 if closed else 0.0]
+        for pt in points:
+            values.extend(self._point3(pt))
+        return self._append(POLYLINE, values)
+
+    def _extend_rows(self, type_code, rows, width):
+        """Append a whole (N, width) array of same-type entities without a Python loop."""
+        rows = np.ascontiguousarray(rows, dtype=np.float64).reshape(-1, width)
+        n = len(rows)
+        first = len(self.types)
+        base = len(self.coords)
+        self.types.frombytes(np.full(n, type_code, dtype=self.types.typecode).tobytes())
+        self.layer_ids.frombytes(np.full(n, self.current_layer, dtype=self.layer_ids.typecode).tobytes())
+        self.offsets.frombytes((base + width * np.arange(n, dtype=self.offsets.typecode)).tobytes())
+        self.coords.frombytes(rows.tobytes())
+        return range(first, first + n)
+
+    def add_lines(self, segments):
+        """Append an (N, 6) segment array; returns the range of new entity indices."""
+        return self._extend_rows(LINE, segments, 6)
+
+    def add_circles(self, circles):
+        """Append an (N, 4) circle array; returns the range of new entity indices."""
+        return self._extend_rows(CIRCLE, circles, 4)
+
+    def add_points(self, points):
+        """Append an (N, 3) point array; returns the range of new entity indices."""
+        return self._extend_rows(POINT, points, 3)
+
+    # --- Arrays -----------------------------------------------------------
+
+    def _row(self, kind, args):
+        """Flatten primitive args into (type code, row values, xyz columns, angle columns)."""
+        if kind == 'line':
+            return LINE, args[0] + args[1], (0, 3), ()
+        if kind == 'circle':
+            return CIRCLE, args[0] + (args[1],), (0,), ()
+        if kind == 'point':
+            return POINT, args[0], (0,), ()
+        if kind == 'arc':
+            return ARC, args[0] + args[1:], (0,), (4, 5)
+        if kind == 'polyline':
+            values = [1.0 if args[1] else 0.0]
+            for p in args[0]:
+                values.extend(p)
+            return POLYLINE, values, tuple(range(1, len(values), 3)), ()
+        values = [args[1], args[2]]
+        for p in args[0]:
+            values.extend(p)
+        return SPLINE, values, tuple(range(2, len(values), 3)), ()
+
+    def polar_array(self, entity, center, count, fill_angle=360.0):
+        """Generate every rotated copy of the seed in one vectorized step."""
+        count = geometry.polar_count(count)
+        kind, args = self._entity_args(entity)
+        code, row, xyz, angles = self._row(kind, args)
+        # Spline tangents (the first two columns) are in degrees, like the backend._rotated helper has them
+        rows = geometry.rotated_copies(row, xyz, center, geometry.polar_angles(count, fill_angle), angles,
+                                       (0, 1) if code == SPLINE else ())
+        return len(self._extend_rows(code, rows, len(row)))
+
+    def rectangular_array(self, entity, rows, columns, row_spacing, column_spacing):
+        """Generate every grid copy of the seed in one vectorized step."""
+        kind, args = self._entity_args(entity)
+        code, row, xyz, _ = self._row(kind, args)
+        offsets = geometry.rectangular_points((0, 0, 0), rows, columns, row_spacing, column_spacing)
+        return len(self._extend_rows(code, geometry.translated_copies(row, xyz, offsets), len(row)))
+
+    def path_array(self, entity, points):
+        """Generate one copy of the seed per path point in one vectorized step."""
+        kind, args = self._entity_args(entity)
+        code, row, xyz, _ = self._row(kind, args)
+        offsets = np.asarray([self._point3(p) for p in points], dtype=np.float64).reshape(-1, 3)
+        offsets -= np.asarray(self._anchor(kind, args))
+        return len(self._extend_rows(code, geometry.translated_copies(row, xyz, offsets), len(row)))
+
+    def _span(self, index):
+        start = self.offsets[index]
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self.coords)
+        return start, end
+
+    def entity(self, index):
+        """Decode one entity row into a dictionary."""
+        start, end = self._span(index)
+        c = self.coords[start:end]
+        kind = self.types[index]
+        data = {'type': TYPE_NAMES[kind], 'layer': self.layers[self.layer_ids[index]]['name'], 'handle': self.handle(index)}
+        if kind == LINE:
+            data.update(start=tuple(c[0:3]), end=tuple(c[3:6]))
+        elif kind == CIRCLE:
+            data.update(center=tuple(c[0:3]), radius=c[3])
+        elif kind == POINT:
+            data.update(point=tuple(c[0:3]))
+        elif kind == ARC:
+            data.update(center=tuple(c[0:3]), radius=c[3], start_angle=c[4], end_angle=c[5])
+        elif kind == SPLINE:
+            data.update(start_angle=c[0], end_angle=c[1],
+                        points=[tuple(c[i:i + 3]) for i in range(2, len(c), 3)])
+        elif kind == POLYLINE:
+            data.update(closed=bool(c[0]), points=[tuple(c[i:i + 3]) for i in range(1, len(c), 3)])
+        elif kind == INSERT:
+            data.update(insertion_point=tuple(c[0:3]), rotation=c[3], block=self.block_names[int(c[4])])
+        return data
+
+    def primitive(self, index):
+        """Entity `index` as (kind, args, handle) in the argument order of the add_* methods."""
+        start, end = self._span(index)
+        c = self.coords[start:end]
+        kind = self.types[index]
+        if kind == LINE:
+            args = ((c[0], c[1], c[2]), (c[3], c[4], c[5]))
+        elif kind in (CIRCLE, ARC):
+            args = ((c[0], c[1], c[2]),) + tuple(c[3:])
+        elif kind == POINT:
+            args = ((c[0], c[1], c[2]),)
+        elif kind == SPLINE:
+            args = (tuple((c[i], c[i + 1], c[i + 2]) for i in range(2, len(c), 3)), c[0], c[1])
+        elif kind == POLYLINE:
+            args = (tuple((c[i], c[i + 1], c[i + 2]) for i in range(1, len(c), 3)), bool(c[0]))
+        else:
+            args = ((c[0], c[1], c[2]), self.block_names[int(c[4])], c[3])
+        return TYPE_NAMES[kind], args, self.handle(index)
+
+    def spatial_index(self):
+        """
+        Index over every entity. The arrays only ever grow, so after the first
+        (bulk) load each query just adds the rows appended since the last one.
+        """
+        if self._index is None:
+            self._index = SpatialIndex()
+            self._index.bulk_load(self.primitive(i) for i in range(len(self)))
+        else:
+            for i in range(len(self._index), len(self)):
+                self._index.insert(*self.primitive(i))
+        return self._index
+
+    def handle(self, index):
+        """AutoCAD-style hexadecimal handle for an entity index."""
+        return format(index + 0x100, 'X')
+
+    def count_by_type(self):
+        counts = {name: 0 for name in TYPE_NAMES}
+        for code in self.types:
+            counts[TYPE_NAMES[code]] += 1
+        return counts
+
+    def count_by_layer(self):
+        counts = np.bincount(np.frombuffer(self.layer_ids, dtype=np.uint32), minlength=len(self.layers)) \
+            if len(self.layer_ids) else [0] * len(self.layers)
+        return {layer['name']: int(count) for layer, count in zip(self.layers, counts) if count}
+
+    def select_entities(self, entity_type=None, layer=None, corner1=None, corner2=None, crossing=True, limit=20):
+        """Filter the type and layer columns with the same wildcard rules AutoCAD applies to a selection set."""
+        type_match, layer_match = filter_predicates(*selection_filter(entity_type, layer))
+        mask = np.ones(len(self), dtype=bool)
+        if type_match is not None:
+            codes = [code for code, name in enumerate(TYPE_NAMES) if type_match(DXF_TYPES[name])]
+            mask &= np.isin(np.frombuffer(self.types, dtype=np.uint8), codes)
+        if layer_match is not None:
+            ids = [i for i, info in enumerate(self.layers) if layer_match(info['name'])]
+            mask &= np.isin(np.frombuffer(self.layer_ids, dtype=np.uint32), ids)
+        if corner1 is not None and corner2 is not None:
+            hits = np.asarray(self.spatial_index().window(corner1, corner2, crossing), dtype=np.int64)
+            rows = hits[mask[hits]]
+        else:
+            rows = np.flatnonzero(mask)
+        entities = [{'type': TYPE_NAMES[self.types[i]], 'handle': self.handle(i),
+                     'layer': self.layers[self.layer_ids[i]]['name']} for i in rows[:limit].tolist()]
+        return {'count': len(rows), 'entities': entities}
+
+    def memory_bytes(self):
+        """Bytes held by the entity arrays (excluding the layer table)."""
+        return sum(a.itemsize * len(a) for a in (self.types, self.layer_ids, self.offsets, self.coords))
+
+    # --- Blocks -----------------------------------------------------------
+
+    def define_block(self, name, entities):
+        """Store the block definition once; redefining an existing name is a no-op."""
+        if name.lower() not in self.blocks:
+            self.blocks[name.lower()] = [self._entity_args(e) for e in entities]
+            self.block_names.append(name)
+        return True
+
+    def insert_block(self, name, insertion_point, rotation=0.0):
+        """Add a block reference and return its entity index."""
+        index = next((i for i, n in enumerate(self.block_names) if n.lower() == name.lower()), None)
+        if index is None:
+            raise ValueError(f"Block '{name}' is not defined")
+        return self._append(INSERT, self._point3(insertion_point) + (math.radians(float(rotation)), float(index)))
+
+    # --- Layers -----------------------------------------------------------
+
+    def _add_layer(self, name, color):
+        self._layer_index[name.lower()] = len(self.layers)
+        self.layers.append({'name': name, 'is_on': True, 'is_frozen': False, 'is_locked': False, 'color': int(color)})
+        return self.layers[-1]
+
+    def _find_layer(self, name):
+        index = self._layer_index.get(str(name).lower())
+        if index is None:
+            raise KeyError(f"Layer '{name}' not found")
+        return self.layers[index]
+
+    def create_layer(self, layer_name, color_index=7):
+        """Create a new layer or update the color of an existing one."""
+        index = self._layer_index.get(layer_name.lower())
+        if index is None:
+            layer = self._add_layer(layer_name, color_index)
+        else:
+            layer = self.layers[index]
+            layer['color'] = int(color_index)
+        return layer
+
+    def rename_layer(self, old_name, new_name):
+        try:
+            layer = self._find_layer(old_name)
+            if new_name.lower() in self._layer_index and new_name.lower() != old_name.lower():
+                raise ValueError(f"Layer '{new_name}' already exists")
+            index = self._layer_index.pop(old_name.lower())
+            layer['name'] = new_name
+            self._layer_index[new_name.lower()] = index
+            return True
+        except Exception as e:
+            print(f"Error renaming layer: {e}")
+            return False
+
+    def change_layer_color(self, layer_name, color_index):
+        try:
+            self._find_layer(layer_name)['color'] = int(color_index)
+            return True
+        except Exception as e:
+            print(f"Error changing layer color: {e}")
+            return False
+
+    def get_layers_info(self):
+        return [dict(layer) for layer in self.layers]
+
+    def set_layer_status(self, layer_name, is_on):
+        try:
+            self._find_layer(layer_name)['is_on'] = bool(is_on)
+            return True
+        except Exception as e:
+            print(f"Error setting layer status: {e}")
+            return False
+
+    def set_current_layer(self, layer_name):
+        """Make new entities go to `layer_name`."""
+        self.current_layer = self._layer_index[self._find_layer(layer_name)['name'].lower()]
+
+    # --- Commands ---------------------------------------------------------
+
+    def send_command(self, command):
+        """Record the command; there is no command line to run it against."""
+        self.commands.append(command)
+        return True
+
+    # --- DXF export -------------------------------------------------------
+
+    def _write_entity(self, w, kind, c, layer):
+        if kind == LINE:
+            w(f"0\nLINE\n8\n{layer}\n10\n{c[0]!r}\n20\n{c[1]!r}\n30\n{c[2]!r}\n11\n{c[3]!r}\n21\n{c[4]!r}\n31\n{c[5]!r}\n")
+        elif kind == CIRCLE:
+            w(f"0\nCIRCLE\n8\n{layer}\n10\n{c[0]!r}\n20\n{c[1]!r}\n30\n{c[2]!r}\n40\n{c[3]!r}\n")
+        elif kind == POINT:
+            w(f"0\nPOINT\n8\n{layer}\n10\n{c[0]!r}\n20\n{c[1]!r}\n30\n{c[2]!r}\n")
+        elif kind == ARC:
+            w(f"0\nARC\n8\n{layer}\n10\n{c[0]!r}\n20\n{c[1]!r}\n30\n{c[2]!r}\n40\n{c[3]!r}\n"
+              f"50\n{math.degrees(c[4])!r}\n51\n{math.degrees(c[5])!r}\n")
+        elif kind == SPLINE:
+            w(f"0\nPOLYLINE\n8\n{layer}\n66\n1\n70\n8\n")
+            for j in range(2, len(c), 3):
+                w(f"0\nVERTEX\n8\n{layer}\n10\n{c[j]!r}\n20\n{c[j + 1]!r}\n30\n{c[j + 2]!r}\n70\n32\n")
+            w(f"0\nSEQEND\n8\n{layer}\n")
+        elif kind == POLYLINE:
+            w(f"0\nPOLYLINE\n8\n{layer}\n66\n1\n10\n0.0\n20\n0.0\n30\n{c[3]!r}\n70\n{int(c[0])}\n")
+            for j in range(1, len(c), 3):
+                w(f"0\nVERTEX\n8\n{layer}\n10\n{c[j]!r}\n20\n{c[j + 1]!r}\n30\n{c[j + 2]!r}\n")
+            w(f"0\nSEQEND\n8\n{layer}\n")
+        elif kind == INSERT:
+            name = self.block_names[int(c[4])]
+            w(f"0\nINSERT\n8\n{layer}\n2\n{name}\n10\n{c[0]!r}\n20\n{c[1]!r}\n30\n{c[2]!r}\n50\n{math.degrees(c[3])!r}\n")
+
+    def write_dxf(self, stream):
+        """
+        Write the drawing as an ASCII DXF (R12). R12 has no SPLINE entity, so splines
+        are exported as 3D polylines through their fit points.
+        """
+        w = stream.write
+        w("0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n0\nENDSEC\n")
+        w(f"0\nSECTION\n2\nTABLES\n0\nTABLE\n2\nLAYER\n70\n{len(self.layers)}\n")
+        for layer in self.layers:
+            color = layer['color'] if layer['is_on'] else -layer['color']
+            flags = (1 if layer['is_frozen'] else 0) | (4 if layer['is_locked'] else 0)
+            w(f"0\nLAYER\n2\n{layer['name']}\n70\n{flags}\n62\n{color}\n6\nCONTINUOUS\n")
+        w("0\nENDTAB\n0\nENDSEC\n")
+
+        if self.block_names:
+            w("0\nSECTION\n2\nBLOCKS\n")
+            for name in self.block_names:
+                w(f"0\nBLOCK\n8\n0\n2\n{name}\n70\n0\n10\n0.0\n20\n0.0\n30\n0.0\n3\n{name}\n")
+                for kind, args in self.blocks[name.lower()]:
+                    code, row = self._row(kind, args)[:2]
+                    self._write_entity(w, code, row, "0")
+                w("0\nENDBLK\n8\n0\n")
+            w("0\nENDSEC\n")
+
+        w("0\nSECTION\n2\nENTITIES\n")
+        coords = self.coords
+        for i, kind in enumerate(self.types):
+            start, end = self._span(i)
+            self._write_entity(w, kind, coords[start:end], self.layers[self.layer_ids[i]]['name'])
+        w("0\nENDSEC\n0\nEOF\n")
+
+    def save_dxf(self, path):
+        """Save the drawing to `path` as DXF."""
+        with open(path, "w", encoding="utf-8") as f:
+            self.write_dxf(f)
+        print(f"[+] Saved {len(self)} entities to '{path}'.")
+        return path
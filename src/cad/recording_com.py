@@ -0,0 +1,515 @@
+import math
+import threading
+import time
+from collections import Counter
+
+from src.cad.selection import OBJECT_DXF_TYPES, SELECT_ALL, SELECT_CROSSING, filter_predicates
+from src.cad.spatial_index import entity_bounds
+
+# HRESULTs as pywintypes.com_error reports them (signed 32-bit)
+MK_E_UNAVAILABLE = 0x800401E3 - 2 ** 32
+RPC_E_DISCONNECTED = 0x80010108 - 2 ** 32
+
+
+def _coords(value):
+    """Unwrap a win32com VARIANT (or plain sequence) into a tuple of floats."""
+    value = getattr(value, 'value', value)
+    return tuple(float(v) for v in value)
+
+
+class RecordingComError(Exception):
+    """Stand-in for pywintypes.com_error, carrying the HRESULT the same way."""
+    def __init__(self, hresult, message=""):
+        super().__init__(hresult, message, None, None)
+        self.hresult = hresult
+
+
+class CallLog:
+    """Shared record of every COM method invoked on the stand-in objects."""
+    def __init__(self, latency=0.0):
+        self.latency = float(latency)
+        self.calls = []
+        self.counts = Counter()
+        self.disconnected = False
+
+    def record(self, name):
+        if self.disconnected:
+            raise RecordingComError(RPC_E_DISCONNECTED, "The object invoked has disconnected from its clients.")
+        self.calls.append(name)
+        self.counts[name] += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    @property
+    def total(self):
+        return len(self.calls)
+
+    def reset(self):
+        self.calls.clear()
+        self.counts.clear()
+
+
+def _geometry_property(name, read):
+    """A read-only entity property that counts as one COM round-trip."""
+    def get(self):
+        self._owner._log.record(name)
+        return read(self.geometry)
+
+    return property(get)
+
+
+def _coordinates(geometry):
+    if 'points' in geometry:
+        # Lightweight polylines report their vertices as flat (x, y) pairs
+        return tuple(v for x, y, _ in geometry['points'] for v in (x, y))
+    return tuple(geometry['point'])
+
+
+class RecordingEntity:
+    """A model-space entity created through the recording stand-in."""
+    OBJECT_NAMES = {'insert': "AcDbBlockReference"}
+
+    StartPoint = _geometry_property('StartPoint', lambda g: tuple(g['start']))
+    EndPoint = _geometry_property('EndPoint', lambda g: tuple(g['end']))
+    Center = _geometry_property('Center', lambda g: tuple(g['center']))
+    Radius = _geometry_property('Radius', lambda g: g['radius'])
+    StartAngle = _geometry_property('StartAngle', lambda g: g['start_angle'])
+    EndAngle = _geometry_property('EndAngle', lambda g: g['end_angle'])
+    Coordinates = _geometry_property('Coordinates', _coordinates)
+    FitPoints = _geometry_property('FitPoints', lambda g: tuple(v for p in g['points'] for v in p))
+    ControlPoints = _geometry_property('ControlPoints', lambda g: tuple(v for p in g['points'] for v in p))
+    InsertionPoint = _geometry_property('InsertionPoint', lambda g: tuple(g['point']))
+    Rotation = _geometry_property('Rotation', lambda g: g['rotation'])
+    Name = _geometry_property('Name', lambda g: g['name'])
+
+    def __init__(self, owner, kind, geometry):
+        self._owner = owner
+        self.kind = kind
+        self.geometry = geometry
+        self.layer = "0"
+        self.handle = owner._next_handle()
+
+    @property
+    def object_name(self):
+        return self.OBJECT_NAMES.get(self.kind, "AcDb" + self.kind.capitalize())
+
+    @property
+    def ObjectName(self):
+        self._owner._log.record('ObjectName')
+        return self.object_name
+
+    @property
+    def Handle(self):
+        self._owner._log.record('Handle')
+        return self.handle
+
+    @property
+    def Layer(self):
+        self._owner._log.record('Layer')
+        return self.layer
+
+    @Layer.setter
+    def Layer(self, value):
+        self._owner._log.record('Layer=')
+        self.layer = str(value)
+
+    def _transformed(self, fn):
+        """Return a copy of the geometry with every point passed through fn."""
+        geometry = dict(self.geometry)
+        for key in ('start', 'end', 'center', 'point'):
+            if key in geometry:
+                geometry[key] = fn(geometry[key])
+        if 'points' in geometry:
+            geometry['points'] = [fn(p) for p in geometry['points']]
+        return geometry
+
+    @property
+    def Closed(self):
+        return self.geometry.get('closed', False)
+
+    @Closed.setter
+    def Closed(self, value):
+        self._owner._log.record('Closed')
+        self.geometry['closed'] = bool(value)
+
+    @property
+    def Elevation(self):
+        return self.geometry['points'][0][2]
+
+    @Elevation.setter
+    def Elevation(self, value):
+        self._owner._log.record('Elevation')
+        self.geometry['points'] = [(x, y, float(value)) for x, y, _ in self.geometry['points']]
+
+    def ArrayPolar(self, count, angle_to_fill, center_point):
+        self._owner._log.record('ArrayPolar')
+        count = int(count)
+        fill = float(angle_to_fill)
+        cx, cy = _coords(center_point)[:2]
+        # AutoCAD spreads a full circle evenly; partial fills include both ends.
+        step = fill / count if abs(abs(fill) - 2 * math.pi) < 1e-9 else fill / max(count - 1, 1)
+        copies = []
+        for k in range(1, count):
+            cos_a, sin_a = math.cos(step * k), math.sin(step * k)
+
+            def rotate(p, cos_a=cos_a, sin_a=sin_a):
+                dx, dy = p[0] - cx, p[1] - cy
+                return (cx + dx * cos_a - dy * sin_a, cy + dx * sin_a + dy * cos_a) + tuple(p[2:])
+
+            geometry = self._transformed(rotate)
+            if 'start_angle' in geometry:
+                geometry['start_angle'] += step * k
+                geometry['end_angle'] += step * k
+            copies.append(self._owner._append(self.kind, geometry))
+        return tuple(copies)
+
+    def ArrayRectangular(self, rows, columns, levels, row_distance, column_distance, level_distance):
+        self._owner._log.record('ArrayRectangular')
+        copies = []
+        for level in range(int(levels)):
+            for row in range(int(rows)):
+                for column in range(int(columns)):
+                    if row == column == level == 0:
+                        continue
+                    dx, dy, dz = column * column_distance, row * row_distance, level * level_distance
+                    geometry = self._transformed(lambda p: (p[0] + dx, p[1] + dy, p[2] + dz))
+                    copies.append(self._owner._append(self.kind, geometry))
+        return tuple(copies)
+
+    def Copy(self):
+        self._owner._log.record('Copy')
+        return self._owner._append(self.kind, self._transformed(lambda p: p))
+
+    def Move(self, from_point, to_point):
+        self._owner._log.record('Move')
+        (fx, fy, fz), (tx, ty, tz) = _coords(from_point), _coords(to_point)
+        self.geometry = self._transformed(lambda p: (p[0] + tx - fx, p[1] + ty - fy, p[2] + tz - fz))
+
+    def Delete(self):
+        self._owner._log.record('Delete')
+        self._owner.entities.remove(self)
+
+    def bounds(self):
+        """XY bounding box, computed inside 'AutoCAD' for window selection."""
+        g = self.geometry
+        if 'start' in g:
+            return entity_bounds('line', (g['start'], g['end']))
+        if 'radius' in g:
+            return entity_bounds('circle', (g['center'], g['radius']))
+        if 'points' in g:
+            return entity_bounds('polyline', (g['points'], False))
+        return entity_bounds('point', (g['point'],))
+
+
+class RecordingModelSpace:
+    """Stand-in for AutoCAD's ModelSpace collection that records every Add* call."""
+    def __init__(self, log):
+        self._log = log
+        self._handle_seed = 0x200
+        self.entities = []
+
+    def _next_handle(self):
+        self._handle_seed += 1
+        return format(self._handle_seed, 'X')
+
+    def _append(self, kind, geometry):
+        entity = RecordingEntity(self, kind, geometry)
+        self.entities.append(entity)
+        return entity
+
+    @property
+    def Count(self):
+        self._log.record('Count')
+        return len(self.entities)
+
+    def __iter__(self):
+        self._log.record('_NewEnum')
+        return iter(list(self.entities))
+
+    def Item(self, index):
+        self._log.record('Item')
+        return self.entities[index]
+
+    def AddLine(self, start, end):
+        self._log.record('AddLine')
+        return self._append('line', {'start': _coords(start), 'end': _coords(end)})
+
+    def AddCircle(self, center, radius):
+        self._log.record('AddCircle')
+        return self._append('circle', {'center': _coords(center), 'radius': float(radius)})
+
+    def AddPoint(self, point):
+        self._log.record('AddPoint')
+        return self._append('point', {'point': _coords(point)})
+
+    def AddArc(self, center, radius, start_angle, end_angle):
+        self._log.record('AddArc')
+        return self._append('arc', {
+            'center': _coords(center), 'radius': float(radius),
+            'start_angle': float(start_angle), 'end_angle': float(end_angle),
+        })
+
+    def InsertBlock(self, point, name, x_scale, y_scale, z_scale, rotation):
+        self._log.record('InsertBlock')
+        return self._append('insert', {
+            'point': _coords(point), 'name': name,
+            'scale': (float(x_scale), float(y_scale), float(z_scale)), 'rotation': float(rotation),
+        })
+
+    def AddLightWeightPolyline(self, vertices):
+        self._log.record('AddLightWeightPolyline')
+        flat = _coords(vertices)
+        return self._append('polyline', {
+            'points': [(flat[i], flat[i + 1], 0.0) for i in range(0, len(flat), 2)], 'closed': False,
+        })
+
+    def AddSpline(self, points, start_tangent, end_tangent):
+        self._log.record('AddSpline')
+        flat = _coords(points)
+        return self._append('spline', {
+            'points': [flat[i:i + 3] for i in range(0, len(flat), 3)],
+            'start_tangent': _coords(start_tangent), 'end_tangent': _coords(end_tangent),
+        })
+
+
+class RecordingBlock(RecordingModelSpace):
+    """Block definition: same Add* surface as model space."""
+    def __init__(self, log, name, origin):
+        super().__init__(log)
+        self.Name = name
+        self.Origin = origin
+
+
+class RecordingBlocks:
+    def __init__(self, log):
+        self._log = log
+        self._items = {}
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def Add(self, origin, name):
+        self._log.record('Blocks.Add')
+        block = self._items.get(name.lower())
+        if block is None:
+            block = self._items[name.lower()] = RecordingBlock(self._log, name, _coords(origin))
+        return block
+
+    def Item(self, name):
+        self._log.record('Blocks.Item')
+        try:
+            return self._items[str(name).lower()]
+        except KeyError:
+            raise KeyError(f"Block '{name}' not found")
+
+
+def _layer_property(name):
+    """A layer property whose reads and writes each count as one COM round-trip."""
+    def get(self):
+        self._log.record(f'Layer.{name}')
+        return self._props[name]
+
+    def set(self, value):
+        self._log.record(f'Layer.{name}=')
+        self._props[name] = value
+
+    return property(get, set)
+
+
+class RecordingLayer:
+    Name = _layer_property('Name')
+    Color = _layer_property('Color')
+    LayerOn = _layer_property('LayerOn')
+    Freeze = _layer_property('Freeze')
+    Lock = _layer_property('Lock')
+
+    def __init__(self, log, name, color=7):
+        self._log = log
+        self._props = {'Name': name, 'Color': color, 'LayerOn': True, 'Freeze': False, 'Lock': False}
+
+
+class RecordingLayers:
+    def __init__(self, log):
+        self._log = log
+        self._items = [RecordingLayer(log, "0")]
+
+    @property
+    def Count(self):
+        self._log.record('Layers.Count')
+        return len(self._items)
+
+    def __iter__(self):
+        self._log.record('Layers._NewEnum')
+        return iter(list(self._items))
+
+    def _find(self, name):
+        # Lookup inside AutoCAD itself, so it does not count as a round-trip
+        for layer in self._items:
+            if layer._props['Name'].lower() == str(name).lower():
+                return layer
+        return None
+
+    def Add(self, name):
+        self._log.record('Layers.Add')
+        layer = self._find(name)
+        if layer is None:
+            layer = RecordingLayer(self._log, name)
+            self._items.append(layer)
+        return layer
+
+    def Item(self, key):
+        self._log.record('Layers.Item')
+        if isinstance(key, int):
+            return self._items[key]
+        layer = self._find(key)
+        if layer is None:
+            raise KeyError(f"Layer '{key}' not found")
+        return layer
+
+
+class RecordingSelectionSet:
+    """Selection set whose filtering runs on the 'AutoCAD' side, like the real one."""
+    def __init__(self, owner, log, name):
+        self._owner = owner
+        self._log = log
+        self.Name = name
+        self._items = []
+
+    def Select(self, mode, point1=None, point2=None, filter_type=None, filter_data=None):
+        self._log.record('SelectionSet.Select')
+        type_match, layer_match = filter_predicates(list(filter_type or ()), list(filter_data or ()))
+        window = None
+        if mode != SELECT_ALL:
+            (x1, y1), (x2, y2) = _coords(point1)[:2], _coords(point2)[:2]
+            window = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        for entity in self._owner.ModelSpace.entities:
+            dxf = OBJECT_DXF_TYPES.get(entity.object_name, "")
+            if type_match is not None and not type_match(dxf):
+                continue
+            if layer_match is not None and not layer_match(entity.layer):
+                continue
+            if window is not None:
+                x0, y0, x1, y1 = entity.bounds()
+                if mode == SELECT_CROSSING:
+                    inside = x0 <= window[2] and x1 >= window[0] and y0 <= window[3] and y1 >= window[1]
+                else:
+                    inside = x0 >= window[0] and x1 <= window[2] and y0 >= window[1] and y1 <= window[3]
+                if not inside:
+                    continue
+            self._items.append(entity)
+
+    @property
+    def Count(self):
+        self._log.record('SelectionSet.Count')
+        return len(self._items)
+
+    def Item(self, index):
+        self._log.record('SelectionSet.Item')
+        return self._items[index]
+
+    def Delete(self):
+        self._log.record('SelectionSet.Delete')
+        self._owner.SelectionSets._items.pop(self.Name.lower(), None)
+
+
+class RecordingSelectionSets:
+    def __init__(self, owner, log):
+        self._owner = owner
+        self._log = log
+        self._items = {}
+
+    def Add(self, name):
+        self._log.record('SelectionSets.Add')
+        if name.lower() in self._items:
+            raise ValueError(f"Selection set '{name}' already exists")
+        selection = self._items[name.lower()] = RecordingSelectionSet(self._owner, self._log, name)
+        return selection
+
+    def Item(self, name):
+        self._log.record('SelectionSets.Item')
+        try:
+            return self._items[str(name).lower()]
+        except KeyError:
+            raise KeyError(f"Selection set '{name}' not found")
+
+
+class RecordingDocument:
+    def __init__(self, log):
+        self._log = log
+        self.ModelSpace = RecordingModelSpace(log)
+        self.Layers = RecordingLayers(log)
+        self.Blocks = RecordingBlocks(log)
+        self.SelectionSets = RecordingSelectionSets(self, log)
+        self.commands = []
+        self.undo_depth = 0
+
+    def SendCommand(self, command):
+        self._log.record('SendCommand')
+        self.commands.append(command)
+
+    def GetVariable(self, name):
+        self._log.record('GetVariable')
+        if name.upper() == 'HANDSEED':
+            return format(self.ModelSpace._handle_seed + 1, 'X')
+        raise KeyError(f"System variable '{name}' not found")
+
+    def StartUndoMark(self):
+        self._log.record('StartUndoMark')
+        self.undo_depth += 1
+
+    def EndUndoMark(self):
+        self._log.record('EndUndoMark')
+        self.undo_depth -= 1
+
+
+class RecordingApplication:
+    """Recording stand-in for the AutoCAD.Application COM object.
+
+    Every COM method call is appended to ``log`` and can be slowed down by
+    ``latency`` seconds to mimic a cross-process round-trip, so drawing code can be
+    measured and regression-tested without AutoCAD.
+    """
+    def __init__(self, latency=0.0):
+        self.log = CallLog(latency)
+        self._document = RecordingDocument(self.log)
+
+    @property
+    def ActiveDocument(self):
+        if self.log.disconnected:
+            raise RecordingComError(RPC_E_DISCONNECTED, "The object invoked has disconnected from its clients.")
+        return self._document
+
+    @ActiveDocument.setter
+    def ActiveDocument(self, document):
+        self._document = document
+
+    def Quit(self):
+        """Simulate AutoCAD going away: every later call on this object tree fails."""
+        self.log.disconnected = True
+
+
+class FakeComProvider:
+    """Stand-in for win32com.client.GetActiveObject.
+
+    ``running`` maps ProgIDs to application objects; any other ProgID fails with
+    MK_E_UNAVAILABLE like a version that is not installed or not running. Each
+    lookup sleeps ``latency`` seconds (a number, or a dict per ProgID) and is
+    appended to ``calls``, so connection strategies can be timed and compared.
+    """
+    def __init__(self, running=None, latency=0.0):
+        self.running = dict(running or {})
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prog_id):
+        with self._lock:
+            self.calls.append(prog_id)
+        delay = self.latency.get(prog_id, 0.0) if isinstance(self.latency, dict) else self.latency
+        if delay > 0:
+            time.sleep(delay)
+        app = self.running.get(prog_id)
+        if app is None:
+            raise RecordingComError(MK_E_UNAVAILABLE, "Operation unavailable")
+        return app
@@ -0,0 +1,112 @@
+import re
+
+# Entity type names used by the tools -> DXF type names matched by group code 0
+DXF_TYPES = {
+    'line': 'LINE', 'circle': 'CIRCLE', 'point': 'POINT', 'arc': 'ARC',
+    'spline': 'SPLINE', 'insert': 'INSERT', 'polyline': 'LWPOLYLINE',
+}
+_ALIASES = {'block': 'insert', 'lwpolyline': 'polyline', 'pline': 'polyline'}
+# ObjectName reported over COM -> DXF type name
+OBJECT_DXF_TYPES = {
+    'AcDbLine': 'LINE', 'AcDbCircle': 'CIRCLE', 'AcDbPoint': 'POINT', 'AcDbArc': 'ARC',
+    'AcDbSpline': 'SPLINE', 'AcDbBlockReference': 'INSERT', 'AcDbPolyline': 'LWPOLYLINE',
+}
+KIND_NAMES = {dxf: kind for kind, dxf in DXF_TYPES.items()}
+
+# DXF group codes understood by the filters
+GROUP_TYPE = 0
+GROUP_LAYER = 8
+
+# AutoCAD SelectionSet.Select modes
+SELECT_WINDOW = 0
+SELECT_CROSSING = 1
+SELECT_ALL = 5
+
+_WILDCARDS = {'*': '.*', '?': '.', '#': '[0-9]', '@': '[A-Za-z]', '.': '[^A-Za-z0-9]'}
+
+
+def _wildcard_regex(pattern):
+    """Regex for one comma-free alternative of an AutoCAD wildcard pattern."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '`' and i + 1 < len(pattern):
+            # Backquote: next character is literal
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        if ch == '[':
+            end = pattern.find(']', i + 1)
+            if end > i:
+                body = pattern[i + 1:end]
+                negate = body.startswith('~')
+                body = body[1:] if negate else body
+                body = body.replace('\\', '\\\\').replace('^', '\\^')
+                out.append(f"[{'^' if negate else ''}{body}]")
+                i = end + 1
+                continue
+        out.append(_WILDCARDS.get(ch, re.escape(ch)))
+        i += 1
+    return ''.join(out)
+
+
+def wcmatch(pattern):
+    """
+    Predicate for an AutoCAD wildcard pattern as used in selection filters:
+    `*` `?` `#` (digit) `@` (letter) `.` (non-alphanumeric), `[...]` and `[~...]`,
+    a backquote to escape, commas between alternatives and a leading `~` to
+    negate. Matching ignores case, like AutoCAD.
+    """
+    pattern = str(pattern)
+    negate = pattern.startswith('~')
+    if negate:
+        pattern = pattern[1:]
+    alternatives = re.split(r'(?<!`),', pattern)
+    regex = re.compile('|'.join(f"(?:{_wildcard_regex(p.strip())})" for p in alternatives) + r'\Z', re.IGNORECASE)
+    if negate:
+        return lambda name: regex.match(str(name)) is None
+    return lambda name: regex.match(str(name)) is not None
+
+
+def type_pattern(entity_type):
+    """
+    DXF type pattern for a tool's entity_type: a name ('circle'), a DXF name
+    ('LWPOLYLINE'), a comma-separated string or a list of either. Unknown names
+    pass through as written, so wildcards and other DXF types still work.
+    """
+    names = entity_type.split(',') if isinstance(entity_type, str) else list(entity_type)
+    patterns = []
+    for name in names:
+        key = str(name).strip().lower()
+        if key not in DXF_TYPES and key not in _ALIASES and key.endswith('s'):
+            # "count circles"
+            key = key[:-1]
+        key = _ALIASES.get(key, key)
+        patterns.append(DXF_TYPES.get(key, str(name).strip().upper()))
+    return ','.join(patterns)
+
+
+def selection_filter(entity_type=None, layer=None):
+    """DXF group-code filter as ([codes], [values]) for SelectionSet.Select; empty lists select everything."""
+    codes, values = [], []
+    if entity_type:
+        codes.append(GROUP_TYPE)
+        values.append(type_pattern(entity_type))
+    if layer:
+        codes.append(GROUP_LAYER)
+        values.append(str(layer))
+    return codes, values
+
+
+def filter_predicates(codes, values):
+    """(type predicate, layer predicate) matching DXF type names and layer names; None where unfiltered."""
+    type_match = layer_match = None
+    for code, value in zip(codes, values):
+        if code == GROUP_TYPE:
+            type_match = wcmatch(value)
+        elif code == GROUP_LAYER:
+            layer_match = wcmatch(value)
+        else:
+            raise ValueError(f"Unsupported DXF group code {code}")
+    return type_match, layer_match
@@ -0,0 +1,255 @@
+"""
+Vectorized point-list reduction for splines and polylines.
+
+Every function takes an (N, 2) or (N, 3) point list and works on a float64
+(N, 3) array. Reductions keep a subset of the input points and are bounded by
+`tolerance`: no input point is farther than that from what is drawn through
+the kept ones, the polyline or, for fit points, the spline. The spans are
+processed together, one NumPy pass per refinement level, rather than one
+recursive call per span.
+"""
+import math
+
+import numpy as np
+
+# Curve samples per span when measuring how far points are from a fitted spline
+SPLINE_SAMPLES = 32
+
+
+def as_points(points):
+    """(N, 3) float64 array of the points; 2D points get z = 0."""
+    pts = np.asarray(points, dtype=np.float64)
+    if pts.ndim != 2 or pts.shape[1] not in (2, 3):
+        pts = pts.reshape(len(pts), -1)
+    if pts.shape[1] == 2:
+        pts = np.column_stack([pts, np.zeros(len(pts))])
+    return np.ascontiguousarray(pts[:, :3])
+
+
+def segment_distances(points, starts, ends):
+    """Row-wise distance from each point to the segment between the matching start and end points."""
+    d = ends - starts
+    length2 = np.einsum('ij,ij->i', d, d)
+    t = np.einsum('ij,ij->i', points - starts, d) / np.where(length2 > 0, length2, 1.0)
+    nearest = starts + np.clip(t, 0.0, 1.0)[:, None] * d
+    return np.linalg.norm(points - nearest, axis=1)
+
+
+def dedupe_indices(points, epsilon=1e-9):
+    """Indices of the points left when points within `epsilon` of their predecessor are dropped."""
+    pts = as_points(points)
+    if len(pts) < 2:
+        return np.arange(len(pts))
+    steps = np.linalg.norm(np.diff(pts, axis=0), axis=1)
+    return np.concatenate(([0], np.flatnonzero(steps > epsilon) + 1))
+
+
+def deviations(points, kept):
+    """Distance of every point to the segment of the reduced polyline (through the sorted `kept` indices) it was replaced by."""
+    pts = as_points(points)
+    kept = np.asarray(kept)
+    if len(kept) < 2:
+        return np.zeros(len(pts))
+    span = np.minimum(np.searchsorted(kept, np.arange(len(pts)), side='right') - 1, len(kept) - 2)
+    return segment_distances(pts, pts[kept[span]], pts[kept[span + 1]])
+
+
+def max_deviation(points, kept):
+    """Largest distance from an input point to the reduced polyline."""
+    dist = deviations(points, kept)
+    return float(dist.max()) if len(dist) else 0.0
+
+
+def rdp_indices(points, tolerance, keep=None):
+    """
+    Ramer-Douglas-Peucker: sorted indices of the points to keep so that every
+    point lies within `tolerance` of the polyline through the kept ones.
+    Starts from the end points plus `keep`. Each pass splits every span that
+    is still out of tolerance at its farthest point.
+    """
+    pts = as_points(points)
+    n = len(pts)
+    if n <= 2:
+        return np.arange(n)
+    kept = np.unique(np.concatenate(([0, n - 1], [] if keep is None else np.asarray(keep, dtype=np.int64)))).astype(np.int64)
+    while True:
+        dist = deviations(pts, kept)
+        # Points are in order, so each span is the slice from its start index to the next one
+        worst = np.maximum.reduceat(dist, kept[:-1])
+        split = worst > tolerance
+        if not split.any():
+            return kept
+        span = np.minimum(np.searchsorted(kept, np.arange(n), side='right') - 1, len(kept) - 2)
+        far = np.flatnonzero((dist == worst[span]) & split[span])
+        # One point per span: the first of its farthest points
+        _, first = np.unique(span[far], return_index=True)
+        kept = np.union1d(kept, far[first])
+
+
+def curvature(points):
+    """Menger curvature at each point (1 / radius of the circle through it and its neighbours); 0 at the ends."""
+    pts = as_points(points)
+    k = np.zeros(len(pts))
+    if len(pts) < 3:
+        return k
+    a, b, c = pts[:-2], pts[1:-1], pts[2:]
+    area2 = np.linalg.norm(np.cross(b - a, c - a), axis=1)
+    sides = np.linalg.norm(b - a, axis=1) * np.linalg.norm(c - b, axis=1) * np.linalg.norm(a - c, axis=1)
+    k[1:-1] = np.divide(2.0 * area2, sides, out=np.zeros(len(sides)), where=sides > 0)
+    return k
+
+
+def adaptive_indices(points, tolerance):
+    """
+    Curvature-adaptive resampling: indices spaced along the curve so that a
+    chord over a stretch of radius r sags at most `tolerance`, i.e. one point
+    every sqrt(8 * r * tolerance) of arc length. Straight stretches get no
+    points besides the end points.
+    """
+    pts = as_points(points)
+    n = len(pts)
+    if n <= 2:
+        return np.arange(n)
+    k = curvature(pts)
+    bend = np.maximum(k[:-1], k[1:])
+    lengths = np.linalg.norm(np.diff(pts, axis=0), axis=1)
+    per_length = np.sqrt(bend / (8.0 * tolerance)) if tolerance > 0 else np.where(bend > 0, np.inf, 0.0)
+    # Samples needed from the start up to each point; a new one wherever that passes a whole number
+    needed = np.floor(np.concatenate(([0.0], np.cumsum(np.nan_to_num(lengths * per_length, posinf=n)))))
+    marks = np.flatnonzero(np.diff(needed) > 0) + 1
+    return np.unique(np.concatenate(([0], marks, [n - 1])))
+
+
+def _tangent(angle):
+    rad = math.radians(float(angle))
+    return np.array([math.cos(rad), math.sin(rad), 0.0])
+
+
+def spline_derivatives(points, start_angle=15.0, end_angle=15.0):
+    """
+    Derivatives at the fit points of the cubic spline AutoCAD fits through
+    them: chord-length parameters, C2 continuity and unit end tangents at
+    `start_angle` / `end_angle` degrees (a clamped cubic spline).
+    """
+    pts = as_points(points)
+    n = len(pts)
+    d = np.zeros((n, 3))
+    d[0], d[-1] = _tangent(start_angle), _tangent(end_angle)
+    if n < 3:
+        return d
+    h = np.linalg.norm(np.diff(pts, axis=0), axis=1)
+    slopes = np.diff(pts, axis=0) / h[:, None]
+    # h[i] D[i-1] + 2 (h[i-1] + h[i]) D[i] + h[i-1] D[i+1] = 3 (h[i] slope[i-1] + h[i-1] slope[i])
+    lower, diag, upper = h[1:], 2.0 * (h[:-1] + h[1:]), h[:-1]
+    rhs = 3.0 * (h[1:, None] * slopes[:-1] + h[:-1, None] * slopes[1:])
+    rhs[0] -= lower[0] * d[0]
+    rhs[-1] -= upper[-1] * d[-1]
+    d[1:-1] = tridiagonal_solve(np.concatenate(([0.0], lower[1:])), diag, np.concatenate((upper[:-1], [0.0])), rhs)
+    return d
+
+
+def tridiagonal_solve(lower, diag, upper, rhs):
+    """
+    Solve lower[i] x[i-1] + diag[i] x[i] + upper[i] x[i+1] = rhs[i] for a
+    diagonally dominant system (lower[0] and upper[-1] are 0); `rhs` is (N,) or
+    (N, k). Parallel cyclic reduction: every pass eliminates, from all rows at
+    once, the neighbours at twice the previous distance, so log2(N) NumPy
+    passes leave a diagonal system.
+    """
+    a, b, c = (np.array(v, dtype=np.float64) for v in (lower, diag, upper))
+    r = np.asarray(rhs, dtype=np.float64)
+    shape = r.shape
+    r = r.reshape(len(b), -1)
+    n = len(b)
+    stride = 1
+    while stride < n:
+        # Rows beyond either end act as identity rows with nothing on the right-hand side
+        edge = np.zeros(stride)
+        pa, pc = np.concatenate((edge, a, edge)), np.concatenate((edge, c, edge))
+        pb = np.concatenate((edge + 1.0, b, edge + 1.0))
+        pr = np.concatenate((np.zeros((stride, r.shape[1])), r, np.zeros((stride, r.shape[1]))))
+        alpha, gamma = -a / pb[:n], -c / pb[2 * stride:]
+        r = r + alpha[:, None] * pr[:n] + gamma[:, None] * pr[2 * stride:]
+        b = b + alpha * pc[:n] + gamma * pa[2 * stride:]
+        a, c = alpha * pa[:n], gamma * pc[2 * stride:]
+        stride *= 2
+    return (r / b[:, None]).reshape(shape)
+
+
+def spline_samples(points, start_angle=15.0, end_angle=15.0, samples=SPLINE_SAMPLES):
+    """Points along each span of the fitted spline as an (N - 1, samples + 1, 3) array."""
+    pts = as_points(points)
+    d = spline_derivatives(pts, start_angle, end_angle)
+    h = np.linalg.norm(np.diff(pts, axis=0), axis=1)[:, None, None]
+    u = np.linspace(0.0, 1.0, samples + 1)[None, :, None]
+    # Cubic Hermite basis
+    h00, h10, h01, h11 = 2 * u ** 3 - 3 * u ** 2 + 1, u ** 3 - 2 * u ** 2 + u, -2 * u ** 3 + 3 * u ** 2, u ** 3 - u ** 2
+    return (h00 * pts[:-1, None] + h10 * h * d[:-1, None] + h01 * pts[1:, None] + h11 * h * d[1:, None])
+
+
+def spline_deviations(points, kept, start_angle=15.0, end_angle=15.0):
+    """Distance of every point to the span of the spline fitted through the sorted `kept` indices it was replaced by."""
+    pts = as_points(points)
+    kept = np.asarray(kept)
+    if len(kept) < 2:
+        return np.zeros(len(pts))
+    curve = spline_samples(pts[kept], start_angle, end_angle)
+    span = np.minimum(np.searchsorted(kept, np.arange(len(pts)), side='right') - 1, len(kept) - 2)
+    samples = curve.shape[1] - 1
+    starts = curve[span, :-1].reshape(-1, 3)
+    ends = curve[span, 1:].reshape(-1, 3)
+    dist = segment_distances(np.repeat(pts, samples, axis=0), starts, ends)
+    return dist.reshape(len(pts), samples).min(axis=1)
+
+
+def spline_indices(points, tolerance, start_angle=15.0, end_angle=15.0, keep=None):
+    """
+    Sorted indices of the fit points to keep so that every point lies within
+    `tolerance` of the spline fitted through the kept ones. Starts from the
+    Ramer-Douglas-Peucker result and adds the farthest point of every span
+    that is still out of tolerance. With every point kept the spline passes
+    through all of them, so this always ends.
+    """
+    pts = as_points(points)
+    kept = rdp_indices(pts, tolerance, keep)
+    n = len(pts)
+    while True:
+        dist = spline_deviations(pts, kept, start_angle, end_angle)
+        dist[kept] = 0.0
+        worst = np.maximum.reduceat(dist, kept[:-1]) if len(kept) > 1 else np.zeros(0)
+        split = worst > tolerance
+        if not split.any():
+            return kept
+        span = np.minimum(np.searchsorted(kept, np.arange(n), side='right') - 1, len(kept) - 2)
+        far = np.flatnonzero((dist == worst[span]) & split[span])
+        _, first = np.unique(span[far], return_index=True)
+        kept = np.union1d(kept, far[first])
+
+
+def simplify(points, tolerance, closed=False, tangents=None):
+    """
+    Reduced point list and its largest deviation, as (points (M, 3), max deviation).
+
+    Duplicate points are dropped, then Ramer-Douglas-Peucker keeps the points
+    needed to stay within `tolerance`. For spline fit points pass `tangents`
+    as (start angle, end angle) in degrees: curved stretches also keep the
+    points of `adaptive_indices`, and the deviation is measured against the
+    spline fitted through the kept points (see `spline_indices`) rather than
+    the polyline. A closed outline is reduced as a loop back to its first point.
+    """
+    pts = as_points(points)
+    pts = pts[dedupe_indices(pts)]
+    if tangents is not None:
+        kept = spline_indices(pts, tolerance, *tangents, keep=adaptive_indices(pts, tolerance))
+        return pts[kept], float(spline_deviations(pts, kept, *tangents).max(initial=0.0))
+    if closed and len(pts) > 2:
+        if np.linalg.norm(pts[-1] - pts[0]) <= 1e-9:
+            pts = pts[:-1]
+        loop = np.vstack([pts, pts[:1]])
+    else:
+        loop = pts
+    kept = rdp_indices(loop, tolerance)
+    deviation = max_deviation(loop, kept)
+    if loop is not pts:
+        kept = kept[:-1]
+    return pts[kept], deviation
@@ -0,0 +1,189 @@
+import sys
+from array import array
+
+import numpy as np
+
+from src.cad.headless_backend import ARC, CIRCLE, INSERT, LINE, POINT, POLYLINE, SPLINE, TYPE_NAMES
+
+# Entities the snapshot counts but keeps no geometry for (hatches, text, dimensions, ...)
+OTHER = len(TYPE_NAMES)
+SNAPSHOT_TYPE_NAMES = TYPE_NAMES + ('other',)
+_CODES = {name: code for code, name in enumerate(SNAPSHOT_TYPE_NAMES)}
+
+
+class ModelSpaceSnapshot:
+    """
+    Read-only copy of the model-space entities in compact columnar arrays.
+
+    Rows use the same `types`/`layer_ids`/`offsets`/`coords` layout as
+    HeadlessBackend, plus an integer handle per row and an `alive` flag, so
+    an erased entity is dropped by clearing its flag instead of shifting
+    every array. Rows are kept in model-space order (the order AutoCAD
+    enumerates them), which lets a sync locate erased entities by comparing
+    positions. Erased rows are compacted away once they outnumber live ones.
+    """
+
+    def __init__(self):
+        self.types = array('B')
+        self.layer_ids = array('I')
+        self.offsets = array('Q')
+        self.coords = array('d')
+        self.handles = array('Q')
+        self.alive = bytearray()
+        self.rows = {}
+        self.layers = []
+        self._layer_index = {}
+        self.block_names = []
+        self._block_index = {}
+        self.erased = 0
+        # Next handle AutoCAD will assign (HANDSEED) as of the last sync
+        self.handseed = 0
+        self.last_sync = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, handle):
+        return self._key(handle) in self.rows
+
+    @staticmethod
+    def _key(handle):
+        return handle if isinstance(handle, int) else int(handle, 16)
+
+    def _layer_id(self, name):
+        key = name.lower()
+        index = self._layer_index.get(key)
+        if index is None:
+            index = self._layer_index[key] = len(self.layers)
+            self.layers.append(name)
+        return index
+
+    def append(self, kind, args, handle, layer="0"):
+        """Add one entity given as (kind, args) in the argument order of the add_* methods; kind None keeps no geometry."""
+        key = self._key(handle)
+        if key in self.rows:
+            self.erase(key)
+        code = OTHER if kind is None else _CODES[kind]
+        if code in (LINE, POINT):
+            values = [v for p in args for v in p]
+        elif code in (CIRCLE, ARC):
+            values = list(args[0]) + [float(v) for v in args[1:]]
+        elif code == SPLINE:
+            values = [float(args[1]), float(args[2])] + [v for p in args[0] for v in p]
+        elif code == POLYLINE:
+            values = [1.0 if args[1] else 0.0] + [v for p in args[0] for v in p]
+        elif code == INSERT:
+            block = self._block_index.get(args[1].lower())
+            if block is None:
+                block = self._block_index[args[1].lower()] = len(self.block_names)
+                self.block_names.append(args[1])
+            values = list(args[0]) + [float(args[2]), float(block)]
+        else:
+            values = []
+        row = len(self.types)
+        self.types.append(code)
+        self.layer_ids.append(self._layer_id(str(layer)))
+        self.offsets.append(len(self.coords))
+        self.coords.extend(values)
+        self.handles.append(key)
+        self.alive.append(1)
+        self.rows[key] = row
+        return row
+
+    def erase(self, handle):
+        """Drop an entity; returns False if the handle is not in the snapshot."""
+        row = self.rows.pop(self._key(handle), None)
+        if row is None:
+            return False
+        self.alive[row] = 0
+        self.erased += 1
+        if self.erased > len(self.rows):
+            self.compact()
+        return True
+
+    def compact(self):
+        """Rewrite the arrays without erased rows."""
+        live = self.live_rows()
+        starts = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64) if len(self.offsets) else np.zeros(0, np.int64)
+        ends = np.append(starts[1:], len(self.coords))
+        coords = np.frombuffer(self.coords, dtype=np.float64) if len(self.coords) else np.zeros(0)
+        sizes = (ends - starts)[live]
+        keep = np.concatenate([np.arange(s, e) for s, e in zip(starts[live], ends[live])]) if len(live) else np.zeros(0, np.int64)
+        self.types = array('B', np.frombuffer(self.types, dtype=np.uint8)[live].tobytes())
+        self.layer_ids = array('I', np.frombuffer(self.layer_ids, dtype=np.uint32)[live].tobytes())
+        self.handles = array('Q', np.frombuffer(self.handles, dtype=np.uint64)[live].tobytes())
+        self.offsets = array('Q', (np.cumsum(sizes) - sizes).astype(np.uint64).tobytes())
+        self.coords = array('d', coords[keep.astype(np.int64)].tobytes())
+        self.alive = bytearray(b'\x01' * len(live))
+        self.rows = {handle: row for row, handle in enumerate(self.handles)}
+        self.erased = 0
+
+    def live_rows(self):
+        """Row numbers of the entities still in the drawing, in model-space order."""
+        return np.flatnonzero(np.frombuffer(bytes(self.alive), dtype=np.uint8))
+
+    def live_handles(self):
+        """Handles (as integers) of the live entities, in model-space order."""
+        return np.frombuffer(self.handles, dtype=np.uint64)[self.live_rows()].tolist() if self.alive else []
+
+    def primitive(self, row):
+        """Entity `row` as (kind, args, handle), or None for entities kept without geometry."""
+        code = self.types[row]
+        if code == OTHER:
+            return None
+        start = self.offsets[row]
+        end = self.offsets[row + 1] if row + 1 < len(self.offsets) else len(self.coords)
+        c = self.coords[start:end]
+        if code == LINE:
+            args = ((c[0], c[1], c[2]), (c[3], c[4], c[5]))
+        elif code in (CIRCLE, ARC):
+            args = ((c[0], c[1], c[2]),) + tuple(c[3:])
+        elif code == POINT:
+            args = ((c[0], c[1], c[2]),)
+        elif code == SPLINE:
+            args = (tuple((c[i], c[i + 1], c[i + 2]) for i in range(2, len(c), 3)), c[0], c[1])
+        elif code == POLYLINE:
+            args = (tuple((c[i], c[i + 1], c[i + 2]) for i in range(1, len(c), 3)), bool(c[0]))
+        else:
+            args = ((c[0], c[1], c[2]), self.block_names[int(c[4])], c[3])
+        return SNAPSHOT_TYPE_NAMES[code], args, format(self.handles[row], 'X')
+
+    def primitives(self):
+        """(kind, args, handle) of every live entity that has geometry."""
+        for row in self.live_rows().tolist():
+            item = self.primitive(row)
+            if item is not None:
+                yield item
+
+    def entity(self, handle):
+        """Type, layer and geometry of one entity as a dictionary, or None if it is not in the snapshot."""
+        row = self.rows.get(self._key(handle))
+        if row is None:
+            return None
+        data = {'type': SNAPSHOT_TYPE_NAMES[self.types[row]], 'layer': self.layers[self.layer_ids[row]],
+                'handle': format(self.handles[row], 'X')}
+        item = self.primitive(row)
+        if item is not None:
+            data['args'] = item[1]
+        return data
+
+    def count_by_type(self):
+        live = self.live_rows()
+        counts = np.bincount(np.frombuffer(self.types, dtype=np.uint8)[live], minlength=len(SNAPSHOT_TYPE_NAMES))
+        return {name: int(count) for name, count in zip(SNAPSHOT_TYPE_NAMES, counts)}
+
+    def count_by_layer(self):
+        """Live entities per layer name (layers without entities are left out)."""
+        live = self.live_rows()
+        counts = np.bincount(np.frombuffer(self.layer_ids, dtype=np.uint32)[live], minlength=len(self.layers))
+        return {name: int(count) for name, count in zip(self.layers, counts) if count}
+
+    def memory_bytes(self):
+        """Bytes held by the columnar arrays and the handle lookup table."""
+        columns = sum(a.itemsize * len(a) for a in (self.types, self.layer_ids, self.offsets, self.coords, self.handles))
+        # The lookup table also owns one int object per key and per row number
+        lookup = sys.getsizeof(self.rows) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.rows.items())
+        return columns + len(self.alive) + lookup
+
+    def bytes_per_entity(self):
+        return self.memory_bytes() / len(self) if len(self) else 0.0
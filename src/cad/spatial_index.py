@@ -0,0 +1,325 @@
+import heapq
+import math
+from collections import defaultdict
+
+import numpy as np
+
+# Entities whose bounding box covers more cells than this are kept in a short
+# list that every query scans, instead of being copied into all of those cells
+MAX_CELLS_PER_ENTITY = 64
+# Aim for about this many entities per cell when the grid is sized from the data
+ENTITIES_PER_CELL = 4
+
+
+def _segment_distance(px, py, pts):
+    """Distance from (px, py) to the polyline through the (N, 2+) array `pts`."""
+    if len(pts) == 1:
+        return math.hypot(pts[0][0] - px, pts[0][1] - py)
+    a = pts[:-1, :2]
+    d = pts[1:, :2] - a
+    length2 = (d * d).sum(axis=1)
+    t = np.clip(((px - a[:, 0]) * d[:, 0] + (py - a[:, 1]) * d[:, 1]) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+    dx = a[:, 0] + t * d[:, 0] - px
+    dy = a[:, 1] + t * d[:, 1] - py
+    return float(np.sqrt(dx * dx + dy * dy).min())
+
+
+def _line_distance(px, py, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else min(1.0, max(0.0, ((px - x1) * dx + (py - y1) * dy) / length2))
+    return math.hypot(x1 + t * dx - px, y1 + t * dy - py)
+
+
+def _arc_points(center, radius, start, end):
+    return ((center[0] + radius * math.cos(start), center[1] + radius * math.sin(start), center[2]),
+            (center[0] + radius * math.cos(end), center[1] + radius * math.sin(end), center[2]))
+
+
+def entity_bounds(kind, args):
+    """XY bounding box (min x, min y, max x, max y) of a primitive given as (kind, args)."""
+    if kind == 'line':
+        (x1, y1, _), (x2, y2, _) = args[0], args[1]
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+    if kind in ('circle', 'arc'):
+        (cx, cy, _), r = args[0], args[1]
+        # The full circle bounds an arc too; queries measure the exact distance
+        return cx - r, cy - r, cx + r, cy + r
+    if kind in ('polyline', 'spline'):
+        xs = [p[0] for p in args[0]]
+        ys = [p[1] for p in args[0]]
+        return min(xs), min(ys), max(xs), max(ys)
+    x, y = args[0][0], args[0][1]
+    return x, y, x, y
+
+
+def entity_ends(kind, args):
+    """Points an endpoint snap can land on: line and arc ends, vertices, points, insertion points."""
+    if kind == 'line':
+        return [args[0], args[1]]
+    if kind == 'arc':
+        return list(_arc_points(*args))
+    if kind == 'polyline':
+        return list(args[0])
+    if kind == 'spline':
+        return [args[0][0], args[0][-1]]
+    if kind in ('point', 'insert'):
+        return [args[0]]
+    return []
+
+
+def entity_distance(kind, args, px, py):
+    """Planar distance from (px, py) to the entity itself (not to its bounding box)."""
+    if kind == 'line':
+        (x1, y1, _), (x2, y2, _) = args[0], args[1]
+        return _line_distance(px, py, x1, y1, x2, y2)
+    if kind == 'circle':
+        (cx, cy, _), r = args[0], args[1]
+        return abs(math.hypot(px - cx, py - cy) - r)
+    if kind == 'arc':
+        (cx, cy, _), r, start, end = args
+        sweep = (end - start) % (2 * math.pi)
+        if (math.atan2(py - cy, px - cx) - start) % (2 * math.pi) <= sweep:
+            return abs(math.hypot(px - cx, py - cy) - r)
+        return min(math.hypot(px - x, py - y) for x, y, _ in _arc_points(*args))
+    if kind in ('polyline', 'spline'):
+        points = args[0]
+        if kind == 'polyline' and args[1]:
+            points = tuple(points) + (points[0],)
+        if len(points) <= 8:
+            return min(_line_distance(px, py, a[0], a[1], b[0], b[1]) for a, b in zip(points, points[1:])) \
+                if len(points) > 1 else math.hypot(points[0][0] - px, points[0][1] - py)
+        # Splines are measured along their fit points
+        return _segment_distance(px, py, np.asarray(points, dtype=np.float64))
+    x, y = args[0][0], args[0][1]
+    return math.hypot(px - x, py - y)
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the XY bounding boxes of model-space entities.
+
+    Each entity is listed in every grid cell its bounding box touches, and its
+    snap points (see `entity_ends`) in a second grid of the same cell size, so
+    nearest-entity, window and endpoint-snap queries only look at the few cells
+    around the query instead of the whole drawing. Entities are (kind, args)
+    primitives in the argument order of the backend's add_* methods, with an
+    optional handle. The cell size is derived from the data by `bulk_load` and
+    re-derived whenever incremental inserts have doubled the entity count.
+    """
+
+    def __init__(self, cell_size=1.0):
+        self.cell_size = float(cell_size)
+        self.clear()
+
+    def clear(self):
+        self.entities = []
+        self.handles = []
+        self.boxes = []
+        self._cells = defaultdict(list)
+        self._ends = defaultdict(list)
+        self._large = []
+        self._cell_range = None
+        self._gridded = 0
+
+    def __len__(self):
+        return len(self.entities)
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _grid(self, index):
+        box = self.boxes[index]
+        x0, y0 = self._cell(box[0], box[1])
+        x1, y1 = self._cell(box[2], box[3])
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_ENTITY:
+            self._large.append(index)
+        else:
+            cells = self._cells
+            for ix in range(x0, x1 + 1):
+                for iy in range(y0, y1 + 1):
+                    cells[(ix, iy)].append(index)
+        if self._cell_range is None:
+            self._cell_range = [x0, y0, x1, y1]
+        else:
+            r = self._cell_range
+            r[0], r[1], r[2], r[3] = min(r[0], x0), min(r[1], y0), max(r[2], x1), max(r[3], y1)
+        kind, args = self.entities[index]
+        for point in entity_ends(kind, args):
+            self._ends[self._cell(point[0], point[1])].append((point[0], point[1], point[2], index))
+
+    def _regrid(self, cell_size):
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+        self._ends = defaultdict(list)
+        self._large = []
+        self._cell_range = None
+        for index in range(len(self.entities)):
+            self._grid(index)
+        self._gridded = len(self.entities)
+
+    def _fitted_cell_size(self):
+        """Cell size giving about ENTITIES_PER_CELL entities per cell over the data extent."""
+        if not self.boxes:
+            return self.cell_size
+        boxes = np.asarray(self.boxes, dtype=np.float64)
+        width = boxes[:, 2].max() - boxes[:, 0].min()
+        height = boxes[:, 3].max() - boxes[:, 1].min()
+        spread = math.sqrt(max(width, 1e-9) * max(height, 1e-9) * ENTITIES_PER_CELL / len(boxes))
+        typical = float(np.median(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])))
+        size = max(spread, typical, max(width, height) / 4096.0)
+        return size if size > 0 else 1.0
+
+    def bulk_load(self, items):
+        """Replace the contents with `items` ((kind, args) or (kind, args, handle)) and size the grid to them."""
+        self.clear()
+        for item in items:
+            self._add(*item)
+        self._regrid(self._fitted_cell_size())
+        return len(self.entities)
+
+    def _add(self, kind, args, handle=None):
+        self.entities.append((kind, args))
+        self.handles.append(handle)
+        self.boxes.append(entity_bounds(kind, args))
+        return len(self.entities) - 1
+
+    def insert(self, kind, args, handle=None):
+        """Add one entity; returns its index."""
+        index = self._add(kind, args, handle)
+        if len(self.entities) > 2 * max(self._gridded, 32):
+            # The data outgrew the cell size it was gridded with
+            self._regrid(self._fitted_cell_size())
+        else:
+            self._grid(index)
+        return index
+
+    # --- Queries ----------------------------------------------------------
+
+    def nearest(self, point, count=1, max_distance=math.inf):
+        """Up to `count` (distance, index) pairs closest to `point`, nearest first."""
+        if not self.entities or count < 1:
+            return []
+        px, py = float(point[0]), float(point[1])
+        cs = self.cell_size
+        cx, cy = self._cell(px, py)
+        best = []  # max-heap of (-distance, index)
+        seen = set()
+
+        def consider(index):
+            if index in seen:
+                return
+            seen.add(index)
+            kind, args = self.entities[index]
+            d = entity_distance(kind, args, px, py)
+            if d > max_distance:
+                return
+            if len(best) < count:
+                heapq.heappush(best, (-d, index))
+            elif d < -best[0][0]:
+                heapq.heapreplace(best, (-d, index))
+
+        for index in self._large:
+            consider(index)
+        cells = self._cells
+        if self._cell_range is not None:
+            x0, y0, x1, y1 = self._cell_range
+            # Rings before `first` miss the gridded area, rings after `last` lie beyond it
+            first = max(0, x0 - cx, cx - x1, y0 - cy, cy - y1)
+            last = max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1))
+            for r in range(first, last + 1):
+                # Only the part of ring r inside the gridded area
+                for iy in (cy - r, cy + r) if r else (cy,):
+                    if y0 <= iy <= y1:
+                        for ix in range(max(cx - r, x0), min(cx + r, x1) + 1):
+                            for index in cells.get((ix, iy), ()):
+                                consider(index)
+                for ix in (cx - r, cx + r) if r else ():
+                    if x0 <= ix <= x1:
+                        for iy in range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1):
+                            for index in cells.get((ix, iy), ()):
+                                consider(index)
+                # Anything not seen yet lies outside the (2r+1)^2 block around the query cell
+                reach = min(px - (cx - r) * cs, (cx + r + 1) * cs - px, py - (cy - r) * cs, (cy + r + 1) * cs - py)
+                if reach > max_distance or (len(best) == count and -best[0][0] <= reach):
+                    break
+        return sorted((-d, index) for d, index in best)
+
+    def window(self, corner1, corner2, crossing=True):
+        """
+        Indices of entities in the rectangle between two corners. With crossing=True
+        (AutoCAD's crossing selection) an entity only has to touch the rectangle's
+        bounding box; with crossing=False it has to lie entirely inside it.
+        """
+        xmin, xmax = sorted((float(corner1[0]), float(corner2[0])))
+        ymin, ymax = sorted((float(corner1[1]), float(corner2[1])))
+        if not self.entities:
+            return []
+        x0, y0 = self._cell(xmin, ymin)
+        x1, y1 = self._cell(xmax, ymax)
+        r = self._cell_range
+        x0, y0, x1, y1 = max(x0, r[0]), max(y0, r[1]), min(x1, r[2]), min(y1, r[3])
+        candidates = set(self._large)
+        cells = self._cells
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > 4 * max(len(cells), 1):
+            # A window larger than the drawing: scanning the occupied cells is cheaper
+            for (ix, iy), indices in cells.items():
+                if x0 <= ix <= x1 and y0 <= iy <= y1:
+                    candidates.update(indices)
+        else:
+            for ix in range(x0, x1 + 1):
+                for iy in range(y0, y1 + 1):
+                    candidates.update(cells.get((ix, iy), ()))
+        boxes = self.boxes
+        if crossing:
+            hits = [i for i in candidates
+                    if boxes[i][0] <= xmax and boxes[i][2] >= xmin and boxes[i][1] <= ymax and boxes[i][3] >= ymin]
+        else:
+            hits = [i for i in candidates
+                    if boxes[i][0] >= xmin and boxes[i][2] <= xmax and boxes[i][1] >= ymin and boxes[i][3] <= ymax]
+        return sorted(hits)
+
+    def snap(self, point, tolerance):
+        """Closest snap point within `tolerance` of `point` as (distance, (x, y, z), index), or None."""
+        px, py = float(point[0]), float(point[1])
+        if self._cell_range is None:
+            return None
+        x0, y0 = self._cell(px - tolerance, py - tolerance)
+        x1, y1 = self._cell(px + tolerance, py + tolerance)
+        r = self._cell_range
+        x0, y0, x1, y1 = max(x0, r[0]), max(y0, r[1]), min(x1, r[2]), min(y1, r[3])
+        best = None
+        ends = self._ends
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(ends):
+            # A tolerance wider than the drawing: scanning the occupied cells is cheaper
+            cells = [points for (ix, iy), points in ends.items() if x0 <= ix <= x1 and y0 <= iy <= y1]
+        else:
+            cells = [ends.get((ix, iy), ()) for ix in range(x0, x1 + 1) for iy in range(y0, y1 + 1)]
+        for points in cells:
+            for x, y, z, index in points:
+                d = math.hypot(x - px, y - py)
+                if d <= tolerance and (best is None or d < best[0]):
+                    best = (d, (x, y, z), index)
+        return best
+
+    def describe(self, index):
+        """Plain-data summary of an entity for tool results."""
+        kind, args = self.entities[index]
+        r3 = lambda p: [round(float(v), 6) for v in p]
+        data = {'type': kind}
+        if self.handles[index] is not None:
+            data['handle'] = self.handles[index]
+        if kind == 'line':
+            data.update(start=r3(args[0]), end=r3(args[1]))
+        elif kind == 'circle':
+            data.update(center=r3(args[0]), radius=round(float(args[1]), 6))
+        elif kind == 'arc':
+            data.update(center=r3(args[0]), radius=round(float(args[1]), 6),
+                        start_angle=round(float(args[2]), 6), end_angle=round(float(args[3]), 6))
+        elif kind in ('polyline', 'spline'):
+            data.update(vertices=len(args[0]), start=r3(args[0][0]), end=r3(args[0][-1]))
+        elif kind == 'insert':
+            data.update(insertion_point=r3(args[0]), block=args[1])
+        else:
+            data.update(point=r3(args[0]))
+        return data
@@ -0,0 +1,211 @@
+import math
+import re
+
+# Length of one unit in millimetres
+UNIT_SCALE = {
+    'mm': 1.0, 'millimeter': 1.0, 'millimeters': 1.0, 'millimetre': 1.0, 'millimetres': 1.0,
+    'cm': 10.0, 'centimeter': 10.0, 'centimeters': 10.0, 'centimetre': 10.0, 'centimetres': 10.0,
+    'm': 1000.0, 'meter': 1000.0, 'meters': 1000.0, 'metre': 1000.0, 'metres': 1000.0,
+    'in': 25.4, 'inch': 25.4, 'inches': 25.4, '"': 25.4,
+    'ft': 304.8, 'foot': 304.8, 'feet': 304.8, "'": 304.8,
+}
+
+COLOR_NAMES = {'red': 1, 'yellow': 2, 'green': 3, 'cyan': 4, 'blue': 5, 'magenta': 6, 'white': 7, 'black': 7}
+
+_NUM = r'[-+]?(?:\d+(?:\.\d*)?|\.\d+)'
+_UNIT = r'(?:mm|cm|m|in|ft|millimet(?:er|re)s?|centimet(?:er|re)s?|met(?:er|re)s?|inch(?:es)?|foot|feet|"|\')'
+_LEN = rf'({_NUM})\s*({_UNIT})?(?![a-z])'
+_POINT = rf'\(?\s*{_LEN}\s*,\s*{_LEN}(?:\s*,\s*{_LEN})?\s*\)?'
+
+
+def _name(group):
+    """Layer name, optionally quoted."""
+    return rf'["\']?(?P<{group}>[\w\-.$]+)["\']?'
+
+
+_LAYER, _LAYER2, _OLD, _NEW = _name('layer'), _name('layer2'), _name('old'), _name('new')
+_COLOR = r'(?P<color>\d+|' + '|'.join(COLOR_NAMES) + ')'
+_VERB = r'(?:(?:please\s+)?(?:draw|create|make|add|place|insert|put)\s+)?(?:an?\s+|the\s+)?'
+
+_TYPES = r'(?P<type>(?:lines?|circles?|arcs?|points?|splines?|polylines?|plines?|blocks?|block\s+references?|inserts?|entities|entity|objects?))'
+_ON_LAYER = rf'(?:\s+(?:on|in)\s+(?:the\s+)?layer\s+{_LAYER})?'
+
+_SPLIT = re.compile(r'\s*;\s*|\s+(?:and\s+then|then|and)\s+', re.I)
+
+
+class CommandParser:
+    """
+    Deterministic parser for simple drawing and layer commands.
+
+    Recognizes prompts such as "circle at 5,5 radius 2", "line from 0,0 to 10 cm,0",
+    "polyline 0,0 10,0 10,10 closed" or "turn off layer DIM" and returns the same
+    tool-call structure the LLM would. Lengths with units are converted to
+    `units`. Anything it cannot parse completely returns None so the prompt
+    goes to the LLM instead.
+    """
+
+    def __init__(self, units='mm'):
+        self.units = units.lower() if units else None
+        self._rules = [
+            (re.compile(rf'{_VERB}circle\s+(?:at|centered\s+at|center(?:ed)?|with\s+center)\s+(?P<p>{_POINT})\s*,?\s*(?:and\s+|with\s+(?:a\s+)?)?(?P<kind>radius|r|diameter|d)\s*(?:of|=|:)?\s*(?P<r>{_LEN})', re.I), self._circle),
+            (re.compile(rf'{_VERB}circle\s+(?:with\s+|of\s+)?(?P<kind>radius|r|diameter|d)\s*(?:of|=|:)?\s*(?P<r>{_LEN})\s*,?\s*(?:at|centered\s+at|center(?:ed)?\s+(?:at\s+)?)\s*(?P<p>{_POINT})', re.I), self._circle),
+            (re.compile(rf'{_VERB}line\s+from\s+(?P<a>{_POINT})\s+to\s+(?P<b>{_POINT})', re.I), self._line),
+            (re.compile(rf'{_VERB}point\s+(?:at\s+)?(?P<p>{_POINT})', re.I), self._point),
+            (re.compile(rf'{_VERB}arc\s+(?:at|centered\s+at|center(?:ed)?)\s+(?P<p>{_POINT})\s*,?\s*(?:with\s+)?(?:radius|r)\s*(?:of|=|:)?\s*(?P<r>{_LEN})\s*,?\s*from\s+(?P<a>{_NUM})\s*(?:deg(?:rees)?|°)?\s+to\s+(?P<b>{_NUM})\s*(?:deg(?:rees)?|°)?', re.I), self._arc),
+            (re.compile(rf'{_VERB}(?P<closed>closed\s+)?(?:polyline|pline)\s+(?:through\s+|with\s+points\s+|points\s+)?(?P<pts>(?:{_POINT}[\s,]*)+?)\s*(?P<closed2>,?\s*closed)?', re.I), self._polyline),
+            (re.compile(rf'(?:turn|switch|set)\s+(?P<state>on|off)\s+(?:the\s+)?layer\s+{_LAYER}', re.I), self._layer_status),
+            (re.compile(rf'(?:(?:turn|switch|set)\s+)?(?:the\s+)?layer\s+{_LAYER}\s+(?P<state>on|off)', re.I), self._layer_status),
+            (re.compile(rf'(?P<action>hide|show)\s+(?:the\s+)?layer\s+{_LAYER}', re.I), self._layer_visibility),
+            # Needs a verb or "new": a bare "layer X" is more likely a clause of another command
+            (re.compile(rf'(?:please\s+)?(?:(?:create|make|add)\s+(?:an?\s+|the\s+)?(?:new\s+)?|(?:an?\s+)?new\s+)layer\s+(?:called\s+|named\s+)?{_LAYER}(?:\s+(?:with\s+)?(?:colou?r\s+)?{_COLOR})?', re.I), self._create_layer),
+            (re.compile(rf'rename\s+(?:the\s+)?layer\s+{_OLD}\s+(?:to|as)\s+{_NEW}', re.I), self._rename_layer),
+            (re.compile(rf'(?:set|change|make)\s+(?:the\s+)?(?:colou?r\s+of\s+(?:the\s+)?layer\s+{_LAYER}|layer\s+{_LAYER2}(?:\s*\'s)?\s+colou?r)\s+(?:to\s+)?{_COLOR}', re.I), self._layer_color),
+            (re.compile(r'(?:list|show)\s+(?:all\s+)?(?:the\s+)?(?:(?P<state>on|off|frozen|locked)\s+)?layers(?:[\s,]+page\s+(?P<page>\d+))?|what\s+layers\s+(?:are\s+there|exist)', re.I), self._list_layers),
+            (re.compile(rf'(?:count|how\s+many)\s+(?:the\s+|all\s+)?{_TYPES}(?:\s+are\s+there)?{_ON_LAYER}(?:\s+are\s+there)?\s*\??', re.I), self._count),
+            (re.compile(rf'(?:select|find|list)\s+(?:the\s+|all\s+)?{_TYPES}{_ON_LAYER}\s+(?P<mode>in|inside|within)\s+(?:the\s+|a\s+)?(?:window|area|region|rectangle)\s+(?:from\s+)?(?P<a>{_POINT})\s+(?:to|and)\s+(?P<b>{_POINT})', re.I), self._select_window),
+        ]
+
+    # --- Values -----------------------------------------------------------
+
+    def _length(self, value, unit):
+        value = float(value)
+        if not unit:
+            return value
+        if self.units is None or self.units not in UNIT_SCALE:
+            raise ValueError("drawing units unknown")
+        return value * UNIT_SCALE[unit.lower()] / UNIT_SCALE[self.units]
+
+    def _points(self, text):
+        points = []
+        for m in re.finditer(_POINT, text, re.I):
+            values = [m.group(i) for i in range(1, 7)]
+            point = [self._length(values[0], values[1]), self._length(values[2], values[3])]
+            point.append(self._length(values[4], values[5]) if values[4] is not None else 0.0)
+            points.append(point)
+        return points
+
+    def _radius(self, m):
+        length = re.match(_LEN, m.group('r'), re.I)
+        r = self._length(length.group(1), length.group(2))
+        return r / 2.0 if m.group('kind').lower() in ('diameter', 'd') else r
+
+    @staticmethod
+    def _color(value):
+        value = value.lower()
+        color = COLOR_NAMES.get(value)
+        if color is None:
+            color = int(value)
+            if not 1 <= color <= 255:
+                raise ValueError("color index out of range")
+        return color
+
+    @staticmethod
+    def _call(name, **arguments):
+        return {'function': {'name': name, 'arguments': arguments}}
+
+    # --- Rules --------------------------------------------------------------
+
+    def _circle(self, m):
+        radius = self._radius(m)
+        if radius <= 0:
+            raise ValueError("radius must be positive")
+        return self._call('draw_circle', center=self._points(m.group('p'))[0], radius=radius)
+
+    def _line(self, m):
+        return self._call('draw_line', start=self._points(m.group('a'))[0], end=self._points(m.group('b'))[0])
+
+    def _point(self, m):
+        return self._call('draw_point', point=self._points(m.group('p'))[0])
+
+    def _arc(self, m):
+        length = re.match(_LEN, m.group('r'), re.I)
+        return self._call('draw_arc', center=self._points(m.group('p'))[0],
+                          radius=self._length(length.group(1), length.group(2)),
+                          start_angle=math.radians(float(m.group('a'))), end_angle=math.radians(float(m.group('b'))))
+
+    def _polyline(self, m):
+        text = m.group('pts')
+        found = list(re.finditer(_POINT, text, re.I))
+        for a, b in zip(found, found[1:]):
+            # "0,0, 10,0, 10,10" could be 2D or 3D points: bare points must be separated by
+            # whitespace only, commas between points need parentheses around them
+            if ',' in text[a.end():b.start()] and not (a.group().endswith(')') and b.group().startswith('(')):
+                raise ValueError("ambiguous point list")
+        points = self._points(text)
+        if len(points) < 2:
+            raise ValueError("a polyline needs at least two points")
+        return self._call('draw_polyline', points=points, closed=bool(m.group('closed') or m.group('closed2')))
+
+    def _layer_status(self, m):
+        return self._call('set_layer_status', layer_name=m.group('layer'), is_on=m.group('state').lower() == 'on')
+
+    def _layer_visibility(self, m):
+        return self._call('set_layer_status', layer_name=m.group('layer'), is_on=m.group('action').lower() == 'show')
+
+    def _create_layer(self, m):
+        arguments = {'layer_name': m.group('layer')}
+        if m.group('color'):
+            arguments['color'] = self._color(m.group('color'))
+        return self._call('create_layer', **arguments)
+
+    def _rename_layer(self, m):
+        return self._call('rename_layer', old_name=m.group('old'), new_name=m.group('new'))
+
+    def _layer_color(self, m):
+        return self._call('change_layer_color', layer_name=m.group('layer') or m.group('layer2'), color=self._color(m.group('color')))
+
+    def _list_layers(self, m):
+        arguments = {}
+        if m.group('state'):
+            arguments['state'] = m.group('state').lower()
+        if m.group('page'):
+            arguments['page'] = int(m.group('page'))
+        return self._call('list_layers', **arguments)
+
+    @staticmethod
+    def _filters(m):
+        """entity_type / layer arguments of the selection tools; 'entities' and 'objects' mean any type."""
+        arguments = {}
+        kind = re.sub(r'\s+', ' ', m.group('type').lower())
+        if not kind.startswith(('entit', 'object')):
+            kind = kind[:-1] if kind.endswith('s') else kind
+            arguments['entity_type'] = 'insert' if kind.startswith('block') else kind
+        if m.group('layer'):
+            arguments['layer'] = m.group('layer')
+        return arguments
+
+    def _count(self, m):
+        return self._call('count_entities', **self._filters(m))
+
+    def _select_window(self, m):
+        a, b = self._points(m.group('a')) + self._points(m.group('b'))
+        # "inside" / "within" is AutoCAD's window selection, "in" its crossing selection
+        return self._call('select_entities', **self._filters(m), corner1=a, corner2=b,
+                          crossing=m.group('mode').lower() == 'in')
+
+    # --- Parsing ------------------------------------------------------------
+
+    def parse_command(self, text):
+        """Tool call for a single command, or None if no rule matches all of it."""
+        text = text.strip().rstrip('.!')
+        for pattern, build in self._rules:
+            m = pattern.fullmatch(text)
+            if m:
+                try:
+                    return build(m)
+                except (ValueError, IndexError):
+                    return None
+        return None
+
+    def parse(self, prompt):
+        """Tool calls for the whole prompt, or None when any part of it needs the LLM."""
+        parts = [part for part in _SPLIT.split(prompt.strip()) if part.strip()]
+        if not parts:
+            return None
+        calls = []
+        for part in parts:
+            call = self.parse_command(part)
+            if call is None:
+                return None
+            calls.append(call)
+        return calls
@@ -1,27 +1,268 @@
 import json
 import os
+import re
+import threading
+import time
 import ollama
 from dotenv import load_dotenv
 
+from src import tracing
+from src.llm.command_parser import CommandParser
+from src.llm.ollama_pool import OllamaPool, clean_url
+from src.llm.plan_cache import PlanCache, plain_data, schema_hash
+from src.llm.stream_parser import ToolCallStreamParser
+from src.llm.tool_registry import ToolRegistry, estimate_tokens
+
 # Load environment variables
 load_dotenv()
 
+# Words that make a prompt depend on earlier turns, so its cached plan cannot be reused
+_REFERS_BACK = re.compile(
+    r"\b(it|its|that|those|them|this|these|again|previous|last|same|bigger|smaller|larger|"
+    r"more|less|another|instead|undo|twice|half)\b", re.I)
+
+
+def _keep_alive(value):
+    """OLLAMA_KEEP_ALIVE as Ollama expects it: a duration string ("30m") or seconds (-1 = forever)."""
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class ChatSession:
+    """
+    Conversation memory so follow-ups ("make it twice as big") keep their context.
+
+    History is replayed after the system prompt and tool schemas, which never
+    change within a session, so the server's prompt cache covers everything but
+    the newest turn. Tools are pinned too: once a tool was sent it stays in the
+    list, and new ones are merged in registry order. When the history grows past
+    `max_tokens` (estimated), the oldest turns are replaced by one-line summaries
+    of what they drew, in a single step down to 60% of the budget so the prefix
+    is not rewritten on every turn.
+    """
+
+    SUMMARY_LINES = 20
+
+    def __init__(self, max_tokens=3000):
+        self.max_tokens = max_tokens
+        self.reset()
+
+    def reset(self):
+        self.turns = []
+        self.summary = []
+        self.turn_stats = []
+        self._summary_message = None
+        self._tool_names = set()
+
+    @staticmethod
+    def estimate(value):
+        """Rough token count (about four characters per token)."""
+        return len(json.dumps(value)) // 4
+
+    def history(self):
+        messages = [self._summary_message] if self._summary_message else []
+        for turn in self.turns:
+            messages.extend(turn['messages'])
+        return messages
+
+    def tools_for(self, registry, prompt):
+        """Tool schemas for the next turn: everything sent so far plus what this prompt needs."""
+        selected = registry.select(prompt)
+        self._tool_names.update(tool['function']['name'] for tool in selected)
+        return [tool for tool in registry.tools if tool['function']['name'] in self._tool_names]
+
+    def add_turn(self, prompt, tool_calls, content="", prompt_tokens=None, prompt_estimate=None):
+        """Append a finished turn; prompt_tokens is what the server actually evaluated."""
+        tool_calls = plain_data(list(tool_calls or []))
+        assistant = {'role': 'assistant', 'content': content or ''}
+        if tool_calls:
+            assistant['tool_calls'] = tool_calls
+        self.turns.append({'prompt': prompt, 'tool_calls': tool_calls,
+                           'messages': [{'role': 'user', 'content': prompt}, assistant]})
+        self.turn_stats.append({'prompt_tokens': prompt_tokens, 'prompt_estimate': prompt_estimate})
+        self._trim()
+
+    def record_results(self, results, turn=None):
+        """
+        Attach (tool_name, result text) pairs for the steps executed for `turn`
+        (default: the last turn). Nothing is attached once the turn was summarized.
+        """
+        turn = turn if turn is not None else (self.turns[-1] if self.turns else None)
+        if turn is None or not any(t is turn for t in self.turns):
+            return
+        turn['messages'].extend(
+            {'role': 'tool', 'tool_name': name, 'content': str(text)} for name, text in results)
+        self._trim()
+
+    @staticmethod
+    def _summarize(turn):
+        steps = [
+            f"{call['function']['name']}({json.dumps(call['function'].get('arguments') or {}, separators=(',', ':'))[:80]})"
+            for call in turn['tool_calls']
+        ]
+        return f"- \"{turn['prompt'][:80]}\" -> {'; '.join(steps) if steps else 'no drawing'}"
+
+    def _trim(self):
+        if self.estimate(self.history()) <= self.max_tokens:
+            return
+        target = self.max_tokens * 0.6
+        while len(self.turns) > 1 and self.estimate(self.history()) > target:
+            self.summary.append(self._summarize(self.turns.pop(0)))
+            self.summary = self.summary[-self.SUMMARY_LINES:]
+            self._summary_message = {'role': 'system', 'content': 'Earlier in this session:\n' + '\n'.join(self.summary)}
+
+    def format_report(self):
+        evaluated = [s['prompt_tokens'] for s in self.turn_stats if s['prompt_tokens'] is not None]
+        if not evaluated:
+            return ""
+        estimated = sum(s['prompt_estimate'] for s in self.turn_stats if s['prompt_tokens'] is not None)
+        reused = 1 - sum(evaluated) / estimated if estimated else 0.0
+        return (f"[*] Session: {len(self.turn_stats)} turns, prompt-eval tokens per LLM turn {evaluated}, "
+                f"~{max(reused, 0.0):.0%} of prompt tokens reused from the server cache, "
+                f"{len(self.turns)} turns kept ({len(self.summary)} summarized).")
+
+
+def ollama_timings(response):
+    """Token counts and durations (in seconds) Ollama reports with a finished response."""
+    eval_tokens = response.get('eval_count') or 0
+    eval_seconds = (response.get('eval_duration') or 0) / 1e9
+    return {
+        'prompt_tokens': response.get('prompt_eval_count') or 0,
+        'prompt_eval_seconds': (response.get('prompt_eval_duration') or 0) / 1e9,
+        'eval_tokens': eval_tokens,
+        'eval_seconds': eval_seconds,
+        'load_seconds': (response.get('load_duration') or 0) / 1e9,
+        'tokens_per_second': eval_tokens / eval_seconds if eval_seconds > 0 else None,
+    }
+
+
 class LLMManager:
     def __init__(self):
+        self.started_at = time.perf_counter()
         self.model = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:7b")
+        # How long Ollama keeps the model loaded between requests
+        self.keep_alive = _keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
         self.api_url = os.getenv("LLM_API_URL", 'http://localhost:11434')
-        
-        if self.api_url:
+        # Several hosts (comma-separated) are load-balanced by a shared pool
+        self.api_urls = [url for url in os.getenv("LLM_API_URLS", "").split(",") if url.strip()]
+        self.pool = None
+
+        if len(self.api_urls) > 1:
+            hedge = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))
+            self.pool = OllamaPool.shared(
+                self.api_urls,
+                hedge_percentile=hedge or None,
+                health_interval=float(os.getenv("LLM_HEALTH_INTERVAL", "10")),
+            )
+            self.client = self.pool
+            self.api_url = ", ".join(host.url for host in self.pool.hosts)
+        elif self.api_urls or self.api_url:
             # Cleanup URL if user pasted the endpoint instead of the base host
-            self.api_url = self.api_url.strip().rstrip('/')
-            for suffix in ['/api/generate', '/api/chat', '/api']:
-                if self.api_url.endswith(suffix):
-                    self.api_url = self.api_url[:-len(suffix)]
-            
+            self.api_url = clean_url((self.api_urls or [self.api_url])[0])
             self.client = ollama.Client(host=self.api_url)
         else:
             self.client = ollama
 
+        # Plans for prompts seen before are served without an LLM round-trip
+        self.plan_cache = PlanCache.from_env()
+        self._tools_hash = schema_hash(self.get_tool_definitions())
+        # Only the tools relevant to a prompt are sent, which keeps prompt evaluation short
+        self.tool_registry = ToolRegistry(self.get_tool_definitions(), top_k=int(os.getenv("TOOL_TOP_K", "6")))
+        self.last_eval = None
+        self.last_cache_hit = False
+        # Simple commands ("circle at 5,5 radius 2") are parsed locally without the LLM
+        self.fast_path = None
+        if os.getenv("FAST_PATH", "1") != "0":
+            self.fast_path = CommandParser(units=os.getenv("DRAWING_UNITS", "mm"))
+        self.last_fast_path = False
+        self.fast_path_stats = {'fast_prompts': 0, 'fast_seconds': 0.0, 'llm_prompts': 0, 'llm_seconds': 0.0}
+        self.last_content = ""
+        self.last_stream = None
+        # Follow-up prompts see earlier turns; LLM_SESSION=0 makes every prompt stand alone
+        self.session = None
+        if os.getenv("LLM_SESSION", "1") != "0":
+            self.session = ChatSession(max_tokens=int(os.getenv("SESSION_MAX_TOKENS", "3000")))
+        # Short description of the current drawing (CADBackend.drawing_summary), sent after the system prompt
+        self.drawing_context = None
+        self.first_answer_seconds = None
+        self.warmup_seconds = None
+        self._warm = threading.Event()
+        self._warmup_thread = None
+        # Tools primed by warm_up; every later request sends them first so the cached prefix matches
+        self._warm_tools = []
+
+    def warm_up(self, background=True, prompt=None):
+        """
+        Load the model and pre-evaluate the system prompt and tool schemas, so the
+        first real request only pays for the user's text. The tools primed are the
+        ones `prompt` selects if the first prompt is known, else the registry's
+        default set; later requests list them first and add what they need after.
+        With background=True this runs in a daemon thread (e.g. while the CAD
+        backend connects).
+        """
+        tools = self._warm_tools = list(self.tool_registry.select(prompt) if prompt else self.tool_registry.default())
+
+        def run():
+            started = time.perf_counter()
+            try:
+                self.client.chat(
+                    model=self.model,
+                    messages=self._messages(""),
+                    tools=tools,
+                    keep_alive=self.keep_alive,
+                    options={'num_predict': 1},
+                )
+                self.warmup_seconds = time.perf_counter() - started
+                print(f"[*] Model '{self.model}' loaded and primed in {self.warmup_seconds:.2f}s.")
+            except Exception as e:
+                print(f"[!] Model warm-up failed: {e}")
+            finally:
+                self._warm.set()
+
+        if not background:
+            run()
+            return None
+        self._warmup_thread = threading.Thread(target=run, name="ollama-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def wait_until_warm(self, timeout=None):
+        """Block until a started warm-up has finished; True if it finished in time."""
+        if self._warmup_thread is None:
+            return True
+        return self._warm.wait(timeout)
+
+    def _mark_answer(self):
+        if self.first_answer_seconds is None:
+            self.first_answer_seconds = time.perf_counter() - self.started_at
+            print(f"[*] Startup to first answer: {self.first_answer_seconds:.2f}s.")
+
+    def _entity_schema(self):
+        """Schema of the seed entity replicated by the array tools."""
+        point = {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'}
+        return {
+            'type': 'object',
+            'description': (
+                'Entity to replicate. line: start, end; circle: center, radius; point: point; '
+                'arc: center, radius, start_angle, end_angle (radians); spline: points.'
+            ),
+            'properties': {
+                'type': {'type': 'string', 'enum': ['line', 'circle', 'point', 'arc', 'spline']},
+                'start': point,
+                'end': point,
+                'center': point,
+                'radius': {'type': 'number'},
+                'point': point,
+                'start_angle': {'type': 'number'},
+                'end_angle': {'type': 'number'},
+                'points': {'type': 'array', 'items': {'type': 'array', 'items': {'type': 'number'}}},
+            },
+            'required': ['type'],
+        }
+
     def get_tool_definitions(self):
         return [
             {
@@ -34,6 +275,7 @@ class LLMManager:
                         'properties': {
                             'start': {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'},
                             'end': {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'},
+                            'snap_tolerance': {'type': 'number', 'description': 'Optional. Move each vertex onto the nearest existing endpoint within this distance.'},
                         },
                         'required': ['start', 'end'],
                     },
@@ -113,6 +355,26 @@ class LLMManager:
                     },
                 },
             },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'draw_polyline',
+                    'description': 'Draw a polyline through a list of points (one entity made of straight segments). Prefer this over many draw_line calls for connected outlines.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'points': {
+                                'type': 'array',
+                                'items': {'type': 'array', 'items': {'type': 'number'}},
+                                'description': 'List of vertices [[x,y,z], [x,y,z], ...]'
+                            },
+                            'closed': {'type': 'boolean', 'description': 'Join the last vertex back to the first. Default is false.', 'default': False},
+                            'snap_tolerance': {'type': 'number', 'description': 'Optional. Move each vertex onto the nearest existing endpoint within this distance.'},
+                        },
+                        'required': ['points'],
+                    },
+                },
+            },
             {
                 'type': 'function',
                 'function': {
@@ -128,10 +390,14 @@ class LLMManager:
                 'type': 'function',
                 'function': {
                     'name': 'list_layers',
-                    'description': 'Get information about all layers in the drawing, including name, color, and status (on/off, frozen, locked).',
+                    'description': 'Get information about the layers in the drawing: a summary of their colors and status (on/off, frozen, locked), or with page, state or name the layers themselves, one page at a time.',
                     'parameters': {
                         'type': 'object',
-                        'properties': {},
+                        'properties': {
+                            'page': {'type': 'integer', 'description': 'Page of the layer list to show (1 = first)'},
+                            'state': {'type': 'string', 'enum': ['on', 'off', 'frozen', 'locked'], 'description': 'Only layers in this state'},
+                            'name': {'type': 'string', 'description': 'Only layers whose name matches this wildcard pattern, e.g. "A-*"'},
+                        },
                     },
                 },
             },
@@ -237,59 +503,420 @@ class LLMManager:
                         'required': ['center', 'radii'],
                     },
                 },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'draw_concentric_rings',
+                    'description': 'Draw a set of concentric circles around one center, evenly spaced.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'center': {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'},
+                            'start_radius': {'type': 'number', 'description': 'Radius of the innermost circle'},
+                            'spacing': {'type': 'number', 'description': 'Distance between consecutive circles'},
+                            'count': {'type': 'integer', 'description': 'Number of circles'},
+                        },
+                        'required': ['center', 'start_radius', 'spacing', 'count'],
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'polar_array',
+                    'description': 'Repeat an entity around a center point (e.g. bolt holes on a circle). Use this instead of drawing each copy.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'entity': self._entity_schema(),
+                            'center': {'type': 'array', 'items': {'type': 'number'}, 'description': 'Center of rotation [x, y, z]'},
+                            'count': {'type': 'integer', 'description': 'Total number of items, including the original'},
+                            'fill_angle': {
+                                'type': 'number',
+                                'description': 'Angle to fill in degrees, positive is counter-clockwise. Default is 360.',
+                                'default': 360.0
+                            },
+                        },
+                        'required': ['entity', 'center', 'count'],
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'rectangular_array',
+                    'description': 'Repeat an entity in a grid of rows and columns. Use this instead of drawing each copy.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'entity': self._entity_schema(),
+                            'rows': {'type': 'integer', 'description': 'Number of rows (along Y)'},
+                            'columns': {'type': 'integer', 'description': 'Number of columns (along X)'},
+                            'row_spacing': {'type': 'number', 'description': 'Distance between rows'},
+                            'column_spacing': {'type': 'number', 'description': 'Distance between columns'},
+                        },
+                        'required': ['entity', 'rows', 'columns', 'row_spacing', 'column_spacing'],
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'path_array',
+                    'description': 'Place copies of an entity at each point of a path. The entity reference point (line start, circle/arc center, point, first spline point) lands on each path point.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'entity': self._entity_schema(),
+                            'points': {
+                                'type': 'array',
+                                'items': {'type': 'array', 'items': {'type': 'number'}},
+                                'description': 'Positions [[x,y,z], [x,y,z], ...]'
+                            },
+                        },
+                        'required': ['entity', 'points'],
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'find_nearest_entities',
+                    'description': 'Find the entities in the drawing closest to a point (type, handle, layer and distance).',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'point': {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'},
+                            'count': {'type': 'integer', 'description': 'How many entities to return. Default is 1.', 'default': 1},
+                            'max_distance': {'type': 'number', 'description': 'Optional search radius.'},
+                        },
+                        'required': ['point'],
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'find_entities_in_window',
+                    'description': 'List the entities inside a rectangular window of the drawing.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'corner1': {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'},
+                            'corner2': {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'},
+                            'crossing': {'type': 'boolean', 'description': 'Also include entities that only cross the window edge. Default is true.', 'default': True},
+                        },
+                        'required': ['corner1', 'corner2'],
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'count_entities',
+                    'description': 'Count the entities in the drawing, optionally only those of a type, on a layer or inside a window.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'entity_type': {'type': 'string', 'description': 'Optional. line, circle, arc, point, spline, polyline or insert (block reference); several separated by commas.'},
+                            'layer': {'type': 'string', 'description': 'Optional layer name; * and ? wildcards are allowed.'},
+                            'corner1': {'type': 'array', 'items': {'type': 'number'}, 'description': 'Optional window corner [x, y, z]'},
+                            'corner2': {'type': 'array', 'items': {'type': 'number'}, 'description': 'Optional opposite window corner [x, y, z]'},
+                            'crossing': {'type': 'boolean', 'description': 'With a window, also include entities that only cross its edge. Default is true.', 'default': True},
+                        },
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'select_entities',
+                    'description': 'Select entities by type, layer and/or window and list them (type, handle, layer).',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'entity_type': {'type': 'string', 'description': 'Optional. line, circle, arc, point, spline, polyline or insert (block reference); several separated by commas.'},
+                            'layer': {'type': 'string', 'description': 'Optional layer name; * and ? wildcards are allowed.'},
+                            'corner1': {'type': 'array', 'items': {'type': 'number'}, 'description': 'Optional window corner [x, y, z]'},
+                            'corner2': {'type': 'array', 'items': {'type': 'number'}, 'description': 'Optional opposite window corner [x, y, z]'},
+                            'crossing': {'type': 'boolean', 'description': 'With a window, also include entities that only cross its edge. Default is true.', 'default': True},
+                        },
+                    },
+                },
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'snap_to_endpoint',
+                    'description': 'Find the existing endpoint (line, arc or polyline end, point, block insertion point) nearest to a point.',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'point': {'type': 'array', 'items': {'type': 'number'}, 'description': '[x, y, z]'},
+                            'tolerance': {'type': 'number', 'description': 'Maximum snap distance.'},
+                        },
+                        'required': ['point', 'tolerance'],
+                    },
+                },
             }
         ]
 
+    def _messages(self, prompt):
+        """System prompt, session history (if any), the drawing context (if any) and the user request."""
+        history = self.session.history() if self.session else []
+        # The context changes with every drawing edit, so it goes after the history to keep the
+        # system prompt and earlier turns a stable prefix for Ollama's prompt cache
+        context = [{'role': 'system', 'content': self.drawing_context}] if self.drawing_context else []
+        return [self._system_message()] + history + context + [{'role': 'user', 'content': prompt}]
+
+    def _system_message(self):
+        return {
+            'role': 'system',
+            'content': (
+                'You are an expert AutoCAD assistant. Use the provided tools to fulfill the user request. '
+                'IMPORTANT: If the user asks to draw a circle but does not provide the center coordinates or the radius, '
+                'DO NOT call the tool. Instead, respond with a polite text message asking the user for the missing information. '
+                'When the user asks for repeated copies of the same entity, use polar_array, rectangular_array or path_array '
+                'instead of one draw call per copy.'
+            )
+        }
+
+    def _fast_plan(self, prompt):
+        """Tool calls from the local command parser, or None when the prompt needs the LLM."""
+        self.last_fast_path = False
+        if self.fast_path is None:
+            return None
+        started = time.perf_counter()
+        tool_calls = self.fast_path.parse(prompt)
+        if tool_calls is not None:
+            self.last_fast_path = True
+            self.fast_path_stats['fast_prompts'] += 1
+            self.fast_path_stats['fast_seconds'] += time.perf_counter() - started
+        return tool_calls
+
+    def _count_llm(self, seconds):
+        self.fast_path_stats['llm_prompts'] += 1
+        self.fast_path_stats['llm_seconds'] += seconds
+
+    def format_fast_path_report(self):
+        stats = self.fast_path_stats
+        total = stats['fast_prompts'] + stats['llm_prompts']
+        if not total:
+            return ""
+        fast = stats['fast_seconds'] / stats['fast_prompts'] * 1000 if stats['fast_prompts'] else 0.0
+        llm = stats['llm_seconds'] / stats['llm_prompts'] if stats['llm_prompts'] else 0.0
+        return (f"[*] Fast path: {stats['fast_prompts']}/{total} prompts ({stats['fast_prompts'] / total:.0%}), "
+                f"avg {fast:.2f} ms locally vs {llm:.2f} s per LLM call.")
+
+    def _cached_plan(self, prompt):
+        """Return (cache_key, cached (tool_calls, content) or None)."""
+        self.last_cache_hit = False
+        if self.plan_cache is None or (self.session and self.session.turns and _REFERS_BACK.search(prompt)):
+            # "make it bigger" means something different after every turn
+            return None, None
+        if self.drawing_context:
+            # Plans made with the drawing in view may depend on what was in it
+            return None, None
+        cache_key = PlanCache.key(prompt, self.model, self._tools_hash)
+        cached = self.plan_cache.get(cache_key)
+        self.last_cache_hit = cached is not None
+        return cache_key, cached
+
+    def _chat_plan(self, messages, tools):
+        """One non-streamed chat round-trip; returns (tool_calls, content, response)."""
+        with tracing.span('llm.chat', tools=len(tools)) as trace:
+            response = self.client.chat(
+                model=self.model,
+                messages=messages,
+                tools=tools,
+                keep_alive=self.keep_alive,
+            )
+            if trace is not None:
+                trace.set(**ollama_timings(response))
+
+        with tracing.span('llm.parse'):
+            message = response.get('message', {})
+            content = message.get('content', '')
+            tool_calls = message.get('tool_calls', [])
+
+            # Fallback: if no structured tool calls, check if content looks like one
+            if not tool_calls and content:
+                stripped_content = content.strip()
+                if stripped_content.startswith('{') and stripped_content.endswith('}'):
+                    try:
+                        data = json.loads(stripped_content)
+                        if 'name' in data and 'arguments' in data:
+                            tool_calls = [{'function': data}]
+                            content = "" # Clear content if it was actually a tool call
+                    except:
+                        pass
+                elif stripped_content.startswith('[') and stripped_content.endswith(']'):
+                    try:
+                        data = json.loads(stripped_content)
+                        if isinstance(data, list) and len(data) > 0:
+                            potential_calls = []
+                            for item in data:
+                                if isinstance(item, dict) and 'name' in item and 'arguments' in item:
+                                    potential_calls.append({'function': item})
+                            if potential_calls:
+                                tool_calls = potential_calls
+                                content = "" # Clear content
+                    except:
+                        pass
+
+        return tool_calls, content, response
+
+    def _record_eval(self, response, messages, tools, retried=False):
+        """Keep Ollama's prompt-evaluation and generation counters for the last call."""
+        timings = ollama_timings(response)
+        self.last_eval = {
+            'tools_sent': len(tools),
+            'tool_tokens_estimate': estimate_tokens(tools),
+            'prompt_estimate': estimate_tokens(tools) + estimate_tokens(messages),
+            'prompt_tokens': response.get('prompt_eval_count'),
+            'prompt_eval_seconds': timings['prompt_eval_seconds'],
+            'eval_tokens': timings['eval_tokens'],
+            'eval_seconds': timings['eval_seconds'],
+            'retried': retried,
+        }
+
     def process_prompt(self, prompt):
         """Send prompt to LLM and get tool calls, encouraging sequential reasoning."""
-        messages = [
-            {
-                'role': 'system', 
-                'content': (
-                    'You are an expert AutoCAD assistant. Use the provided tools to fulfill the user request. '
-                    'IMPORTANT: If the user asks to draw a circle but does not provide the center coordinates or the radius, '
-                    'DO NOT call the tool. Instead, respond with a polite text message asking the user for the missing information.'
-                )
-            },
-            {'role': 'user', 'content': prompt}
-        ]
-        
-        response = self.client.chat(
+        with tracing.span('process_prompt') as trace:
+            tool_calls, content = self._plan(prompt)
+            if trace is not None:
+                source = 'fast_path' if self.last_fast_path else 'cache' if self.last_cache_hit else 'llm'
+                trace.set(source=source, tool_calls=len(tool_calls or []))
+        self._mark_answer()
+        self._add_turn(prompt, tool_calls, content)
+        return tool_calls, content
+
+    def _select_tools(self, prompt):
+        if self.session:
+            selected = self.session.tools_for(self.tool_registry, prompt)
+        else:
+            selected = self.tool_registry.select(prompt)
+        if not self._warm_tools:
+            return selected
+        warm = {tool['function']['name'] for tool in self._warm_tools}
+        return self._warm_tools + [tool for tool in selected if tool['function']['name'] not in warm]
+
+    def _add_turn(self, prompt, tool_calls, content):
+        if self.session is None:
+            return
+        evaluated = estimate = None
+        if not (self.last_fast_path or self.last_cache_hit) and self.last_eval:
+            evaluated = self.last_eval['prompt_tokens']
+            estimate = self.last_eval['prompt_estimate']
+        self.session.add_turn(prompt, tool_calls, content, evaluated, estimate)
+
+    def _plan(self, prompt):
+        tool_calls = self._fast_plan(prompt)
+        if tool_calls is not None:
+            self.last_cache_hit = False
+            return tool_calls, ""
+        cache_key, cached = self._cached_plan(prompt)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        messages = self._messages(prompt)
+
+        tools = self._select_tools(prompt)
+        tool_calls, content, response = self._chat_plan(messages, tools)
+        retried = False
+        if len(tools) < len(self.tool_registry.tools) and self.tool_registry.unknown_calls(tool_calls):
+            # The model wanted a tool it was not shown; ask again with the full set
+            tools = self.tool_registry.tools
+            tool_calls, content, response = self._chat_plan(messages, tools)
+            retried = True
+        self._record_eval(response, messages, tools, retried)
+
+        seconds = time.perf_counter() - started
+        self._count_llm(seconds)
+        # Only actual plans are cached; clarifying questions depend on the conversation
+        if cache_key is not None and tool_calls:
+            self.plan_cache.put(cache_key, tool_calls, content, seconds)
+        return tool_calls, content
+
+    def stream_prompt(self, prompt):
+        """
+        Streaming variant of process_prompt: yields each tool call as soon as the
+        model has finished generating it, so execution can start while the rest of
+        the plan is still being produced. After the generator is exhausted, the text
+        reply is in `last_content` and timings are in `last_stream`.
+        """
+        tool_calls = []
+        for call in self._stream_plan(prompt):
+            self._mark_answer()
+            tool_calls.append(call)
+            yield call
+        self._mark_answer()
+        self._add_turn(prompt, tool_calls, self.last_content)
+
+    def _stream_plan(self, prompt):
+        self.last_content = ""
+        self.last_stream = None
+        tool_calls = self._fast_plan(prompt)
+        if tool_calls is not None:
+            self.last_cache_hit = False
+            self.last_stream = {'first_call_seconds': 0.0, 'seconds': 0.0, 'calls': len(tool_calls)}
+            yield from tool_calls
+            return
+        cache_key, cached = self._cached_plan(prompt)
+        if cached is not None:
+            tool_calls, self.last_content = cached
+            self.last_stream = {'first_call_seconds': 0.0, 'seconds': 0.0, 'calls': len(tool_calls)}
+            yield from tool_calls
+            return
+
+        started = time.perf_counter()
+        first_call = None
+        parser = ToolCallStreamParser()
+        tool_calls = []
+        tools = self._select_tools(prompt)
+        messages = self._messages(prompt)
+        unknown = []
+        last_chunk = {}
+        for chunk in self.client.chat(
             model=self.model,
             messages=messages,
-            tools=self.get_tool_definitions(),
-        )
-        
-        message = response.get('message', {})
-        content = message.get('content', '')
-        tool_calls = message.get('tool_calls', [])
-        
-        # Fallback: if no structured tool calls, check if content looks like one
-        if not tool_calls and content:
-            stripped_content = content.strip()
-            if stripped_content.startswith('{') and stripped_content.endswith('}'):
-                try:
-                    data = json.loads(stripped_content)
-                    if 'name' in data and 'arguments' in data:
-                        tool_calls = [{'function': data}]
-                        content = "" # Clear content if it was actually a tool call
-                except:
-                    pass
-            elif stripped_content.startswith('[') and stripped_content.endswith(']'):
-                try:
-                    data = json.loads(stripped_content)
-                    if isinstance(data, list) and len(data) > 0:
-                        potential_calls = []
-                        for item in data:
-                            if isinstance(item, dict) and 'name' in item and 'arguments' in item:
-                                potential_calls.append({'function': item})
-                        if potential_calls:
-                            tool_calls = potential_calls
-                            content = "" # Clear content
-                except:
-                    pass
+            tools=tools,
+            stream=True,
+            keep_alive=self.keep_alive,
+        ):
+            last_chunk = chunk
+            for call in parser.feed_message(chunk.get('message') or {}):
+                if self.tool_registry.unknown_calls([call]):
+                    unknown.append(call)
+                    continue
+                if first_call is None:
+                    first_call = time.perf_counter() - started
+                tool_calls.append(call)
+                yield call
+        # A span cannot stay open across the yields above, so the stream is recorded once it ended
+        tracing.add_span('llm.chat', started, tools=len(tools), stream=True, **ollama_timings(last_chunk))
+        self._record_eval(last_chunk, messages, tools)
 
-        return tool_calls, content
+        content = parser.content
+        if unknown and not tool_calls and len(tools) < len(self.tool_registry.tools):
+            # Nothing was executed yet, so the plan can still be redone with every tool
+            tool_calls, content, response = self._chat_plan(messages, self.tool_registry.tools)
+            self._record_eval(response, messages, self.tool_registry.tools, retried=True)
+            for call in tool_calls:
+                if first_call is None:
+                    first_call = time.perf_counter() - started
+                yield call
+        elif unknown:
+            print(f"[!] Skipped unknown tool(s): {', '.join(call['function']['name'] for call in unknown)}")
+
+        seconds = time.perf_counter() - started
+        self._count_llm(seconds)
+        self.last_content = content
+        self.last_stream = {'first_call_seconds': first_call, 'seconds': seconds, 'calls': len(tool_calls)}
+        if cache_key is not None and tool_calls:
+            self.plan_cache.put(cache_key, tool_calls, self.last_content, seconds)
 
 if __name__ == "__main__":
     manager = LLMManager()
@@ -0,0 +1,282 @@
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+def clean_url(url):
+    """Base host of an Ollama URL, also when an endpoint was pasted instead of the host."""
+    url = url.strip().rstrip('/')
+    for suffix in ['/api/generate', '/api/chat', '/api']:
+        if url.endswith(suffix):
+            url = url[:-len(suffix)]
+    return url
+
+
+def _percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Host:
+    SAMPLES = 200
+
+    def __init__(self, url, client):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.healthy = True
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=self.SAMPLES)
+
+    def percentile(self, q):
+        return _percentile(list(self.latencies), q)
+
+
+class OllamaPool:
+    """
+    Drop-in replacement for ollama.Client that spreads requests over several hosts.
+
+    Each request goes to the healthy host with the fewest requests in flight;
+    ties go to the host this thread used last, which keeps that host's prompt
+    cache warm for follow-ups. Connection failures and 5xx answers mark a host
+    down and the request fails over to the next one. A background thread polls
+    /api/version every `health_interval` seconds to bring hosts back.
+
+    With `hedge_percentile` set, a non-streaming request that takes longer than
+    that percentile of its host's recent latencies is also sent to a second host
+    and the first answer wins. Streams are not hedged, and only fail over before
+    their first chunk.
+
+    Batch workers each build their own LLMManager, so use shared() to get one
+    pool per host list and balance across all of them.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, hosts, client_factory=None, hedge_percentile=None, hedge_min_samples=10,
+                 health_interval=10.0, health_timeout=2.0):
+        if not hosts:
+            raise ValueError("OllamaPool needs at least one host")
+        if client_factory is None:
+            import ollama
+            client_factory = ollama.Client
+        self.hosts = [_Host(clean_url(url), client_factory(host=clean_url(url))) for url in hosts]
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.health_timeout = health_timeout
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._health_thread = None
+        if health_interval and health_interval > 0:
+            self._health_thread = threading.Thread(
+                target=self._health_loop, args=(health_interval,), name="ollama-health", daemon=True)
+            self._health_thread.start()
+
+    @classmethod
+    def shared(cls, hosts, **options):
+        """One pool per host list, so every LLMManager in the process balances together."""
+        key = tuple(clean_url(url) for url in hosts)
+        with cls._shared_lock:
+            pool = cls._shared.get(key)
+            if pool is None:
+                pool = cls._shared[key] = cls(hosts, **options)
+            return pool
+
+    def close(self):
+        self._stop.set()
+
+    # --- Health -----------------------------------------------------------
+
+    def check(self, host):
+        """Probe one host; updates and returns its health."""
+        try:
+            with urllib.request.urlopen(f"{host.url}/api/version", timeout=self.health_timeout) as response:
+                healthy = response.status == 200
+        except Exception:
+            healthy = False
+        if healthy != host.healthy:
+            print(f"[*] Ollama host {host.url} is {'back up' if healthy else 'down'}.")
+        host.healthy = healthy
+        return healthy
+
+    def check_all(self):
+        return [self.check(host) for host in self.hosts]
+
+    def _health_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.check_all()
+
+    # --- Routing ----------------------------------------------------------
+
+    def _pick(self, exclude=()):
+        last = getattr(self._local, 'last', None)
+        with self._lock:
+            candidates = [h for h in self.hosts if h not in exclude]
+            # With every host marked down, still try them rather than fail outright
+            candidates = [h for h in candidates if h.healthy] or candidates
+            if not candidates:
+                return None
+            host = min(candidates, key=lambda h: (h.outstanding, h is not last))
+            host.outstanding += 1
+            host.requests += 1
+        self._local.last = host
+        return host
+
+    def _release(self, host, started, failed=False):
+        with self._lock:
+            host.outstanding -= 1
+            if failed:
+                host.errors += 1
+            else:
+                host.latencies.append(time.perf_counter() - started)
+
+    @staticmethod
+    def _is_host_failure(error):
+        """Errors another host might not have: connection problems and server-side failures."""
+        if isinstance(error, (ConnectionError, TimeoutError, OSError)):
+            return True
+        if httpx is not None and isinstance(error, httpx.TransportError):
+            return True
+        return (getattr(error, 'status_code', None) or 0) >= 500
+
+    def _call(self, host, kwargs):
+        """Run one request on a host picked by _pick (which counted it as in flight)."""
+        started = time.perf_counter()
+        try:
+            response = host.client.chat(**kwargs)
+        except Exception as e:
+            self._release(host, started, failed=True)
+            if self._is_host_failure(e):
+                host.healthy = False
+            raise
+        self._release(host, started)
+        return response
+
+    def _hedge_delay(self, host):
+        if not self.hedge_percentile or len(host.latencies) < self.hedge_min_samples:
+            return None
+        return host.percentile(self.hedge_percentile / 100.0)
+
+    def _hedged_call(self, host, kwargs, tried):
+        """Send to `host`; if it is slower than usual, race a second host."""
+        delay = self._hedge_delay(host)
+        if delay is None or len(self.hosts) < 2:
+            return self._call(host, kwargs)
+        results = queue.Queue()
+
+        def run(target):
+            try:
+                results.put((target, self._call(target, kwargs), None))
+            except Exception as e:
+                results.put((target, None, e))
+
+        threading.Thread(target=run, args=(host,), daemon=True).start()
+        running = 1
+        try:
+            first = results.get(timeout=delay)
+        except queue.Empty:
+            first = None
+            backup = self._pick(exclude=tried | {host})
+            if backup is not None:
+                self.hedges += 1
+                tried.add(backup)
+                threading.Thread(target=run, args=(backup,), daemon=True).start()
+                running += 1
+        error = None
+        while True:
+            target, response, e = first if first is not None else results.get()
+            first = None
+            running -= 1
+            if e is None:
+                if target is not host:
+                    self.hedge_wins += 1
+                return response
+            error = e
+            if not running:
+                raise error
+
+    def chat(self, **kwargs):
+        if kwargs.get('stream'):
+            return self._stream(kwargs)
+        tried = set()
+        while True:
+            host = self._pick(exclude=tried)
+            if host is None:
+                raise last_error
+            tried.add(host)
+            try:
+                return self._hedged_call(host, kwargs, tried)
+            except Exception as e:
+                if not self._is_host_failure(e):
+                    raise
+                last_error = e
+                print(f"[!] Ollama host {host.url} failed ({e}); trying another host.")
+
+    def _stream(self, kwargs):
+        tried = set()
+        while True:
+            host = self._pick(exclude=tried)
+            if host is None:
+                raise last_error
+            tried.add(host)
+            started = time.perf_counter()
+            try:
+                chunks = host.client.chat(**kwargs)
+                first = next(chunks)
+            except StopIteration:
+                self._release(host, started)
+                return
+            except Exception as e:
+                self._release(host, started, failed=True)
+                if not self._is_host_failure(e):
+                    raise
+                host.healthy = False
+                last_error = e
+                print(f"[!] Ollama host {host.url} failed ({e}); trying another host.")
+                continue
+            failed = True
+            try:
+                yield first
+                yield from chunks
+                failed = False
+            finally:
+                self._release(host, started, failed=failed)
+            return
+
+    # --- Reporting --------------------------------------------------------
+
+    def stats(self):
+        return {
+            host.url: {
+                'requests': host.requests,
+                'errors': host.errors,
+                'healthy': host.healthy,
+                'outstanding': host.outstanding,
+                'p50': host.percentile(0.5),
+                'p95': host.percentile(0.95),
+            }
+            for host in self.hosts
+        }
+
+    def format_report(self):
+        lines = [f"[*] Ollama pool: {len(self.hosts)} hosts, {self.hedges} hedged requests ({self.hedge_wins} won by the backup)."]
+        for url, s in self.stats().items():
+            latency = (f"p50 {s['p50'] * 1000:.0f} ms, p95 {s['p95'] * 1000:.0f} ms"
+                       if s['p50'] is not None else "no completed requests")
+            lines.append(f"    - {url}: {s['requests']} requests, {s['errors']} errors, {latency}"
+                         f"{'' if s['healthy'] else ' (down)'}")
+        return "\n".join(lines)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+
+
+def _plain(value):
+    """json.dumps hook for ollama response objects (pydantic models)."""
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(exclude_none=True)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def plain_data(value):
+    """Deep copy of `value` as plain JSON data (dicts, lists, numbers, strings)."""
+    return json.loads(json.dumps(value, default=_plain))
+
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive form of a prompt used for cache keys."""
+    return re.sub(r"\s+", " ", prompt.strip().lower())
+
+
+def schema_hash(tools):
+    """Stable hash of a tool definition list; any schema change gives a new key space."""
+    return hashlib.sha256(json.dumps(tools, sort_keys=True, default=_plain).encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """
+    Two-tier cache of LLM plans (tool-call lists).
+
+    The memory tier is an LRU of `max_entries` plans. The disk tier keeps one
+    JSON file per plan under `directory` and evicts the least recently used
+    files once their total size exceeds `max_bytes`. Each entry remembers how
+    long the LLM took to produce it, so hits can be reported as saved time.
+    """
+
+    def __init__(self, directory=None, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache from PLAN_CACHE* settings, or return None when disabled."""
+        if os.getenv("PLAN_CACHE", "1") == "0":
+            return None
+        return cls(
+            directory=os.getenv("PLAN_CACHE_DIR", ".plan_cache") or None,
+            max_entries=int(os.getenv("PLAN_CACHE_ENTRIES", "256")),
+            max_bytes=int(float(os.getenv("PLAN_CACHE_MAX_MB", "16")) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def key(prompt, model, tools_hash):
+        text = "\0".join((normalize_prompt(prompt), model, tools_hash))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return (tool_calls, content) for a cached plan, or None."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        elif self.directory:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                # Touch the file so disk eviction sees it as recently used
+                os.utime(self._path(key))
+                self.disk_hits += 1
+                self._remember(key, entry)
+            except (OSError, ValueError):
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_seconds += entry["seconds"]
+        # Callers rewrite plans in place, so hand out copies
+        return plain_data(entry["tool_calls"]), entry["content"]
+
+    def put(self, key, tool_calls, content, seconds):
+        entry = plain_data({"tool_calls": tool_calls, "content": content, "seconds": float(seconds)})
+        self._remember(key, entry)
+        if not self.directory:
+            return
+        try:
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            self._evict()
+        except OSError as e:
+            print(f"[!] Could not write plan cache entry: {e}")
+
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        self._memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "saved_seconds": self.saved_seconds,
+            "memory_entries": len(self._memory),
+        }
+
+    def format_report(self):
+        return (f"[*] Plan cache: {self.hits} hit(s) ({self.disk_hits} from disk), {self.misses} miss(es), "
+                f"hit rate {self.hit_rate:.0%}, ~{self.saved_seconds:.1f}s of LLM time saved.")
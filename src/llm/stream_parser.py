@@ -0,0 +1,85 @@
+import json
+
+
+class ToolCallStreamParser:
+    """
+    Incremental extraction of tool calls from a streamed chat response.
+
+    Structured `tool_calls` are passed through as they arrive. Message content
+    that starts with '{' or '[' is scanned for complete top-level JSON objects
+    with 'name' and 'arguments' keys (the same fallback process_prompt applies
+    to a full response), and each one is returned as soon as its closing brace
+    has been received. Any other content is kept as the text reply.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._mode = None      # 'object', 'array' or 'text' once the first character is known
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+        self._content_calls = 0
+
+    def feed_message(self, message):
+        """Consume one streamed message chunk; return the tool calls it completed."""
+        calls = list(message.get('tool_calls') or [])
+        calls.extend(self.feed(message.get('content') or ""))
+        return calls
+
+    def feed(self, text):
+        """Consume a piece of message content; return tool calls completed by it."""
+        self._text += text
+        if self._mode is None:
+            stripped = self._text.lstrip()
+            if not stripped:
+                return []
+            self._mode = {'{': 'object', '[': 'array'}.get(stripped[0], 'text')
+        if self._mode == 'text':
+            return []
+
+        # Objects that are tool calls sit at depth 0 ('{...}') or inside the top-level array
+        base = 1 if self._mode == 'array' else 0
+        calls = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if ch == '{' and self._depth == base:
+                    self._start = i
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if ch == '}' and self._depth == base and self._start is not None:
+                    call = self._parse(text[self._start:i + 1])
+                    self._start = None
+                    if call is not None:
+                        calls.append(call)
+        self._pos = len(text)
+        self._content_calls += len(calls)
+        return calls
+
+    @staticmethod
+    def _parse(fragment):
+        try:
+            data = json.loads(fragment)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and 'name' in data and 'arguments' in data:
+            return {'function': data}
+        return None
+
+    @property
+    def content(self):
+        """Text reply of the message; empty when the content carried tool calls."""
+        return "" if self._content_calls else self._text
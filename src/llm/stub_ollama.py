@@ -0,0 +1,172 @@
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _keep_alive_seconds(value):
+    """Ollama keep_alive ("30m", "1h", 300, -1, "0") in seconds; inf means never unload."""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return math.inf if value < 0 else float(value)
+    m = re.fullmatch(r'\s*(-?[\d.]+)\s*(ms|s|m|h)?\s*', str(value))
+    if not m:
+        return 300.0
+    number = float(m.group(1))
+    if number < 0:
+        return math.inf
+    return number * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, None: 1}[m.group(2)]
+
+
+class StubOllamaServer:
+    """
+    Local HTTP stand-in for an Ollama server, for tests and benchmarks.
+
+    Mimics the costs that matter for latency work: the first request (or the first
+    after the model was unloaded because keep_alive expired) pays `load_seconds`;
+    prompt evaluation reuses the longest common prefix with the previous request,
+    like Ollama's KV cache, and costs `seconds_per_token` for the rest; every
+    request adds `latency`. Like OLLAMA_NUM_PARALLEL, `parallel` requests are
+    served at once and the rest wait for a free slot. Replies come from
+    `reply(body) -> message dict`. Each request is recorded in `requests` with
+    the tokens it had to evaluate.
+    """
+
+    def __init__(self, reply=None, load_seconds=0.0, seconds_per_token=0.0, latency=0.0, port=0, parallel=1):
+        self.reply = reply or (lambda body: {'role': 'assistant', 'content': ''})
+        self.load_seconds = load_seconds
+        self.seconds_per_token = seconds_per_token
+        self.latency = latency
+        self.requests = []
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(parallel)
+        self._loaded_until = 0.0
+        self._last_prompt = ""
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @staticmethod
+    def render(body):
+        """Flatten a chat request the way a chat template would: system, tools, turns."""
+        messages = body.get('messages') or []
+        system = [m.get('content', '') for m in messages if m.get('role') == 'system']
+        turns = [f"{m.get('role')}: {m.get('content', '')}{json.dumps(m['tool_calls']) if m.get('tool_calls') else ''}"
+                 for m in messages if m.get('role') != 'system']
+        tools = json.dumps(body.get('tools') or [], sort_keys=True)
+        return "\n".join(system + [tools] + turns)
+
+    def _evaluate(self, body):
+        """Simulate model load and prompt evaluation; returns Ollama timing fields."""
+        with self._slots:
+            with self._lock:
+                now = time.monotonic()
+                load = 0.0
+                if now >= self._loaded_until:
+                    load = self.load_seconds
+                    self.loads += 1
+                    self._last_prompt = ""
+                    # Nobody else runs while the model loads
+                    time.sleep(load)
+                prompt = self.render(body) if 'messages' in body else body.get('prompt', '')
+                common = 0
+                for a, b in zip(prompt, self._last_prompt):
+                    if a != b:
+                        break
+                    common += 1
+                tokens = math.ceil((len(prompt) - common) / 4)
+                self._last_prompt = prompt
+                self._loaded_until = math.inf
+            eval_seconds = tokens * self.seconds_per_token
+            time.sleep(eval_seconds + self.latency)
+            with self._lock:
+                self._loaded_until = time.monotonic() + _keep_alive_seconds(body.get('keep_alive'))
+                self.requests.append({'body': body, 'prompt_tokens': tokens, 'load_seconds': load})
+        return {
+            'load_duration': int(load * 1e9),
+            'prompt_eval_count': tokens,
+            'prompt_eval_duration': int(eval_seconds * 1e9),
+            'total_duration': int((load + eval_seconds + self.latency) * 1e9),
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path in ('/', '/api/version'):
+                    self._send({'version': 'stub'})
+                elif self.path == '/api/ps':
+                    loaded = time.monotonic() < stub._loaded_until
+                    self._send({'models': [{'name': 'stub'}] if loaded else []})
+                else:
+                    self._send({'error': 'not found'}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path not in ('/api/chat', '/api/generate'):
+                    self._send({'error': 'not found'}, 404)
+                    return
+                timings = stub._evaluate(body)
+                base = {'model': body.get('model', ''), 'created_at': '1970-01-01T00:00:00Z', **timings}
+                if self.path == '/api/generate':
+                    self._send({**base, 'response': '', 'done': True, 'done_reason': 'stop'})
+                    return
+                message = stub.reply(body) if body.get('messages') else {'role': 'assistant', 'content': ''}
+                # Generation is the request latency, spread over the tokens of the reply
+                base['eval_count'] = math.ceil(len(json.dumps(message)) / 4)
+                base['eval_duration'] = int(stub.latency * 1e9)
+                if not body.get('stream', True):
+                    self._send({**base, 'message': message, 'done': True, 'done_reason': 'stop'})
+                    return
+                # Streamed reply: content in small pieces, tool calls in their own chunk, then the summary
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                content = message.get('content', '')
+                chunks = [{'role': 'assistant', 'content': content[i:i + 16]} for i in range(0, len(content), 16)]
+                if message.get('tool_calls'):
+                    chunks.append({'role': 'assistant', 'content': '', 'tool_calls': message['tool_calls']})
+                for chunk in chunks:
+                    line = {'model': base['model'], 'created_at': base['created_at'], 'message': chunk, 'done': False}
+                    self.wfile.write((json.dumps(line) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                final = {**base, 'message': {'role': 'assistant', 'content': ''}, 'done': True, 'done_reason': 'stop'}
+                self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+
+        return Handler
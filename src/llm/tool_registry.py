@@ -0,0 +1,92 @@
+import json
+import math
+import re
+from collections import Counter
+
+_STOPWORDS = {
+    'a', 'an', 'the', 'of', 'to', 'in', 'on', 'at', 'and', 'or', 'with', 'for', 'by', 'from', 'is', 'it',
+    'this', 'that', 'be', 'as', 'me', 'my', 'please', 'can', 'you', 'i', 'x', 'y', 'z', 'default',
+}
+
+# Everyday words mapped onto the vocabulary the tool schemas use
+ALIASES = {
+    'copy': 'array', 'copie': 'array', 'repeat': 'array', 'grid': 'rectangular', 'row': 'rectangular',
+    'column': 'rectangular', 'around': 'polar', 'ray': 'radial', 'spoke': 'radial', 'ring': 'concentric',
+    'curve': 'spline', 'outline': 'polyline', 'rectangle': 'polyline', 'square': 'polyline',
+    'triangle': 'polyline', 'polygon': 'polyline', 'hide': 'status', 'show': 'status', 'off': 'status',
+    'visible': 'status', 'colour': 'color', 'cut': 'trim', 'along': 'path',
+}
+
+
+def _tokens(text):
+    words = re.findall(r'[a-z]+', text.lower().replace('_', ' '))
+    out = []
+    for word in words:
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        # Crude plural folding: circles -> circle, radii stays
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        out.append(ALIASES.get(word, word))
+    return out
+
+
+def estimate_tokens(tools):
+    """Rough prompt-token count of a tool list (about four characters per token)."""
+    return len(json.dumps(tools)) // 4
+
+
+class ToolRegistry:
+    """
+    Tool schemas plus a keyword relevance ranker.
+
+    Every tool is indexed by the words of its name, description and parameter
+    names/descriptions (TF-IDF weighted, name words counted double). `select`
+    returns the `top_k` tools that best match a prompt, or the full set when
+    nothing matches or ranking is disabled (top_k <= 0).
+    """
+
+    def __init__(self, tools, top_k=6):
+        self.tools = list(tools)
+        self.top_k = top_k
+        self.names = {tool['function']['name'] for tool in self.tools}
+        self._weights = []
+        documents = [self._document(tool) for tool in self.tools]
+        df = Counter(word for doc in documents for word in set(doc))
+        n = len(documents)
+        for doc in documents:
+            tf = Counter(doc)
+            self._weights.append({word: count * math.log(1 + n / df[word]) for word, count in tf.items()})
+
+    @staticmethod
+    def _document(tool):
+        fn = tool['function']
+        words = _tokens(fn['name']) * 2 + _tokens(fn.get('description', ''))
+        for name, spec in fn.get('parameters', {}).get('properties', {}).items():
+            words += _tokens(name) + _tokens(spec.get('description', ''))
+        return words
+
+    def scores(self, prompt):
+        words = set(_tokens(prompt))
+        return [sum(weights.get(word, 0.0) for word in words) for weights in self._weights]
+
+    def select(self, prompt):
+        """Most relevant tool schemas for `prompt`, in registry order."""
+        if self.top_k <= 0 or self.top_k >= len(self.tools):
+            return self.tools
+        scores = self.scores(prompt)
+        ranked = sorted(range(len(self.tools)), key=lambda i: -scores[i])
+        chosen = [i for i in ranked[:self.top_k] if scores[i] > 0]
+        if not chosen:
+            return self.tools
+        return [self.tools[i] for i in sorted(chosen)]
+
+    def default(self):
+        """Tool schemas to send before any prompt is known: the first `top_k` (the basic draw tools), or the full set."""
+        if self.top_k <= 0 or self.top_k >= len(self.tools):
+            return self.tools
+        return self.tools[:self.top_k]
+
+    def unknown_calls(self, tool_calls):
+        """Names the model called that are not registered tools."""
+        return [call['function']['name'] for call in tool_calls if call['function']['name'] not in self.names]
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_prompts(path):
+    """
+    Read a JSONL prompt file. Each line is a JSON string or an object with a
+    `prompt` (or `body`/`text`) field and an optional `id`/`request_id`.
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                entries.append({'id': line_no, 'prompt': None, 'error': f"invalid JSON: {e}"})
+                continue
+            if isinstance(item, str):
+                item = {'prompt': item}
+            prompt = item.get('prompt') or item.get('body') or item.get('text')
+            entry = {'id': item.get('id', item.get('request_id', line_no)), 'prompt': prompt}
+            if not prompt:
+                entry['error'] = "no prompt field"
+            entries.append(entry)
+    return entries
+
+
+class BatchRunner:
+    """
+    Non-interactive runner for files of prompts.
+
+    Prompts are planned by `workers` concurrent LLM requests, each worker thread
+    with its own LLMManager from `make_llm` (managers keep per-request state).
+    Plans are drawn one at a time in submission order through `draw(tool_calls)
+    -> [(tool_name, result text)]`, after the plan `passes` (objects with an
+    optimize() method), so the drawing does not depend on which reply came back
+    first. Drawn plans are also written to `recorder` (a PlanRecorder), if any,
+    unless a step failed. Each prompt gets a record with its timings; `summary`
+    holds the throughput of the last run.
+    """
+
+    def __init__(self, make_llm, draw, workers=4, passes=(), recorder=None):
+        self.make_llm = make_llm
+        self.draw = draw
+        self.workers = max(1, int(workers))
+        self.passes = list(passes)
+        self.recorder = recorder
+        self.records = []
+        self.summary = None
+        self._local = threading.local()
+
+    def _llm(self):
+        llm = getattr(self._local, 'llm', None)
+        if llm is None:
+            llm = self._local.llm = self.make_llm()
+        return llm
+
+    def _plan(self, prompt, submitted):
+        """Worker thread: plan one prompt."""
+        llm = self._llm()
+        started = time.perf_counter()
+        tool_calls, content = llm.process_prompt(prompt)
+        source = 'fast_path' if llm.last_fast_path else 'cache' if llm.last_cache_hit else 'llm'
+        tokens = llm.last_eval['prompt_tokens'] if source == 'llm' and llm.last_eval else None
+        return tool_calls, content, {
+            'source': source,
+            'queued_seconds': round(started - submitted, 4),
+            'plan_seconds': round(time.perf_counter() - started, 4),
+            'prompt_tokens': tokens,
+        }
+
+    def run(self, entries, report_path=None):
+        """Plan and draw every entry; returns the per-prompt records."""
+        self.records = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="llm-worker") as pool:
+            futures = [
+                pool.submit(self._plan, entry['prompt'], time.perf_counter()) if not entry.get('error') else None
+                for entry in entries
+            ]
+            for entry, future in zip(entries, futures):
+                record = {'id': entry['id'], 'prompt': entry['prompt']}
+                self.records.append(record)
+                if future is None:
+                    record.update(status='error', error=entry['error'])
+                    continue
+                try:
+                    tool_calls, content, timings = future.result()
+                except Exception as e:
+                    record.update(status='error', error=str(e))
+                    continue
+                record.update(timings)
+                if not tool_calls:
+                    record.update(status='no_plan', reply=content, steps=0)
+                    continue
+                for plan_pass in self.passes:
+                    tool_calls = plan_pass.optimize(tool_calls)
+                draw_started = time.perf_counter()
+                try:
+                    results = self.draw(tool_calls)
+                except Exception as e:
+                    record.update(status='error', error=str(e), steps=len(tool_calls))
+                    continue
+                if self.recorder is not None:
+                    self.recorder.record(entry['prompt'], tool_calls, results)
+                errors = [text for _, text in results if text.startswith("error")]
+                record.update(
+                    status='partial' if errors else 'ok',
+                    steps=len(tool_calls),
+                    errors=errors,
+                    draw_seconds=round(time.perf_counter() - draw_started, 4),
+                    finished_seconds=round(time.perf_counter() - started, 4),
+                )
+
+        seconds = time.perf_counter() - started
+        statuses = Counter(r['status'] for r in self.records)
+        planned = [r['plan_seconds'] for r in self.records if 'plan_seconds' in r]
+        self.summary = {
+            'prompts': len(self.records),
+            'workers': self.workers,
+            'seconds': seconds,
+            'prompts_per_minute': len(self.records) / seconds * 60 if seconds > 0 else 0.0,
+            'statuses': dict(statuses),
+            'sources': dict(Counter(r['source'] for r in self.records if 'source' in r)),
+            'plan_avg_seconds': sum(planned) / len(planned) if planned else 0.0,
+        }
+        if report_path:
+            self.write_report(report_path)
+        return self.records
+
+    def write_report(self, path):
+        """One JSON line per prompt, in submission order."""
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+
+    def format_report(self):
+        s = self.summary
+        if not s:
+            return ""
+        statuses = ", ".join(f"{n} {status}" for status, n in sorted(s['statuses'].items()))
+        sources = ", ".join(f"{n} {source}" for source, n in sorted(s['sources'].items()))
+        return (f"[*] Batch: {s['prompts']} prompts in {s['seconds']:.1f}s with {s['workers']} LLM workers "
+                f"({s['prompts_per_minute']:.1f} prompts/min); {statuses}; plans from {sources or 'nowhere'}, "
+                f"avg {s['plan_avg_seconds']:.2f}s per plan.")
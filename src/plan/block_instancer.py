@@ -0,0 +1,221 @@
+import hashlib
+import io
+import math
+
+from src.cad import geometry
+from src.cad.backend import CADBackend
+from src.cad.headless_backend import HeadlessBackend
+
+
+class BlockInstancer:
+    """
+    Plan optimizer that turns repeated geometry into block references.
+
+    Each drawing tool call is expanded into primitives, moved to its anchor point
+    and rotated so its first off-anchor point lies on +X. Calls whose normalized
+    geometry matches are defined once as a block (`define_block` step) and every
+    occurrence becomes an `insert_block` step with its own position and rotation.
+    """
+
+    def __init__(self, enabled=True, min_repeats=2, digits=6):
+        self.enabled = enabled
+        self.min_repeats = min_repeats
+        self.digits = digits
+        self.last_report = None
+        # Signatures already defined as blocks this session -> block name
+        self._known = {}
+
+    # --- Expansion --------------------------------------------------------
+
+    @staticmethod
+    def expand_call(name, args):
+        """Primitives (kind, args) a drawing tool call creates, or None if not instanceable."""
+        p3 = CADBackend._point3
+        if args.get('snap_tolerance'):
+            # Snapped vertices depend on what is already drawn
+            return None
+        if name == 'draw_line':
+            return [('line', (p3(args['start']), p3(args['end'])))]
+        if name == 'draw_circle':
+            return [('circle', (p3(args['center']), float(args['radius'])))]
+        if name == 'draw_point':
+            return [('point', (p3(args['point']),))]
+        if name == 'draw_arc':
+            return [('arc', (p3(args['center']), float(args['radius']),
+                             float(args['start_angle']), float(args['end_angle'])))]
+        if name == 'draw_spline':
+            return [('spline', (tuple(p3(p) for p in args['points']),
+                                float(args.get('start_angle', 15.0)), float(args.get('end_angle', 15.0))))]
+        if name == 'draw_polyline':
+            return [('polyline', (tuple(p3(p) for p in args['points']), bool(args.get('closed', False))))]
+        if name in ('draw_radials', 'draw_cloud_radials'):
+            if name == 'draw_radials':
+                segments = geometry.radial_segments(args['center'], args['radius'], args['angle_increment'])
+                prims = [('circle', (p3(args['center']), float(args['radius'])))]
+            else:
+                segments = geometry.cloud_radial_segments(args['center'], args['radii'], args.get('angle_increment', 20.0))
+                prims = []
+            prims.extend(('line', (tuple(s[0:3]), tuple(s[3:6]))) for s in segments.tolist())
+            return prims
+        if name == 'draw_concentric_rings':
+            circles = geometry.concentric_circles(
+                args['center'], geometry.ring_radii(args['start_radius'], args['spacing'], args['count']))
+            return [('circle', (tuple(c[0:3]), c[3])) for c in circles.tolist()]
+        return None
+
+    @staticmethod
+    def _points(prims):
+        for kind, args in prims:
+            if kind == 'line':
+                yield args[0]
+                yield args[1]
+            elif kind in ('spline', 'polyline'):
+                yield from args[0]
+            else:
+                yield args[0]
+
+    @staticmethod
+    def to_spec(kind, args):
+        """Entity spec dict (as used by define_block and the array tools) for a primitive."""
+        if kind == 'line':
+            return {'type': 'line', 'start': list(args[0]), 'end': list(args[1])}
+        if kind == 'circle':
+            return {'type': 'circle', 'center': list(args[0]), 'radius': args[1]}
+        if kind == 'point':
+            return {'type': 'point', 'point': list(args[0])}
+        if kind == 'arc':
+            return {'type': 'arc', 'center': list(args[0]), 'radius': args[1],
+                    'start_angle': args[2], 'end_angle': args[3]}
+        if kind == 'polyline':
+            return {'type': 'polyline', 'points': [list(p) for p in args[0]], 'closed': args[1]}
+        return {'type': 'spline', 'points': [list(p) for p in args[0]],
+                'start_angle': args[1], 'end_angle': args[2]}
+
+    # --- Normalization ----------------------------------------------------
+
+    def _round(self, value):
+        if isinstance(value, tuple):
+            return tuple(self._round(v) for v in value)
+        # + 0.0 folds -0.0 into 0.0 so mirrored zeros hash alike
+        return round(value, self.digits) + 0.0
+
+    def canonical(self, prims):
+        """Return (anchor, rotation_deg, local_prims, signature) for a primitive list."""
+        ax, ay, az = CADBackend._anchor(*prims[0])
+        theta = 0.0
+        tolerance = 10.0 ** -self.digits
+        for x, y, _ in self._points(prims):
+            if math.hypot(x - ax, y - ay) > tolerance:
+                theta = math.atan2(y - ay, x - ax)
+                break
+        cos_t, sin_t = math.cos(-theta), math.sin(-theta)
+
+        def local(p):
+            dx, dy = p[0] - ax, p[1] - ay
+            return (dx * cos_t - dy * sin_t, dx * sin_t + dy * cos_t, p[2] - az)
+
+        out = []
+        for kind, args in prims:
+            if kind == 'line':
+                out.append((kind, (local(args[0]), local(args[1]))))
+            elif kind == 'arc':
+                out.append((kind, (local(args[0]), args[1],
+                                   (args[2] - theta) % (2 * math.pi), (args[3] - theta) % (2 * math.pi))))
+            elif kind == 'spline':
+                deg = math.degrees(theta)
+                out.append((kind, (tuple(local(p) for p in args[0]), (args[1] - deg) % 360.0, (args[2] - deg) % 360.0)))
+            elif kind == 'polyline':
+                out.append((kind, (tuple(local(p) for p in args[0]), args[1])))
+            else:
+                out.append((kind, (local(args[0]),) + args[1:]))
+        signature = tuple((kind, self._round(args)) for kind, args in out)
+        return (ax, ay, az), math.degrees(theta), out, signature
+
+    @staticmethod
+    def _worth_instancing(prims):
+        """Single simple entities gain nothing from a block; splines and polylines carry enough data to."""
+        return len(prims) > 1 or prims[0][0] in ('spline', 'polyline')
+
+    # --- Optimization -----------------------------------------------------
+
+    def optimize(self, tool_calls):
+        """Return a plan where repeated geometry is defined once and inserted as blocks."""
+        self.last_report = None
+        if not self.enabled or not tool_calls:
+            return tool_calls
+
+        groups = {}
+        for idx, call in enumerate(tool_calls):
+            fn = call.get('function', {})
+            try:
+                prims = self.expand_call(fn.get('name'), fn.get('arguments') or {})
+            except (KeyError, TypeError, ValueError):
+                prims = None
+            if not prims or not self._worth_instancing(prims):
+                continue
+            anchor, rotation, local, signature = self.canonical(prims)
+            groups.setdefault(signature, []).append((idx, anchor, rotation, local, prims))
+
+        selected = {sig: members for sig, members in groups.items()
+                    if len(members) >= self.min_repeats or sig in self._known}
+        if not selected:
+            return tool_calls
+
+        defines = {}
+        inserts = {}
+        originals = []
+        for signature, members in selected.items():
+            local = members[0][3]
+            name = self._known.get(signature)
+            if name is None:
+                name = "AI_" + hashlib.sha1(repr(signature).encode()).hexdigest()[:10].upper()
+                self._known[signature] = name
+            defines[members[0][0]] = {'function': {'name': 'define_block', 'arguments': {
+                'name': name, 'entities': [self.to_spec(kind, args) for kind, args in local]}}}
+            for idx, anchor, rotation, _, prims in members:
+                inserts[idx] = {'function': {'name': 'insert_block', 'arguments': {
+                    'name': name, 'insertion_point': list(anchor), 'rotation': rotation}}}
+                originals.extend(prims)
+
+        plan = []
+        for idx, call in enumerate(tool_calls):
+            if idx in defines:
+                plan.append(defines[idx])
+            plan.append(inserts.get(idx, call))
+
+        self.last_report = self._report(originals, [defines[i] for i in sorted(defines)], [inserts[i] for i in sorted(inserts)])
+        return plan
+
+    @staticmethod
+    def _dxf_size(backend):
+        out = io.StringIO()
+        backend.write_dxf(out)
+        return len(out.getvalue().encode("utf-8"))
+
+    def _report(self, originals, defines, inserts):
+        """Compare the replaced geometry drawn flat against its block form."""
+        flat = HeadlessBackend()
+        for kind, args in originals:
+            getattr(flat, f'add_{kind}')(*args)
+        blocks = HeadlessBackend()
+        for call in defines:
+            blocks.define_block(**call['function']['arguments'])
+        for call in inserts:
+            blocks.insert_block(**call['function']['arguments'])
+        return {
+            'blocks': len(defines),
+            'references': len(inserts),
+            'entities_before': len(flat),
+            'entities_after': len(blocks),
+            'block_entities': sum(len(call['function']['arguments']['entities']) for call in defines),
+            'dxf_bytes_before': self._dxf_size(flat),
+            'dxf_bytes_after': self._dxf_size(blocks),
+        }
+
+    def format_report(self):
+        r = self.last_report
+        if not r:
+            return ""
+        return (f"[*] Block instancing: {r['blocks']} block(s), {r['references']} references, "
+                f"model-space entities {r['entities_before']} -> {r['entities_after']}, "
+                f"DXF {r['dxf_bytes_before'] / 1024:.1f} KB -> {r['dxf_bytes_after'] / 1024:.1f} KB.")
@@ -0,0 +1,192 @@
+import json
+import time
+
+from src import tracing
+from src.plan.layer_report import LayerReporter
+
+
+class PlanDispatcher:
+    """
+    Executes plans (lists of Ollama tool calls) against a CAD backend.
+
+    `cad` is a backend or a ComExecutor proxy; `llm` is only needed for the
+    layer summary `layer_reporter` writes for `list_layers`, which
+    `summarize_layers` asks for after the plan ran. The interactive REPL, the batch runner
+    and plan replay share this so a plan draws the same way in all of them.
+    With verbose=False the per-step progress lines are not printed.
+    """
+
+    def __init__(self, cad, llm=None, verbose=True, layer_reporter=None):
+        self.cad = cad
+        self.llm = llm
+        self.verbose = verbose
+        self.layer_reporter = layer_reporter or LayerReporter()
+
+    def _snapped(self, args, point):
+        """`point` moved onto the nearest existing endpoint when the step asks for snapping."""
+        tolerance = args.get('snap_tolerance')
+        if not tolerance:
+            return tuple(point)
+        return self.cad.snap_point(point, tolerance)
+
+    def _report(self, title, data):
+        """Print a query result and return it as the step's result text (fed back to the LLM session)."""
+        text = json.dumps(data, separators=(',', ':'))
+        print(f"[{title}]: {json.dumps(data, indent=2) if self.verbose else text}")
+        return text
+
+    def execute_step(self, func_name, args):
+        """Run one tool call against the CAD backend; query tools return their result as text."""
+        if func_name == 'draw_line':
+            self.cad.add_line(self._snapped(args, args['start']), self._snapped(args, args['end']))
+        elif func_name == 'draw_circle':
+            self.cad.add_circle(tuple(args['center']), args['radius'])
+        elif func_name == 'draw_point':
+            self.cad.add_point(tuple(args['point']))
+        elif func_name == 'draw_arc':
+            self.cad.add_arc(tuple(args['center']), args['radius'], args['start_angle'], args['end_angle'])
+        elif func_name == 'draw_spline':
+            self.cad.add_spline(
+                args['points'], 
+                args.get('start_angle', 15.0), 
+                args.get('end_angle', 15.0)
+            )
+        elif func_name == 'draw_polyline':
+            self.cad.add_polyline([self._snapped(args, p) for p in args['points']], args.get('closed', False))
+        elif func_name == 'trim_entities':
+            self.cad.trim()
+        elif func_name == 'list_layers':
+            layers = self.cad.get_layers_info()
+            if self.verbose:
+                print(f"Retrieved {len(layers)} layers.")
+            summarized = self.layer_reporter.summarizes(self.llm, args)
+            text = self.layer_reporter.describe(layers, args, summarized)
+            if not summarized:
+                print(f"\n[Layers Summary]:\n{text}")
+            # A digest for the model is turned into the summary by summarize_layers, off this thread
+            return text
+        elif func_name == 'set_layer_status':
+            success = self.cad.set_layer_status(args['layer_name'], args['is_on'])
+            status_str = "ON" if args['is_on'] else "OFF"
+            if success:
+                print(f"[*] Layer '{args['layer_name']}' successfully turned {status_str}.")
+            else:
+                print(f"[!] Failed to turn {status_str} the layer '{args['layer_name']}'.")
+        elif func_name == 'create_layer':
+            color = args.get('color', 7)
+            self.cad.create_layer(args['layer_name'], color)
+            print(f"[*] Layer '{args['layer_name']}' created with color {color}.")
+        elif func_name == 'rename_layer':
+            self.cad.rename_layer(args['old_name'], args['new_name'])
+            print(f"[*] Layer '{args['old_name']}' renamed to '{args['new_name']}'.")
+        elif func_name == 'change_layer_color':
+            self.cad.change_layer_color(args['layer_name'], args['color'])
+            print(f"[*] Layer '{args['layer_name']}' color set to {args['color']}.")
+        elif func_name == 'draw_radials':
+            self.cad.draw_radials(args['center'], args['radius'], args['angle_increment'])
+            print(f"[*] Radial pattern created at {args['center']} with radius {args['radius']}.")
+        elif func_name == 'draw_cloud_radials':
+            self.cad.cloud_radials(args['center'], args['radii'], args.get('angle_increment', 20.0))
+            print(f"[*] Cloud radial pattern created at {args['center']} with {len(args['radii'])} lines.")
+        elif func_name == 'draw_concentric_rings':
+            self.cad.draw_concentric_rings(args['center'], args['start_radius'], args['spacing'], args['count'])
+            print(f"[*] {args['count']} concentric rings created at {args['center']}.")
+        elif func_name == 'define_block':
+            self.cad.define_block(args['name'], args['entities'])
+        elif func_name == 'insert_block':
+            self.cad.insert_block(args['name'], args['insertion_point'], args.get('rotation', 0.0))
+        elif func_name == 'polar_array':
+            count = self.cad.polar_array(args['entity'], args['center'], args['count'], args.get('fill_angle', 360.0))
+            print(f"[*] Polar array of {count} items created around {args['center']}.")
+        elif func_name == 'rectangular_array':
+            count = self.cad.rectangular_array(
+                args['entity'], args['rows'], args['columns'],
+                args['row_spacing'], args['column_spacing']
+            )
+            print(f"[*] Rectangular array of {count} items created.")
+        elif func_name == 'path_array':
+            count = self.cad.path_array(args['entity'], args['points'])
+            print(f"[*] Path array of {count} items created.")
+        elif func_name == 'find_nearest_entities':
+            found = self.cad.nearest_entities(args['point'], args.get('count', 1), args.get('max_distance'))
+            return self._report("Nearest entities", found)
+        elif func_name == 'find_entities_in_window':
+            found = self.cad.entities_in_window(args['corner1'], args['corner2'], args.get('crossing', True))
+            return self._report("Entities in window", found)
+        elif func_name == 'count_entities':
+            count = self.cad.count_entities(args.get('entity_type'), args.get('layer'),
+                                            args.get('corner1'), args.get('corner2'), args.get('crossing', True))
+            return self._report("Entity count", {'count': count})
+        elif func_name == 'select_entities':
+            found = self.cad.select_entities(args.get('entity_type'), args.get('layer'),
+                                             args.get('corner1'), args.get('corner2'), args.get('crossing', True))
+            return self._report("Selected entities", found)
+        elif func_name == 'snap_to_endpoint':
+            snap = self.cad.snap_to_endpoint(args['point'], args['tolerance'])
+            return self._report("Endpoint snap", snap)
+        else:
+            print(f"Unsupported command: {func_name}")
+
+    def summarizes_layers(self, tool_calls):
+        """True when `summarize_layers` has model calls to make for the results of this plan."""
+        return any(call['function']['name'] == 'list_layers'
+                   and self.layer_reporter.summarizes(self.llm, call['function'].get('arguments'))
+                   for call in tool_calls)
+
+    def summarize_layers(self, tool_calls, results):
+        """
+        `results` of `tool_calls` with the layer digests replaced by the LLM's
+        summary. Run it on the caller's thread, not the COM thread, so drawing
+        goes on while the model writes.
+        """
+        summarized = []
+        for call, (func_name, text) in zip(tool_calls, results):
+            if (func_name == 'list_layers' and not text.startswith("error")
+                    and self.layer_reporter.summarizes(self.llm, call['function'].get('arguments'))):
+                text = self.layer_reporter.summarize(text, self.llm)
+                print(f"\n[Layers Summary]:\n{text}")
+                report = self.layer_reporter.last_report
+                if self.verbose:
+                    print(f"[*] Layer summary: {report['tokens_sent']} tokens sent for {report['layers']} layers "
+                          f"in {report['seconds']:.2f}s.")
+            summarized.append((func_name, text))
+        return summarized
+
+    def run_step(self, func_name, args):
+        """Run one tool call, retrying it once if the CAD connection had to be re-established."""
+        try:
+            return self.execute_step(func_name, args)
+        except Exception as step_error:
+            if not self.cad.recover(step_error):
+                raise
+            return self.execute_step(func_name, args)
+
+    def draw_step(self, step, func_name, args, flush=False):
+        """Run one step and return (func_name, result text, finish time); errors are reported, not raised."""
+        if self.verbose:
+            print(f"[Step {step}] Executing: {func_name}")
+        with tracing.span('step', step=str(step), tool=func_name) as trace:
+            try:
+                result = self.run_step(func_name, args) or "done"
+            except Exception as step_error:
+                print(f"Error in step {step}: {step_error}")
+                result = f"error: {step_error}"
+            if flush:
+                # Send this step's geometry now instead of at the end of the plan
+                self.cad.flush()
+            if trace is not None and result.startswith("error"):
+                trace.set(error=result)
+        return func_name, result, time.perf_counter()
+
+    def run_plan(self, tool_calls):
+        """Execute a whole plan; primitives are queued and sent to AutoCAD in one flush."""
+        if not self.cad.ensure_connected():
+            print("[!] CAD backend is not reachable; skipping this plan.")
+            return []
+        results = []
+        with tracing.span('dispatch', steps=len(tool_calls)):
+            with self.cad.batch():
+                for i, call in enumerate(tool_calls, 1):
+                    func_name, result, _ = self.draw_step(f"{i}/{len(tool_calls)}", call['function']['name'], call['function']['arguments'])
+                    results.append((func_name, result))
+        return results
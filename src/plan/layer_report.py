@@ -0,0 +1,209 @@
+import re
+import time
+from collections import Counter
+
+from src import tracing
+from src.cad.selection import wcmatch
+
+# Layer name prefixes end at the first of these ("A-WALL", "E_LIGHT", "SITE|ROAD" for xref layers)
+_PREFIX_SEPARATORS = re.compile(r'[-_|$ .]')
+STATES = ('on', 'off', 'frozen', 'locked')
+NO_PREFIX = '(no prefix)'
+
+_SUMMARY_PROMPT = (
+    "The user asked about layers. Here is a summary of the drawing's layer table:\n{digest}\n"
+    "Please summarize this for the user in a friendly way, highlighting which ones are off, frozen or locked."
+)
+
+
+def estimate_tokens(text):
+    """Rough token count of a prompt (about four characters per token)."""
+    return len(text) // 4
+
+
+def layer_prefix(name):
+    """Group name of a layer: the part of its name before the first separator, upper-cased."""
+    head = _PREFIX_SEPARATORS.split(name, 1)
+    return head[0].upper() if len(head) > 1 and head[0] else NO_PREFIX
+
+
+def _in_state(layer, state):
+    if state == 'on':
+        return bool(layer['is_on'])
+    if state == 'off':
+        return not layer['is_on']
+    return bool(layer['is_frozen'] if state == 'frozen' else layer['is_locked'])
+
+
+def _listing(title, shown, total, separator=", "):
+    """'Title (total): a, b, ... and N more' for the first entries of a longer list."""
+    text = separator.join(shown)
+    more = total - len(shown)
+    if more > 0:
+        text = f"{text}{separator}... and {more} more" if shown else f"{more} not listed"
+    return f"{title} ({total}): {text}"
+
+
+class LayerReport:
+    """
+    Aggregated view of a layer table (the dicts `get_layers_info` returns).
+
+    Everything is counted locally in one pass: layers per state and per
+    color, the names of the off/frozen/locked layers and the layers grouped
+    by name prefix, so "A-WALL" and "A-DOOR" fall under "A". `digest` renders
+    that in a token budget, `page` lists the layers themselves.
+    """
+
+    def __init__(self, layers):
+        self.layers = sorted(layers, key=lambda layer: str(layer['name']).lower())
+        self.states = Counter()
+        self.colors = Counter()
+        self.groups = {}
+        self.names = {'off': [], 'frozen': [], 'locked': []}
+        for layer in self.layers:
+            name = str(layer['name'])
+            group = self.groups.get(layer_prefix(name))
+            if group is None:
+                group = self.groups[layer_prefix(name)] = Counter()
+            group['layers'] += 1
+            self.colors[layer['color']] += 1
+            for state in STATES:
+                if _in_state(layer, state):
+                    self.states[state] += 1
+                    group[state] += 1
+                    if state in self.names:
+                        self.names[state].append(name)
+
+    def __len__(self):
+        return len(self.layers)
+
+    def _headline(self):
+        counts = ", ".join(f"{self.states[state]} {state}" for state in STATES)
+        return f"{len(self)} layers: {counts}."
+
+    def _colors(self, limit):
+        shown = [f"{color} ({count})" for color, count in self.colors.most_common(limit)]
+        return _listing("Colors", shown, len(self.colors))
+
+    def _groups(self, limit):
+        ordered = sorted(self.groups.items(), key=lambda item: (-item[1]['layers'], item[0]))
+        shown = []
+        for prefix, group in ordered[:limit]:
+            flags = ", ".join(f"{group[state]} {state}" for state in self.names if group[state])
+            shown.append(f"{prefix} ({group['layers']}{': ' + flags if flags else ''})")
+        return _listing("Name prefixes", shown, len(ordered), "; ")
+
+    def digest(self, max_tokens=None):
+        """
+        Plain-text summary of the table. With `max_tokens` the lists (colors,
+        prefix groups, off/frozen/locked names) are shortened, one entry at a
+        time across all of them, until the text fits; the counts always stay.
+        """
+        lists = {'colors': len(self.colors), 'groups': len(self.groups)}
+        lists.update((state, len(names)) for state, names in self.names.items() if names)
+        limits = dict.fromkeys(lists, 0) if max_tokens is not None else dict(lists)
+
+        def render():
+            lines = [self._headline()]
+            if self.colors:
+                lines.append(self._colors(limits['colors']))
+            if self.groups:
+                lines.append(self._groups(limits['groups']))
+            lines += [_listing(state.capitalize(), self.names[state][:limits[state]], len(self.names[state]))
+                      for state in self.names if state in limits]
+            return "\n".join(lines)
+
+        text = render()
+        if max_tokens is None:
+            return text
+        growing = [key for key in lists if lists[key]]
+        while growing:
+            for key in list(growing):
+                limits[key] += 1
+                candidate = render()
+                if estimate_tokens(candidate) > max_tokens:
+                    limits[key] -= 1
+                    growing.remove(key)
+                    continue
+                text = candidate
+                if limits[key] >= lists[key]:
+                    growing.remove(key)
+        return text
+
+    def select(self, state=None, name=None):
+        """Layers in `state` ('on', 'off', 'frozen', 'locked') whose name matches the wildcard `name`."""
+        if state is not None and state not in STATES:
+            raise ValueError(f"Unknown layer state '{state}'; expected one of {', '.join(STATES)}")
+        match = wcmatch(name) if name else None
+        return [layer for layer in self.layers
+                if (state is None or _in_state(layer, state)) and (match is None or match(layer['name']))]
+
+    def page(self, number=1, page_size=50, state=None, name=None):
+        """One page (1-based) of the selected layers as text, one layer per line."""
+        selected = self.select(state, name)
+        pages = max(1, -(-len(selected) // page_size))
+        number = min(max(1, int(number)), pages)
+        rows = selected[(number - 1) * page_size:number * page_size]
+        lines = [f"Layers {(number - 1) * page_size + 1 if rows else 0}-{(number - 1) * page_size + len(rows)} "
+                 f"of {len(selected)} (page {number}/{pages}):"]
+        for layer in rows:
+            flags = [state for state in ('off', 'frozen', 'locked') if _in_state(layer, state)]
+            lines.append(f"{layer['name']}: color {layer['color']}{', ' + ', '.join(flags) if flags else ''}")
+        return "\n".join(lines)
+
+
+class LayerReporter:
+    """
+    Answers `list_layers` from a LayerReport instead of sending the whole
+    layer table to the LLM.
+
+    `describe` builds the local answer from the layer table and runs with the
+    CAD backend (on the COM thread, when there is one). Calls with a page,
+    state or name filter list the layers themselves, `page_size` at a time;
+    otherwise the answer is the report's digest. In mode 'llm' that digest is
+    cut to `max_tokens` and `summarize` then has the model turn it into a
+    friendly summary; it is called on the caller's thread, so AutoCAD work is
+    not held up while the model generates. Mode 'local' (or no LLM) prints the
+    digest itself. `last_report` has the layer count, the tokens sent and the
+    seconds taken by the last call.
+    """
+
+    def __init__(self, mode='llm', max_tokens=400, page_size=50):
+        self.mode = mode
+        self.max_tokens = max_tokens
+        self.page_size = page_size
+        self.last_report = None
+
+    def summarizes(self, llm, args=None):
+        """True when the `describe` answer for a list_layers call with `args` is a digest for `summarize`."""
+        args = args or {}
+        return llm is not None and self.mode != 'local' and not (args.get('page') or args.get('state') or args.get('name'))
+
+    def describe(self, layers, args=None, summarized=False):
+        """Local text answer to one list_layers call; with `summarized` the digest cut for the model."""
+        args = args or {}
+        started = time.perf_counter()
+        with tracing.span('layer_report', layers=len(layers)):
+            report = LayerReport(layers)
+            if args.get('page') or args.get('state') or args.get('name'):
+                text = report.page(args.get('page') or 1, self.page_size, args.get('state'), args.get('name'))
+            else:
+                text = report.digest(self.max_tokens if summarized else None)
+            self.last_report = {'layers': len(report), 'tokens_sent': 0,
+                                'seconds': time.perf_counter() - started}
+        return text
+
+    def summarize(self, digest, llm):
+        """The model's friendly summary of a `describe` digest."""
+        started = time.perf_counter()
+        prompt = _SUMMARY_PROMPT.format(digest=digest)
+        tokens = estimate_tokens(prompt)
+        with tracing.span('layer_summary', tokens_sent=tokens):
+            response = llm.client.chat(
+                model=llm.model,
+                messages=[{'role': 'user', 'content': prompt}],
+                keep_alive=llm.keep_alive,
+            )
+        report = self.last_report or {'layers': None, 'seconds': 0.0}
+        self.last_report = dict(report, tokens_sent=tokens, seconds=report['seconds'] + time.perf_counter() - started)
+        return response['message']['content']
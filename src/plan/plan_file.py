@@ -0,0 +1,157 @@
+import json
+import re
+import time
+
+from src.llm.plan_cache import plain_data
+
+VERSION = 1
+
+# Argument names, across every tool and entity spec, that hold geometry
+POINT_KEYS = {'start', 'end', 'center', 'point', 'insertion_point', 'corner1', 'corner2'}
+POINT_LIST_KEYS = {'points'}
+LENGTH_KEYS = {'radius', 'start_radius', 'spacing', 'row_spacing', 'column_spacing',
+               'max_distance', 'tolerance', 'snap_tolerance'}
+LENGTH_LIST_KEYS = {'radii'}
+# Tools that only read the drawing; a replay would just repeat the reads, so they are not recorded
+QUERY_TOOLS = {'list_layers', 'find_nearest_entities', 'find_entities_in_window', 'count_entities',
+               'select_entities', 'snap_to_endpoint'}
+
+
+def drawing_calls(tool_calls):
+    """The tool calls of a plan that change the drawing (query steps left out)."""
+    return [call for call in tool_calls if call['function']['name'] not in QUERY_TOOLS]
+
+
+def compile_plan(prompt, tool_calls):
+    """Compact record of an executed plan: [tool name, arguments] pairs after the plan passes, without query steps."""
+    calls = [[call['function']['name'], call['function'].get('arguments') or {}] for call in drawing_calls(tool_calls)]
+    return plain_data({'v': VERSION, 'prompt': prompt, 'calls': calls})
+
+
+def load_plans(path):
+    """Read a plan file (one compiled plan per line) back into tool-call lists."""
+    plans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get('v', VERSION) > VERSION:
+                raise ValueError(f"{path}:{line_no}: plan format version {record['v']} is newer than {VERSION}")
+            plans.append({
+                'prompt': record.get('prompt', ''),
+                'tool_calls': [{'function': {'name': name, 'arguments': args}} for name, args in record['calls']],
+            })
+    return plans
+
+
+class PlanRecorder:
+    """
+    Appends executed plans to a plan file so they can be replayed without the
+    LLM. Call `record` once the plan has run, with its results: plans with a
+    failed or missing step are skipped (counted in `skipped`), and so are plans
+    that only queried the drawing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.recorded = 0
+        self.skipped = 0
+
+    def record(self, prompt, tool_calls, results):
+        """Write one plan; `results` are the (tool name, result text) pairs its execution returned."""
+        if not drawing_calls(tool_calls):
+            return
+        failed = sum(1 for _, text in results if str(text).startswith("error"))
+        if failed or len(results) != len(tool_calls):
+            # A plan that was not run (backend unreachable) has no results at all
+            self.skipped += 1
+            print(f"[*] Plan not recorded: {failed or len(tool_calls) - len(results)} step(s) failed or did not run.")
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(compile_plan(prompt, tool_calls), separators=(',', ':')) + "\n")
+            self.recorded += 1
+        except OSError as e:
+            print(f"[!] Could not record plan: {e}")
+
+
+def transform_plan(tool_calls, shift=(0.0, 0.0, 0.0), scale=1.0, about=(0.0, 0.0, 0.0)):
+    """
+    Copy of a plan with its geometry scaled by `scale` around `about` and then
+    moved by `shift`. Lengths (radii, spacings) are scaled, angles and counts
+    are kept. Block definitions are in block coordinates, so their contents are
+    only scaled, and scaled blocks get a new name so they do not collide with
+    the unscaled definition already in the drawing.
+    """
+    shift = tuple(float(v) for v in shift) + (0.0,) * (3 - len(shift))
+    about = tuple(float(v) for v in about) + (0.0,) * (3 - len(about))
+    scale = float(scale)
+
+    def point(p, move=True):
+        if not move:
+            return [float(v) * scale for v in p]
+        return [about[i] + (float(v) - about[i]) * scale + shift[i] for i, v in enumerate(p)]
+
+    def block_name(name):
+        if scale == 1.0:
+            return name
+        return f"{name}_S{re.sub(r'[^0-9A-Za-z]', '_', f'{scale:g}')}"
+
+    def walk(args, move=True):
+        out = {}
+        for key, value in args.items():
+            if key in POINT_KEYS:
+                value = point(value, move)
+            elif key in POINT_LIST_KEYS:
+                value = [point(p, move) for p in value]
+            elif key in LENGTH_KEYS:
+                value = float(value) * scale
+            elif key in LENGTH_LIST_KEYS:
+                value = [float(v) * scale for v in value]
+            elif key == 'entity':
+                value = walk(value, move)
+            elif key == 'entities':
+                # Block contents are relative to the insertion point
+                value = [walk(entity, move=False) for entity in value]
+            out[key] = value
+        return out
+
+    result = []
+    for call in plain_data(list(tool_calls)):
+        name = call['function']['name']
+        args = walk(call['function'].get('arguments') or {})
+        if name in ('define_block', 'insert_block'):
+            args['name'] = block_name(args['name'])
+        result.append({'function': {'name': name, 'arguments': args}})
+    return result
+
+
+def replay_plans(dispatcher, plans, shift=(0.0, 0.0, 0.0), scale=1.0, about=(0.0, 0.0, 0.0)):
+    """Execute recorded plans through `dispatcher` with no LLM involved; returns throughput stats."""
+    cad = dispatcher.cad
+    before = cad.entity_count()
+    steps = errors = 0
+    started = time.perf_counter()
+    for plan in plans:
+        # Files recorded before query steps were left out may still hold some
+        tool_calls = transform_plan(drawing_calls(plan['tool_calls']), shift, scale, about)
+        results = dispatcher.run_plan(tool_calls)
+        steps += len(results)
+        errors += sum(1 for _, text in results if text.startswith("error"))
+    seconds = time.perf_counter() - started
+    entities = cad.entity_count() - before
+    return {
+        'plans': len(plans),
+        'steps': steps,
+        'errors': errors,
+        'entities': entities,
+        'seconds': seconds,
+        'entities_per_sec': entities / seconds if seconds > 0 else float('inf'),
+    }
+
+
+def format_replay_report(stats):
+    return (f"[*] Replay: {stats['plans']} plans, {stats['steps']} steps ({stats['errors']} failed), "
+            f"{stats['entities']} entities in {stats['seconds']:.3f}s ({stats['entities_per_sec']:.0f} entities/sec).")
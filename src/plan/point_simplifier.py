@@ -0,0 +1,75 @@
+import time
+
+from src.cad import simplify
+
+
+class PointSimplifier:
+    """
+    Plan pass that thins out the point lists of draw_spline and draw_polyline
+    calls (including the polylines made by the PolylineCoalescer).
+
+    Duplicate and nearly collinear points are dropped so that no original
+    point is more than `tolerance` (drawing units) from what gets drawn: the
+    reduced polyline, or for splines the spline fitted through the kept fit
+    points with the call's end tangents. Calls with `snap_tolerance` and
+    lists of at most `min_points` points are left alone.
+    """
+
+    def __init__(self, enabled=True, tolerance=0.01, min_points=3):
+        self.enabled = enabled
+        self.tolerance = float(tolerance)
+        self.min_points = min_points
+        self.last_report = None
+
+    def _simplified(self, name, args):
+        """(new arguments, points before, points after, deviation), or None if the call is left as is."""
+        points = args.get('points')
+        if not points or len(points) <= self.min_points or args.get('snap_tolerance'):
+            return None
+        try:
+            tangents = (args.get('start_angle', 15.0), args.get('end_angle', 15.0)) if name == 'draw_spline' else None
+            reduced, deviation = simplify.simplify(points, self.tolerance, closed=bool(args.get('closed')), tangents=tangents)
+        except (TypeError, ValueError):
+            return None
+        if len(reduced) == len(points) or len(reduced) < 2:
+            return None
+        dims = 2 if all(len(p) == 2 for p in points) else 3
+        return dict(args, points=reduced[:, :dims].tolist()), len(points), len(reduced), deviation
+
+    def optimize(self, tool_calls):
+        """Return a plan where the point lists of spline and polyline calls are reduced."""
+        self.last_report = None
+        if not self.enabled or not tool_calls:
+            return tool_calls
+
+        started = time.perf_counter()
+        plan = []
+        calls = points_before = points_after = 0
+        deviation = 0.0
+        for call in tool_calls:
+            name = call['function'].get('name')
+            result = None
+            if name in ('draw_spline', 'draw_polyline'):
+                result = self._simplified(name, call['function'].get('arguments') or {})
+            if result is None:
+                plan.append(call)
+                continue
+            args, before, after, off = result
+            plan.append({**call, 'function': {**call['function'], 'arguments': args}})
+            calls += 1
+            points_before += before
+            points_after += after
+            deviation = max(deviation, off)
+
+        if not calls:
+            return tool_calls
+        self.last_report = {'calls': calls, 'points_before': points_before, 'points_after': points_after,
+                            'max_deviation': deviation, 'seconds': time.perf_counter() - started}
+        return plan
+
+    def format_report(self):
+        r = self.last_report
+        if not r:
+            return ""
+        return (f"[*] Point simplification: {r['calls']} curve(s), {r['points_before']} -> {r['points_after']} points "
+                f"(max deviation from the drawn curves {r['max_deviation']:.3g} <= {self.tolerance:g}) in {r['seconds'] * 1000:.1f}ms.")
@@ -0,0 +1,153 @@
+import math
+
+from src.cad.backend import CADBackend
+
+# Calls that neither read nor modify existing geometry, so draw_line calls can be
+# regrouped across them. Anything else (e.g. trim_entities) splits the plan.
+_REORDERABLE = {
+    'draw_line', 'draw_circle', 'draw_point', 'draw_arc', 'draw_spline', 'draw_polyline',
+    'draw_radials', 'draw_cloud_radials', 'draw_concentric_rings',
+    'polar_array', 'rectangular_array', 'path_array', 'define_block', 'insert_block',
+    'create_layer', 'rename_layer', 'change_layer_color', 'set_layer_status', 'list_layers',
+}
+
+
+class PolylineCoalescer:
+    """
+    Plan pass that merges draw_line calls whose endpoints chain together into
+    draw_polyline calls, so an N-segment outline is one AddLightWeightPolyline
+    call instead of N AddLine calls. Endpoints closer than `tolerance` are
+    treated as the same vertex. Chains must lie at a single elevation.
+    """
+
+    def __init__(self, enabled=True, tolerance=1e-6):
+        self.enabled = enabled
+        self.tolerance = float(tolerance)
+        self.last_report = None
+
+    def _vertex_ids(self, points):
+        """Assign a vertex id to every point, merging points within tolerance."""
+        cell = self.tolerance if self.tolerance > 0 else 1e-12
+        grid = {}
+        vertices = []
+        ids = []
+        for p in points:
+            kx, ky, kz = (math.floor(v / cell) for v in p)
+            match = None
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for vid in grid.get((kx + dx, ky + dy, kz), ()):
+                        q = vertices[vid]
+                        if abs(q[0] - p[0]) <= self.tolerance and abs(q[1] - p[1]) <= self.tolerance and q[2] == p[2]:
+                            match = vid
+                            break
+                    if match is not None:
+                        break
+                if match is not None:
+                    break
+            if match is None:
+                match = len(vertices)
+                vertices.append(p)
+                grid.setdefault((kx, ky, kz), []).append(match)
+            ids.append(match)
+        return vertices, ids
+
+    def chains(self, segments):
+        """
+        Split segments into chains. Returns a list of (segment indices, vertex list, closed).
+        A chain only runs through vertices where exactly two segments meet; it ends at
+        junctions, so fans and stars stay separate lines. Walks start at vertices that
+        do not have two segments, so open outlines come out in one piece.
+        """
+        points = []
+        for start, end in segments:
+            points.append(start)
+            points.append(end)
+        vertices, ids = self._vertex_ids(points)
+
+        adjacency = {}
+        edges = []
+        for i in range(len(segments)):
+            u, v = ids[2 * i], ids[2 * i + 1]
+            edges.append((u, v))
+            if u == v:
+                continue
+            adjacency.setdefault(u, []).append(i)
+            adjacency.setdefault(v, []).append(i)
+
+        used = [u == v for u, v in edges]
+        starts = [n for n, inc in adjacency.items() if len(inc) != 2] + list(adjacency)
+        result = []
+        for start in starts:
+            while any(not used[e] for e in adjacency[start]):
+                node = start
+                path = [node]
+                walked = []
+                while True:
+                    nxt = next((e for e in adjacency[node] if not used[e]), None)
+                    if nxt is None:
+                        break
+                    used[nxt] = True
+                    walked.append(nxt)
+                    u, v = edges[nxt]
+                    node = v if u == node else u
+                    path.append(node)
+                    if len(adjacency[node]) != 2:
+                        # Junction or loose end: the chain stops here
+                        break
+                closed = len(walked) > 2 and path[0] == path[-1]
+                if closed:
+                    path.pop()
+                result.append((walked, [vertices[n] for n in path], closed))
+        return result
+
+    def optimize(self, tool_calls):
+        """Return a plan where chained draw_line calls are replaced by draw_polyline calls."""
+        self.last_report = None
+        if not self.enabled or not tool_calls:
+            return tool_calls
+
+        replaced = {}
+        lines_in = 0
+        polylines = 0
+
+        run = []
+        for idx, call in enumerate(list(tool_calls) + [None]):
+            name = call['function'].get('name') if call else None
+            if name == 'draw_line' and not (call['function'].get('arguments') or {}).get('snap_tolerance'):
+                try:
+                    args = call['function']['arguments']
+                    start, end = CADBackend._point3(args['start']), CADBackend._point3(args['end'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if start[2] == end[2]:
+                    run.append((idx, start, end))
+                continue
+            if name in _REORDERABLE and name != 'draw_line':
+                continue
+            # Barrier: coalesce the lines collected so far
+            if len(run) > 1:
+                for walked, vertices, closed in self.chains([(s, e) for _, s, e in run]):
+                    if len(walked) < 2:
+                        continue
+                    indices = sorted(run[k][0] for k in walked)
+                    replaced[indices[0]] = {'function': {'name': 'draw_polyline', 'arguments': {
+                        'points': [list(v) for v in vertices], 'closed': closed}}}
+                    for other in indices[1:]:
+                        replaced[other] = None
+                    lines_in += len(walked)
+                    polylines += 1
+            run = []
+
+        if not polylines:
+            return tool_calls
+        plan = [replaced.get(idx, call) for idx, call in enumerate(tool_calls)]
+        plan = [call for call in plan if call is not None]
+        self.last_report = {'lines': lines_in, 'polylines': polylines, 'calls_before': len(tool_calls), 'calls_after': len(plan)}
+        return plan
+
+    def format_report(self):
+        r = self.last_report
+        if not r:
+            return ""
+        return f"[*] Polyline coalescing: {r['lines']} lines -> {r['polylines']} polyline(s), {r['calls_before']} -> {r['calls_after']} steps."
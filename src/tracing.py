@@ -0,0 +1,353 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import types
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Innermost open span of the running request; the COM executor copies it to its worker
+_current = contextvars.ContextVar('trace_span', default=None)
+_tracer = None
+
+_PLAIN = (str, bytes, int, float, bool, complex, tuple, list, dict, type(None))
+_METHODS = (types.MethodType, types.BuiltinMethodType, types.FunctionType)
+
+
+class Span:
+    """One timed section of a request, with its child spans and the COM calls made while it was open."""
+
+    __slots__ = ('name', 'attrs', 'start', 'end', 'children', 'com')
+
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        # COM member name -> [calls, seconds]
+        self.com = {}
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def seconds(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record_com(self, member, seconds):
+        entry = self.com.get(member)
+        if entry is None:
+            entry = self.com[member] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def walk(self):
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def com_calls(self):
+        """(calls, seconds) spent in COM inside this span and its children."""
+        calls = seconds = 0
+        for span in self.walk():
+            for count, spent in span.com.values():
+                calls += count
+                seconds += spent
+        return calls, seconds
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+        data = {'name': self.name, 'start_ms': round((self.start - origin) * 1000, 3),
+                'ms': round(self.seconds * 1000, 3)}
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.com:
+            data['com'] = {member: [count, round(spent * 1000, 3)] for member, (count, spent) in self.com.items()}
+            data['com_calls'] = sum(count for count, _ in self.com.values())
+        if self.children:
+            data['children'] = [child.to_dict(origin) for child in list(self.children)]
+        return data
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a section of the current request. Outside a request (no open root
+    span) nothing is recorded and None is yielded, so instrumented code costs
+    next to nothing in tests, benchmarks and batch runs.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, attrs)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current.reset(token)
+
+
+def add_span(name, start, **attrs):
+    """Attach an already finished section (started at perf_counter `start`) to the current span."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    child = Span(name, attrs)
+    child.start = start
+    child.finish()
+    parent.children.append(child)
+    return child
+
+
+def current_span():
+    return _current.get()
+
+
+def get_tracer():
+    """The tracer installed by the application, or None when tracing is off."""
+    return _tracer
+
+
+def set_tracer(tracer):
+    global _tracer
+    _tracer = tracer
+    return tracer
+
+
+class TracedCom:
+    """
+    Transparent wrapper around a COM object that charges every method call,
+    property read and property write to the current span. Objects returned by
+    COM are wrapped as well, so a whole document tree is covered by wrapping
+    the document once.
+    """
+
+    __slots__ = ('_obj',)
+
+    def __init__(self, obj):
+        object.__setattr__(self, '_obj', obj)
+
+    @staticmethod
+    def wrap(value):
+        if isinstance(value, (TracedCom,) + _PLAIN) or type(value).__name__ == 'VARIANT':
+            return value
+        return TracedCom(value)
+
+    @staticmethod
+    def unwrap(value):
+        return value._obj if isinstance(value, TracedCom) else value
+
+    def __getattr__(self, name):
+        active = _current.get()
+        started = time.perf_counter()
+        value = getattr(self._obj, name)
+        if isinstance(value, _METHODS):
+            # Only the call itself goes to AutoCAD
+            return _TracedMethod(value, name)
+        if active is not None:
+            active.record_com(name, time.perf_counter() - started)
+        return TracedCom.wrap(value)
+
+    def __setattr__(self, name, value):
+        active = _current.get()
+        started = time.perf_counter()
+        setattr(self._obj, name, TracedCom.unwrap(value))
+        if active is not None:
+            active.record_com(f"{name}=", time.perf_counter() - started)
+
+    def __iter__(self):
+        active = _current.get()
+        started = time.perf_counter()
+        items = iter(self._obj)
+        if active is not None:
+            active.record_com('_NewEnum', time.perf_counter() - started)
+        return (TracedCom.wrap(item) for item in items)
+
+    def __bool__(self):
+        return bool(self._obj)
+
+    def __eq__(self, other):
+        return self._obj == TracedCom.unwrap(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._obj)
+
+    def __repr__(self):
+        return f"TracedCom({self._obj!r})"
+
+
+class _TracedMethod:
+    __slots__ = ('_method', '_name')
+
+    def __init__(self, method, name):
+        self._method = method
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        args = tuple(TracedCom.unwrap(a) for a in args)
+        active = _current.get()
+        if active is None:
+            return TracedCom.wrap(self._method(*args, **kwargs))
+        started = time.perf_counter()
+        try:
+            return TracedCom.wrap(self._method(*args, **kwargs))
+        finally:
+            active.record_com(self._name, time.perf_counter() - started)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Tracer:
+    """
+    Collects one span tree per request and exports it. Every finished request
+    is appended to `path` as one JSON line, and running totals (span time, COM
+    calls per member, LLM tokens) are rewritten to `prom_path` in the Prometheus
+    text format, for the node_exporter textfile collector.
+    """
+
+    PREFIX = "cad_assistant"
+
+    def __init__(self, path=None, prom_path=None):
+        self.path = path
+        self.prom_path = prom_path
+        self.requests = 0
+        self.last = None
+        self._lock = threading.Lock()
+        # span name -> [count, seconds]
+        self._spans = defaultdict(lambda: [0, 0.0])
+        # COM member -> [calls, seconds]
+        self._com = defaultdict(lambda: [0, 0.0])
+        self._tokens = {'prompt': 0, 'eval': 0}
+        self._eval_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """Tracer configured by TRACING, TRACE_PATH and TRACE_PROMETHEUS_PATH; None when tracing is off."""
+        if os.getenv("TRACING", "1") == "0":
+            return None
+        return cls(path=os.getenv("TRACE_PATH", "traces.jsonl") or None,
+                   prom_path=os.getenv("TRACE_PROMETHEUS_PATH") or None)
+
+    @contextmanager
+    def request(self, name="request", **attrs):
+        """
+        Open the root span of a request. Work handed to other threads (the COM
+        executor) after this point is attached to it; call finish() once that
+        work is done.
+        """
+        root = Span(name, attrs)
+        token = _current.set(root)
+        try:
+            yield root
+        finally:
+            _current.reset(token)
+
+    def finish(self, root):
+        """Close a request, update the totals and export it; returns the summary line."""
+        root.finish()
+        with self._lock:
+            self.requests += 1
+            self.last = root
+            for s in root.walk():
+                entry = self._spans[s.name]
+                entry[0] += 1
+                entry[1] += s.seconds
+                for member, (count, spent) in s.com.items():
+                    self._com[member][0] += count
+                    self._com[member][1] += spent
+                if s.name == 'llm.chat':
+                    self._tokens['prompt'] += s.attrs.get('prompt_tokens') or 0
+                    self._tokens['eval'] += s.attrs.get('eval_tokens') or 0
+                    self._eval_seconds += s.attrs.get('eval_seconds') or 0.0
+            self._write_jsonl(root)
+            self._write_prometheus()
+        return self.format_summary(root)
+
+    def _write_jsonl(self, root):
+        if not self.path:
+            return
+        record = {'ts': round(time.time(), 3), **root.to_dict()}
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, separators=(',', ':'), default=str) + "\n")
+        except OSError as e:
+            print(f"[!] Could not write trace: {e}")
+
+    def prometheus_text(self):
+        p = self.PREFIX
+        lines = [
+            f"# HELP {p}_requests_total Requests traced.",
+            f"# TYPE {p}_requests_total counter",
+            f"{p}_requests_total {self.requests}",
+            f"# HELP {p}_span_seconds Time spent in each traced section.",
+            f"# TYPE {p}_span_seconds summary",
+        ]
+        for name, (count, seconds) in sorted(self._spans.items()):
+            lines.append(f'{p}_span_seconds_sum{{span="{_escape(name)}"}} {seconds:.6f}')
+            lines.append(f'{p}_span_seconds_count{{span="{_escape(name)}"}} {count}')
+        lines += [f"# HELP {p}_com_calls_total AutoCAD COM calls by member.", f"# TYPE {p}_com_calls_total counter"]
+        lines += [f'{p}_com_calls_total{{member="{_escape(m)}"}} {count}' for m, (count, _) in sorted(self._com.items())]
+        lines += [f"# HELP {p}_com_seconds_total Time spent in AutoCAD COM calls by member.",
+                  f"# TYPE {p}_com_seconds_total counter"]
+        lines += [f'{p}_com_seconds_total{{member="{_escape(m)}"}} {spent:.6f}' for m, (_, spent) in sorted(self._com.items())]
+        lines += [f"# HELP {p}_llm_tokens_total Tokens evaluated (prompt) and generated (eval) by Ollama.",
+                  f"# TYPE {p}_llm_tokens_total counter"]
+        lines += [f'{p}_llm_tokens_total{{kind="{kind}"}} {count}' for kind, count in self._tokens.items()]
+        lines += [f"# HELP {p}_llm_eval_seconds_total Time Ollama spent generating tokens.",
+                  f"# TYPE {p}_llm_eval_seconds_total counter",
+                  f"{p}_llm_eval_seconds_total {self._eval_seconds:.6f}"]
+        return "\n".join(lines) + "\n"
+
+    def _write_prometheus(self):
+        if not self.prom_path:
+            return
+        # Written next to the target and renamed, so the collector never reads half a file
+        tmp = f"{self.prom_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, self.prom_path)
+        except OSError as e:
+            print(f"[!] Could not write Prometheus metrics: {e}")
+
+    @staticmethod
+    def format_summary(root):
+        """One line: total time, then LLM, response parsing, CAD steps and COM calls."""
+        parts = [f"[*] Timing: {root.seconds:.2f}s"]
+        spans = list(root.walk())
+        chats = [s for s in spans if s.name == 'llm.chat']
+        if chats:
+            llm = sum(s.seconds for s in chats)
+            prompt_tokens = sum(s.attrs.get('prompt_tokens') or 0 for s in chats)
+            eval_tokens = sum(s.attrs.get('eval_tokens') or 0 for s in chats)
+            eval_seconds = sum(s.attrs.get('eval_seconds') or 0.0 for s in chats)
+            rate = f" @ {eval_tokens / eval_seconds:.1f} tok/s" if eval_seconds > 0 else ""
+            parts.append(f"LLM {llm:.2f}s ({prompt_tokens} prompt + {eval_tokens} generated tokens{rate})")
+        else:
+            source = next((s.attrs['source'] for s in spans if s.name == 'process_prompt' and 'source' in s.attrs), None)
+            if source:
+                parts.append(f"plan from {source.replace('_', ' ')}")
+        parse = sum(s.seconds for s in spans if s.name == 'llm.parse')
+        if parse:
+            parts.append(f"parse {parse * 1000:.1f}ms")
+        steps = [s for s in spans if s.name == 'step']
+        if steps:
+            parts.append(f"{len(steps)} steps {sum(s.seconds for s in steps):.2f}s")
+        calls, seconds = root.com_calls()
+        if calls:
+            parts.append(f"{calls} COM calls {seconds:.2f}s")
+        return " | ".join(parts)
@@ -0,0 +1,107 @@
+import math
+
+import pytest
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+
+
+def _client():
+    app = RecordingApplication()
+    cad = AutoCADClient()
+    cad.attach(app)
+    return cad, app
+
+
+def _recorded(app, key):
+    return sorted(tuple(round(v, 6) for v in e.geometry[key]) for e in app.ActiveDocument.ModelSpace.entities)
+
+
+def _headless(cad, key):
+    return sorted(tuple(round(v, 6) for v in cad.entity(i)[key]) for i in range(len(cad)))
+
+
+def test_rectangular_grid_is_two_com_calls():
+    circle = {'type': 'circle', 'center': [0, 0, 0], 'radius': 0.4}
+    cad, app = _client()
+    assert cad.rectangular_array(circle, 50, 50, 1.0, 2.0) == 2500
+    assert app.log.total == 2
+    assert app.log.counts['ArrayRectangular'] == 1
+
+    headless = HeadlessBackend()
+    assert headless.rectangular_array(circle, 50, 50, 1.0, 2.0) == 2500
+    assert _recorded(app, 'center') == _headless(headless, 'center')
+    assert max(_headless(headless, 'center')) == (98.0, 49.0, 0.0)
+
+
+def test_polar_array_matches_between_backends():
+    line = {'type': 'line', 'start': [1, 0], 'end': [2, 0]}
+    for fill in (360.0, 90.0, -120.0):
+        cad, app = _client()
+        assert cad.polar_array(line, [0, 0], 6, fill) == 6
+        assert app.log.total == 2
+        headless = HeadlessBackend()
+        assert headless.polar_array(line, [0, 0], 6, fill) == 6
+        assert _recorded(app, 'end') == _headless(headless, 'end')
+
+
+def test_polar_array_rejects_counts_below_one_on_both_backends():
+    line = {'type': 'line', 'start': [1, 0], 'end': [2, 0]}
+    cad, app = _client()
+    headless = HeadlessBackend()
+    for count in (0, -3):
+        for backend in (cad, headless):
+            with pytest.raises(ValueError, match="count must be at least 1"):
+                backend.polar_array(line, [0, 0], count)
+    assert len(app.ActiveDocument.ModelSpace.entities) == 0 and len(headless) == 0
+    assert cad.polar_array(line, [0, 0], 1) == headless.polar_array(line, [0, 0], 1) == 1
+
+
+def test_polar_array_rotates_arc_angles():
+    arc = {'type': 'arc', 'center': [5, 0], 'radius': 1, 'start_angle': 0, 'end_angle': 1}
+    cad = HeadlessBackend()
+    cad.polar_array(arc, [0, 0], 4)
+    second = cad.entity(1)
+    assert [round(v, 9) for v in second['center']] == [0.0, 5.0, 0.0]
+    assert round(second['start_angle'], 9) == round(3.141592653589793 / 2, 9)
+
+
+def test_polar_array_rotates_spline_tangents_like_the_shared_helper():
+    spline = {'type': 'spline', 'points': [[5, 0], [6, 1], [7, 0]], 'start_angle': 10, 'end_angle': -20}
+    cad = HeadlessBackend()
+    cad.polar_array(spline, [1, 1], 4, 180.0)
+    kind, args = cad._entity_args(spline)
+    for k in range(4):
+        points, start, end = cad._rotated(kind, args, [1, 1], math.radians(60.0 * k))
+        copy = cad.entity(k)
+        assert (copy['start_angle'], copy['end_angle']) == pytest.approx((start, end))
+        assert [tuple(p) for p in copy['points']] == pytest.approx(list(points))
+
+
+def test_path_array_places_reference_point_on_each_target():
+    circle = {'type': 'circle', 'center': [100, 100], 'radius': 1}
+    path = [[0, 0], [3, 4], [6, 8, 1]]
+    cad, app = _client()
+    assert cad.path_array(circle, path) == 3
+    headless = HeadlessBackend()
+    assert headless.path_array(circle, path) == 3
+    assert _recorded(app, 'center') == _headless(headless, 'center') == [(0, 0, 0), (3, 4, 0), (6, 8, 1)]
+
+
+def test_spline_path_array_copies_server_side():
+    spline = {'type': 'spline', 'points': [[0, 0], [1, 1], [2, 0], [3, 1]]}
+    cad, app = _client()
+    assert cad.path_array(spline, [[10, 0], [20, 0], [30, 0]]) == 3
+    assert app.log.counts['AddSpline'] == 1
+    assert app.log.counts['Copy'] == 2
+    firsts = sorted(e.geometry['points'][0] for e in app.ActiveDocument.ModelSpace.entities)
+    assert firsts == [(10.0, 0.0, 0.0), (20.0, 0.0, 0.0), (30.0, 0.0, 0.0)]
+
+
+def test_array_seed_is_created_after_queued_geometry():
+    cad, app = _client()
+    with cad.batch():
+        cad.add_line((0, 0), (1, 1))
+        cad.polar_array({'type': 'point', 'point': [1, 0]}, [0, 0], 3)
+    assert app.log.calls[:2] == ['AddLine', 'AddPoint']
@@ -0,0 +1,109 @@
+import math
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.recording_com import RecordingApplication
+
+
+def _client(latency=0.0):
+    app = RecordingApplication(latency=latency)
+    cad = AutoCADClient()
+    cad.attach(app)
+    return cad, app
+
+
+def _line_set(model_space):
+    """Order-independent set of rounded line endpoints."""
+    return {
+        tuple(round(v, 6) for v in e.geometry['start'] + e.geometry['end'])
+        for e in model_space.entities if e.kind == 'line'
+    }
+
+
+def test_radials_batched_match_unbatched_geometry():
+    direct, direct_app = _client()
+    for angle in range(360):
+        rad = math.radians(90 - angle)
+        direct.add_line((5, 5, 0), (5 + 10 * math.cos(rad), 5 + 10 * math.sin(rad), 0))
+    direct.add_circle((5, 5, 0), 10)
+
+    batched, batched_app = _client()
+    assert batched.draw_radials((5, 5, 0), 10, 1.0)
+
+    assert direct_app.log.total == 361
+    assert batched_app.log.total <= 5
+    assert batched_app.log.counts['ArrayPolar'] == 1
+    assert len(batched_app.ActiveDocument.ModelSpace.entities) == 361
+    assert _line_set(batched_app.ActiveDocument.ModelSpace) == _line_set(direct_app.ActiveDocument.ModelSpace)
+
+
+def test_partial_fan_uses_signed_fill_angle():
+    cad, app = _client()
+    assert cad.draw_radials((0, 0), 4, 7.0)
+    model_space = app.ActiveDocument.ModelSpace
+    # 52 rays at 7° clockwise steps do not close the circle, so the fill is partial
+    assert len([e for e in model_space.entities if e.kind == 'line']) == 52
+    ends = {(round(e.geometry['end'][0], 6), round(e.geometry['end'][1], 6)) for e in model_space.entities if e.kind == 'line'}
+    expected = {
+        (round(4 * math.cos(math.radians(90 - 7 * k)), 6), round(4 * math.sin(math.radians(90 - 7 * k)), 6))
+        for k in range(52)
+    }
+    assert ends == expected
+
+
+def _queue_with_duplicate(cad):
+    with cad.batch():
+        cad.add_line((0, 0), (1, 0))
+        cad.add_line((0, 0), (1, 0))
+        cad.add_circle((0, 0), 2)
+        cad.add_point((3, 3))
+
+
+def test_flush_keeps_duplicates_and_reports_throughput():
+    cad, app = _client()
+    _queue_with_duplicate(cad)
+
+    stats = cad.last_flush
+    assert stats['queued'] == 4
+    assert stats['duplicates'] == 0
+    assert stats['entities'] == 4
+    assert stats['entities_per_sec'] > 0
+    assert app.ActiveDocument.undo_depth == 0
+    # Same entities as drawing them one at a time
+    assert app.log.counts['AddLine'] == 2
+    assert len(app.ActiveDocument.ModelSpace.entities) == 4
+
+
+def test_flush_drops_duplicates_when_asked(monkeypatch):
+    monkeypatch.setenv("AUTOCAD_DROP_DUPLICATES", "1")
+    cad, app = _client()
+    _queue_with_duplicate(cad)
+    assert (cad.last_flush['duplicates'], cad.last_flush['entities']) == (1, 3)
+    assert app.log.counts['AddLine'] == 1
+
+
+def test_cloud_radials_share_one_batch():
+    cad, app = _client()
+    assert cad.cloud_radials((0, 0, 0), [1, 2, 3, 4], 90)
+    assert app.log.counts['AddLine'] == 4
+    assert cad.last_flush['entities'] == 4
+
+
+def test_send_command_flushes_pending_geometry():
+    cad, app = _client()
+    with cad.batch():
+        cad.add_line((0, 0), (5, 5))
+        cad.trim()
+        assert app.log.calls.index('AddLine') < app.log.calls.index('SendCommand')
+
+
+def test_batching_cuts_round_trips_under_com_latency():
+    cad, app = _client(latency=0.0005)
+    cad.begin_batch()
+    for angle in range(0, 360, 2):
+        rad = math.radians(angle)
+        cad.add_line((0, 0, 0), (math.cos(rad), math.sin(rad), 0))
+    stats = cad.end_batch()
+
+    assert stats['entities'] == 180
+    assert stats['com_calls'] == app.log.total == 4
+    assert len(app.ActiveDocument.ModelSpace.entities) == 180
@@ -0,0 +1,64 @@
+import json
+import re
+import time
+
+from src.cad.headless_backend import CIRCLE, HeadlessBackend
+from src.llm.llm_manager import LLMManager
+from src.llm.stub_ollama import StubOllamaServer
+from src.plan.batch_runner import BatchRunner, load_prompts
+from src.plan.dispatcher import PlanDispatcher
+
+
+def _reply(body):
+    prompt = body['messages'][-1]['content']
+    n = int(re.search(r"\d+", prompt).group())
+    # Later prompts answer faster, so replies arrive out of submission order
+    time.sleep(0.02 * (8 - n))
+    return {'role': 'assistant', 'content': '', 'tool_calls': [
+        {'function': {'name': 'draw_circle', 'arguments': {'center': [0, 0, 0], 'radius': n}}}
+    ]}
+
+
+def _runner(monkeypatch, server, cad, workers):
+    monkeypatch.setenv("LLM_API_URL", server.url)
+    monkeypatch.setenv("PLAN_CACHE", "0")
+    monkeypatch.setenv("FAST_PATH", "0")
+    monkeypatch.setenv("LLM_SESSION", "0")
+    return BatchRunner(LLMManager, PlanDispatcher(cad).run_plan, workers=workers)
+
+
+def _prompts(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    lines = [json.dumps({'id': f"p{n}", 'prompt': f"sketch number {n}"}) for n in range(1, 8)]
+    path.write_text("\n".join(lines + ['"sketch number 0"', '{"id": "empty"}', "not json"]) + "\n")
+    return load_prompts(str(path))
+
+
+def test_plans_are_drawn_in_submission_order(monkeypatch, tmp_path):
+    entries = _prompts(tmp_path)
+    cad = HeadlessBackend()
+    with StubOllamaServer(reply=_reply, parallel=8) as server:
+        runner = _runner(monkeypatch, server, cad, workers=4)
+        records = runner.run(entries, str(tmp_path / "report.jsonl"))
+
+    radii = [cad.coords[cad.offsets[i] + 3] for i in range(len(cad)) if cad.types[i] == CIRCLE]
+    assert radii == [1, 2, 3, 4, 5, 6, 7, 0]
+    assert [r['id'] for r in records] == ['p1', 'p2', 'p3', 'p4', 'p5', 'p6', 'p7', 8, 'empty', 10]
+    assert [r['status'] for r in records] == ['ok'] * 8 + ['error', 'error']
+    assert all(r['source'] == 'llm' and r['steps'] == 1 for r in records[:8])
+
+    report = [json.loads(line) for line in (tmp_path / "report.jsonl").read_text().splitlines()]
+    assert report == records
+    assert runner.summary['statuses'] == {'ok': 8, 'error': 2}
+    assert "prompts/min" in runner.format_report()
+
+
+def test_throughput_scales_with_workers(monkeypatch, tmp_path):
+    entries = [e for e in _prompts(tmp_path) if not e.get('error')] * 2
+    seconds = {}
+    with StubOllamaServer(latency=0.1, parallel=4) as server:
+        for workers in (1, 4):
+            runner = _runner(monkeypatch, server, HeadlessBackend(), workers)
+            runner.run(entries)
+            seconds[workers] = runner.summary['seconds']
+    assert seconds[4] < seconds[1] / 2
@@ -0,0 +1,116 @@
+import math
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+from src.plan.block_instancer import BlockInstancer
+
+
+def _call(name, **arguments):
+    return {'function': {'name': name, 'arguments': arguments}}
+
+
+def _names(plan):
+    return [call['function']['name'] for call in plan]
+
+
+def _explode(cad):
+    """World-space points of every block reference, for comparison with the flat drawing."""
+    points = []
+    for i in range(len(cad)):
+        ref = cad.entity(i)
+        ix, iy, iz = ref['insertion_point']
+        cos_r, sin_r = math.cos(ref['rotation']), math.sin(ref['rotation'])
+        for kind, args in cad.blocks[ref['block'].lower()]:
+            for x, y, z in BlockInstancer._points([(kind, args)]):
+                points.append((round(ix + x * cos_r - y * sin_r, 6), round(iy + x * sin_r + y * cos_r, 6), round(iz + z, 6)))
+    return sorted(points)
+
+
+def test_identical_radials_become_one_block():
+    plan = [
+        _call('draw_radials', center=[0, 0, 0], radius=5, angle_increment=15),
+        _call('draw_circle', center=[50, 50, 0], radius=1),
+        _call('draw_radials', center=[20, 0, 0], radius=5, angle_increment=15),
+        _call('draw_radials', center=[40, 10, 2], radius=5, angle_increment=15),
+    ]
+    instancer = BlockInstancer()
+    optimized = instancer.optimize(plan)
+
+    assert _names(optimized) == ['define_block', 'insert_block', 'draw_circle', 'insert_block', 'insert_block']
+    report = instancer.last_report
+    assert report['entities_before'] == 3 * 25
+    assert report['entities_after'] == 3
+    assert report['block_entities'] == 25
+    assert report['dxf_bytes_after'] < report['dxf_bytes_before'] / 2
+
+    flat = HeadlessBackend()
+    for call in plan[:1] + plan[2:]:
+        flat.draw_radials(**call['function']['arguments'])
+    blocks = HeadlessBackend()
+    for call in optimized:
+        if call['function']['name'] != 'draw_circle':
+            getattr(blocks, call['function']['name'])(**call['function']['arguments'])
+    flat_points = sorted(
+        tuple(round(v, 6) for v in flat.entity(i)[key])
+        for i in range(len(flat)) for key in ('center', 'start', 'end') if key in flat.entity(i)
+    )
+    assert _explode(blocks) == flat_points
+
+
+def test_rotated_splines_share_a_block():
+    shape = [(0, 0), (1, 2), (3, 2), (4, 0)]
+    angle = math.radians(40)
+    rotated = [(10 + x * math.cos(angle) - y * math.sin(angle), 5 + x * math.sin(angle) + y * math.cos(angle)) for x, y in shape]
+    plan = [
+        _call('draw_spline', points=shape, start_angle=15, end_angle=15),
+        _call('draw_spline', points=rotated, start_angle=55, end_angle=55),
+    ]
+    instancer = BlockInstancer()
+    optimized = instancer.optimize(plan)
+    assert _names(optimized) == ['define_block', 'insert_block', 'insert_block']
+    second = optimized[2]['function']['arguments']
+    assert second['insertion_point'] == [10.0, 5.0, 0.0]
+    assert math.isclose(second['rotation'] - optimized[1]['function']['arguments']['rotation'], 40.0)
+
+
+def test_unique_or_trivial_geometry_is_left_alone():
+    plan = [
+        _call('draw_circle', center=[0, 0], radius=1),
+        _call('draw_circle', center=[5, 0], radius=1),
+        _call('draw_radials', center=[0, 0], radius=5, angle_increment=30),
+        _call('list_layers'),
+    ]
+    instancer = BlockInstancer()
+    assert instancer.optimize(plan) is plan
+    assert instancer.last_report is None
+    assert BlockInstancer(enabled=False).optimize(plan * 2) == plan * 2
+
+
+def test_known_blocks_are_reused_in_later_plans():
+    instancer = BlockInstancer()
+    radials = lambda x: _call('draw_cloud_radials', center=[x, 0], radii=[1, 2, 3], angle_increment=30)
+    first = instancer.optimize([radials(0), radials(10)])
+    later = instancer.optimize([radials(30)])
+    assert _names(later) == ['define_block', 'insert_block']
+    assert later[0]['function']['arguments']['name'] == first[0]['function']['arguments']['name']
+
+
+def test_autocad_client_defines_block_once_and_inserts_references():
+    app = RecordingApplication()
+    cad = AutoCADClient()
+    cad.attach(app)
+    plan = BlockInstancer().optimize([
+        _call('draw_radials', center=[x, 0, 0], radius=5, angle_increment=10) for x in (0, 20, 40)
+    ])
+    with cad.batch():
+        for call in plan:
+            getattr(cad, call['function']['name'])(**call['function']['arguments'])
+        cad.define_block(plan[0]['function']['arguments']['name'], [])
+
+    assert app.log.counts['Blocks.Add'] == 1
+    assert app.log.counts['InsertBlock'] == 3
+    block = app.ActiveDocument.Blocks.Item(plan[0]['function']['arguments']['name'])
+    assert len(block.entities) == 37
+    assert app.log.counts['ArrayPolar'] == 1
+    assert len(app.ActiveDocument.ModelSpace.entities) == 3
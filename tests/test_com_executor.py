@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.com_executor import ComExecutor
+from src.cad.recording_com import RecordingApplication
+from src.llm.llm_manager import ChatSession
+
+
+def _executor(latency=0.0, max_queue=64):
+    app = RecordingApplication(latency=latency)
+
+    def factory():
+        cad = AutoCADClient()
+        cad.attach(app)
+        return cad
+    return ComExecutor(factory, max_queue=max_queue), app
+
+
+def test_backend_lives_on_one_worker_thread():
+    executor, app = _executor()
+    cad = executor.proxy
+    try:
+        assert cad.name == "autocad" and cad.connected
+        cad.add_circle((0, 0), 1)
+        with cad.batch():
+            cad.add_line((0, 0), (1, 0))
+            cad.add_line((1, 0), (1, 1))
+        assert len(app.ActiveDocument.ModelSpace.entities) == 3
+
+        threads = {executor.call(threading.get_ident) for _ in range(3)}
+        assert threads == {executor._thread.ident} != {threading.get_ident()}
+    finally:
+        executor.shutdown()
+
+
+def test_method_calls_are_one_job_each():
+    executor, app = _executor()
+    cad = executor.proxy
+    try:
+        for i in range(5):
+            cad.add_circle((i, 0), 1)
+        assert executor.submitted == 5
+        assert executor.stats()['ops'].keys() == {'add_circle'}
+        # Plain attributes are still read on the worker, one job per read
+        assert cad.name == "autocad" and cad.last_flush is None
+        assert executor.submitted == 7
+    finally:
+        executor.shutdown()
+
+
+def test_plan_runs_while_caller_continues():
+    executor, app = _executor(latency=0.005)
+    cad = executor.proxy
+
+    def plan():
+        # On the worker the proxy calls the backend directly
+        for i in range(20):
+            cad.add_point((i, 0))
+        return "done"
+    try:
+        started = time.perf_counter()
+        future = executor.submit(plan)
+        assert time.perf_counter() - started < 0.05
+        assert not future.done()
+        assert future.result(timeout=5) == "done"
+        assert len(app.ActiveDocument.ModelSpace.entities) == 20
+    finally:
+        executor.shutdown()
+
+
+def test_bounded_queue_applies_backpressure():
+    executor, _ = _executor(max_queue=2)
+    release = threading.Event()
+    try:
+        blocker = executor.submit(release.wait)
+        while executor.depth or not blocker.running():
+            time.sleep(0.001)
+        executor.submit('add_point', (0, 0))
+        executor.submit('add_point', (1, 0))
+        with pytest.raises(queue.Full):
+            executor.submit('add_point', (2, 0), timeout=0.05)
+        assert executor.depth == 2
+        release.set()
+    finally:
+        release.set()
+        executor.shutdown()
+    stats = executor.stats()
+    assert stats['submitted'] == 3 and stats['max_depth'] == 2
+    assert stats['ops']['add_point']['calls'] == 2
+    assert stats['wait_p95'] > 0
+    assert "max queue depth 2/2" in executor.format_report()
+
+
+def test_errors_come_back_through_the_future():
+    executor, _ = _executor()
+    try:
+        with pytest.raises(ValueError):
+            executor.submit('_emit', 'hexagon', (), None).result()
+        # The worker keeps going after a failed job
+        assert executor.proxy.add_circle((0, 0), 1) is not None
+    finally:
+        executor.shutdown()
+
+    def broken():
+        raise RuntimeError("no CAD")
+    with pytest.raises(RuntimeError):
+        ComExecutor(broken)
+
+
+def test_late_results_go_to_their_own_turn():
+    session = ChatSession()
+    session.add_turn("draw a circle", [])
+    first = session.turns[-1]
+    session.add_turn("now a square", [])
+    session.record_results([('draw_circle', 'done')], first)
+    assert first['messages'][-1] == {'role': 'tool', 'tool_name': 'draw_circle', 'content': 'done'}
+    assert session.turns[-1]['messages'][-1]['role'] == 'assistant'
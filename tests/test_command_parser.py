@@ -0,0 +1,85 @@
+import math
+
+import pytest
+
+from src.llm.command_parser import CommandParser
+from src.llm.llm_manager import LLMManager
+
+
+def _call(name, **arguments):
+    return {'function': {'name': name, 'arguments': arguments}}
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("circle at 5,5 radius 2", _call('draw_circle', center=[5.0, 5.0, 0.0], radius=2.0)),
+    ("Draw a circle at (5, 5, 1) with radius 2cm.", _call('draw_circle', center=[5.0, 5.0, 1.0], radius=20.0)),
+    ("circle radius 3 at -1.5,.5", _call('draw_circle', center=[-1.5, 0.5, 0.0], radius=3.0)),
+    ("circle at 0,0 diameter 1 m", _call('draw_circle', center=[0.0, 0.0, 0.0], radius=500.0)),
+    ("line from 0,0 to 1 in,2", _call('draw_line', start=[0.0, 0.0, 0.0], end=[25.4, 2.0, 0.0])),
+    ("point at 3,4", _call('draw_point', point=[3.0, 4.0, 0.0])),
+    ("arc at 0,0 radius 5 from 0 to 90 degrees",
+     _call('draw_arc', center=[0.0, 0.0, 0.0], radius=5.0, start_angle=0.0, end_angle=math.pi / 2)),
+    ("polyline 0,0 10,0 10,10 closed",
+     _call('draw_polyline', points=[[0.0, 0.0, 0.0], [10.0, 0.0, 0.0], [10.0, 10.0, 0.0]], closed=True)),
+    ("polyline (0,0), (10,0), (10,10)",
+     _call('draw_polyline', points=[[0.0, 0.0, 0.0], [10.0, 0.0, 0.0], [10.0, 10.0, 0.0]], closed=False)),
+    ("turn off layer DIM", _call('set_layer_status', layer_name='DIM', is_on=False)),
+    ("layer 'A-WALL' on", _call('set_layer_status', layer_name='A-WALL', is_on=True)),
+    ("create layer Walls color red", _call('create_layer', layer_name='Walls', color=1)),
+    ("new layer Doors", _call('create_layer', layer_name='Doors')),
+    ("please add a new layer called Grid 8", _call('create_layer', layer_name='Grid', color=8)),
+    ("rename layer A to B", _call('rename_layer', old_name='A', new_name='B')),
+    ("set layer DIM color to 3", _call('change_layer_color', layer_name='DIM', color=3)),
+    ("list layers", _call('list_layers')),
+    ("show frozen layers page 2", _call('list_layers', state='frozen', page=2)),
+    ("how many circles are there on layer WALLS?", _call('count_entities', entity_type='circle', layer='WALLS')),
+    ("count block references", _call('count_entities', entity_type='insert')),
+    ("select lines inside the window from 0,0 to 10,5",
+     _call('select_entities', entity_type='line', corner1=[0.0, 0.0, 0.0], corner2=[10.0, 5.0, 0.0], crossing=False)),
+])
+def test_simple_commands(prompt, expected):
+    assert CommandParser().parse(prompt) == [expected]
+
+
+@pytest.mark.parametrize("prompt", [
+    "draw a circle",                           # missing parameters: the LLM asks for them
+    "draw a house",
+    "circle at 5,5 radius 2 and a tree",       # one part not understood -> whole prompt to the LLM
+    "create layer X color 900",
+    "circle at 0,0 radius 0",
+    "what layers are locked?",
+    "polyline 0,0, 10,0, 10,10",               # 2D or 3D points? commas between points are ambiguous
+    "polyline 0,0,10,0,10,10",
+    "turn off layer DIM and layer TEXT",       # the second clause has no verb of its own
+    "layer DIM",
+])
+def test_uncertain_prompts_fall_back(prompt):
+    assert CommandParser().parse(prompt) is None
+
+
+def test_units_need_known_drawing_units():
+    assert CommandParser(units='m').parse("circle at 0,0 radius 50cm")[0]['function']['arguments']['radius'] == 0.5
+    assert CommandParser(units=None).parse("circle at 0,0 radius 50cm") is None
+    assert CommandParser(units=None).parse("circle at 0,0 radius 50") is not None
+
+
+def test_compound_prompt():
+    calls = CommandParser().parse("circle at 5,5 radius 2 and then turn off layer DIM; list layers")
+    assert [c['function']['name'] for c in calls] == ['draw_circle', 'set_layer_status', 'list_layers']
+
+
+class FailingClient:
+    def chat(self, *args, **kwargs):
+        raise AssertionError("the LLM should not be called")
+
+
+def test_manager_bypasses_llm(monkeypatch):
+    monkeypatch.setenv("PLAN_CACHE", "0")
+    llm = LLMManager()
+    llm.client = FailingClient()
+    tool_calls, content = llm.process_prompt("circle at 5,5 radius 2")
+    assert llm.last_fast_path and content == ""
+    assert tool_calls == [_call('draw_circle', center=[5.0, 5.0, 0.0], radius=2.0)]
+    assert list(llm.stream_prompt("turn off layer DIM")) == [_call('set_layer_status', layer_name='DIM', is_on=False)]
+    assert llm.fast_path_stats['fast_prompts'] == 2
+    assert "2/2 prompts" in llm.format_fast_path_report()
@@ -0,0 +1,94 @@
+import time
+
+from src.cad.autocad_client import PROG_IDS, AutoCADClient
+from src.cad.recording_com import FakeComProvider, RecordingApplication
+
+
+def _client(provider, tmp_path, **settings):
+    cad = AutoCADClient(get_active_object=provider, prog_id_file=str(tmp_path / "progid"))
+    for name, value in settings.items():
+        setattr(cad, name, value)
+    return cad
+
+
+def test_probes_in_parallel_and_remembers_the_prog_id(tmp_path):
+    app = RecordingApplication()
+    provider = FakeComProvider({"AutoCAD.Application.20": app}, latency=0.05)
+    cad = _client(provider, tmp_path)
+
+    started = time.perf_counter()
+    assert cad.connect()
+    # Ten sequential lookups would take 0.5 s
+    assert time.perf_counter() - started < 0.3
+    assert cad.model_space is app.ActiveDocument.ModelSpace
+    assert cad.connection_stats['prog_id'] == "AutoCAD.Application.20"
+    assert cad.connection_stats['probed'] == len(PROG_IDS)
+    assert (tmp_path / "progid").read_text() == "AutoCAD.Application.20"
+
+    # Next start: the remembered ProgID answers and nothing else is probed
+    provider.calls.clear()
+    again = _client(provider, tmp_path)
+    assert again.connect()
+    assert provider.calls == ["AutoCAD.Application.20"]
+    assert again.connection_stats['cached']
+
+
+def test_stale_prog_id_falls_back_to_probing(tmp_path):
+    (tmp_path / "progid").write_text("AutoCAD.Application.21")
+    provider = FakeComProvider({"AutoCAD.Application.25": RecordingApplication()})
+    cad = _client(provider, tmp_path)
+    assert cad.connect()
+    assert provider.calls[0] == "AutoCAD.Application.21"
+    assert provider.calls.count("AutoCAD.Application.21") == 1
+    assert not cad.connection_stats['cached']
+    assert (tmp_path / "progid").read_text() == "AutoCAD.Application.25"
+
+
+def test_no_running_instance(tmp_path):
+    cad = _client(FakeComProvider(), tmp_path)
+    assert not cad.connect()
+    assert not cad.connected
+    assert cad.connection_stats['prog_id'] is None
+
+
+def test_reconnects_when_autocad_goes_away(tmp_path):
+    first = RecordingApplication()
+    provider = FakeComProvider({"AutoCAD.Application": first})
+    cad = _client(provider, tmp_path, reconnect_delay=0.01)
+    assert cad.connect()
+
+    # AutoCAD restarts: the old objects are dead, a new instance is registered
+    first.Quit()
+    second = RecordingApplication()
+    provider.running["AutoCAD.Application"] = second
+    with cad.batch():
+        cad.add_line((0, 0), (1, 0))
+        cad.add_circle((0, 0), 2)
+    assert len(second.ActiveDocument.ModelSpace.entities) == 2
+    assert cad.reconnects == 1
+
+    # A direct call that fails with a disconnect error is recoverable
+    second.Quit()
+    provider.running["AutoCAD.Application"] = RecordingApplication()
+    try:
+        cad.add_point((1, 1))
+        raise AssertionError("expected a COM error")
+    except Exception as e:
+        assert cad.recover(e)
+    assert cad.add_point((1, 1)) is not None
+    assert cad.connection_stats['reconnects'] == 2
+
+
+def test_reconnect_gives_up_after_backoff(tmp_path):
+    app = RecordingApplication()
+    provider = FakeComProvider({"AutoCAD.Application": app})
+    cad = _client(provider, tmp_path, reconnect_attempts=3, reconnect_delay=0.02)
+    assert cad.connect()
+    app.Quit()
+    provider.running.clear()
+
+    started = time.perf_counter()
+    assert not cad.ensure_connected()
+    # Waits 0.02 s, then 0.04 s between the three attempts
+    assert time.perf_counter() - started >= 0.06
+    assert not cad.connected
@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+
+from benchmarks.bench_patterns import legacy_cloud_radial_segments, legacy_radial_segments
+from src.cad import geometry
+from src.cad.headless_backend import HeadlessBackend
+
+
+def test_radial_segments_match_legacy_loop():
+    for inc in (1.0, 7.0, 15.0, 45.0, 100.0):
+        fast = geometry.radial_segments((2, 3, 1), 5, inc)
+        slow = np.array(legacy_radial_segments((2, 3, 1), 5, inc))
+        assert fast.shape == slow.shape
+        assert np.allclose(fast, slow, atol=1e-9)
+        assert fast.flags['C_CONTIGUOUS']
+
+
+def test_cloud_radial_segments_match_legacy_loop():
+    radii = [1, 2.5, 4, 0.5]
+    fast = geometry.cloud_radial_segments((0, 0), radii, 30)
+    assert np.allclose(fast, legacy_cloud_radial_segments((0, 0), radii, 30), atol=1e-12)
+
+
+def test_polar_points_full_and_partial_fill():
+    full = geometry.polar_points((0, 0), 1, 4, start_angle=0)
+    assert np.allclose(full[:, :2], [[1, 0], [0, 1], [-1, 0], [0, -1]], atol=1e-12)
+    half = geometry.polar_points((0, 0), 1, 3, start_angle=0, fill_angle=180)
+    assert np.allclose(half[:, :2], [[1, 0], [0, 1], [-1, 0]], atol=1e-12)
+
+
+def test_rectangular_points_row_major():
+    pts = geometry.rectangular_points((1, 1), rows=2, columns=3, row_spacing=10, column_spacing=2)
+    assert pts.tolist() == [[1, 1, 0], [3, 1, 0], [5, 1, 0], [1, 11, 0], [3, 11, 0], [5, 11, 0]]
+
+
+def test_concentric_rings_through_backend():
+    cad = HeadlessBackend()
+    assert cad.draw_concentric_rings((0, 0), 1, 0.5, 4)
+    assert [cad.entity(i)['radius'] for i in range(len(cad))] == [1.0, 1.5, 2.0, 2.5]
+
+
+def test_tens_of_thousands_of_rays_in_milliseconds():
+    started = time.perf_counter()
+    segments = geometry.radial_segments((0, 0, 0), 10, 0.005)
+    cad = HeadlessBackend()
+    cad.add_lines(segments)
+    elapsed = time.perf_counter() - started
+    assert len(cad) == geometry.radial_count(0.005) == 71980
+    assert cad.entity(len(cad) - 1)['start'] == (0.0, 0.0, 0.0)
+    assert elapsed < 0.25
@@ -0,0 +1,89 @@
+import io
+import math
+
+import pytest
+
+from src.cad.backend import create_backend
+from src.cad.headless_backend import HeadlessBackend
+
+
+def _dxf_entities(text):
+    """Return the entity type names found in the ENTITIES section of a DXF string."""
+    lines = text.split("\n")
+    start = lines.index("ENTITIES")
+    end = lines.index("ENDSEC", start)
+    return [lines[i + 1] for i in range(start + 1, end - 1, 2) if lines[i] == "0"]
+
+
+def test_create_backend_from_name():
+    assert isinstance(create_backend("headless"), HeadlessBackend)
+
+
+def test_primitives_round_trip_through_arrays():
+    cad = HeadlessBackend()
+    line = cad.add_line((0, 0), (3, 4, 5))
+    circle = cad.add_circle((1, 1, 0), 2.5)
+    arc = cad.add_arc((0, 0, 0), 1, 0, math.pi)
+    spline = cad.add_spline([(0, 0), (1, 2), (3, 1)], 10, 20)
+
+    assert len(cad) == 4
+    assert cad.entity(line)['end'] == (3.0, 4.0, 5.0)
+    assert cad.entity(circle)['radius'] == 2.5
+    assert cad.entity(arc)['end_angle'] == math.pi
+    assert cad.entity(spline)['points'] == [(0.0, 0.0, 0.0), (1.0, 2.0, 0.0), (3.0, 1.0, 0.0)]
+    assert cad.entity(spline)['start_angle'] == 10.0
+    assert cad.memory_bytes() < 4 * 64 + 8 * (6 + 4 + 6 + 11)
+
+
+def test_radials_use_shared_backend_logic():
+    cad = HeadlessBackend()
+    assert cad.draw_radials((0, 0, 0), 10, 30)
+    counts = cad.count_by_type()
+    assert (counts['line'], counts['circle'], sum(counts.values())) == (12, 1, 13)
+    top = cad.entity(1)
+    assert math.isclose(top['end'][1], 10.0)
+
+
+def test_unknown_block_is_a_value_error():
+    cad = HeadlessBackend()
+    cad.define_block("Bolt", [{'type': 'circle', 'center': (0, 0, 0), 'radius': 1}])
+    assert cad.entity(cad.insert_block("BOLT", (5, 5)))['type'] == 'insert'
+    with pytest.raises(ValueError, match="Block 'Nut' is not defined"):
+        cad.insert_block("Nut", (0, 0))
+    assert len(cad) == 1
+
+
+def test_layers_are_case_insensitive_like_autocad():
+    cad = HeadlessBackend()
+    cad.create_layer("Walls", 1)
+    assert cad.set_layer_status("WALLS", False)
+    assert cad.rename_layer("walls", "Muros")
+    assert cad.change_layer_color("muros", 3)
+    assert not cad.set_layer_status("Walls", True)
+    assert cad.get_layers_info()[1] == {'name': 'Muros', 'is_on': False, 'is_frozen': False, 'is_locked': False, 'color': 3}
+
+
+def test_dxf_export_contains_every_entity():
+    cad = HeadlessBackend()
+    cad.create_layer("Axes", 5)
+    cad.set_current_layer("Axes")
+    cad.add_line((0, 0), (1, 1))
+    cad.add_circle((0, 0), 1)
+    cad.add_spline([(0, 0), (1, 1), (2, 0)])
+    cad.trim()
+
+    out = io.StringIO()
+    cad.write_dxf(out)
+    text = out.getvalue()
+    assert _dxf_entities(text) == ['LINE', 'CIRCLE', 'POLYLINE', 'VERTEX', 'VERTEX', 'VERTEX', 'SEQEND']
+    assert "8\nAxes\n" in text
+    assert text.endswith("0\nEOF\n")
+    assert cad.commands == ["_TRIM"]
+
+
+def test_bulk_generation_scales_to_many_entities():
+    cad = HeadlessBackend()
+    for i in range(20000):
+        cad.add_line((i, 0), (i, 1))
+    assert len(cad) == 20000
+    assert cad.memory_bytes() == 20000 * (1 + 4 + 8 + 6 * 8)
@@ -0,0 +1,89 @@
+from src.cad.autocad_client import AutoCADClient
+from src.cad.recording_com import RecordingApplication, RecordingDocument
+
+
+def _client(layers=0):
+    app = RecordingApplication()
+    for i in range(layers):
+        app.ActiveDocument.Layers.Add(f"STD-{i:04d}")
+    app.log.reset()
+    cad = AutoCADClient()
+    cad.attach(app)
+    return app, cad
+
+
+def test_layer_table_is_read_once():
+    app, cad = _client(layers=2000)
+    first = cad.get_layers_info()
+    assert len(first) == 2001
+    # One enumeration plus five property reads per layer
+    assert app.log.counts['Layers._NewEnum'] == 1
+    assert app.log.total == 1 + 5 * 2001
+
+    app.log.reset()
+    assert cad.get_layers_info() == first
+    assert cad.set_layer_status("std-1999", False)
+    assert cad.change_layer_color("STD-0001", 3)
+    assert app.log.counts['Layers.Item'] == 0
+    assert app.log.total == 2
+
+
+def test_mutations_keep_cache_coherent():
+    app, cad = _client(layers=3)
+    cad.get_layers_info()
+    cad.create_layer("Walls", 1)
+    cad.rename_layer("STD-0000", "Doors")
+    cad.change_layer_color("Doors", 5)
+    cad.set_layer_status("Walls", False)
+
+    cached = {layer['name']: layer for layer in cad.get_layers_info()}
+    cad.invalidate_layers()
+    fresh = {layer['name']: layer for layer in cad.get_layers_info()}
+    assert cached == fresh
+    assert fresh['Doors']['color'] == 5
+    assert fresh['Walls'] == {'name': 'Walls', 'is_on': False, 'is_frozen': False, 'is_locked': False, 'color': 1}
+    assert 'STD-0000' not in fresh
+
+
+def test_document_switch_invalidates_cache():
+    app, cad = _client(layers=5)
+    assert len(cad.get_layers_info()) == 6
+    app.ActiveDocument = RecordingDocument(app.log)
+    assert [layer['name'] for layer in cad.get_layers_info()] == ["0"]
+    assert cad.model_space is app.ActiveDocument.ModelSpace
+
+
+def test_delta_refresh_reads_only_new_layers():
+    app, cad = _client(layers=50)
+    cad.get_layers_info()
+    # Layers added from the AutoCAD UI, behind the client's back
+    app.ActiveDocument.Layers.Add("NEW-A")
+    app.ActiveDocument.Layers.Add("NEW-B")
+    app.log.reset()
+    assert cad.refresh_layers(full=False) == 53
+    assert app.log.counts['Layers.Item'] == 2
+    assert app.log.counts['Layers._NewEnum'] == 0
+    assert {"NEW-A", "NEW-B"} <= {layer['name'] for layer in cad.get_layers_info()}
+
+
+def test_unknown_layer_is_looked_up_and_missing_layer_fails():
+    app, cad = _client()
+    cad.get_layers_info()
+    app.ActiveDocument.Layers.Add("Outside")
+    assert cad.set_layer_status("outside", False)
+    assert not cad.set_layer_status("Nope", False)
+
+
+def test_creating_an_existing_uncached_layer_keeps_the_delta_refresh_in_step():
+    app, cad = _client(layers=3)
+    cad.get_layers_info()
+    # Renamed in the AutoCAD UI: already in the document, not under that name in the cache
+    app.ActiveDocument.Layers.Item("STD-0000").Name = "Outside"
+    app.ActiveDocument.Layers.Item("Outside").LayerOn = False
+    cad.create_layer("Outside", 2)
+    cad.create_layer("Walls", 1)
+    app.ActiveDocument.Layers.Add("NEW-A")
+    assert cad.refresh_layers(full=False) == 7
+    layers = {layer['name']: layer for layer in cad.get_layers_info()}
+    assert "NEW-A" in layers and layers["Walls"]["color"] == 1
+    assert layers["Outside"] == {'name': 'Outside', 'is_on': False, 'is_frozen': False, 'is_locked': False, 'color': 2}
@@ -0,0 +1,114 @@
+import json
+import threading
+
+import pytest
+
+from src.cad.headless_backend import HeadlessBackend
+from src.llm.llm_manager import LLMManager
+from src.llm.stub_ollama import StubOllamaServer
+from src.plan.dispatcher import PlanDispatcher
+from src.plan.layer_report import LayerReport, LayerReporter, estimate_tokens, layer_prefix
+
+
+def _layers(count):
+    layers = [{'name': "0", 'is_on': True, 'is_frozen': False, 'is_locked': False, 'color': 7}]
+    for i in range(count):
+        layers.append({'name': f"{'AE'[i % 2]}-{('WALL', 'DOOR', 'GLAZ')[i % 3]}-{i:04d}", 'is_on': i % 10 != 0,
+                       'is_frozen': i % 25 == 0, 'is_locked': i % 40 == 0, 'color': i % 3 + 1})
+    return layers
+
+
+def _backend(count):
+    cad = HeadlessBackend()
+    for layer in _layers(count)[1:]:
+        cad.create_layer(layer['name'], layer['color']).update(layer)
+    return cad
+
+
+def test_counts_states_colors_and_prefix_groups():
+    report = LayerReport(_layers(100))
+    assert len(report) == 101
+    assert dict(report.states) == {'on': 91, 'off': 10, 'frozen': 4, 'locked': 3}
+    assert report.colors[7] == 1 and sum(report.colors.values()) == 101
+    assert report.groups['A']['layers'] == 50 and report.groups['E']['off'] == 0
+    assert report.names['locked'] == ["A-DOOR-0040", "A-GLAZ-0080", "A-WALL-0000"]
+    assert [layer_prefix(name) for name in ("0", "SITE|ROAD", "e_light", "-X")] == ["(no prefix)", "SITE", "E", "(no prefix)"]
+
+
+def test_digest_fits_the_token_budget_and_keeps_the_counts():
+    report = LayerReport(_layers(5000))
+    full = report.digest()
+    assert "Off (500): A-DOOR-0010, A-DOOR-0040" in full
+    for budget in (60, 200, 400):
+        digest = report.digest(budget)
+        assert estimate_tokens(digest) <= budget
+        assert digest.splitlines()[0] == "5001 layers: 4501 on, 500 off, 200 frozen, 125 locked."
+    assert "... and" in report.digest(200) and len(report.digest(400)) > len(report.digest(200))
+
+
+def test_pages_and_filters():
+    report = LayerReport(_layers(100))
+    first = report.page(1, 10, state='off').splitlines()
+    assert first[0] == "Layers 1-10 of 10 (page 1/1):"
+    assert first[1] == "A-DOOR-0010: color 2, off"
+    last = report.page(9, 10, name="A-*").splitlines()
+    assert last[0] == "Layers 41-50 of 50 (page 5/5):" and len(last) == 11
+    with pytest.raises(ValueError):
+        report.select(state='hidden')
+
+
+def test_list_layers_sends_only_the_digest(monkeypatch, capsys):
+    def reply(body):
+        return {'role': 'assistant', 'content': 'Most layers are on.'}
+
+    with StubOllamaServer(reply=reply) as server:
+        monkeypatch.setenv("LLM_API_URL", server.url)
+        monkeypatch.setenv("LLM_API_URLS", "")
+        llm = LLMManager()
+        reporter = LayerReporter(max_tokens=300)
+        dispatcher = PlanDispatcher(_backend(3000), llm, layer_reporter=reporter)
+        plan = [{'function': {'name': 'list_layers', 'arguments': {}}}]
+        assert dispatcher.summarizes_layers(plan)
+        # The step itself only builds the digest; the model is asked afterwards
+        results = dispatcher.run_plan(plan)
+        assert results[0][1].startswith("3001 layers:") and not server.requests
+        assert dispatcher.summarize_layers(plan, results) == [('list_layers', 'Most layers are on.')]
+        prompt = server.requests[0]['body']['messages'][0]['content']
+        assert "3001 layers" in prompt and estimate_tokens(prompt) < 400
+        assert reporter.last_report['tokens_sent'] == estimate_tokens(prompt)
+        assert estimate_tokens(json.dumps(_layers(3000))) > 50 * estimate_tokens(prompt)
+
+        # Detail pages and local summaries do not involve the model
+        pages = [{'function': {'name': 'list_layers', 'arguments': {'page': 2, 'state': 'frozen'}}}]
+        assert not dispatcher.summarizes_layers(pages)
+        page = dispatcher.summarize_layers(pages, dispatcher.run_plan(pages))[0][1]
+        assert page.startswith("Layers 51-100 of 120 (page 2/3):")
+        reporter.mode = 'local'
+        assert dispatcher.summarize_layers(plan, dispatcher.run_plan(plan))[0][1].startswith("3001 layers:")
+        assert len(server.requests) == 1
+    assert "tokens sent for 3001 layers" in capsys.readouterr().out
+
+
+def test_layer_summary_runs_off_the_com_thread(monkeypatch):
+    from src.cad.com_executor import ComExecutor
+
+    def reply(body):
+        return {'role': 'assistant', 'content': 'Most layers are on.'}
+
+    with StubOllamaServer(reply=reply) as server:
+        monkeypatch.setenv("LLM_API_URL", server.url)
+        monkeypatch.setenv("LLM_API_URLS", "")
+        llm = LLMManager()
+        asked = []
+        real_summarize = LayerReporter.summarize
+        reporter = LayerReporter()
+        reporter.summarize = lambda digest, model: asked.append(threading.get_ident()) or real_summarize(reporter, digest, model)
+        executor = ComExecutor(lambda: _backend(200))
+        try:
+            dispatcher = PlanDispatcher(executor.proxy, llm, verbose=False, layer_reporter=reporter)
+            plan = [{'function': {'name': 'list_layers', 'arguments': {}}}]
+            results = executor.submit(dispatcher.run_plan, plan).result()
+            assert dispatcher.summarize_layers(plan, results)[0][1] == 'Most layers are on.'
+        finally:
+            executor.shutdown()
+    assert asked == [threading.get_ident()] != [executor._thread.ident]
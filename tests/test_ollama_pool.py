@@ -0,0 +1,94 @@
+import threading
+import time
+from contextlib import ExitStack
+
+from src.llm.llm_manager import LLMManager
+from src.llm.ollama_pool import OllamaPool
+from src.llm.stub_ollama import StubOllamaServer
+
+MESSAGES = [{'role': 'user', 'content': 'draw a circle'}]
+
+
+def _chat(pool, **kwargs):
+    return pool.chat(model='stub', messages=MESSAGES, **kwargs)
+
+
+def _stubs(stack, *latencies):
+    return [stack.enter_context(StubOllamaServer(latency=latency, parallel=8)) for latency in latencies]
+
+
+def test_least_outstanding_spreads_concurrent_requests():
+    with ExitStack() as stack:
+        servers = _stubs(stack, 0.1, 0.1)
+        pool = OllamaPool([s.url for s in servers], health_interval=0)
+        threads = [threading.Thread(target=_chat, args=(pool,)) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert [len(s.requests) for s in servers] == [3, 3]
+
+        # Sequential requests from one thread stay on the same host (warm prompt cache)
+        _chat(pool)
+        _chat(pool)
+        assert sorted(len(s.requests) for s in servers) == [3, 5]
+        stats = pool.stats()
+        assert all(s['p50'] >= 0.1 and s['p95'] >= s['p50'] for s in stats.values())
+        assert "p95" in pool.format_report()
+
+
+def test_failover_and_health_check():
+    with ExitStack() as stack:
+        live, = _stubs(stack, 0.0)
+        dead = StubOllamaServer().start()
+        dead.stop()
+        pool = OllamaPool([dead.url, live.url], health_interval=0)
+
+        response = _chat(pool)
+        assert response['done']
+        assert len(live.requests) == 1
+        stats = pool.stats()
+        assert stats[dead.url]['errors'] == 1 and not stats[dead.url]['healthy']
+
+        # Down hosts are skipped until a health check sees them again
+        _chat(pool)
+        assert pool.stats()[dead.url]['requests'] == 1
+        assert pool.check_all() == [False, True]
+
+
+def test_streams_fail_over_before_the_first_chunk():
+    with ExitStack() as stack:
+        live, = _stubs(stack, 0.0)
+        dead = StubOllamaServer().start()
+        dead.stop()
+        pool = OllamaPool([dead.url, live.url], health_interval=0)
+        chunks = list(_chat(pool, stream=True))
+        assert chunks[-1]['done']
+        assert pool.stats()[live.url]['requests'] == 1
+
+
+def test_slow_host_is_hedged():
+    with ExitStack() as stack:
+        slow, fast = _stubs(stack, 0.01, 0.01)
+        pool = OllamaPool([slow.url, fast.url], hedge_percentile=95, hedge_min_samples=5, health_interval=0)
+        for _ in range(5):
+            _chat(pool)
+        assert len(slow.requests) == 5
+
+        slow.latency = 0.5
+        started = time.perf_counter()
+        _chat(pool)
+        assert time.perf_counter() - started < 0.3
+        assert pool.hedges == 1 and pool.hedge_wins == 1
+        assert len(fast.requests) == 1
+
+
+def test_manager_uses_a_shared_pool(monkeypatch):
+    with ExitStack() as stack:
+        servers = _stubs(stack, 0.0, 0.0)
+        monkeypatch.setenv("LLM_API_URLS", ",".join(s.url + "/api/chat" for s in servers))
+        monkeypatch.setenv("LLM_HEALTH_INTERVAL", "0")
+        first, second = LLMManager(), LLMManager()
+        assert first.pool is second.pool
+        assert first.client is first.pool
+        assert [h.url for h in first.pool.hosts] == [s.url for s in servers]
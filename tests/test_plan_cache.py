@@ -0,0 +1,91 @@
+import os
+
+from src.llm.llm_manager import LLMManager
+from src.llm.plan_cache import PlanCache
+
+
+class FakeClient:
+    """Stands in for ollama.Client and counts chat round-trips."""
+    def __init__(self):
+        self.chats = 0
+
+    def chat(self, model, messages, tools=None, **kwargs):
+        self.chats += 1
+        return {'message': {'content': '', 'tool_calls': [
+            {'function': {'name': 'draw_circle', 'arguments': {'center': [0, 0, 0], 'radius': self.chats}}}
+        ]}}
+
+
+def _manager(monkeypatch, tmp_path, **env):
+    monkeypatch.setenv("PLAN_CACHE_DIR", str(tmp_path / "plans"))
+    monkeypatch.setenv("FAST_PATH", "0")
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    manager = LLMManager()
+    manager.client = FakeClient()
+    return manager
+
+
+def test_repeated_prompt_skips_llm(monkeypatch, tmp_path):
+    llm = _manager(monkeypatch, tmp_path)
+    first, _ = llm.process_prompt("Draw a circle at 0,0 radius 1")
+    assert not llm.last_cache_hit
+    second, _ = llm.process_prompt("  draw a CIRCLE at 0,0   radius 1 ")
+    assert llm.last_cache_hit
+    assert second == first
+    assert llm.client.chats == 1
+    assert llm.plan_cache.stats()['hits'] == 1
+    assert llm.plan_cache.hit_rate == 0.5
+
+    # Rewriting a served plan does not corrupt the cached one
+    second[0]['function']['arguments']['radius'] = 99
+    third, _ = llm.process_prompt("draw a circle at 0,0 radius 1")
+    assert third[0]['function']['arguments']['radius'] == 1
+
+
+def test_key_depends_on_model_and_tool_schema(monkeypatch, tmp_path):
+    llm = _manager(monkeypatch, tmp_path)
+    llm.process_prompt("draw it")
+    llm.model = "other-model"
+    llm.process_prompt("draw it")
+    llm._tools_hash = "changed"
+    llm.process_prompt("draw it")
+    assert llm.client.chats == 3
+
+
+def test_disk_tier_survives_restart(monkeypatch, tmp_path):
+    llm = _manager(monkeypatch, tmp_path)
+    llm.process_prompt("draw it")
+    restarted = _manager(monkeypatch, tmp_path)
+    restarted.process_prompt("draw it")
+    assert restarted.last_cache_hit
+    assert restarted.client.chats == 0
+    assert restarted.plan_cache.disk_hits == 1
+    assert restarted.plan_cache.saved_seconds >= 0.0
+
+
+def test_disabled_cache(monkeypatch, tmp_path):
+    llm = _manager(monkeypatch, tmp_path, PLAN_CACHE="0")
+    llm.process_prompt("draw it")
+    llm.process_prompt("draw it")
+    assert llm.plan_cache is None
+    assert llm.client.chats == 2
+
+
+def test_memory_lru_and_disk_size_eviction(tmp_path):
+    cache = PlanCache(directory=str(tmp_path), max_entries=2, max_bytes=600)
+    calls = [{'function': {'name': 'draw_point', 'arguments': {'point': [0, 0, 0]}}}]
+    keys = [PlanCache.key(f"prompt {i}", "m", "t") for i in range(10)]
+    for i, key in enumerate(keys):
+        cache.put(key, calls, "", 1.0)
+        os.utime(os.path.join(str(tmp_path), key + ".json"), (i, i))
+    cache._evict()
+
+    assert cache.stats()['memory_entries'] == 2
+    on_disk = sorted(os.listdir(str(tmp_path)))
+    assert sum(os.path.getsize(os.path.join(str(tmp_path), n)) for n in on_disk) <= 600
+    assert keys[-1] + ".json" in on_disk
+    assert keys[0] + ".json" not in on_disk
+    assert cache.get(keys[-1]) is not None
+    assert cache.get(keys[0]) is None
+    assert cache.saved_seconds == 1.0
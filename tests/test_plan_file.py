@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import CIRCLE, HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+from src.plan.dispatcher import PlanDispatcher
+from src.plan.plan_file import PlanRecorder, load_plans, replay_plans, transform_plan
+
+
+def _call(tool, **arguments):
+    return {'function': {'name': tool, 'arguments': arguments}}
+
+
+PLAN = [
+    _call('draw_circle', center=[10, 0, 0], radius=2),
+    _call('draw_polyline', points=[[0, 0], [10, 0], [10, 10]], closed=True),
+    _call('draw_concentric_rings', center=[0, 0, 0], start_radius=1, spacing=0.5, count=3),
+    _call('polar_array', entity={'type': 'circle', 'center': [5, 0, 0], 'radius': 1}, center=[0, 0, 0], count=4),
+    _call('define_block', name='AI_BOLT', entities=[{'type': 'circle', 'center': [0, 0, 0], 'radius': 1}]),
+    _call('insert_block', name='AI_BOLT', insertion_point=[20, 20, 0], rotation=45),
+]
+
+
+def _done(plan):
+    return [(call['function']['name'], "done") for call in plan]
+
+
+def test_record_and_load_round_trip(tmp_path):
+    path = tmp_path / "plans.jsonl"
+    recorder = PlanRecorder(str(path))
+    recorder.record("a bolt pattern", PLAN, _done(PLAN))
+    recorder.record("nothing", [], [])
+    recorder.record("a circle", PLAN[:1], _done(PLAN[:1]))
+    assert recorder.recorded == 2
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2 and ": " not in lines[0]
+    plans = load_plans(str(path))
+    assert [p['prompt'] for p in plans] == ["a bolt pattern", "a circle"]
+    assert plans[0]['tool_calls'] == json.loads(json.dumps(PLAN))
+
+
+def test_only_successful_drawing_steps_are_recorded(tmp_path):
+    path = tmp_path / "plans.jsonl"
+    recorder = PlanRecorder(str(path))
+    cad = HeadlessBackend()
+    dispatcher = PlanDispatcher(cad, verbose=False)
+    queried = [_call('count_entities', entity_type='circle')] + PLAN[:2] + [_call('list_layers')]
+    recorder.record("count, draw, list", queried, dispatcher.run_plan(queried))
+    recorder.record("only a query", queried[:1], dispatcher.run_plan(queried[:1]))
+    failing = PLAN[:1] + [_call('insert_block', name='MISSING', insertion_point=[0, 0, 0])]
+    recorder.record("partly failed", failing, dispatcher.run_plan(failing))
+    recorder.record("never ran", PLAN[:1], [])
+    assert (recorder.recorded, recorder.skipped) == (1, 2)
+    plans = load_plans(str(path))
+    assert [call['function']['name'] for call in plans[0]['tool_calls']] == ['draw_circle', 'draw_polyline']
+
+    # Query steps in older recordings are not re-issued on replay
+    path.write_text(json.dumps({'v': 1, 'prompt': 'old', 'calls': [['list_layers', {}], ['draw_circle', {'center': [0, 0, 0], 'radius': 1}]]}) + "\n")
+    stats = replay_plans(PlanDispatcher(HeadlessBackend(), verbose=False), load_plans(str(path)))
+    assert (stats['steps'], stats['entities']) == (1, 1)
+
+
+def test_newer_format_is_rejected(tmp_path):
+    path = tmp_path / "plans.jsonl"
+    path.write_text('{"v": 99, "calls": []}\n')
+    with pytest.raises(ValueError):
+        load_plans(str(path))
+
+
+def test_shift_and_scale():
+    plan = transform_plan(PLAN, shift=(100, 50), scale=2)
+    args = [call['function']['arguments'] for call in plan]
+    assert args[0] == {'center': [120.0, 50.0, 0.0], 'radius': 4.0}
+    assert args[1]['points'] == [[100.0, 50.0], [120.0, 50.0], [120.0, 70.0]] and args[1]['closed']
+    assert (args[2]['start_radius'], args[2]['spacing'], args[2]['count']) == (2.0, 1.0, 3)
+    assert args[3]['entity'] == {'type': 'circle', 'center': [110.0, 50.0, 0.0], 'radius': 2.0}
+    assert args[3]['center'] == [100.0, 50.0, 0.0]
+    # Block contents stay relative to the insertion point; scaled blocks get their own name
+    assert args[4] == {'name': 'AI_BOLT_S2', 'entities': [{'type': 'circle', 'center': [0.0, 0.0, 0.0], 'radius': 2.0}]}
+    assert args[5] == {'name': 'AI_BOLT_S2', 'insertion_point': [140.0, 90.0, 0.0], 'rotation': 45}
+    # The source plan is untouched
+    assert PLAN[0]['function']['arguments']['center'] == [10, 0, 0]
+
+    about = transform_plan(PLAN[:1], scale=3, about=(10, 0, 0))
+    assert about[0]['function']['arguments']['center'] == [10.0, 0.0, 0.0]
+
+
+def test_replay_headless_without_llm():
+    cad = HeadlessBackend()
+    plans = [{'prompt': 'p', 'tool_calls': PLAN}]
+    first = replay_plans(PlanDispatcher(cad, verbose=False), plans)
+    second = replay_plans(PlanDispatcher(cad, verbose=False), plans, shift=(100, 0, 0))
+    assert first['errors'] == 0 and first['steps'] == len(PLAN)
+    assert first['entities'] == second['entities'] == 1 + 1 + 3 + 4 + 1
+    assert first['entities_per_sec'] > 0
+    circles = [tuple(cad.coords[cad.offsets[i]:cad.offsets[i] + 4]) for i in range(len(cad)) if cad.types[i] == CIRCLE]
+    assert (10.0, 0.0, 0.0, 2.0) in circles and (110.0, 0.0, 0.0, 2.0) in circles
+
+
+def test_replay_through_autocad_client():
+    app = RecordingApplication()
+    cad = AutoCADClient()
+    cad.attach(app)
+    stats = replay_plans(PlanDispatcher(cad, verbose=False), [{'prompt': 'p', 'tool_calls': PLAN[:2]}], scale=0.5)
+    assert stats['entities'] == 2 and stats['errors'] == 0
+    circle = app.ActiveDocument.ModelSpace.entities[0]
+    assert circle.geometry['radius'] == 1.0
@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.cad import simplify
+from src.cad.headless_backend import HeadlessBackend
+from src.plan.dispatcher import PlanDispatcher
+from src.plan.point_simplifier import PointSimplifier
+
+
+def _rdp_recursive(points, tolerance):
+    """Textbook recursive Ramer-Douglas-Peucker, for comparison."""
+    def split(lo, hi):
+        if hi - lo < 2:
+            return [lo]
+        dist = simplify.segment_distances(points[lo + 1:hi], np.repeat(points[lo:lo + 1], hi - lo - 1, axis=0),
+                                          np.repeat(points[hi:hi + 1], hi - lo - 1, axis=0))
+        worst = int(np.argmax(dist))
+        if dist[worst] <= tolerance:
+            return [lo]
+        return split(lo, lo + 1 + worst) + split(lo + 1 + worst, hi)
+    return split(0, len(points) - 1) + [len(points) - 1]
+
+
+def _sine(count):
+    t = np.linspace(0, 20, count)
+    return np.column_stack([t * 5, 10 * np.sin(t), np.zeros(count)])
+
+
+@pytest.mark.parametrize("tolerance", [0.001, 0.05, 1.0])
+def test_rdp_matches_the_recursive_version(tolerance):
+    rng = np.random.default_rng(2)
+    for points in (_sine(500), simplify.as_points(rng.normal(size=(300, 2)).cumsum(axis=0))):
+        kept = simplify.rdp_indices(points, tolerance)
+        assert kept.tolist() == _rdp_recursive(points, tolerance)
+        assert simplify.max_deviation(points, kept) <= tolerance
+
+
+@pytest.mark.parametrize("tolerance", [0.01, 0.1])
+def test_spline_points_stay_within_tolerance_of_the_fitted_curve(tolerance):
+    points = _sine(2000)
+    reduced, deviation = simplify.simplify(points, tolerance, tangents=(45.0, 45.0))
+    assert len(reduced) < len(points) / 8
+    assert deviation <= tolerance
+    # Brute force: every original point against a dense sampling of the whole spline through the kept points
+    curve = simplify.spline_samples(reduced, 45.0, 45.0, samples=200).reshape(-1, 3)
+    segments = len(curve) - 1
+    for point in points[::7]:
+        dist = simplify.segment_distances(np.repeat(point[None], segments, axis=0), curve[:-1], curve[1:])
+        assert dist.min() <= tolerance * 1.01
+
+
+def test_polyline_tolerance_is_not_enough_for_splines():
+    points = _sine(2000)
+    kept = simplify.rdp_indices(points, 0.01)
+    # The outline through the RDP points is within tolerance, the spline through them is not
+    assert simplify.max_deviation(points, kept) <= 0.01
+    assert simplify.spline_deviations(points, kept, 45.0, 45.0).max() > 0.01
+    fitted = simplify.spline_indices(points, 0.01, 45.0, 45.0)
+    assert set(kept.tolist()) <= set(fitted.tolist())
+    assert simplify.spline_deviations(points, fitted, 45.0, 45.0).max() <= 0.01
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_tridiagonal_solve_matches_a_dense_solve(size):
+    rng = np.random.default_rng(size)
+    lower, upper = rng.random(size), rng.random(size)
+    lower[0] = upper[-1] = 0.0
+    diag = 2.0 * (lower + upper) + 0.1
+    rhs = rng.normal(size=(size, 3))
+    dense = np.diag(diag) + np.diag(lower[1:], -1) + np.diag(upper[:-1], 1)
+    assert np.allclose(simplify.tridiagonal_solve(lower, diag, upper, rhs), np.linalg.solve(dense, rhs))
+    assert np.allclose(simplify.tridiagonal_solve(lower, diag, upper, rhs[:, 0]), np.linalg.solve(dense, rhs[:, 0]))
+
+
+def test_fitted_spline_passes_through_its_fit_points_with_the_end_tangents():
+    points = simplify.as_points([(0, 0), (3, 4), (6, 1), (10, 5)])
+    curve = simplify.spline_samples(points, 90.0, 0.0)
+    assert np.allclose(curve[:, 0], points[:-1]) and np.allclose(curve[:, -1], points[1:])
+    derivatives = simplify.spline_derivatives(points, 90.0, 0.0)
+    assert np.allclose(derivatives[[0, -1]], [[0, 1, 0], [1, 0, 0]])
+
+
+def test_adaptive_resampling_follows_curvature():
+    # A straight run into a tight quarter circle: only the bend needs points
+    straight = [(x, 0.0) for x in np.linspace(-100, 0, 400)]
+    bend = [(5 * math.sin(a), 5 - 5 * math.cos(a)) for a in np.linspace(0, math.pi / 2, 200)[1:]]
+    points = simplify.as_points(straight + bend)
+    kept = simplify.adaptive_indices(points, 0.01)
+    assert np.count_nonzero(kept < 400) == 1
+    # sqrt(8 * r * tolerance) = 0.63 along a quarter circle of length 7.85
+    assert 10 <= np.count_nonzero(kept >= 400) <= 16
+
+
+def test_duplicates_closed_outlines_and_tiny_lists():
+    reduced, deviation = simplify.simplify([(0, 0), (1, 0), (1, 0), (2, 0), (2, 2), (0, 2), (0, 0)], 0.01, closed=True)
+    assert reduced[:, :2].tolist() == [[0, 0], [2, 0], [2, 2], [0, 2]] and deviation == 0
+    assert len(simplify.simplify([(1, 1)], 0.1)[0]) == 1
+    assert simplify.dedupe_indices([(0, 0), (0, 0), (0, 0)]).tolist() == [0]
+
+
+def test_pass_reduces_spline_and_polyline_calls():
+    points = _sine(600)[:, :2].tolist()
+    plan = [
+        {'function': {'name': 'draw_spline', 'arguments': {'points': points, 'start_angle': 0.0}}},
+        {'function': {'name': 'draw_polyline', 'arguments': {'points': [[0, 0], [1, 1e-4], [2, 0], [2, 2]]}}},
+        {'function': {'name': 'draw_polyline', 'arguments': {'points': points, 'snap_tolerance': 0.5}}},
+        {'function': {'name': 'draw_circle', 'arguments': {'center': [0, 0, 0], 'radius': 1}}},
+    ]
+    simplifier = PointSimplifier(tolerance=0.05)
+    optimized = simplifier.optimize(plan)
+    spline = optimized[0]['function']['arguments']
+    assert spline['start_angle'] == 0.0 and len(spline['points'][0]) == 2
+    assert len(spline['points']) < 100
+    assert optimized[1]['function']['arguments']['points'] == [[0, 0], [2, 0], [2, 2]]
+    assert optimized[2:] == plan[2:]
+    report = simplifier.last_report
+    assert (report['calls'], report['points_before']) == (2, 604)
+    assert report['max_deviation'] <= 0.05
+    assert "604 ->" in simplifier.format_report()
+
+    cad = HeadlessBackend()
+    PlanDispatcher(cad, verbose=False).run_plan(optimized)
+    assert cad.entity(0)['points'][-1] == pytest.approx((100.0, 10 * math.sin(20), 0.0))
+    assert PointSimplifier(enabled=False).optimize(plan) is plan
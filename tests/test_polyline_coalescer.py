@@ -0,0 +1,163 @@
+import math
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+from src.plan.polyline_coalescer import PolylineCoalescer
+
+
+def _call(name, **arguments):
+    return {'function': {'name': name, 'arguments': arguments}}
+
+
+def _names(plan):
+    return [call['function']['name'] for call in plan]
+
+
+def _outline(n, radius=10.0):
+    points = [[radius * math.cos(2 * math.pi * k / n), radius * math.sin(2 * math.pi * k / n), 0.0] for k in range(n)]
+    return [_call('draw_line', start=points[k], end=points[(k + 1) % n]) for k in range(n)]
+
+
+def _segments(cad):
+    """Undirected segments drawn by a headless backend, rounded for comparison."""
+    out = []
+    for i in range(len(cad)):
+        e = cad.entity(i)
+        if e['type'] == 'line':
+            pairs = [(e['start'], e['end'])]
+        else:
+            pts = e['points'] + (e['points'][:1] if e['closed'] else [])
+            pairs = list(zip(pts, pts[1:]))
+        for a, b in pairs:
+            a, b = tuple(round(v, 6) for v in a), tuple(round(v, 6) for v in b)
+            out.append(tuple(sorted((a, b))))
+    return sorted(out)
+
+
+def _run(cad, plan):
+    with cad.batch():
+        for call in plan:
+            args = call['function']['arguments']
+            if call['function']['name'] == 'draw_line':
+                cad.add_line(tuple(args['start']), tuple(args['end']))
+            elif call['function']['name'] == 'draw_polyline':
+                cad.add_polyline(args['points'], args.get('closed', False))
+            elif call['function']['name'] == 'draw_circle':
+                cad.add_circle(tuple(args['center']), args['radius'])
+
+
+def test_closed_outline_becomes_one_lightweight_polyline():
+    plan = _outline(500)
+    coalescer = PolylineCoalescer()
+    optimized = coalescer.optimize(plan)
+    assert _names(optimized) == ['draw_polyline']
+    assert optimized[0]['function']['arguments']['closed'] is True
+    assert len(optimized[0]['function']['arguments']['points']) == 500
+    assert coalescer.last_report == {'lines': 500, 'polylines': 1, 'calls_before': 500, 'calls_after': 1}
+
+    app = RecordingApplication()
+    cad = AutoCADClient()
+    cad.attach(app)
+    _run(cad, optimized)
+    assert app.log.counts['AddLightWeightPolyline'] == 1
+    assert app.log.counts['AddLine'] == 0
+    assert app.ActiveDocument.ModelSpace.entities[0].Closed is True
+
+
+def test_reversed_and_shuffled_segments_form_one_chain():
+    points = [[0, 0, 0], [1, 0, 0], [2, 1, 0], [3, 1, 0], [4, 0, 0]]
+    plan = [
+        _call('draw_line', start=points[2], end=points[1]),
+        _call('draw_line', start=points[3], end=points[4]),
+        _call('draw_line', start=points[0], end=points[1]),
+        _call('draw_line', start=points[3], end=points[2]),
+    ]
+    optimized = PolylineCoalescer().optimize(plan)
+    assert _names(optimized) == ['draw_polyline']
+    vertices = optimized[0]['function']['arguments']['points']
+    assert vertices in ([list(map(float, p)) for p in points], [list(map(float, p)) for p in reversed(points)])
+    assert optimized[0]['function']['arguments']['closed'] is False
+
+
+def test_tolerance_joins_near_endpoints_only():
+    plan = [
+        _call('draw_line', start=[0, 0], end=[1, 0]),
+        _call('draw_line', start=[1.0005, 0], end=[2, 0]),
+    ]
+    assert PolylineCoalescer(tolerance=1e-6).optimize(plan) is plan
+    assert _names(PolylineCoalescer(tolerance=1e-3).optimize(plan)) == ['draw_polyline']
+
+
+def test_branches_and_elevations_split_chains():
+    # A "T": chains end where three segments meet at (1, 0), so only the two-segment stem merges
+    plan = [
+        _call('draw_line', start=[0, 0], end=[1, 0]),
+        _call('draw_line', start=[1, 0], end=[2, 0]),
+        _call('draw_line', start=[1, 0], end=[1, 1]),
+        _call('draw_line', start=[1, 1], end=[1, 2]),
+        _call('draw_line', start=[5, 5, 0], end=[6, 5, 1]),
+        _call('draw_line', start=[6, 5, 1], end=[7, 5, 1]),
+    ]
+    optimized = PolylineCoalescer().optimize(plan)
+    assert sorted(_names(optimized)) == ['draw_line'] * 4 + ['draw_polyline']
+    stem = next(call for call in optimized if call['function']['name'] == 'draw_polyline')
+    assert stem['function']['arguments']['points'] in ([[1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [1.0, 2.0, 0.0]],
+                                                       [[1.0, 2.0, 0.0], [1.0, 1.0, 0.0], [1.0, 0.0, 0.0]])
+
+    flat, merged = HeadlessBackend(), HeadlessBackend()
+    _run(flat, plan)
+    _run(merged, optimized)
+    assert _segments(merged) == _segments(flat)
+
+
+def test_fans_and_stars_stay_separate_lines():
+    # 36 rays from one centre: every one ends at the junction, so nothing is merged
+    fan = [_call('draw_line', start=[0, 0, 0], end=[10 * math.cos(math.radians(a)), 10 * math.sin(math.radians(a)), 0])
+           for a in range(0, 360, 10)]
+    coalescer = PolylineCoalescer()
+    assert coalescer.optimize(fan) is fan
+    assert coalescer.last_report is None
+
+    # A five-pointed star drawn as spokes plus a closed rim: the spokes stay lines
+    tips = [[10 * math.cos(2 * math.pi * k / 5), 10 * math.sin(2 * math.pi * k / 5), 0.0] for k in range(5)]
+    spokes = [_call('draw_line', start=[0, 0, 0], end=tip) for tip in tips]
+    rim = [_call('draw_line', start=tips[k], end=tips[(k + 2) % 5]) for k in range(5)]
+    # Every tip is a junction (one spoke, two rim edges), so no segment can be chained
+    optimized = PolylineCoalescer().optimize(spokes + rim)
+    assert _names(optimized) == ['draw_line'] * 10
+
+    flat, merged = HeadlessBackend(), HeadlessBackend()
+    _run(flat, spokes + rim)
+    _run(merged, optimized)
+    assert _segments(merged) == _segments(flat)
+
+    # The fan still reaches AutoCAD as lines, where the client can collapse it into AddLine + ArrayPolar
+    app = RecordingApplication()
+    cad = AutoCADClient()
+    cad.attach(app)
+    _run(cad, PolylineCoalescer().optimize(fan))
+    assert app.log.counts['AddLightWeightPolyline'] == 0
+    assert app.log.counts['ArrayPolar'] == 1 and app.log.counts['AddLine'] == 1
+
+
+def test_barrier_steps_are_not_crossed():
+    plan = [
+        _call('draw_line', start=[0, 0], end=[1, 0]),
+        _call('draw_circle', center=[9, 9], radius=1),
+        _call('draw_line', start=[1, 0], end=[2, 0]),
+        _call('trim_entities'),
+        _call('draw_line', start=[2, 0], end=[3, 0]),
+    ]
+    optimized = PolylineCoalescer().optimize(plan)
+    assert _names(optimized) == ['draw_polyline', 'draw_circle', 'trim_entities', 'draw_line']
+    assert optimized[0]['function']['arguments']['points'] == [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0]]
+
+
+def test_disabled_or_nothing_to_merge_leaves_plan_untouched():
+    plan = _outline(4)
+    coalescer = PolylineCoalescer(enabled=False)
+    assert coalescer.optimize(plan) is plan
+    assert coalescer.last_report is None
+    single = [_call('draw_line', start=[0, 0], end=[1, 0]), _call('list_layers')]
+    assert PolylineCoalescer().optimize(single) is single
@@ -0,0 +1,121 @@
+import json
+import random
+
+import pytest
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+from src.cad.selection import selection_filter, type_pattern, wcmatch
+from src.plan.dispatcher import PlanDispatcher
+
+
+@pytest.mark.parametrize("pattern, name, expected", [
+    ("WALLS", "walls", True),
+    ("A-*", "A-DOOR", True),
+    ("A-*", "S-BEAM", False),
+    ("DIM,TEXT", "text", True),
+    ("~0", "0", False),
+    ("~0", "WALLS", True),
+    ("L#", "L7", True),
+    ("L#", "LX", False),
+    ("[AB]*", "beam", True),
+    ("`*STAR", "*STAR", True),
+    ("`*STAR", "XSTAR", False),
+])
+def test_wildcards_follow_autocad(pattern, name, expected):
+    assert wcmatch(pattern)(name) is expected
+
+
+def test_filters_use_dxf_group_codes():
+    assert type_pattern("circles") == "CIRCLE"
+    assert type_pattern(["polyline", "block"]) == "LWPOLYLINE,INSERT"
+    assert selection_filter("line", "WALLS") == ([0, 8], ["LINE", "WALLS"])
+    assert selection_filter() == ([], [])
+
+
+def _entities(count, seed=3):
+    """(layer, kind, args) of a random drawing: lines, circles and polylines on four layers."""
+    rng = random.Random(seed)
+    layers = ["0", "WALLS", "DOORS", "A-DIM"]
+    for i in range(count):
+        x, y = rng.uniform(0, 100), rng.uniform(0, 100)
+        if i % 3 == 0:
+            yield layers[i % 4], 'line', ((x, y, 0.0), (x + rng.uniform(-3, 3), y + rng.uniform(-3, 3), 0.0))
+        elif i % 3 == 1:
+            yield layers[i % 4], 'circle', ((x, y, 0.0), rng.uniform(0.5, 2))
+        else:
+            yield layers[i % 4], 'polyline', ([(x, y, 0.0), (x + 1, y, 0.0), (x + 1, y + 1, 0.0)], False)
+
+
+def _headless(count):
+    cad = HeadlessBackend()
+    for name in ("WALLS", "DOORS", "A-DIM"):
+        cad.create_layer(name, 1)
+    for layer, kind, args in _entities(count):
+        cad.set_current_layer(layer)
+        getattr(cad, 'add_' + kind)(*args)
+    return cad
+
+
+def _autocad(count):
+    """A client on a drawing holding the same entities, created directly in the stand-in."""
+    app = RecordingApplication()
+    space = app.ActiveDocument.ModelSpace
+    for layer, kind, args in _entities(count):
+        if kind == 'line':
+            entity = space.AddLine(*args)
+        elif kind == 'circle':
+            entity = space.AddCircle(*args)
+        else:
+            entity = space.AddLightWeightPolyline([v for p in args[0] for v in p[:2]])
+        entity.layer = layer
+    cad = AutoCADClient()
+    cad.attach(app)
+    app.log.reset()
+    return cad, app
+
+
+QUERIES = [
+    {'entity_type': 'circle'},
+    {'layer': 'WALLS'},
+    {'entity_type': 'line,polyline', 'layer': 'A-*'},
+    {'layer': '~0'},
+    {'corner1': (20, 20), 'corner2': (60, 50)},
+    {'entity_type': 'circle', 'corner1': (20, 20), 'corner2': (60, 50), 'crossing': False},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_headless_and_autocad_select_the_same(query):
+    autocad, _ = _autocad(120)
+    headless = _headless(120)
+    expected = headless.select_entities(**query, limit=1000)
+    found = autocad.select_entities(**query, limit=1000)
+    assert found['count'] == expected['count'] > 0
+    assert sorted((e['type'], e['layer']) for e in found['entities']) == \
+        sorted((e['type'], e['layer']) for e in expected['entities'])
+
+
+def test_filtering_runs_inside_autocad():
+    cad, app = _autocad(2000)
+    assert cad.count_entities('circle', 'DOORS') > 0
+    # Select, Count and the selection set bookkeeping; no entity crosses the process boundary
+    assert app.log.total <= 6 and app.log.counts['SelectionSet.Item'] == 0
+    app.log.reset()
+    result = cad.select_entities(layer='WALLS', limit=5)
+    assert len(result['entities']) == 5 and result['count'] == 500
+    assert app.log.counts['SelectionSet.Item'] == 5
+    # The temporary selection set is removed again
+    assert not app.ActiveDocument.SelectionSets._items
+
+
+def test_selection_tools_through_the_dispatcher():
+    cad = _headless(30)
+    results = PlanDispatcher(cad, verbose=False).run_plan([
+        {'function': {'name': 'count_entities', 'arguments': {'entity_type': 'circle', 'layer': 'walls'}}},
+        {'function': {'name': 'select_entities', 'arguments': {'layer': 'DOORS', 'entity_type': 'polyline'}}},
+    ])
+    assert json.loads(results[0][1]) == {'count': cad.count_entities('circle', 'WALLS')}
+    selected = json.loads(results[1][1])
+    assert {(e['type'], e['layer']) for e in selected['entities']} == {('polyline', 'DOORS')}
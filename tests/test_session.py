@@ -0,0 +1,87 @@
+from src.llm.llm_manager import ChatSession, LLMManager
+from src.llm.stub_ollama import StubOllamaServer
+from src.llm.tool_registry import ToolRegistry
+
+
+def _reply(body):
+    radius = 2 * len([m for m in body['messages'] if m['role'] == 'user'])
+    return {'role': 'assistant', 'content': '', 'tool_calls': [
+        {'function': {'name': 'draw_circle', 'arguments': {'center': [0, 0, 0], 'radius': radius}}}
+    ]}
+
+
+def _manager(monkeypatch, server, **env):
+    monkeypatch.setenv("LLM_API_URL", server.url)
+    monkeypatch.setenv("PLAN_CACHE", "0")
+    monkeypatch.setenv("FAST_PATH", "0")
+    monkeypatch.setenv("TOOL_TOP_K", "0")
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return LLMManager()
+
+
+def test_follow_ups_reuse_the_prompt_prefix(monkeypatch):
+    with StubOllamaServer(reply=_reply) as server:
+        llm = _manager(monkeypatch, server)
+        llm.process_prompt("draw a circle at the origin with radius 2")
+        llm.session.record_results([('draw_circle', 'done')])
+        tool_calls, _ = llm.process_prompt("make it twice as big")
+        llm.process_prompt("and once more")
+
+        follow_up = server.requests[1]['body']['messages']
+        assert [m['role'] for m in follow_up] == ['system', 'user', 'assistant', 'tool', 'user']
+        assert follow_up[2]['tool_calls'][0]['function']['arguments']['radius'] == 2
+        assert tool_calls[0]['function']['arguments']['radius'] == 4
+
+        tokens = [s['prompt_tokens'] for s in llm.session.turn_stats]
+        # Only the first turn evaluates the system prompt and tool schemas
+        assert tokens[1] < tokens[0] / 10 and tokens[2] < tokens[0] / 10
+        assert "reused from the server cache" in llm.session.format_report()
+
+
+def test_stateless_mode_resends_everything(monkeypatch):
+    with StubOllamaServer(reply=_reply) as server:
+        llm = _manager(monkeypatch, server, LLM_SESSION="0")
+        llm.process_prompt("draw a circle")
+        llm.process_prompt("make it twice as big")
+        assert llm.session is None
+        assert len(server.requests[1]['body']['messages']) == 2
+
+
+def test_budget_summarizes_old_turns_and_keeps_prefix_between_trims():
+    session = ChatSession(max_tokens=300)
+    call = {'function': {'name': 'draw_line', 'arguments': {'start': [0, 0, 0], 'end': [1, 1, 0]}}}
+    histories = []
+    for i in range(12):
+        session.add_turn(f"draw line number {i}", [call])
+        session.record_results([('draw_line', 'done')])
+        histories.append(session.history())
+    assert ChatSession.estimate(session.history()) <= 300
+    assert session.summary and session.summary[0].startswith('- "draw line number 0" -> draw_line(')
+    assert session.history()[0]['role'] == 'system'
+    assert session.turns[-1]['prompt'] == "draw line number 11"
+    # Between trims the history only grows at the end
+    grew = sum(1 for a, b in zip(histories, histories[1:]) if b[:len(a)] == a)
+    assert grew >= len(histories) // 2
+
+
+def test_tools_are_pinned_within_a_session():
+    registry = ToolRegistry(LLMManager().get_tool_definitions(), top_k=3)
+    session = ChatSession()
+    first = session.tools_for(registry, "draw concentric rings")
+    second = session.tools_for(registry, "hide the DIM layer")
+    names = [t['function']['name'] for t in second]
+    assert all(t in second for t in first)
+    assert 'set_layer_status' in names
+    assert names == [t['function']['name'] for t in registry.tools if t['function']['name'] in names]
+
+
+def test_referring_prompts_skip_the_plan_cache(monkeypatch, tmp_path):
+    with StubOllamaServer(reply=_reply) as server:
+        llm = _manager(monkeypatch, server, PLAN_CACHE="1", PLAN_CACHE_DIR=str(tmp_path))
+        llm.process_prompt("make it bigger")
+        llm.process_prompt("draw a circle please")
+        llm.process_prompt("make it bigger")
+        llm.process_prompt("draw a circle please")
+        assert len(server.requests) == 3
+        assert llm.last_cache_hit
@@ -0,0 +1,162 @@
+import random
+
+import pytest
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+from src.cad.snapshot import ModelSpaceSnapshot
+from src.llm.llm_manager import LLMManager
+
+
+def _drawing(count):
+    """A recording application whose model space already holds `count` entities on a few layers."""
+    app = RecordingApplication()
+    space = app.ActiveDocument.ModelSpace
+    for i in range(count):
+        if i % 3 == 0:
+            entity = space.AddLine((i, 0, 0), (i, 1, 0))
+        elif i % 3 == 1:
+            entity = space.AddCircle((i, 5, 0), 0.5)
+        else:
+            entity = space.AddLightWeightPolyline((i, 0, i + 1, 1, i + 2, 0))
+        entity.layer = f"L{i % 4}"
+    app.log.reset()
+    return app
+
+
+def _client(app):
+    cad = AutoCADClient()
+    cad.attach(app)
+    return cad
+
+
+def _fresh(app):
+    """What a full read of the drawing gives right now."""
+    return _client(app).snapshot()
+
+
+def test_full_sync_reads_types_layers_and_geometry():
+    app = _drawing(12)
+    cad = _client(app)
+    snapshot = cad.snapshot()
+    assert snapshot.last_sync['mode'] == 'full' and len(snapshot) == 12
+    assert app.log.counts['_NewEnum'] == 1 and app.log.counts['Handle'] == 12
+    assert cad.count_by_type()['polyline'] == 4
+    assert cad.count_by_layer() == {'L0': 3, 'L1': 3, 'L2': 3, 'L3': 3}
+    first = app.ActiveDocument.ModelSpace.entities[0]
+    assert snapshot.entity(first.handle) == {'type': 'line', 'layer': 'L0', 'handle': first.handle,
+                                             'args': ((0.0, 0.0, 0.0), (0.0, 1.0, 0.0))}
+
+
+def test_unchanged_drawing_costs_two_calls():
+    app = _drawing(50)
+    cad = _client(app)
+    cad.snapshot()
+    app.log.reset()
+    assert cad.snapshot().last_sync['mode'] == 'incremental'
+    assert app.log.total == 2
+
+
+def test_added_and_erased_handles_are_synced_without_a_full_read():
+    app = _drawing(2000)
+    cad = _client(app)
+    cad.snapshot()
+    space = app.ActiveDocument.ModelSpace
+    rng = random.Random(5)
+    for entity in rng.sample(space.entities, 7) + space.entities[-3:]:
+        if entity in space.entities:
+            entity.Delete()
+    cad.add_line((0, 0), (5, 5))
+    space.AddPoint((1, 2, 0))
+    app.log.reset()
+
+    snapshot = cad.snapshot()
+    sync = snapshot.last_sync
+    assert (sync['mode'], sync['added']) == ('incremental', 2)
+    assert sync['erased'] == 2000 + 2 - space.Count
+    assert app.log.counts['_NewEnum'] == 0
+    # Erasures are located by binary search rather than by reading every handle
+    assert app.log.counts['Item'] < 200
+    expected = _fresh(app)
+    assert snapshot.live_handles() == expected.live_handles()
+    assert snapshot.count_by_type() == expected.count_by_type()
+
+
+def test_erased_rows_are_compacted():
+    snapshot = ModelSpaceSnapshot()
+    for i in range(10):
+        snapshot.append('circle', ((i, 0.0, 0.0), 1.0), 0x100 + i, "0")
+    for i in range(6):
+        snapshot.erase(0x100 + i)
+    assert len(snapshot.types) == 4 and snapshot.erased == 0
+    assert [kind for kind, _, _ in snapshot.primitives()] == ['circle'] * 4
+    assert snapshot.primitive(snapshot.rows[0x109])[1] == ((9.0, 0.0, 0.0), 1.0)
+
+
+def test_commands_force_a_full_read():
+    app = _drawing(5)
+    cad = _client(app)
+    cad.snapshot()
+    cad.trim()
+    assert cad.snapshot().last_sync['mode'] == 'full'
+
+
+def test_memory_per_entity_stays_small():
+    app = _drawing(3000)
+    snapshot = _client(app).snapshot()
+    # Coordinates plus columns and the handle lookup; a dict per entity would be ~1 KB
+    assert snapshot.bytes_per_entity() < 250
+
+
+def test_drawing_summary_goes_to_the_llm(monkeypatch):
+    cad = HeadlessBackend()
+    cad.add_line((0, 0), (1, 1))
+    cad.create_layer("WALLS")
+    cad.set_current_layer("WALLS")
+    cad.add_circle((0, 0), 1)
+    cad.add_circle((5, 0), 1)
+    summary = cad.drawing_summary()
+    assert summary.startswith("The drawing has 3 entities: 1 line, 2 circle.")
+    assert "WALLS (2), 0 (1)" in summary
+
+    monkeypatch.setenv("LLM_SESSION", "0")
+    llm = LLMManager()
+    llm.drawing_context = summary
+    messages = llm._messages("draw a circle")
+    assert messages[1] == {'role': 'system', 'content': summary}
+    assert llm._cached_plan("draw a circle") == (None, None)
+
+
+def test_drawing_context_keeps_the_prompt_prefix_stable(monkeypatch):
+    monkeypatch.setenv("LLM_SESSION", "1")
+    llm = LLMManager()
+    cad = HeadlessBackend()
+    call = {'function': {'name': 'draw_circle', 'arguments': {'center': [0, 0, 0], 'radius': 1}}}
+
+    cad.add_circle((0, 0), 1)
+    llm.drawing_context = cad.drawing_summary()
+    first = llm._messages("draw a circle at 0,0 radius 1")
+    llm.session.add_turn("draw a circle at 0,0 radius 1", [call])
+
+    cad.add_circle((5, 0), 1)
+    llm.drawing_context = cad.drawing_summary()
+    second = llm._messages("and another one")
+    # Everything before the context (system prompt and the earlier turn) is sent byte for byte again
+    assert first[:-2] == second[:len(first) - 2]
+    assert second[1:-2] == llm.session.history()
+    assert second[-2] == {'role': 'system', 'content': llm.drawing_context} and first[-2] != second[-2]
+
+    llm.session.add_turn("and another one", [call])
+    cad.add_line((0, 0), (9, 9))
+    llm.drawing_context = cad.drawing_summary()
+    third = llm._messages("now a line")
+    assert third[:len(second) - 2] == second[:-2]
+
+
+@pytest.mark.parametrize("count", [0, 1])
+def test_empty_and_tiny_drawings(count):
+    app = _drawing(count)
+    cad = _client(app)
+    assert len(cad.snapshot()) == count
+    assert len(cad.snapshot()) == count
@@ -0,0 +1,176 @@
+import json
+import math
+import random
+import time
+
+import pytest
+
+from src.cad.autocad_client import AutoCADClient
+from src.cad.headless_backend import HeadlessBackend
+from src.cad.recording_com import RecordingApplication
+from src.cad.spatial_index import SpatialIndex, entity_distance, entity_ends
+from src.plan.dispatcher import PlanDispatcher
+
+
+def _random_entities(count, seed=7, extent=1000.0):
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        x, y = rng.uniform(0, extent), rng.uniform(0, extent)
+        kind = i % 4
+        if kind == 0:
+            items.append(('line', ((x, y, 0.0), (x + rng.uniform(-5, 5), y + rng.uniform(-5, 5), 0.0))))
+        elif kind == 1:
+            items.append(('circle', ((x, y, 0.0), rng.uniform(0.1, 3))))
+        elif kind == 2:
+            items.append(('point', ((x, y, 0.0),)))
+        else:
+            points = tuple((x + k, y + rng.uniform(-2, 2), 0.0) for k in range(4))
+            items.append(('polyline', (points, False)))
+    return items
+
+
+def _nearest_brute(items, px, py, count):
+    return sorted((entity_distance(kind, args, px, py), i) for i, (kind, args) in enumerate(items))[:count]
+
+
+def test_queries_match_brute_force():
+    items = _random_entities(3000)
+    index = SpatialIndex()
+    index.bulk_load(items)
+    rng = random.Random(1)
+    for _ in range(50):
+        px, py = rng.uniform(-50, 1050), rng.uniform(-50, 1050)
+        found = index.nearest((px, py), 5)
+        expected = _nearest_brute(items, px, py, 5)
+        assert [d for d, _ in found] == pytest.approx([d for d, _ in expected])
+
+        tolerance = rng.uniform(0.5, 20)
+        hit = index.snap((px, py), tolerance)
+        ends = [(math.hypot(x - px, y - py), i) for i, (kind, args) in enumerate(items)
+                for x, y, _ in entity_ends(kind, args)]
+        best = min(ends)
+        assert (hit is None) == (best[0] > tolerance)
+        if hit is not None:
+            assert hit[0] == pytest.approx(best[0])
+
+
+def test_window_inside_and_crossing():
+    index = SpatialIndex()
+    index.bulk_load([
+        ('line', ((1, 1, 0), (2, 2, 0))),
+        ('line', ((5, 5, 0), (15, 5, 0))),
+        ('circle', ((50, 50, 0), 1.0)),
+    ])
+    assert index.window((0, 0), (10, 10), crossing=False) == [0]
+    assert index.window((10, 10), (0, 0)) == [0, 1]
+    assert index.window((60, 60), (70, 70)) == []
+
+
+def test_huge_snap_tolerance_scans_only_occupied_cells():
+    index = SpatialIndex(cell_size=0.001)
+    index.insert('line', ((0, 0, 0), (1, 0, 0)))
+    index.insert('point', ((5, 5, 0),))
+    started = time.perf_counter()
+    # 2e12 cells around the query point, but only a handful are occupied
+    hit = index.snap((1e6, 1e6), 1e9)
+    assert time.perf_counter() - started < 0.5
+    assert hit[1] == (5, 5, 0)
+    assert index.snap((1.0001, 0), 1e9)[1] == (1, 0, 0)
+    assert SpatialIndex().snap((0, 0), 1e9) is None
+
+
+def test_headless_index_follows_new_entities():
+    cad = HeadlessBackend()
+    cad.add_line((0, 0), (10, 0))
+    assert cad.nearest_entities((5, 1))[0]['distance'] == pytest.approx(1.0)
+    cad.add_circle((100, 100), 5)
+    nearest, = cad.nearest_entities((100, 104))
+    assert nearest['type'] == 'circle' and nearest['handle'] == cad.handle(1)
+    assert cad.entities_in_window((-1, -1), (200, 200))['count'] == 2
+    assert cad.snap_to_endpoint((10.2, 0.1), 0.5)['point'] == [10.0, 0.0, 0.0]
+    assert cad.snap_to_endpoint((50, 50), 0.5) is None
+
+
+def _layout(entities):
+    return sorted(json.dumps(dict(entities.describe(i), handle=None), sort_keys=True) for i in range(len(entities)))
+
+
+def test_autocad_index_loads_once_and_tracks_created_entities():
+    app = RecordingApplication()
+    # Entities drawn before the assistant started
+    app.ActiveDocument.ModelSpace.AddLine((0, 0, 0), (10, 0, 0))
+    app.ActiveDocument.ModelSpace.AddCircle((20, 0, 0), 2.0)
+    cad = AutoCADClient()
+    cad.attach(app)
+
+    assert cad.nearest_entities((10, 1))[0]['handle'] == app.ActiveDocument.ModelSpace.entities[0].handle
+    assert app.log.counts['_NewEnum'] == 1
+
+    app.log.reset()
+    cad.add_polyline([(0, 5), (5, 5), (5, 10)])
+    cad.polar_array({'type': 'line', 'start': [1, 0, 0], 'end': [2, 0, 0]}, (0, 0, 0), 6)
+    cad.rectangular_array({'type': 'circle', 'center': [0, 20, 0], 'radius': 1}, 2, 3, 5, 5)
+    cad.path_array({'type': 'polyline', 'points': [[0, 0, 0], [1, 1, 0]]}, [(30, 0), (40, 0), (50, 0)])
+    snapped = cad.snap_to_endpoint((5.1, 9.9), 0.5)
+    assert snapped['point'] == [5.0, 10.0, 0.0]
+    # Nothing was re-read from the drawing: the index followed the client's own calls
+    assert app.log.counts['_NewEnum'] == 0
+    tracked = cad.spatial_index()
+    assert len(tracked) == app.ActiveDocument.ModelSpace.Count
+
+    # A fresh load of the same drawing gives the same geometry
+    fresh = AutoCADClient()
+    fresh.attach(app)
+    assert _layout(fresh.spatial_index()) == pytest.approx(_layout(tracked))
+
+
+def test_autocad_index_reloads_after_outside_changes():
+    app = RecordingApplication()
+    cad = AutoCADClient()
+    cad.attach(app)
+    cad.add_line((0, 0), (1, 0))
+    assert len(cad.spatial_index()) == 1
+    app.log.reset()
+    app.ActiveDocument.ModelSpace.AddPoint((50, 50, 0))
+    assert cad.nearest_entities((50, 51))[0]['type'] == 'point'
+    # Only the new entity (and its neighbour, to find where the old ones end) was read
+    assert app.log.counts['_NewEnum'] == 0 and app.log.counts['Item'] == 2
+
+
+def test_queries_see_queued_entities():
+    app = RecordingApplication()
+    cad = AutoCADClient()
+    cad.attach(app)
+    with cad.batch():
+        cad.add_line((0, 0), (10, 0))
+        assert cad.entities_in_window((-1, -1), (11, 1))['count'] == 1
+
+
+def test_dispatcher_query_tools_and_snapping():
+    cad = HeadlessBackend()
+    dispatcher = PlanDispatcher(cad, verbose=False)
+    results = dispatcher.run_plan([
+        {'function': {'name': 'draw_line', 'arguments': {'start': [0, 0, 0], 'end': [10, 0, 0]}}},
+        {'function': {'name': 'draw_line', 'arguments': {'start': [10.3, 0.2, 0], 'end': [10, 10, 0], 'snap_tolerance': 0.5}}},
+        {'function': {'name': 'find_nearest_entities', 'arguments': {'point': [5, 1, 0], 'count': 2}}},
+        {'function': {'name': 'snap_to_endpoint', 'arguments': {'point': [9, 9, 0], 'tolerance': 0.1}}},
+    ])
+    assert cad.entity(1)['start'] == (10.0, 0.0, 0.0)
+    nearest = json.loads(results[2][1])
+    assert [e['handle'] for e in nearest] == [cad.handle(0), cad.handle(1)]
+    assert results[3][1] == "null"
+
+
+def test_nearest_is_sub_millisecond_on_100k_entities():
+    index = SpatialIndex()
+    index.bulk_load(_random_entities(100_000, extent=3000.0))
+    rng = random.Random(3)
+    queries = [(rng.uniform(0, 3000), rng.uniform(0, 3000)) for _ in range(200)]
+    started = time.perf_counter()
+    for q in queries:
+        index.nearest(q)
+        index.snap(q, 1.0)
+    per_query = (time.perf_counter() - started) / (2 * len(queries))
+    # Generous bound for slow CI machines; typically ~0.05ms
+    assert per_query < 0.002
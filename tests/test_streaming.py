@@ -0,0 +1,93 @@
+import json
+import time
+
+from src.cad.headless_backend import HeadlessBackend
+from src.llm.llm_manager import LLMManager
+from src.llm.stream_parser import ToolCallStreamParser
+
+
+def _pieces(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StreamingClient:
+    """Fake ollama client that streams a response in small chunks with a delay per chunk."""
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.streamed = []
+
+    def chat(self, model, messages, tools=None, stream=False, **kwargs):
+        self.streamed.append(stream)
+        for message in self.chunks:
+            time.sleep(self.delay)
+            yield {'message': message}
+
+
+def _manager(monkeypatch, chunks, delay=0.0):
+    monkeypatch.setenv("PLAN_CACHE", "0")
+    llm = LLMManager()
+    llm.client = StreamingClient(chunks, delay)
+    return llm
+
+
+def test_parser_yields_array_items_as_they_close():
+    calls = [{'name': 'draw_circle', 'arguments': {'center': [i, 0, 0], 'radius': 1}} for i in range(3)]
+    text = json.dumps(calls)
+    parser = ToolCallStreamParser()
+    emitted = []
+    for piece in _pieces(text, 7):
+        emitted.append(len(parser.feed(piece)))
+    assert sum(emitted) == 3
+    # The first call is released long before the end of the text
+    assert emitted.index(1) < len(emitted) - 2
+    assert parser.content == ""
+
+
+def test_parser_handles_strings_with_braces_and_plain_text():
+    parser = ToolCallStreamParser()
+    text = ' {"name": "create_layer", "arguments": {"layer_name": "A}{\\"B"}}'
+    calls = [c for piece in _pieces(text, 3) for c in parser.feed(piece)]
+    assert calls == [{'function': {'name': 'create_layer', 'arguments': {'layer_name': 'A}{"B'}}}]
+
+    parser = ToolCallStreamParser()
+    for piece in _pieces("Please give me the radius {like 5}.", 4):
+        assert parser.feed(piece) == []
+    assert parser.content == "Please give me the radius {like 5}."
+
+
+def test_structured_tool_calls_pass_through():
+    call = {'function': {'name': 'draw_point', 'arguments': {'point': [1, 2, 3]}}}
+    parser = ToolCallStreamParser()
+    assert parser.feed_message({'content': '', 'tool_calls': [call]}) == [call]
+    assert parser.feed_message({'content': ''}) == []
+
+
+def test_stream_prompt_starts_execution_before_generation_ends(monkeypatch):
+    calls = [{'name': 'draw_circle', 'arguments': {'center': [i, 0, 0], 'radius': 1}} for i in range(5)]
+    chunks = [{'content': piece} for piece in _pieces(json.dumps(calls), 10)]
+    llm = _manager(monkeypatch, chunks, delay=0.002)
+    cad = HeadlessBackend()
+
+    started = time.perf_counter()
+    first_entity = None
+    for call in llm.stream_prompt("five circles"):
+        cad.add_circle(call['function']['arguments']['center'], call['function']['arguments']['radius'])
+        if first_entity is None:
+            first_entity = time.perf_counter() - started
+    total = time.perf_counter() - started
+
+    assert llm.client.streamed == [True]
+    assert len(cad) == 5
+    assert first_entity < total / 2
+    stats = llm.last_stream
+    assert stats['calls'] == 5
+    assert stats['first_call_seconds'] < stats['seconds']
+    assert llm.last_content == ""
+
+
+def test_stream_prompt_reports_text_reply(monkeypatch):
+    llm = _manager(monkeypatch, [{'content': 'What radius '}, {'content': 'should I use?'}])
+    assert list(llm.stream_prompt("draw a circle")) == []
+    assert llm.last_content == "What radius should I use?"
+    assert llm.last_stream['first_call_seconds'] is None
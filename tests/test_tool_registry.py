@@ -0,0 +1,74 @@
+from src.llm.llm_manager import LLMManager
+from src.llm.tool_registry import ToolRegistry, estimate_tokens
+
+
+def _names(tools):
+    return [tool['function']['name'] for tool in tools]
+
+
+def _manager(monkeypatch, client, top_k="6"):
+    monkeypatch.setenv("PLAN_CACHE", "0")
+    monkeypatch.setenv("FAST_PATH", "0")
+    monkeypatch.setenv("TOOL_TOP_K", top_k)
+    llm = LLMManager()
+    llm.client = client
+    return llm
+
+
+class ScriptedClient:
+    """Returns the scripted tool-call names in order and remembers which tools were sent."""
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.sent = []
+
+    def chat(self, model, messages, tools=None, **kwargs):
+        self.sent.append(_names(tools))
+        names = self.replies.pop(0)
+        return {
+            'message': {'content': '', 'tool_calls': [{'function': {'name': n, 'arguments': {}}} for n in names]},
+            'prompt_eval_count': 40 * len(tools), 'prompt_eval_duration': 5_000_000 * len(tools),
+        }
+
+
+def test_ranker_picks_relevant_tools():
+    registry = ToolRegistry(LLMManager().get_tool_definitions(), top_k=4)
+    assert 'rectangular_array' in _names(registry.select("make a grid of circles, 5 rows and 4 columns"))
+    assert 'draw_cloud_radials' in _names(registry.select("a sun with rays of different lengths"))
+    assert 'set_layer_status' in _names(registry.select("hide the DIM layer"))
+    assert len(registry.select("draw a spline curve")) <= 4
+
+
+def test_unmatched_prompt_or_disabled_ranking_sends_everything():
+    tools = LLMManager().get_tool_definitions()
+    assert ToolRegistry(tools, top_k=4).select("hello there") == tools
+    assert ToolRegistry(tools, top_k=0).select("draw a circle") == tools
+
+
+def test_subset_shrinks_prompt(monkeypatch):
+    client = ScriptedClient(['draw_concentric_rings'])
+    llm = _manager(monkeypatch, client)
+    llm.process_prompt("draw concentric rings at 0,0")
+    full = llm.tool_registry.tools
+    assert len(client.sent[0]) <= 6
+    assert llm.last_eval['tools_sent'] == len(client.sent[0])
+    assert llm.last_eval['prompt_tokens'] < 40 * len(full)
+    assert llm.last_eval['tool_tokens_estimate'] < estimate_tokens(full) / 2
+    assert not llm.last_eval['retried']
+
+
+def test_unknown_tool_retries_with_full_set(monkeypatch):
+    client = ScriptedClient(['draw_hexagon'], ['draw_polyline'])
+    llm = _manager(monkeypatch, client)
+    tool_calls, _ = llm.process_prompt("draw a circle at the origin")
+    assert [len(sent) for sent in client.sent] == [len(client.sent[0]), len(llm.tool_registry.tools)]
+    assert len(client.sent[0]) < len(client.sent[1])
+    assert _names(tool_calls) == ['draw_polyline']
+    assert llm.last_eval['retried']
+
+
+def test_registered_tool_outside_subset_is_accepted(monkeypatch):
+    client = ScriptedClient(['trim_entities'])
+    llm = _manager(monkeypatch, client)
+    tool_calls, _ = llm.process_prompt("draw a circle")
+    assert len(client.sent) == 1
+    assert _names(tool_calls) == ['trim_entities']
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from src import tracing
+from src.cad.autocad_client import AutoCADClient
+from src.cad.com_executor import ComExecutor
+from src.cad.recording_com import RecordingApplication
+from src.llm.llm_manager import LLMManager
+from src.llm.stub_ollama import StubOllamaServer
+from src.plan.dispatcher import PlanDispatcher
+from src.tracing import Tracer
+
+PLAN = [
+    {'function': {'name': 'create_layer', 'arguments': {'layer_name': 'WALLS', 'color': 1}}},
+    {'function': {'name': 'draw_line', 'arguments': {'start': [0, 0, 0], 'end': [10, 0, 0]}}},
+    {'function': {'name': 'draw_circle', 'arguments': {'center': [5, 5, 0], 'radius': 2}}},
+]
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    tracer = tracing.set_tracer(Tracer(path=str(tmp_path / "traces.jsonl"), prom_path=str(tmp_path / "cad.prom")))
+    yield tracer
+    tracing.set_tracer(None)
+
+
+def _client(app):
+    cad = AutoCADClient()
+    cad.attach(app)
+    return cad
+
+
+def test_steps_and_com_calls_are_traced(tracer, tmp_path):
+    app = RecordingApplication()
+    cad = _client(app)
+    app.log.reset()
+    with tracer.request(prompt="walls") as root:
+        PlanDispatcher(cad, verbose=False).run_plan(PLAN)
+    summary = tracer.finish(root)
+
+    dispatch, = root.children
+    assert dispatch.name == 'dispatch'
+    steps = [s for s in dispatch.children if s.name == 'step']
+    assert [s.attrs['tool'] for s in steps] == ['create_layer', 'draw_line', 'draw_circle']
+    # Layer calls go out with their step; primitives with the flush at the end of the plan
+    assert steps[0].com['Add'][0] == 1 and steps[0].com['Color='][0] == 1
+    flush, = [s for s in dispatch.children if s.name == 'flush']
+    assert flush.com['AddLine'][0] == flush.com['AddCircle'][0] == 1
+    assert root.com_calls()[0] >= app.log.total
+    assert "3 steps" in summary and "COM calls" in summary
+
+    record = json.loads((tmp_path / "traces.jsonl").read_text())
+    assert record['attrs'] == {'prompt': "walls"} and record['children'][0]['name'] == 'dispatch'
+    prom = (tmp_path / "cad.prom").read_text()
+    assert 'cad_assistant_requests_total 1' in prom
+    assert 'cad_assistant_com_calls_total{member="AddLine"} 1' in prom
+    assert 'cad_assistant_span_seconds_count{span="step"} 3' in prom
+
+
+def test_spans_follow_work_onto_the_com_thread(tracer):
+    app = RecordingApplication()
+    executor = ComExecutor(lambda: _client(app))
+    try:
+        with tracer.request() as root:
+            future = executor.submit(PlanDispatcher(executor.proxy, verbose=False).run_plan, PLAN)
+        future.result()
+    finally:
+        executor.shutdown()
+    tracer.finish(root)
+    assert [s.name for s in root.children] == ['dispatch']
+    assert root.com_calls()[0] > 0
+
+
+def test_llm_timings_and_token_rate(tracer, monkeypatch):
+    reply = {'role': 'assistant', 'content': json.dumps([{'name': 'draw_circle', 'arguments': {'center': [0, 0], 'radius': 1}}])}
+    with StubOllamaServer(reply=lambda body: reply, latency=0.05) as server:
+        monkeypatch.setenv("LLM_API_URL", server.url)
+        monkeypatch.setenv("PLAN_CACHE", "0")
+        monkeypatch.setenv("FAST_PATH", "0")
+        monkeypatch.setenv("LLM_SESSION", "0")
+        llm = LLMManager()
+        with tracer.request() as root:
+            tool_calls, _ = llm.process_prompt("a circle")
+    summary = tracer.finish(root)
+
+    assert len(tool_calls) == 1
+    prompt, = root.children
+    assert prompt.attrs == {'source': 'llm', 'tool_calls': 1}
+    chat, parse = prompt.children
+    assert (chat.name, parse.name) == ('llm.chat', 'llm.parse')
+    assert chat.attrs['prompt_tokens'] > 0 and chat.attrs['eval_tokens'] > 0
+    assert chat.attrs['tokens_per_second'] == pytest.approx(chat.attrs['eval_tokens'] / 0.05)
+    assert llm.last_eval['eval_tokens'] == chat.attrs['eval_tokens']
+    assert "tok/s" in summary and "parse" in summary
+
+
+def test_nothing_is_recorded_outside_a_request():
+    app = RecordingApplication()
+    cad = _client(app)
+    # Without an installed tracer the document is used as is
+    assert cad.doc is app.ActiveDocument
+    with tracing.span('step') as trace:
+        assert trace is None
+    assert tracing.current_span() is None
@@ -0,0 +1,96 @@
+import time
+
+from src.llm.llm_manager import LLMManager
+from src.llm.stub_ollama import StubOllamaServer
+
+
+def _reply(body):
+    return {'role': 'assistant', 'content': '', 'tool_calls': [
+        {'function': {'name': 'draw_circle', 'arguments': {'center': [0, 0, 0], 'radius': 1}}}
+    ]}
+
+
+def _manager(monkeypatch, server, keep_alive="30m", top_k="0"):
+    monkeypatch.setenv("LLM_API_URL", server.url)
+    monkeypatch.setenv("PLAN_CACHE", "0")
+    monkeypatch.setenv("FAST_PATH", "0")
+    monkeypatch.setenv("TOOL_TOP_K", top_k)
+    monkeypatch.setenv("OLLAMA_KEEP_ALIVE", keep_alive)
+    return LLMManager()
+
+
+def test_warm_up_overlaps_startup_and_primes_prefix(monkeypatch):
+    with StubOllamaServer(reply=_reply, load_seconds=0.3, seconds_per_token=0.0002) as server:
+        llm = _manager(monkeypatch, server)
+        started = time.perf_counter()
+        llm.warm_up(background=True)
+        # Returns immediately; the model loads while the caller does other work (cad.connect())
+        assert time.perf_counter() - started < 0.1
+        time.sleep(0.2)
+        assert llm.wait_until_warm(timeout=5)
+
+        tool_calls, _ = llm.process_prompt("draw a circle at the origin")
+        assert tool_calls[0]['function']['name'] == 'draw_circle'
+        warm, first = server.requests
+        assert warm['load_seconds'] == 0.3 and first['load_seconds'] == 0.0
+        assert server.loads == 1
+        # System prompt and tool schemas were evaluated during warm-up; only the user text is new
+        assert first['prompt_tokens'] < warm['prompt_tokens'] / 20
+        assert first['body']['keep_alive'] == "30m"
+        assert llm.first_answer_seconds is not None
+        assert llm.first_answer_seconds < 0.3 + warm['prompt_tokens'] * 0.0002 + 0.25
+
+
+def test_cold_start_pays_load_on_first_request(monkeypatch):
+    with StubOllamaServer(reply=_reply, load_seconds=0.2) as server:
+        llm = _manager(monkeypatch, server)
+        llm.process_prompt("draw a circle")
+        assert server.requests[0]['load_seconds'] == 0.2
+        assert llm.first_answer_seconds >= 0.2
+        assert llm.wait_until_warm(timeout=0)
+
+
+def test_keep_alive_controls_unloading(monkeypatch):
+    with StubOllamaServer(reply=_reply, load_seconds=0.05) as server:
+        llm = _manager(monkeypatch, server, keep_alive="0")
+        assert llm.keep_alive == 0
+        llm.process_prompt("one")
+        llm.process_prompt("two")
+        assert server.loads == 2
+
+    with StubOllamaServer(reply=_reply, load_seconds=0.05) as server:
+        llm = _manager(monkeypatch, server, keep_alive="-1")
+        llm.process_prompt("one")
+        llm.process_prompt("two")
+        assert server.loads == 1
+
+
+def test_failed_warm_up_does_not_raise(monkeypatch):
+    server = StubOllamaServer()
+    url = server.url
+    server._server.server_close()
+    monkeypatch.setenv("LLM_API_URL", url)
+    llm = LLMManager()
+    llm.warm_up(background=False)
+    assert llm.warmup_seconds is None
+
+
+def test_warm_up_primes_the_prefix_of_top_k_requests(monkeypatch):
+    for session in ("1", "0"):
+        monkeypatch.setenv("LLM_SESSION", session)
+        with StubOllamaServer(reply=_reply) as server:
+            llm = _manager(monkeypatch, server, top_k="6")
+            llm.warm_up(background=False)
+            llm.process_prompt("draw a circle at the origin with radius 1")
+            llm.process_prompt("turn off the layer DIM")
+            warm, first, second = (request['body'] for request in server.requests)
+            assert 0 < len(warm['tools']) < len(llm.tool_registry.tools)
+            # Same system prompt and tool block up front as the requests that follow
+            for request in (first, second):
+                assert request['messages'][0] == warm['messages'][0]
+                assert request['tools'][:len(warm['tools'])] == warm['tools']
+                assert len(request['tools']) < len(llm.tool_registry.tools)
+            assert 'set_layer_status' in {tool['function']['name'] for tool in second['tools']}
+            # Nearly all of the warm-up prompt is reused; only the added tools and the user text are new
+            reused = len(server.render(first)) / 4 - server.requests[1]['prompt_tokens']
+            assert reused > 0.95 * server.requests[0]['prompt_tokens']